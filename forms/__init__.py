@@ -14,6 +14,34 @@
 
 # Register APIs
 from ._version import __version__, version_info
-from forms.core.forms import from_df, from_db, DFWorkbook, DBWorkbook
+from forms.core.forms import (
+    from_df,
+    from_db,
+    from_stream,
+    from_checkpoint,
+    from_parquet,
+    from_arrow_ipc,
+    DFWorkbook,
+    DBWorkbook,
+    DuckDBWorkbook,
+    StreamingWorkbook,
+    FileWorkbook,
+    render_openmetrics,
+)
+from forms.core.sheet import Sheet
 
-__all__ = ["from_df", "from_db", "DFWorkbook", "DBWorkbook"]
+__all__ = [
+    "from_df",
+    "from_db",
+    "from_stream",
+    "from_checkpoint",
+    "from_parquet",
+    "from_arrow_ipc",
+    "DFWorkbook",
+    "DBWorkbook",
+    "DuckDBWorkbook",
+    "StreamingWorkbook",
+    "FileWorkbook",
+    "Sheet",
+    "render_openmetrics",
+]
@@ -14,6 +14,12 @@
 
 AUX_TABLE = "FormS_A"
 BASE_TABLE = "FormS_T"
+INPUT_TABLE = "FormS_I"
+# the rows of the input table inside the base view, and the tables holding the formula columns of a sheet
+BASE_ROWS = "FormS_R"
+SHEET_TABLE_PREFIX = "FormS_S_"
+# the results of a formula written into a table or column of the database, before they are moved there
+RESULT_TABLE = "FormS_Result"
 TRANSLATE_TEMP_TABLE = "FormS_Trans_Temp"
 TEMP_TABLE_PREFIX = "FormS_Temp_"
 TEMP_TABLE_COL_SUFFIX = "_A"
@@ -17,8 +17,22 @@ from forms.core.catalog import TableCatalog
 
 
 class DFConfig:
-    def __init__(self, enable_rewriting):
+    def __init__(
+        self,
+        enable_rewriting,
+        memory_tracking: str = None,
+        memory_budget: int = None,
+        use_polars: bool = False,
+        enable_fusion: bool = True,
+    ):
         self.df_enable_rewriting = enable_rewriting
+        # None disables memory accounting; a budget without a mode accounts for table sizes
+        self.memory_tracking = memory_tracking
+        self.memory_budget = memory_budget
+        # lower whole plans into polars expressions; plans that cannot be lowered run on pandas
+        self.use_polars = use_polars
+        # evaluate element-wise subtrees as one sequence of ufunc calls over reused buffers
+        self.enable_fusion = enable_fusion
 
 
 class DBConfig:
@@ -34,6 +48,8 @@ class DBConfig:
         order_key: list,
         enable_rewriting: bool,
         enable_pipelining: bool,
+        enable_explain: bool = False,
+        record_table_sizes: bool = False,
     ):
         self.host = host
         self.port = port
@@ -45,6 +61,18 @@ class DBConfig:
         self.order_key = order_key
         self.enable_pipelining = enable_pipelining
         self.db_enable_rewriting = enable_rewriting
+        self.enable_explain = enable_explain
+        self.record_table_sizes = record_table_sizes
+
+
+class DuckDBConfig:
+    def __init__(self, enable_rewriting: bool, enable_pipelining: bool, threads: int = None):
+        self.db_enable_rewriting = enable_rewriting
+        self.enable_pipelining = enable_pipelining
+        # None lets DuckDB use all cores
+        self.threads = threads
+        self.enable_explain = False
+        self.record_table_sizes = False
 
 
 class DFExecContext:
@@ -55,11 +83,9 @@ class DFExecContext:
 
 
 class DBExecContext:
-    def __init__(
-        self, conn, cursor, base_table: TableCatalog, formula_id_start: int, formula_id_end: int
-    ):
-        self.conn = conn
-        self.cursor = cursor
+    def __init__(self, dialect, base_table: TableCatalog, formula_id_start: int, formula_id_end: int):
+        # the SQLDialect that renders and runs the translated statements
+        self.dialect = dialect
         self.base_table = base_table
         self.formula_id_start = formula_id_start
         self.formula_id_end = formula_id_end
@@ -12,31 +12,80 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
+import numpy as np
+import os
 import pandas as pd
+import pickle
 import traceback
 import sys
 import psycopg2
 import time
 
 from psycopg2 import sql
-from forms.core.catalog import START_ROW_ID, TableCatalog, BASE_TABLE, AUX_TABLE, ROW_ID
+from forms.core.catalog import (
+    START_ROW_ID,
+    TableCatalog,
+    BASE_TABLE,
+    BASE_ROWS,
+    AUX_TABLE,
+    INPUT_TABLE,
+    RESULT_TABLE,
+    ROW_ID,
+    SHEET_TABLE_PREFIX,
+)
 
-from forms.core.config import DBConfig, DBExecContext, DFConfig, DFExecContext
+from forms.core.config import DBConfig, DBExecContext, DFConfig, DFExecContext, DuckDBConfig
 from forms.executor.dbexecutor.dbexecutor import DBExecutor
+from forms.executor.dbexecutor.dialect import DuckDBDialect, PostgresDialect
+from forms.executor.dbexecutor.journal import QueryJournal
 from forms.executor.dfexecutor.dfexecutor import DFExecutor
+from forms.executor.dfexecutor.dftable import DFTable
+from forms.executor.dfexecutor.filetable import ArrowIPCTable, FileTable, ParquetTable, ResultWriter
+from forms.executor.dfexecutor.incremental import MaintainedFormula
+from forms.executor.dfexecutor.kernels import start_warm_up
+from forms.executor.dfexecutor.polarsexecutor import PolarsExecutor, is_polars_available
+from forms.executor.dfexecutor.streaming import StreamFormula
 
 from forms.parser.parser import parse_formula
-from forms.planner.plannode import PlanNode
+from forms.planner.plancache import assign_ref_slots, plan_cache
+from forms.planner.plannode import PlanNode, FunctionNode
 from forms.planner.planrewriter import rewrite_plan
 from forms.utils.functions import FunctionExecutor
 from forms.utils.generic import get_columns_and_types
-from forms.utils.metrics import MetricsTracker, PARSING_TIME, REWRITE_TIME, MICROS_PER_SEC, TOTAL_TIME
+from forms.utils.metrics import (
+    MetricsTracker,
+    PARSING_TIME,
+    REWRITE_TIME,
+    EXECUTION_TIME,
+    MICROS_PER_SEC,
+    TOTAL_TIME,
+)
+from forms.utils.memory import MEMORY_TRACKING_MODES
+from forms.utils.metricsrecorder import metrics_recorder
+from forms.utils.tracing import (
+    Tracer,
+    write_chrome_trace,
+    BACKEND,
+    FORMULA,
+    FORMULA_SPAN,
+    COMPILE_SPAN,
+    EXECUTE_SPAN,
+)
 from forms.utils.validator import validate
 
 from forms.utils.exceptions import DBConfigException, DBRuntimeException, FormSException
 from forms.utils.reference import DEFAULT_AXIS
 from abc import ABC, abstractmethod
 
+PANDAS_BACKEND = "pandas"
+POLARS_BACKEND = "polars"
+DUCKDB_BACKEND = "duckdb"
+STREAM_CHECKPOINT_VERSION = 2
+# rows read at a time from memory-mapped files
+FILE_CHUNK_SIZE = 65536
+# rows updated per transaction when formula results are written into a column of the input table
+WRITE_BATCH_SIZE = 100000
+
 
 class Workbook(ABC):
     def __init__(self):
@@ -53,6 +102,12 @@ class Workbook(ABC):
     def get_metrics(self):
         return self.metrics_tracker.get_metrics()
 
+    def get_trace(self) -> list:
+        return self.metrics_tracker.get_trace()
+
+    def export_chrome_trace(self, path: str):
+        write_chrome_trace(self.metrics_tracker.get_trace(), path)
+
     def reset_metrics(self):
         self.metrics_tracker.reset_metrics()
 
@@ -65,40 +120,589 @@ class Workbook(ABC):
 
 
 class DFWorkbook(Workbook):
+    # formulas only read the shared table, so independent formula columns of a sheet run in parallel
+    parallel_sheet_columns = True
+
     def __init__(self, df_config: DFConfig, df: pd.DataFrame):
         super().__init__()
         self.df_config = df_config
-        self.df = df
+        # shared by all formulas so that cached per-column structures are reused across them
+        self.df_table = DFTable(df)
+        # whether df is a copy made by the workbook, which sheet columns may be added to
+        self.owns_df = False
+        # results kept up to date under set_values, keyed by formula string and number of formulas
+        self.maintained_formulas = {}
+        # window kernels compile in the background; formulas use pandas until they are ready
+        start_warm_up()
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """
+        The table formulas are computed over. It is not copied, so it may be modified in place: cached
+        per-column structures of modified columns are rebuilt by the next formula, but the results of
+        maintained formulas are only brought up to date by set_values or invalidate_caches.
+        """
+        return self.df_table.get_table_content()
+
+    @df.setter
+    def df(self, df: pd.DataFrame):
+        self.df_table.set_table_content(df)
+        self.owns_df = False
+        self.recompute_maintained_formulas()
+
+    def invalidate_caches(self):
+        # must be called after modifying self.df in place
+        self.df_table.invalidate()
+        self.recompute_maintained_formulas()
+
+    def set_values(self, rows, cols, values):
+        """
+        Writes values into the cells at the given row and column positions of df, which is modified in
+        place. rows and cols are positions or lists of distinct positions, and values is a scalar or an
+        array of shape (len(rows), len(cols)), or of shape (len(rows),) for one column. The results of
+        maintained formulas are brought up to date by evaluating only the formulas whose windows contain
+        an edited cell.
+        """
+        df = self.df
+        rows = np.atleast_1d(np.asarray(rows, dtype=np.int64))
+        cols = np.atleast_1d(np.asarray(cols, dtype=np.int64))
+        if np.unique(rows).size != rows.size or np.unique(cols).size != cols.size:
+            raise FormSException("The edited rows and columns must be distinct")
+        if rows.size == 0 or cols.size == 0:
+            return
+        if rows.min() < 0 or rows.max() >= df.shape[0] or cols.min() < 0 or cols.max() >= df.shape[1]:
+            raise FormSException(f"Edited cells are outside of the {df.shape[0]}x{df.shape[1]} table")
+        values = np.asarray(values)
+        if values.ndim == 1 and cols.size == 1:
+            values = values[:, np.newaxis]
+        values = np.broadcast_to(values, (rows.size, cols.size))
+
+        old_dtypes = list(df.dtypes.iloc[cols])
+        old_values = df.iloc[rows, cols].to_numpy(dtype=object)
+        for idx, col in enumerate(cols):
+            try:
+                df.iloc[rows, col] = values[:, idx]
+            except (TypeError, ValueError):
+                # the values do not fit the column's dtype, so the column is rebuilt with a wider one
+                column = df.iloc[:, col].to_numpy(dtype=object, copy=True)
+                column[rows] = values[:, idx]
+                df.isetitem(col, pd.Series(column, index=df.index).infer_objects())
+        new_values = df.iloc[rows, cols].to_numpy(dtype=object)
+
+        if list(df.dtypes.iloc[cols]) != old_dtypes:
+            # the plans may have been compiled for the old dtypes
+            self.invalidate_caches()
+            return
+        self.df_table.invalidate_columns(cols)
+        edited_rows = np.repeat(rows, cols.size)
+        edited_cols = np.tile(cols, rows.size)
+        for maintained_formula in self.maintained_formulas.values():
+            maintained_formula.apply_edits(
+                self.df_table, edited_rows, edited_cols, old_values.ravel(), new_values.ravel()
+            )
+
+    def get_result(self, formula_str: str, num_formulas: int = 0) -> pd.DataFrame:
+        # the current result of a formula computed with maintain=True
+        key = (formula_str, num_formulas)
+        if key not in self.maintained_formulas:
+            raise FormSException(f"Formula {formula_str} is not maintained")
+        return self.maintained_formulas[key].get_result()
+
+    def release_formula(self, formula_str: str, num_formulas: int = 0):
+        self.maintained_formulas.pop((formula_str, num_formulas), None)
+
+    def add_sheet_column(self, name) -> int:
+        # formula columns of a sheet start out as nulls after the columns of df
+        if name in self.df.columns:
+            raise FormSException(f"Column {name} already exists")
+        if not self.owns_df:
+            # the caller's frame is left as it was
+            self.df = self.df.copy()
+            self.owns_df = True
+        df = self.df
+        df[name] = np.nan
+        self.df_table.invalidate_columns([df.shape[1] - 1])
+        return df.shape[1] - 1
+
+    def evaluate_sheet_column(self, col: int, formula_str: str) -> np.ndarray:
+        # other columns may be evaluated at the same time, so the result is written by store_sheet_column
+        return self.evaluate_formula(formula_str).iloc[:, 0].to_numpy()
+
+    def store_sheet_column(self, col: int, values: np.ndarray):
+        df = self.df
+        df.isetitem(col, pd.Series(values, index=df.index))
+        self.df_table.invalidate_columns([col])
+        if self.maintained_formulas:
+            self.recompute_maintained_formulas()
+
+    def release_sheet_column(self, col: int):
+        # a read-only view repeating one null holds no values, and copies of df get a regular column
+        df = self.df
+        nulls = np.broadcast_to(np.float64(np.nan), df.shape[0])
+        df.isetitem(col, pd.Series(nulls, index=df.index, copy=False))
+        self.df_table.invalidate_columns([col])
+
+    def read_sheet_columns(self, cols: list) -> pd.DataFrame:
+        return self.df.iloc[:, cols].copy()
+
+    def recompute_maintained_formulas(self):
+        for maintained_formula in self.maintained_formulas.values():
+            executor = DFExecutor(self.df_config, maintained_formula.exec_context, self.metrics_tracker)
+            program = executor.compile_formula_plan(self.df_table, maintained_formula.formula_plan)
+            maintained_formula.recompute(self.df_table, program)
 
     def compute_formula(self, formula_str: str, num_formulas: int = 0, **kwargs) -> pd.DataFrame:
+        # with maintain=True, the result is kept up to date by set_values and read with get_result
         try:
-            root = parse_formula_str(formula_str)
-            validate(FunctionExecutor.DF_EXECUTOR, self.df.shape[0], self.df.shape[1], root)
-            root = rewrite_plan(root, df_enable_rewriting=self.df_config.df_enable_rewriting)
+            return self.evaluate_formula(formula_str, num_formulas, kwargs.get("maintain", False))
+        except FormSException as e:
+            metrics_recorder.record_error("df")
+            print(f"An error occurred: {e}")
+            traceback.print_exception(*sys.exc_info())
+
+    def evaluate_formula(self, formula_str: str, num_formulas: int = 0, maintain=False) -> pd.DataFrame:
+        # compute_formula without the error handling
+        self.df_table.invalidate_changed_columns()
+        tracer = Tracer()
+        with tracer.span(FORMULA_SPAN, **{BACKEND: "df", FORMULA: formula_str}) as formula_span:
+            with tracer.span(COMPILE_SPAN):
+                root = compile_formula_str(
+                    formula_str,
+                    FunctionExecutor.DF_EXECUTOR,
+                    self.df.shape[0],
+                    self.df.shape[1],
+                    self.metrics_tracker,
+                    df_enable_rewriting=self.df_config.df_enable_rewriting,
+                )
 
+            key = (formula_str, num_formulas)
             if num_formulas <= 0:
                 num_formulas = self.df.shape[0]
             exec_context = DFExecContext(0, num_formulas, DEFAULT_AXIS)
-            executor = DFExecutor(self.df_config, exec_context, self.metrics_tracker)
-            res = executor.execute_formula_plan(self.df, root)
-            executor.clean_up()
+            with tracer.span(EXECUTE_SPAN):
+                if maintain:
+                    # maintained formulas keep their compiled program to evaluate edited ranges
+                    executor = DFExecutor(self.df_config, exec_context, self.metrics_tracker, tracer)
+                    program = executor.compile_formula_plan(self.df_table, root)
+                    res = executor.execute_program(self.df_table, program)
+                    self.maintained_formulas[key] = MaintainedFormula(
+                        root, program, exec_context, res.iloc[:, 0].to_numpy(copy=True)
+                    )
+                else:
+                    executor_class = PolarsExecutor if self.df_config.use_polars else DFExecutor
+                    executor = executor_class(self.df_config, exec_context, self.metrics_tracker, tracer)
+                    res = executor.execute_formula_plan(self.df_table, root)
+                executor.clean_up()
+
+        self.metrics_tracker.put_one_metric(TOTAL_TIME, formula_span.wall_time)
+        self.metrics_tracker.put_trace(tracer.get_root_spans())
+        metrics_recorder.record_formula(
+            "df", get_top_level_function_name(root), self.metrics_tracker.metrics
+        )
+        return res
 
-            return res
+    def print_workbook(self, num_rows=10, keep_original_labels=False):
+        print_workbook_view(self.df.head(num_rows), keep_original_labels)
+
+    def close(self):
+        self.maintained_formulas = {}
+        self.df = None
+
+
+class StreamingWorkbook(Workbook):
+    """
+    Formulas over a table that only grows by appended batches of rows. The rows themselves are not kept,
+    only the window state of the registered formulas, so formulas are registered before the first
+    batch and every batch returns the formula values that became final with it.
+    """
+
+    def __init__(self, df_config: DFConfig, columns: list):
+        super().__init__()
+        self.df_config = df_config
+        self.columns = list(columns)
+        self.num_rows = 0
+        self.stream_formulas = {}
+        self.last_batch = None
+        start_warm_up()
+
+    def compute_formula(self, formula_str: str, num_formulas: int = -1, **kwargs) -> pd.DataFrame:
+        # registers a formula evaluated for every appended row; no value is final before the first batch
+        try:
+            if self.num_rows > 0:
+                raise FormSException("Formulas must be registered before rows are appended")
+            root = compile_formula_str(
+                formula_str,
+                FunctionExecutor.DF_EXECUTOR,
+                sys.maxsize,
+                len(self.columns),
+                self.metrics_tracker,
+                df_enable_rewriting=self.df_config.df_enable_rewriting,
+            )
+            self.stream_formulas[formula_str] = StreamFormula(root)
+            # a formula is counted once, when it is registered
+            metrics_recorder.record_formula(
+                "stream", get_top_level_function_name(root), self.metrics_tracker.metrics
+            )
+            return pd.DataFrame(np.empty(0))
         except FormSException as e:
+            metrics_recorder.record_error("stream")
             print(f"An error occurred: {e}")
             traceback.print_exception(*sys.exc_info())
 
+    def append(self, batch: pd.DataFrame) -> dict:
+        """
+        Appends rows to the table. Returns, for each registered formula string, a DataFrame of the values
+        that became final, indexed by the position of their formula.
+        """
+        if batch.shape[1] != len(self.columns):
+            raise FormSException(f"Appended rows must have {len(self.columns)} columns")
+        block = self.get_float_block(batch)
+        results = {}
+        for formula_str, stream_formula in self.stream_formulas.items():
+            start, values = stream_formula.append(block)
+            results[formula_str] = pd.DataFrame(values, index=pd.RangeIndex(start, start + values.size))
+        self.num_rows += batch.shape[0]
+        self.last_batch = batch
+        return results
+
+    def get_float_block(self, batch: pd.DataFrame) -> np.ndarray:
+        # columns that no formula reads are left as nulls
+        block = np.full(batch.shape, np.nan)
+        for col in set().union(*(formula.get_columns() for formula in self.stream_formulas.values())):
+            try:
+                block[:, col] = batch.iloc[:, col].to_numpy(dtype=np.float64, na_value=np.nan)
+            except (TypeError, ValueError):
+                raise FormSException(f"Column {self.columns[col]} must be numeric to be streamed")
+        return block
+
+    def save_checkpoint(self, path: str):
+        # written to a temporary file first, so that a crash never leaves a partial checkpoint behind
+        state = {
+            "version": STREAM_CHECKPOINT_VERSION,
+            "df_config": self.df_config,
+            "columns": self.columns,
+            "num_rows": self.num_rows,
+            "stream_formulas": self.stream_formulas,
+        }
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f)
+        os.replace(tmp_path, path)
+
     def print_workbook(self, num_rows=10, keep_original_labels=False):
-        print_workbook_view(self.df.head(num_rows), keep_original_labels)
+        # only the last batch is at hand
+        if self.last_batch is not None:
+            print_workbook_view(self.last_batch.head(num_rows), keep_original_labels)
 
     def close(self):
-        self.df = None
+        self.stream_formulas = {}
+        self.last_batch = None
 
 
-class DBWorkbook(Workbook):
-    def __init__(self, db_config: DBConfig):
+class FileWorkbook(Workbook):
+    """
+    Formulas over a table in a memory-mapped Arrow IPC or Parquet file, which is never loaded as a
+    whole. A formula reads the columns it references in chunks of rows through the windows of the
+    streaming mode: they keep the rows of the next chunk's windows that start in earlier chunks, and
+    the running state of FR and RF references. Its values are emitted as they become final, into an
+    output file by compute_formula_into, so neither the table nor the results need to fit in memory.
+    """
+
+    def __init__(self, df_config: DFConfig, file_table: FileTable, chunk_size: int):
+        super().__init__()
+        if chunk_size <= 0:
+            file_table.close()
+            raise FormSException(f"The chunk size must be positive, got {chunk_size}")
+        self.df_config = df_config
+        self.file_table = file_table
+        self.chunk_size = chunk_size
+        start_warm_up()
+
+    def compute_formula(self, formula_str: str, num_formulas: int = 0, **kwargs) -> pd.DataFrame:
+        # the values are collected in memory; compute_formula_into writes them to a file instead
+        try:
+            values = []
+            root = self.compile_formula(formula_str)
+            self.evaluate_formula(formula_str, root, num_formulas, values.append)
+            return pd.DataFrame(np.concatenate(values) if values else np.empty(0))
+        except FormSException as e:
+            metrics_recorder.record_error("file")
+            print(f"An error occurred: {e}")
+            traceback.print_exception(*sys.exc_info())
+
+    def compute_formula_into(self, formula_str: str, output_path: str, num_formulas: int = 0) -> int:
+        """
+        Writes the values of a formula to output_path, as Parquet when it ends with .parquet and as an
+        Arrow IPC file otherwise. Returns the number of values written.
+        """
+        try:
+            # compiled first, so that an invalid formula leaves no file behind
+            root = self.compile_formula(formula_str)
+            writer = ResultWriter(output_path, formula_str)
+            try:
+                self.evaluate_formula(formula_str, root, num_formulas, writer.write)
+            except BaseException:
+                writer.abort()
+                raise
+            writer.close()
+            return writer.num_written
+        except FormSException as e:
+            metrics_recorder.record_error("file")
+            print(f"An error occurred: {e}")
+            traceback.print_exception(*sys.exc_info())
+
+    def compile_formula(self, formula_str: str) -> PlanNode:
+        return compile_formula_str(
+            formula_str,
+            FunctionExecutor.DF_EXECUTOR,
+            self.file_table.num_rows,
+            len(self.file_table.columns),
+            self.metrics_tracker,
+            df_enable_rewriting=self.df_config.df_enable_rewriting,
+        )
+
+    def evaluate_formula(self, formula_str: str, root: PlanNode, num_formulas: int, write_values):
+        # passes the values of formulas [0, num_formulas) to write_values, in order and chunk by chunk
+        stream_formula = StreamFormula(root)
+        cols = sorted(stream_formula.get_columns())
+        stream_formula.select_columns(cols)
+        num_rows = self.file_table.num_rows
+        num_formulas = num_rows if num_formulas <= 0 else min(num_formulas, num_rows)
+
+        tracer = Tracer()
+        with tracer.span(FORMULA_SPAN, **{BACKEND: "file", FORMULA: formula_str}) as formula_span:
+            with tracer.span(EXECUTE_SPAN) as execute_span:
+                for block in self.file_table.iter_blocks(cols, self.chunk_size):
+                    start, values = stream_formula.append(block)
+                    write_values(values[: max(num_formulas - start, 0)])
+                    if stream_formula.num_emitted >= num_formulas:
+                        break
+                else:
+                    start, values = stream_formula.finish()
+                    write_values(values[: max(num_formulas - start, 0)])
+
+        self.metrics_tracker.put_one_metric(EXECUTION_TIME, execute_span.wall_time)
+        self.metrics_tracker.put_one_metric(TOTAL_TIME, formula_span.wall_time)
+        self.metrics_tracker.put_trace(tracer.get_root_spans())
+        metrics_recorder.record_formula(
+            "file", get_top_level_function_name(root), self.metrics_tracker.metrics
+        )
+
+    def print_workbook(self, num_rows=10, keep_original_labels=False):
+        print_workbook_view(self.file_table.read_head(num_rows), keep_original_labels)
+
+    def close(self):
+        self.file_table.close()
+
+
+class SQLWorkbook(Workbook):
+    # Formulas are translated to SQL and run by DBExecutor; subclasses set up the base table and dialect
+    backend = ""
+    function_executor = None
+    # statements run on one connection, so the formula columns of a sheet are computed one at a time
+    parallel_sheet_columns = False
+
+    def __init__(self, db_config):
         super().__init__()
         self.db_config = db_config
+        self.dialect = None
+        self.num_rows = 0
+        self.num_columns = 0
+        self.base_table = None
+        self.query_journal = QueryJournal(
+            enable_explain=db_config.enable_explain, record_table_sizes=db_config.record_table_sizes
+        )
+        # formula columns of a Sheet as [name, result table, value column]; the table is None until computed
+        self.sheet_columns = []
+
+    def compute_formula(self, formula_str: str, num_formulas: int = -1, **kwargs) -> pd.DataFrame:
+        try:
+            return self.evaluate_formula(formula_str, num_formulas)
+        except FormSException as e:
+            metrics_recorder.record_error(self.backend)
+            print(f"An error occurred: {e}")
+            traceback.print_exception(*sys.exc_info())
+
+    def evaluate_formula(
+        self, formula_str: str, num_formulas: int = -1, result_table_name: str = None
+    ) -> pd.DataFrame:
+        # compute_formula without the error handling; with a result_table_name, the results are
+        # written into that table on the server and None is returned
+        tracer = Tracer()
+        with tracer.span(FORMULA_SPAN, **{BACKEND: self.backend, FORMULA: formula_str}) as formula_span:
+            with tracer.span(COMPILE_SPAN):
+                root = compile_formula_str(
+                    formula_str,
+                    self.function_executor,
+                    self.num_rows,
+                    self.num_columns,
+                    self.metrics_tracker,
+                    db_enable_rewriting=self.db_config.db_enable_rewriting,
+                )
+
+            if num_formulas <= 0:
+                num_formulas = self.num_rows
+            exec_context = DBExecContext(
+                self.dialect, self.base_table, START_ROW_ID, START_ROW_ID + num_formulas
+            )
+            with tracer.span(EXECUTE_SPAN):
+                executor = DBExecutor(
+                    self.db_config, exec_context, self.metrics_tracker, tracer, self.query_journal
+                )
+                try:
+                    res = executor.execute_formula_plan(root, formula_str, result_table_name)
+                finally:
+                    executor.clean_up()
+
+        self.metrics_tracker.put_one_metric(TOTAL_TIME, formula_span.wall_time)
+        self.metrics_tracker.put_trace(tracer.get_root_spans())
+        metrics_recorder.record_formula(
+            self.backend, get_top_level_function_name(root), self.metrics_tracker.metrics
+        )
+        return res
+
+    def print_sql_strings(self, formula_str: str, num_formulas: int = -1, **kwargs):
+        try:
+            root = compile_formula_str(
+                formula_str,
+                self.function_executor,
+                self.num_rows,
+                self.num_columns,
+                self.metrics_tracker,
+                db_enable_rewriting=self.db_config.db_enable_rewriting,
+            )
+
+            if num_formulas <= 0:
+                num_formulas = self.num_rows
+            exec_context = DBExecContext(
+                self.dialect, self.base_table, START_ROW_ID, START_ROW_ID + num_formulas
+            )
+            executor = DBExecutor(self.db_config, exec_context, self.metrics_tracker)
+            sql_strings = executor.get_sql_strings(root)
+            executor.clean_up()
+
+            for s in sql_strings:
+                print(s)
+        except FormSException as e:
+            print(f"An error occurred: {e}")
+            traceback.print_exception(*sys.exc_info())
+
+    def get_query_journal(self) -> list:
+        return self.query_journal.get_entries()
+
+    def dump_query_journal(self, path: str):
+        self.query_journal.dump_jsonl(path)
+
+    def clear_query_journal(self):
+        self.query_journal.clear()
+
+    def set_explain_enabled(self, enable_explain: bool):
+        # with EXPLAIN ANALYZE enabled, the final query of each formula runs twice
+        self.query_journal.enable_explain = enable_explain
+
+    def set_table_sizes_enabled(self, record_table_sizes: bool):
+        # journal entries and trace spans then carry the size of each intermediate table
+        self.query_journal.record_table_sizes = record_table_sizes
+
+    @abstractmethod
+    def get_base_rows_query(self) -> sql.Composable:
+        # the rows of the input table with their row ids, in order
+        pass
+
+    def create_base_view(self):
+        # the base rows followed by the formula columns of a sheet, joined from their result tables
+        rows = sql.Identifier(BASE_ROWS)
+        columns = [sql.SQL("{rows}.*").format(rows=rows)]
+        joins = []
+        for name, table_name, value_column in self.sheet_columns:
+            if table_name is None:
+                columns.append(
+                    sql.SQL("CAST(NULL AS DOUBLE PRECISION) AS {name}").format(name=sql.Identifier(name))
+                )
+                continue
+            table = sql.Identifier(table_name)
+            columns.append(
+                sql.SQL("{table}.{value_column} AS {name}").format(
+                    table=table, value_column=sql.Identifier(value_column), name=sql.Identifier(name)
+                )
+            )
+            joins.append(
+                sql.SQL("LEFT JOIN {table} ON {table}.{row_id} = {rows}.{row_id}").format(
+                    table=table, row_id=sql.Identifier(ROW_ID), rows=rows
+                )
+            )
+        self.dialect.execute(
+            sql.SQL("DROP VIEW IF EXISTS {view_name}").format(view_name=sql.Identifier(BASE_TABLE))
+        )
+        self.dialect.execute(
+            sql.SQL(
+                "CREATE VIEW {view_name} AS SELECT {columns} FROM ({rows_query}) AS {rows} {joins}"
+            ).format(
+                view_name=sql.Identifier(BASE_TABLE),
+                columns=sql.SQL(", ").join(columns),
+                rows_query=self.get_base_rows_query(),
+                rows=rows,
+                joins=sql.SQL(" ").join(joins),
+            )
+        )
+        column_names, column_types = self.dialect.get_columns_and_types(BASE_TABLE)
+        self.base_table = TableCatalog(BASE_TABLE, column_names[1:], column_types[1:])
+        self.num_columns = len(column_names) - 1
+
+    def add_sheet_column(self, name: str) -> int:
+        if name in self.base_table.table_columns:
+            raise FormSException(f"Column {name} already exists")
+        self.sheet_columns.append([name, None, None])
+        self.create_base_view()
+        self.dialect.commit()
+        return self.num_columns - 1
+
+    def get_sheet_column(self, col: int) -> list:
+        return self.sheet_columns[col - self.num_columns + len(self.sheet_columns)]
+
+    def evaluate_sheet_column(self, col: int, formula_str: str) -> str:
+        # the results stay on the server, in a table of row ids and values
+        self.release_sheet_column(col)
+        table_name = f"{SHEET_TABLE_PREFIX}{col}"
+        self.evaluate_formula(formula_str, result_table_name=table_name)
+        return table_name
+
+    def store_sheet_column(self, col: int, table_name: str):
+        column_names, _ = self.dialect.get_columns_and_types(table_name)
+        sheet_column = self.get_sheet_column(col)
+        sheet_column[1:] = [table_name, column_names[1]]
+        self.create_base_view()
+        self.dialect.commit()
+
+    def release_sheet_column(self, col: int):
+        sheet_column = self.get_sheet_column(col)
+        table_name = sheet_column[1]
+        if table_name is None:
+            return
+        sheet_column[1:] = [None, None]
+        self.create_base_view()
+        self.dialect.execute(
+            sql.SQL("DROP TABLE IF EXISTS {table_name}").format(table_name=sql.Identifier(table_name))
+        )
+        self.dialect.commit()
+
+    def read_sheet_columns(self, cols: list) -> pd.DataFrame:
+        query = sql.SQL("SELECT {row_id}, {columns} FROM {view_name} ORDER BY {row_id}").format(
+            row_id=sql.Identifier(ROW_ID),
+            columns=sql.SQL(", ").join(
+                sql.Identifier(self.base_table.get_table_column(col)) for col in cols
+            ),
+            view_name=sql.Identifier(BASE_TABLE),
+        )
+        return self.dialect.read_query(query).drop(columns=ROW_ID)
+
+
+class DBWorkbook(SQLWorkbook):
+    backend = "db"
+    function_executor = FunctionExecutor.DB_EXECUTOR
+
+    def __init__(self, db_config: DBConfig):
+        super().__init__(db_config)
         self.connection = None
         self.cursor = None
         try:
@@ -110,6 +714,7 @@ class DBWorkbook(Workbook):
                 dbname=db_config.db_name,
             )
             self.cursor = self.connection.cursor()
+            self.dialect = PostgresDialect(self.connection, self.cursor)
 
             # if not self.__check_primary_key():
             #     raise DBConfigException(
@@ -127,6 +732,7 @@ class DBWorkbook(Workbook):
 
             self.base_table = TableCatalog(BASE_TABLE, column_names, column_types)
             self.__build_auxiliary_and_base_tables()
+            self.create_base_view()
 
             self.connection.commit()
         except psycopg2.Error as e:
@@ -234,88 +840,168 @@ class DBWorkbook(Workbook):
                 )
             )
 
-        # Create the Base View
-        cur.execute(
-            sql.SQL(
-                """
-            CREATE OR REPLACE VIEW {view_name} AS
+    def get_base_rows_query(self) -> sql.Composable:
+        return sql.SQL(
+            """
             SELECT {auxiliary_table_name}.{row_id}, {input_table_name}.*
             FROM {input_table_name}
             JOIN {auxiliary_table_name} ON {join_condition}
             """
-            ).format(
-                view_name=sql.Identifier(BASE_TABLE),
-                row_id=sql.Identifier(ROW_ID),
-                auxiliary_table_name=sql.Identifier(AUX_TABLE),
+        ).format(
+            row_id=sql.Identifier(ROW_ID),
+            auxiliary_table_name=sql.Identifier(AUX_TABLE),
+            input_table_name=sql.Identifier(self.db_config.table_name),
+            join_condition=self.__get_primary_key_condition(),
+        )
+
+    def __get_primary_key_condition(self) -> sql.Composable:
+        # matches the rows of the input table with their row ids in the auxiliary table
+        return sql.SQL(" AND ").join(
+            sql.SQL("""{input_table_name}.{col_one} = {auxiliary_table_name}.{col_two}""").format(
                 input_table_name=sql.Identifier(self.db_config.table_name),
-                join_condition=sql.SQL(" AND ").join(
-                    sql.SQL(
-                        """{input_table_name}.{col_one} = {auxiliary_table_name}.{col_two}"""
-                    ).format(
-                        input_table_name=sql.Identifier(self.db_config.table_name),
-                        auxiliary_table_name=sql.Identifier(AUX_TABLE),
-                        col_one=sql.Identifier(col),
-                        col_two=sql.Identifier(col),
-                    )
-                    for col in self.db_config.primary_key
-                ),
+                auxiliary_table_name=sql.Identifier(AUX_TABLE),
+                col_one=sql.Identifier(col),
+                col_two=sql.Identifier(col),
             )
+            for col in self.db_config.primary_key
         )
 
-    def compute_formula(self, formula_str: str, num_formulas: int = -1, **kwargs) -> pd.DataFrame:
+    def compute_formula_into(
+        self,
+        formula_str: str,
+        column_name: str,
+        table_name: str = None,
+        num_formulas: int = -1,
+        batch_size: int = WRITE_BATCH_SIZE,
+    ) -> int:
+        """
+        Computes a formula and writes its results on the server instead of fetching them. With a
+        table_name, the results go into a new table holding the primary key and column_name. Otherwise
+        column_name of the input table is updated, and added when it does not exist, with a commit
+        every batch_size rows. Returns the number of rows written.
+        """
         try:
-            init_time = time.time()
-            start_time = init_time
-            root = parse_formula_str(formula_str)
-            end_time = time.time()
-            parse_time = int((end_time - start_time) * MICROS_PER_SEC)
-            self.metrics_tracker.put_one_metric(PARSING_TIME, parse_time)
-            validate(FunctionExecutor.DB_EXECUTOR, self.num_rows, self.num_columns, root)
-
-            start_time = end_time
-            root = rewrite_plan(root, db_enable_rewriting=self.db_config.db_enable_rewriting)
-            end_time = time.time()
-            rewrite_time = int((end_time - start_time) * MICROS_PER_SEC)
-            self.metrics_tracker.put_one_metric(REWRITE_TIME, rewrite_time)
-
-            if num_formulas <= 0:
-                num_formulas = self.num_rows
-            exec_context = DBExecContext(
-                self.connection, self.cursor, self.base_table, START_ROW_ID, START_ROW_ID + num_formulas
-            )
-            executor = DBExecutor(self.db_config, exec_context, self.metrics_tracker)
-            res = executor.execute_formula_plan(root)
-            executor.clean_up()
-
-            self.metrics_tracker.put_one_metric(
-                TOTAL_TIME, int((time.time() - init_time) * MICROS_PER_SEC)
+            return self.__write_formula_results(
+                formula_str, column_name, table_name, num_formulas, batch_size
             )
-
-            return res
         except FormSException as e:
+            self.connection.rollback()
+            metrics_recorder.record_error(self.backend)
             print(f"An error occurred: {e}")
             traceback.print_exception(*sys.exc_info())
+        finally:
+            self.__drop_table(RESULT_TABLE)
 
-    def print_sql_strings(self, formula_str: str, num_formulas: int = -1, **kwargs):
+    def __write_formula_results(
+        self, formula_str: str, column_name: str, table_name: str, num_formulas: int, batch_size: int
+    ) -> int:
+        if batch_size <= 0:
+            raise FormSException(f"The batch size must be positive, got {batch_size}")
+        if table_name is None and column_name in self.db_config.primary_key + self.db_config.order_key:
+            raise FormSException(f"Column {column_name} is part of the primary key or the order key")
         try:
-            root = parse_formula_str(formula_str)
-            validate(FunctionExecutor.DB_EXECUTOR, self.num_rows, self.num_columns, root)
-            root = rewrite_plan(root, db_enable_rewriting=self.db_config.db_enable_rewriting)
+            input_columns, _ = self.__get_columns_and_types()
+            add_column = table_name is None and column_name not in input_columns
+            if add_column and self.sheet_columns:
+                # the new column would take the letter of the first formula column of the sheet
+                raise FormSException(
+                    f"Column {column_name} cannot be added while a sheet has formula columns"
+                )
 
-            if num_formulas <= 0:
-                num_formulas = self.num_rows
-            exec_context = DBExecContext(
-                self.connection, self.cursor, self.base_table, START_ROW_ID, START_ROW_ID + num_formulas
+            self.__drop_table(RESULT_TABLE)
+            self.evaluate_formula(formula_str, num_formulas, result_table_name=RESULT_TABLE)
+            column_names, column_types = self.dialect.get_columns_and_types(RESULT_TABLE)
+            value_column = sql.Identifier(column_names[1])
+            if table_name is not None:
+                self.cursor.execute(
+                    sql.SQL(
+                        """
+                        CREATE TABLE {table_name} AS
+                        SELECT {pk_cols}, {result_table_name}.{value_column} AS {column_name}
+                        FROM {result_table_name}
+                        JOIN {auxiliary_table_name}
+                          ON {auxiliary_table_name}.{row_id} = {result_table_name}.{row_id}
+                        ORDER BY {result_table_name}.{row_id}
+                        """
+                    ).format(
+                        table_name=sql.Identifier(table_name),
+                        pk_cols=sql.SQL(", ").join(
+                            sql.Identifier(AUX_TABLE, col) for col in self.db_config.primary_key
+                        ),
+                        result_table_name=sql.Identifier(RESULT_TABLE),
+                        value_column=value_column,
+                        column_name=sql.Identifier(column_name),
+                        auxiliary_table_name=sql.Identifier(AUX_TABLE),
+                        row_id=sql.Identifier(ROW_ID),
+                    )
+                )
+                num_written = self.cursor.rowcount
+                self.connection.commit()
+                return num_written
+
+            if add_column:
+                self.cursor.execute(
+                    sql.SQL(
+                        "ALTER TABLE {input_table_name} ADD COLUMN {column_name} {column_type}"
+                    ).format(
+                        input_table_name=sql.Identifier(self.db_config.table_name),
+                        column_name=sql.Identifier(column_name),
+                        column_type=sql.SQL(column_types[1]),
+                    )
+                )
+                # later formulas read the new column after the other columns of the input table
+                self.create_base_view()
+                self.connection.commit()
+            self.cursor.execute(
+                sql.SQL("SELECT MAX({row_id}) FROM {result_table_name}").format(
+                    row_id=sql.Identifier(ROW_ID), result_table_name=sql.Identifier(RESULT_TABLE)
+                )
             )
-            executor = DBExecutor(self.db_config, exec_context, self.metrics_tracker)
-            sql_strings = executor.get_sql_strings(root)
-            executor.clean_up()
+            last_row_id = self.cursor.fetchone()[0] or START_ROW_ID - 1
+            if last_row_id - START_ROW_ID >= batch_size:
+                # each batch reads one range of row ids
+                self.cursor.execute(
+                    sql.SQL("CREATE INDEX ON {result_table_name} ({row_id})").format(
+                        result_table_name=sql.Identifier(RESULT_TABLE), row_id=sql.Identifier(ROW_ID)
+                    )
+                )
+            num_written = 0
+            for batch_start in range(START_ROW_ID, last_row_id + 1, batch_size):
+                self.cursor.execute(
+                    sql.SQL(
+                        """
+                        UPDATE {input_table_name}
+                        SET {column_name} = {result_table_name}.{value_column}
+                        FROM {result_table_name}
+                        JOIN {auxiliary_table_name}
+                          ON {auxiliary_table_name}.{row_id} = {result_table_name}.{row_id}
+                        WHERE {result_table_name}.{row_id} >= {batch_start}
+                          AND {result_table_name}.{row_id} < {batch_end}
+                          AND {join_condition}
+                        """
+                    ).format(
+                        input_table_name=sql.Identifier(self.db_config.table_name),
+                        column_name=sql.Identifier(column_name),
+                        result_table_name=sql.Identifier(RESULT_TABLE),
+                        value_column=value_column,
+                        auxiliary_table_name=sql.Identifier(AUX_TABLE),
+                        row_id=sql.Identifier(ROW_ID),
+                        batch_start=sql.Literal(batch_start),
+                        batch_end=sql.Literal(batch_start + batch_size),
+                        join_condition=self.__get_primary_key_condition(),
+                    )
+                )
+                num_written += self.cursor.rowcount
+                self.connection.commit()
+            return num_written
+        except psycopg2.Error as e:
+            raise DBRuntimeException(f"DB Runtime Error: {e}")
 
-            for s in sql_strings:
-                print(s)
-        except FormSException as e:
-            print(f"An error occurred: {e}")
-            traceback.print_exception(*sys.exc_info())
+    def __drop_table(self, table_name: str):
+        self.cursor.execute(
+            sql.SQL("DROP TABLE IF EXISTS {table_name}").format(table_name=sql.Identifier(table_name))
+        )
+        self.connection.commit()
 
     def print_workbook(self, num_rows=10, keep_original_labels=False):
         order_by_clause = ", ".join(self.db_config.order_key)
@@ -336,6 +1022,13 @@ class DBWorkbook(Workbook):
             cur.execute(
                 sql.SQL("DROP TABLE IF EXISTS {table_name}").format(table_name=sql.Identifier(AUX_TABLE))
             )
+            for _, table_name, _ in self.sheet_columns:
+                if table_name is not None:
+                    cur.execute(
+                        sql.SQL("DROP TABLE IF EXISTS {table_name}").format(
+                            table_name=sql.Identifier(table_name)
+                        )
+                    )
             self.connection.commit()
         except psycopg2.Error as e:
             self.connection.rollback()
@@ -346,8 +1039,102 @@ class DBWorkbook(Workbook):
             self.connection.close()
 
 
-def from_df(df: pd.DataFrame, enable_rewriting=True) -> DFWorkbook:
-    return DFWorkbook(DFConfig(enable_rewriting), df)
+class DuckDBWorkbook(SQLWorkbook):
+    backend = "duckdb"
+    function_executor = FunctionExecutor.DUCKDB_EXECUTOR
+
+    def __init__(self, duckdb_config: DuckDBConfig, df: pd.DataFrame):
+        super().__init__(duckdb_config)
+        try:
+            import duckdb
+        except ImportError:
+            raise FormSException("The duckdb backend requires the duckdb package")
+
+        self.df = df
+        self.num_rows, self.num_columns = df.shape
+        self.connection = duckdb.connect()
+        self.dialect = DuckDBDialect(self.connection)
+        try:
+            if duckdb_config.threads is not None:
+                self.connection.execute(f"SET threads = {int(duckdb_config.threads)}")
+            # the DataFrame is scanned in place rather than copied into DuckDB
+            self.connection.register(INPUT_TABLE, df)
+            self.create_base_view()
+        except duckdb.Error as e:
+            self.connection.close()
+            raise DBRuntimeException(f"DB Runtime Error: {e}")
+
+    def get_base_rows_query(self) -> sql.Composable:
+        # without an ORDER BY, row_number() follows the scan order, which is the order of the rows in df
+        return sql.SQL(
+            """
+            SELECT row_number() OVER () AS {row_id}, *
+            FROM {input_table_name}
+            """
+        ).format(row_id=sql.Identifier(ROW_ID), input_table_name=sql.Identifier(INPUT_TABLE))
+
+    def print_workbook(self, num_rows=10, keep_original_labels=False):
+        print_workbook_view(self.df.head(num_rows), keep_original_labels)
+
+    def close(self):
+        self.connection.close()
+        self.df = None
+
+
+def from_df(
+    df: pd.DataFrame,
+    enable_rewriting=True,
+    memory_tracking: str = None,
+    memory_budget: int = None,
+    backend: str = PANDAS_BACKEND,
+    enable_pipelining=True,
+    threads: int = None,
+    enable_fusion=True,
+) -> Workbook:
+    # memory_tracking is "sizes" or "tracemalloc"; memory_budget is in bytes per formula
+    # backend "polars" evaluates each formula as one polars query, falling back to pandas when needed
+    # backend "duckdb" runs formulas as SQL in an in-process DuckDB; enable_pipelining and threads apply to it
+    # enable_fusion evaluates element-wise subtrees of pandas plans as one sequence of ufunc calls
+    if backend not in (PANDAS_BACKEND, POLARS_BACKEND, DUCKDB_BACKEND):
+        raise FormSException(f"Unknown backend: {backend}")
+    if backend != PANDAS_BACKEND and (memory_tracking is not None or memory_budget is not None):
+        raise FormSException("Memory tracking is only supported by the pandas backend")
+    if backend == DUCKDB_BACKEND:
+        return DuckDBWorkbook(DuckDBConfig(enable_rewriting, enable_pipelining, threads), df)
+    if backend == POLARS_BACKEND and not is_polars_available():
+        raise FormSException("The polars backend requires the polars package")
+    if memory_tracking is not None and memory_tracking not in MEMORY_TRACKING_MODES:
+        raise FormSException(f"Unknown memory tracking mode: {memory_tracking}")
+    df_config = DFConfig(
+        enable_rewriting, memory_tracking, memory_budget, backend == POLARS_BACKEND, enable_fusion
+    )
+    return DFWorkbook(df_config, df)
+
+
+def from_stream(columns: list, enable_rewriting=True) -> StreamingWorkbook:
+    # columns names the columns of the rows that will be appended
+    return StreamingWorkbook(DFConfig(enable_rewriting), columns)
+
+
+def from_checkpoint(path: str) -> StreamingWorkbook:
+    # checkpoints are pickles, so only load those written by a trusted process
+    with open(path, "rb") as f:
+        state = pickle.load(f)
+    if not isinstance(state, dict) or state.get("version") != STREAM_CHECKPOINT_VERSION:
+        raise FormSException(f"{path} is not a streaming checkpoint of this version")
+    wb = StreamingWorkbook(state["df_config"], state["columns"])
+    wb.num_rows = state["num_rows"]
+    wb.stream_formulas = state["stream_formulas"]
+    return wb
+
+
+def from_parquet(path: str, enable_rewriting=True, chunk_size: int = FILE_CHUNK_SIZE) -> FileWorkbook:
+    return FileWorkbook(DFConfig(enable_rewriting), ParquetTable(path), chunk_size)
+
+
+def from_arrow_ipc(path: str, enable_rewriting=True, chunk_size: int = FILE_CHUNK_SIZE) -> FileWorkbook:
+    # the Arrow IPC file format, also known as Feather V2
+    return FileWorkbook(DFConfig(enable_rewriting), ArrowIPCTable(path), chunk_size)
 
 
 def from_db(
@@ -361,6 +1148,8 @@ def from_db(
     order_key: list,
     enable_rewriting=True,
     enable_pipelining=True,
+    enable_explain=False,
+    record_table_sizes=False,
 ) -> DBWorkbook:
     try:
         return DBWorkbook(
@@ -375,6 +1164,8 @@ def from_db(
                 order_key,
                 enable_rewriting,
                 enable_pipelining,
+                enable_explain,
+                record_table_sizes,
             )
         )
     except FormSException as e:
@@ -382,29 +1173,77 @@ def from_db(
         traceback.print_exception(*sys.exc_info())
 
 
+def render_openmetrics() -> str:
+    # counters and latency histograms of all workbooks in this process
+    return metrics_recorder.render_openmetrics()
+
+
 """Helper Functions"""
 
 
+def get_top_level_function_name(root: PlanNode) -> str:
+    return root.function.name if isinstance(root, FunctionNode) else "NONE"
+
+
 def parse_formula_str(formula_str: str) -> PlanNode:
     root = parse_formula(formula_str, DEFAULT_AXIS)
     root.populate_ref_info()
     return root
 
 
+def compile_formula_str(
+    formula_str: str,
+    function_executor: FunctionExecutor,
+    num_rows: int,
+    num_cols: int,
+    metrics_tracker: MetricsTracker,
+    df_enable_rewriting: bool = False,
+    db_enable_rewriting: bool = False,
+) -> PlanNode:
+    # parses, validates and rewrites a formula string, reusing cached plans of the same template
+    rewriting_flags = (df_enable_rewriting, db_enable_rewriting)
+    start_time = time.time()
+    cached_plans = plan_cache.get(formula_str, rewriting_flags)
+    if cached_plans is None:
+        root = parse_formula_str(formula_str)
+        assign_ref_slots(root)
+        parsed_root = root.replicate_node_recursive()
+    else:
+        root, rewritten_root = cached_plans
+    end_time = time.time()
+    metrics_tracker.put_one_metric(PARSING_TIME, int((end_time - start_time) * MICROS_PER_SEC))
+    validate(function_executor, num_rows, num_cols, root)
+
+    start_time = end_time
+    if cached_plans is None:
+        rewritten_root = rewrite_plan(
+            root, df_enable_rewriting=df_enable_rewriting, db_enable_rewriting=db_enable_rewriting
+        )
+        plan_cache.put(formula_str, rewriting_flags, parsed_root, rewritten_root)
+    end_time = time.time()
+    metrics_tracker.put_one_metric(REWRITE_TIME, int((end_time - start_time) * MICROS_PER_SEC))
+    return rewritten_root
+
+
+def get_column_letter(col: int) -> str:
+    # the letters of a column in formulas, where A is column 0
+    res = ""
+    # We want A = 1 instead of 0
+    col += 1
+    while col > 0:
+        mod = (col - 1) % 26
+        res += chr(mod + ord("A"))
+        col = (col - 1) // 26
+    return res[::-1]
+
+
 def print_workbook_view(df: pd.DataFrame, keep_original_labels=False):
     df_copy = df.copy(deep=True)
     # Flatten cols into tuple format if multi-index
     if isinstance(df_copy.columns, pd.MultiIndex):
         df_copy.columns = df_copy.columns.to_flat_index()
     for i, label in enumerate(df_copy.columns):
-        res = ""
-        # We want A = 1 instead of 0
-        i += 1
-        while i > 0:
-            mod = (i - 1) % 26
-            res += chr(mod + ord("A"))
-            i = (i - 1) // 26
-        res = res[::-1]
+        res = get_column_letter(i)
         # Preserve labels
         if keep_original_labels:
             res = res + " (" + str(label) + ")"
@@ -0,0 +1,136 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+# Chained formula columns. Every formula column of a sheet is written back into the table of its
+# workbook, after the columns already there, so later formulas read it like any other column. The
+# columns a formula reads give the dependency graph, which is computed wave by wave in topological
+# order: the columns of one wave only read columns of earlier waves and run in parallel.
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+import pandas as pd
+
+from forms.core.forms import DFWorkbook, SQLWorkbook, Workbook, get_column_letter, parse_formula_str
+from forms.planner.plannode import PlanNode, RefNode
+from forms.utils.exceptions import CyclicDependencyException, FormSException
+
+
+class FormulaColumn(NamedTuple):
+    name: object
+    formula_str: str
+    # position of the column in the table of the workbook
+    col: int
+    referenced_cols: frozenset
+
+
+def get_referenced_columns(plan: PlanNode) -> set:
+    if isinstance(plan, RefNode):
+        return set(range(plan.ref.col, plan.ref.last_col + 1))
+    return set().union(*(get_referenced_columns(child) for child in plan.children))
+
+
+def get_waves(dependencies: dict) -> list:
+    # the columns that only read columns of earlier waves form the next wave
+    remaining = {name: set(names) for name, names in dependencies.items()}
+    waves = []
+    while remaining:
+        wave = [name for name, names in remaining.items() if not names]
+        if not wave:
+            raise CyclicDependencyException(
+                f"Formula columns {', '.join(map(str, remaining))} form or read a cycle"
+            )
+        for name in wave:
+            del remaining[name]
+        for names in remaining.values():
+            names.difference_update(wave)
+        waves.append(wave)
+    return waves
+
+
+class Sheet:
+    """
+    Named formula columns over a DFWorkbook, DBWorkbook or DuckDBWorkbook. Each formula is evaluated
+    for all rows, and formulas of other columns reference its results by the letter add_column returns.
+    """
+
+    def __init__(self, workbook: Workbook, max_workers: int = None):
+        if not isinstance(workbook, (DFWorkbook, SQLWorkbook)):
+            raise FormSException(f"Sheets are not supported by {type(workbook).__name__}")
+        self.workbook = workbook
+        # None lets the thread pool choose the number of threads
+        self.max_workers = max_workers
+        self.columns = {}
+
+    def add_column(self, name, formula_str: str) -> str:
+        if name in self.columns:
+            raise FormSException(f"Formula column {name} already exists")
+        referenced_cols = frozenset(get_referenced_columns(parse_formula_str(formula_str)))
+        col = self.workbook.add_sheet_column(name)
+        self.columns[name] = FormulaColumn(name, formula_str, col, referenced_cols)
+        return get_column_letter(col)
+
+    def get_dependencies(self) -> dict:
+        # the formula columns each formula column reads
+        names = {column.col: name for name, column in self.columns.items()}
+        return {
+            name: {names[col] for col in column.referenced_cols if col in names}
+            for name, column in self.columns.items()
+        }
+
+    def compute(self, outputs: list = None):
+        """
+        Computes the given formula columns, all of them by default, and the columns they read. The
+        other columns are released once every column reading them has been computed.
+        """
+        outputs = list(self.columns) if outputs is None else list(outputs)
+        unknown = [name for name in outputs if name not in self.columns]
+        if unknown:
+            raise FormSException(f"Unknown formula columns: {', '.join(map(str, unknown))}")
+        all_dependencies = self.get_dependencies()
+        dependencies = {}
+        pending = list(outputs)
+        while pending:
+            name = pending.pop()
+            if name not in dependencies:
+                dependencies[name] = all_dependencies[name]
+                pending.extend(all_dependencies[name])
+        waves = get_waves(dependencies)
+
+        num_readers = {name: 0 for name in dependencies}
+        for names in dependencies.values():
+            for name in names:
+                num_readers[name] += 1
+        with ThreadPoolExecutor(self.max_workers) as pool:
+            for wave in waves:
+                columns = [self.columns[name] for name in wave]
+                if self.workbook.parallel_sheet_columns and len(columns) > 1:
+                    results = list(pool.map(self.evaluate_column, columns))
+                else:
+                    results = [self.evaluate_column(column) for column in columns]
+                for column, result in zip(columns, results):
+                    self.workbook.store_sheet_column(column.col, result)
+                for name in wave:
+                    for read_name in dependencies[name]:
+                        num_readers[read_name] -= 1
+                        if num_readers[read_name] == 0 and read_name not in outputs:
+                            self.workbook.release_sheet_column(self.columns[read_name].col)
+
+    def evaluate_column(self, column: FormulaColumn):
+        return self.workbook.evaluate_sheet_column(column.col, column.formula_str)
+
+    def get_values(self, names: list = None) -> pd.DataFrame:
+        # released columns read as nulls
+        names = list(self.columns) if names is None else list(names)
+        return self.workbook.read_sheet_columns([self.columns[name].col for name in names])
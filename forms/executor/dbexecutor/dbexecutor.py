@@ -13,9 +13,10 @@
 #  limitations under the License.
 
 import pandas as pd
-import psycopg2
 import time
 
+from psycopg2 import sql
+
 from forms.core.catalog import TableCatalog
 from forms.core.config import DBConfig, DBExecContext
 from forms.executor.dbexecutor.dbexecnode import (
@@ -23,11 +24,11 @@ from forms.executor.dbexecutor.dbexecnode import (
     DBFuncExecNode,
     create_intermediate_ref_node,
 )
+from forms.executor.dbexecutor.journal import JournalEntry, QueryJournal, get_explain_rows
 from forms.executor.dbexecutor.scheduler import Scheduler
 from forms.executor.dbexecutor.translation import translate
 from forms.planner.plannode import PlanNode
 from forms.utils.exceptions import DBRuntimeException
-from forms.utils.generic import get_columns_and_types
 from forms.utils.metrics import (
     MetricsTracker,
     TRANSLATION_TIME,
@@ -35,8 +36,12 @@ from forms.utils.metrics import (
     NUM_SUBPLANS,
     MICROS_PER_SEC,
 )
+from forms.utils.tracing import Span, Tracer, EXECUTOR, FUNCTION, INPUT_ROWS, OUTPUT_ROWS, OUTPUT_BYTES
 from forms.utils.treenode import link_parent_to_children
 
+PIPELINED = "pipelined"
+SUBTREE = "subtree"
+
 
 def finish_one_subtree(intermediate_table: TableCatalog, exec_subtree: DBFuncExecNode):
     intermediate_ref_node = create_intermediate_ref_node(intermediate_table, exec_subtree)
@@ -48,13 +53,72 @@ def finish_one_subtree(intermediate_table: TableCatalog, exec_subtree: DBFuncExe
     link_parent_to_children(parent, children)
 
 
+def create_node_spans(exec_node, tracer: Tracer, parent: Span = None, node_spans: dict = None) -> dict:
+    # one span per function node, nested like the execution tree; built before subtrees are replaced
+    if node_spans is None:
+        node_spans = {}
+    if isinstance(exec_node, DBFuncExecNode):
+        parent = tracer.create_span(
+            exec_node.function.name, parent, **{FUNCTION: exec_node.function.name}
+        )
+        node_spans[id(exec_node)] = parent
+    for child in exec_node.children:
+        create_node_spans(child, tracer, parent, node_spans)
+    return node_spans
+
+
+def mark_pipelined_spans(exec_subtree: DBFuncExecNode, node_spans: dict):
+    # function nodes translated into the subtree's statement do not run on their own
+    for child in exec_subtree.children:
+        if isinstance(child, DBFuncExecNode) and id(child) in node_spans:
+            span = node_spans[id(child)]
+            span.set_attribute(PIPELINED, True)
+            span.set_attribute(SUBTREE, exec_subtree.intermediate_table_name)
+            mark_pipelined_spans(child, node_spans)
+
+
+def get_input_rows(span: Span) -> int:
+    # rows produced by the statements this one reads from; base table scans are not counted
+    input_rows = 0
+    for child in span.children:
+        if child.get_attribute(PIPELINED):
+            input_rows += get_input_rows(child)
+        else:
+            input_rows += child.get_attribute(OUTPUT_ROWS) or 0
+    return input_rows
+
+
+def create_result_table(sel_query, table_name: str):
+    # unlike intermediate tables, result tables outlive the session
+    return sql.SQL("CREATE TABLE {table_name} AS {sel_query}").format(
+        table_name=sql.Identifier(table_name), sel_query=sel_query
+    )
+
+
+def get_function_name(exec_subtree) -> str:
+    return exec_subtree.function.name if isinstance(exec_subtree, DBFuncExecNode) else ""
+
+
+def get_executor_name(exec_subtree: DBFuncExecNode) -> str:
+    return "window" if exec_subtree.translatable_to_window else "join"
+
+
 class DBExecutor:
     def __init__(
-        self, db_config: DBConfig, exec_context: DBExecContext, metrics_tracker: MetricsTracker
+        self,
+        db_config: DBConfig,
+        exec_context: DBExecContext,
+        metrics_tracker: MetricsTracker,
+        tracer: Tracer = None,
+        journal: QueryJournal = None,
     ):
         self.db_config = db_config
         self.exec_context = exec_context
         self.metrics_tracker = metrics_tracker
+        self.tracer = tracer
+        self.journal = journal
+        self.dialect = exec_context.dialect
+        self.intermediate_table_names = []
 
     def get_sql_strings(self, formula_plan: PlanNode) -> list:
         exec_tree = from_plan_to_execution_tree(formula_plan, self.exec_context.base_table)
@@ -65,15 +129,19 @@ class DBExecutor:
         intermediate_table_name = (
             exec_tree.intermediate_table_name if isinstance(exec_tree, DBFuncExecNode) else ""
         )
-        sql_str = translate(
-            exec_subtree, self.exec_context, intermediate_table_name, is_root_subtree
-        ).as_string(self.exec_context.conn)
+        sql_str = self.dialect.render(
+            translate(exec_subtree, self.exec_context, intermediate_table_name, is_root_subtree)
+        )
         sql_strings.append(sql_str)
         return sql_strings
 
-    def execute_formula_plan(self, formula_plan: PlanNode) -> pd.DataFrame:
+    def execute_formula_plan(
+        self, formula_plan: PlanNode, formula_str: str = "", result_table_name: str = None
+    ) -> pd.DataFrame:
+        # with a result_table_name, the results are written into that table and None is returned
         exec_tree = from_plan_to_execution_tree(formula_plan, self.exec_context.base_table)
         scheduler = Scheduler(exec_tree, self.db_config.enable_pipelining)
+        node_spans = {} if self.tracer is None else create_node_spans(exec_tree, self.tracer)
         df = None
 
         self.metrics_tracker.put_one_metric(NUM_SUBPLANS, scheduler.get_num_subtrees())
@@ -88,38 +156,81 @@ class DBExecutor:
                     if isinstance(exec_subtree, DBFuncExecNode)
                     else ""
                 )
+                span = node_spans.get(id(exec_subtree))
+                if span is not None:
+                    span.start()
                 start_time = time.time()
                 sql_composable = translate(
                     exec_subtree, self.exec_context, intermediate_table_name, is_root_subtree
                 )
-                end_time = time.time()
-                translation_time += end_time - start_time
-
-                print(sql_composable.as_string(self.exec_context.conn))
+                translation_time += time.time() - start_time
 
-                start_time = end_time
+                sql_str = self.dialect.render(sql_composable)
+                explain = None
+                start_time = time.time()
                 if scheduler.has_next_subtree():
-                    sql_str = sql_composable.as_string(self.exec_context.conn)
-                    self.exec_context.cursor.execute(sql_composable)
-                    col_names, col_types = get_columns_and_types(
-                        self.exec_context.cursor, intermediate_table_name
-                    )
+                    if self.journal is not None and self.journal.enable_explain:
+                        explain = self.dialect.explain(sql_composable)
+                    if explain is not None:
+                        output_rows = get_explain_rows(explain)
+                    else:
+                        output_rows = self.dialect.execute(sql_composable)
+                    self.intermediate_table_names.append(intermediate_table_name)
+                    statement_time = time.time() - start_time
+                    col_names, col_types = self.dialect.get_columns_and_types(intermediate_table_name)
                     intermediate_table = TableCatalog(
                         intermediate_table_name, col_names[1:], col_types[1:]
                     )
+                    output_bytes = None
+                    if self.journal is not None and self.journal.record_table_sizes:
+                        output_bytes = self.dialect.get_table_size(intermediate_table_name)
                     finish_one_subtree(intermediate_table, exec_subtree)
+                elif result_table_name is not None:
+                    sql_composable = create_result_table(sql_composable, result_table_name)
+                    sql_str = self.dialect.render(sql_composable)
+                    output_rows = self.dialect.execute(sql_composable)
+                    statement_time = time.time() - start_time
+                    output_bytes = None
                 else:
-                    sql_str = sql_composable.as_string(self.exec_context.conn)
-                    df = pd.read_sql_query(sql_str, self.exec_context.conn)
+                    if self.journal is not None and self.journal.enable_explain:
+                        explain = self.dialect.explain(sql_composable)
+                    df = self.dialect.read_query(sql_composable)
+                    statement_time = time.time() - start_time
+                    output_rows = df.shape[0]
+                    output_bytes = int(df.memory_usage(index=True, deep=False).sum())
                 execution_time += time.time() - start_time
-            self.exec_context.conn.commit()
-        except psycopg2.Error as e:
-            self.exec_context.conn.rollback()
+                if self.journal is not None:
+                    self.journal.record(
+                        JournalEntry(
+                            formula_str,
+                            intermediate_table_name,
+                            get_function_name(exec_subtree),
+                            sql_str,
+                            int(statement_time * MICROS_PER_SEC),
+                            output_rows,
+                            None if is_root_subtree else output_bytes,
+                            explain,
+                        )
+                    )
+                if span is not None:
+                    span.finish()
+                    span.set_attribute(EXECUTOR, get_executor_name(exec_subtree))
+                    span.set_attribute(SUBTREE, intermediate_table_name)
+                    span.set_attribute(INPUT_ROWS, get_input_rows(span))
+                    span.set_attribute(OUTPUT_ROWS, output_rows)
+                    span.set_attribute(OUTPUT_BYTES, output_bytes)
+                    mark_pipelined_spans(exec_subtree, node_spans)
+            self.dialect.commit()
+        except self.dialect.errors as e:
+            self.dialect.rollback()
             raise DBRuntimeException(e)
 
+        if id(exec_tree) in node_spans:
+            node_spans[id(exec_tree)].extend_to_children()
         self.metrics_tracker.put_one_metric(TRANSLATION_TIME, int(translation_time * MICROS_PER_SEC))
         self.metrics_tracker.put_one_metric(EXECUTION_TIME, int(execution_time * MICROS_PER_SEC))
         return df
 
     def clean_up(self):
-        pass
+        self.dialect.release_tables(self.intermediate_table_names)
+        self.intermediate_table_names = []
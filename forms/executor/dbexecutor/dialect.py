@@ -0,0 +1,206 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import math
+import pandas as pd
+import psycopg2
+
+from abc import ABC, abstractmethod
+from decimal import Decimal
+from psycopg2 import sql
+from psycopg2.sql import Composable
+
+from forms.executor.dbexecutor.journal import explain_statement, get_table_size
+from forms.utils.exceptions import FormSException
+from forms.utils.generic import get_columns_and_types
+
+# DuckDB type names mapped to the PostgreSQL names the translator and predicates check
+DUCKDB_TYPE_NAMES = {
+    "tinyint": "smallint",
+    "utinyint": "smallint",
+    "usmallint": "integer",
+    "uinteger": "bigint",
+    "ubigint": "numeric",
+    "hugeint": "numeric",
+    "float": "real",
+    "double": "double precision",
+}
+
+
+class SQLDialect(ABC):
+    """
+    The statements of the translator are psycopg2 composables; a dialect renders and runs them
+    on one engine, so the translation and pipelining logic is shared by all SQL backends.
+    """
+
+    name = ""
+    errors = ()
+
+    @abstractmethod
+    def render(self, composable: Composable) -> str:
+        pass
+
+    @abstractmethod
+    def execute(self, composable: Composable) -> int:
+        # runs a statement that creates an intermediate table and returns its number of rows
+        pass
+
+    @abstractmethod
+    def read_query(self, composable: Composable) -> pd.DataFrame:
+        pass
+
+    @abstractmethod
+    def get_columns_and_types(self, table_name: str) -> tuple[list, list]:
+        pass
+
+    def get_table_size(self, table_name: str):
+        return None
+
+    def explain(self, composable: Composable):
+        # returns None when the engine has no plan to record; the statement is then not executed
+        return None
+
+    def release_tables(self, table_names: list):
+        pass
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+
+class PostgresDialect(SQLDialect):
+    name = "postgres"
+    errors = (psycopg2.Error,)
+
+    def __init__(self, conn, cursor):
+        self.conn = conn
+        self.cursor = cursor
+
+    def render(self, composable: Composable) -> str:
+        return composable.as_string(self.conn)
+
+    def execute(self, composable: Composable) -> int:
+        self.cursor.execute(composable)
+        return self.cursor.rowcount
+
+    def read_query(self, composable: Composable) -> pd.DataFrame:
+        return pd.read_sql_query(self.render(composable), self.conn)
+
+    def get_columns_and_types(self, table_name: str) -> tuple[list, list]:
+        return get_columns_and_types(self.cursor, table_name)
+
+    def get_table_size(self, table_name: str):
+        return get_table_size(self.cursor, table_name)
+
+    def explain(self, composable: Composable):
+        return explain_statement(self.cursor, composable)
+
+    def commit(self):
+        # temporary tables live until the session ends, so release_tables keeps them
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+
+def render_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def render_literal(value) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, Decimal)):
+        return str(value)
+    if isinstance(value, float):
+        if math.isnan(value) or math.isinf(value):
+            return f"CAST('{value}' AS DOUBLE)"
+        return repr(value)
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    raise FormSException(f"Cannot render literal {value!r} of type {type(value).__name__}")
+
+
+def render_composable(composable: Composable) -> str:
+    # the quoting of psycopg2 needs a PostgreSQL connection, so other engines render the tree here
+    if isinstance(composable, sql.Composed):
+        return "".join(render_composable(part) for part in composable.seq)
+    if isinstance(composable, sql.SQL):
+        return composable.string
+    if isinstance(composable, sql.Identifier):
+        return ".".join(render_identifier(str(name)) for name in composable.strings)
+    if isinstance(composable, sql.Literal):
+        return render_literal(composable.wrapped)
+    raise FormSException(f"Cannot render {type(composable).__name__} outside PostgreSQL")
+
+
+class DuckDBDialect(SQLDialect):
+    name = "duckdb"
+
+    def __init__(self, conn):
+        import duckdb
+
+        self.conn = conn
+        self.errors = (duckdb.Error,)
+
+    def render(self, composable: Composable) -> str:
+        return render_composable(composable)
+
+    def execute(self, composable: Composable) -> int:
+        # CREATE TABLE AS returns the number of inserted rows as its result
+        row = self.conn.execute(self.render(composable)).fetchone()
+        return row[0] if row is not None else -1
+
+    def read_query(self, composable: Composable) -> pd.DataFrame:
+        # window queries come back in row_id order from PostgreSQL, but not from a parallel engine
+        ordered = sql.SQL("SELECT * FROM ({query}) AS {alias} ORDER BY 1").format(
+            query=composable, alias=sql.Identifier("FormS_Result")
+        )
+        return self.conn.execute(self.render(ordered)).df()
+
+    def get_columns_and_types(self, table_name: str) -> tuple[list, list]:
+        columns = self.conn.execute(
+            """
+            SELECT column_name, data_type
+            FROM information_schema.columns
+            WHERE table_name = ?
+            ORDER BY ordinal_position
+            """,
+            [table_name],
+        ).fetchall()
+        column_names = [col_name for col_name, _ in columns]
+        column_types = [get_postgres_type_name(data_type) for _, data_type in columns]
+        return column_names, column_types
+
+    def release_tables(self, table_names: list):
+        # intermediate tables are held in this process's memory, so drop them once the formula is done
+        for table_name in table_names:
+            self.conn.execute(
+                self.render(
+                    sql.SQL("DROP TABLE IF EXISTS {table_name}").format(
+                        table_name=sql.Identifier(table_name)
+                    )
+                )
+            )
+
+
+def get_postgres_type_name(data_type: str) -> str:
+    data_type = data_type.lower()
+    if data_type.startswith("decimal"):
+        return "numeric"
+    return DUCKDB_TYPE_NAMES.get(data_type, data_type)
@@ -0,0 +1,122 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+import threading
+import time
+
+from collections import deque
+from psycopg2 import sql
+
+from forms.utils.metrics import MICROS_PER_SEC
+
+DEFAULT_JOURNAL_CAPACITY = 1000
+
+EXPLAIN_OPTIONS = sql.SQL("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) ")
+
+
+class JournalEntry:
+    def __init__(
+        self,
+        formula: str,
+        subtree: str,
+        function: str,
+        sql_str: str,
+        latency: int,
+        rows: int,
+        temp_table_size: int = None,
+        explain=None,
+    ):
+        self.timestamp = int(time.time() * MICROS_PER_SEC)
+        self.formula = formula
+        # the intermediate table the statement creates, or "" for the final query
+        self.subtree = subtree
+        self.function = function
+        self.sql = sql_str
+        # microseconds; includes EXPLAIN ANALYZE overhead when explain is enabled
+        self.latency = latency
+        self.rows = rows
+        self.temp_table_size = temp_table_size
+        self.explain = explain
+
+    def to_dict(self) -> dict:
+        return {
+            "timestamp": self.timestamp,
+            "formula": self.formula,
+            "subtree": self.subtree,
+            "function": self.function,
+            "sql": self.sql,
+            "latency": self.latency,
+            "rows": self.rows,
+            "temp_table_size": self.temp_table_size,
+            "explain": self.explain,
+        }
+
+
+class QueryJournal:
+    # A bounded, in-memory log of the SQL statements executed for formulas; the oldest entries are dropped.
+    def __init__(
+        self,
+        capacity: int = DEFAULT_JOURNAL_CAPACITY,
+        enable_explain: bool = False,
+        record_table_sizes: bool = False,
+    ):
+        self.entries = deque(maxlen=capacity)
+        self.enable_explain = enable_explain
+        # the size of every intermediate table costs one more query
+        self.record_table_sizes = record_table_sizes
+        self.lock = threading.Lock()
+
+    def record(self, entry: JournalEntry):
+        with self.lock:
+            self.entries.append(entry)
+
+    def get_entries(self) -> list:
+        with self.lock:
+            return [entry.to_dict() for entry in self.entries]
+
+    def dump_jsonl(self, path: str):
+        entries = self.get_entries()
+        with open(path, "w") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, default=str))
+                f.write("\n")
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+def explain_statement(cursor, sql_composable: sql.Composable):
+    # EXPLAIN ANALYZE runs the statement, so a CREATE TABLE AS still creates its table
+    cursor.execute(EXPLAIN_OPTIONS + sql_composable)
+    plan = cursor.fetchone()[0]
+    # psycopg2 decodes json columns, but keep working if it is configured not to
+    return json.loads(plan) if isinstance(plan, str) else plan
+
+
+def get_explain_rows(explain) -> int:
+    return explain[0]["Plan"]["Actual Rows"]
+
+
+def get_table_size(cursor, table_name: str) -> int:
+    cursor.execute(
+        sql.SQL("SELECT pg_total_relation_size(to_regclass({table_name}))").format(
+            table_name=sql.Literal(sql.Identifier(table_name).as_string(cursor))
+        )
+    )
+    return cursor.fetchone()[0]
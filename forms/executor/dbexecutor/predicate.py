@@ -0,0 +1,133 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+from psycopg2 import sql
+from psycopg2.sql import Composable
+
+from forms.utils.criteria import (
+    Criteria,
+    CriteriaOperandType,
+    CRITERIA_EQUAL,
+    CRITERIA_NOT_EQUAL,
+    translate_wildcards,
+)
+
+INTEGER_TYPES = {"smallint", "integer", "bigint"}
+FLOAT_TYPES = {"real", "double precision"}
+NUMERIC_TYPES = INTEGER_TYPES | FLOAT_TYPES | {"numeric", "decimal"}
+TEXT_TYPES = {"text", "character varying", "character", "varchar", "char"}
+BOOLEAN_TYPE = "boolean"
+
+LIKE_ESCAPE = "\\"
+
+TRUE_PREDICATE = sql.SQL("TRUE")
+FALSE_PREDICATE = sql.SQL("FALSE")
+
+
+def escape_like(char: str) -> str:
+    if char in {"%", "_", LIKE_ESCAPE}:
+        return LIKE_ESCAPE + char
+    return char
+
+
+def wildcard_to_like(pattern: str) -> str:
+    return translate_wildcards(pattern, "%", "_", escape_like)
+
+
+def cast_literal(value, column_type: str) -> Composable:
+    # typing the bound value like the column keeps the comparison sargable
+    return sql.SQL("CAST({value} AS {column_type})").format(
+        value=sql.Literal(value), column_type=sql.SQL(column_type)
+    )
+
+
+def translate_sql_operator(operator: str) -> Composable:
+    # "<>" also matches NULLs in Excel
+    return sql.SQL("IS DISTINCT FROM") if operator == CRITERIA_NOT_EQUAL else sql.SQL(operator)
+
+
+def translate_number_predicate(criteria: Criteria, column: Composable, column_type: str) -> Composable:
+    operand = criteria.operand
+    if column_type not in NUMERIC_TYPES:
+        # only numeric cells can satisfy a numeric criteria
+        return TRUE_PREDICATE if criteria.operator == CRITERIA_NOT_EQUAL else FALSE_PREDICATE
+    if column_type in INTEGER_TYPES and operand.is_integer():
+        value = cast_literal(int(operand), column_type)
+    elif column_type in INTEGER_TYPES:
+        value = cast_literal(operand, "numeric")
+    else:
+        value = cast_literal(operand, column_type)
+    return sql.SQL("{column} {operator} {value}").format(
+        column=column, operator=translate_sql_operator(criteria.operator), value=value
+    )
+
+
+def translate_text_predicate(criteria: Criteria, column: Composable, column_type: str) -> Composable:
+    if column_type not in TEXT_TYPES:
+        return TRUE_PREDICATE if criteria.operator == CRITERIA_NOT_EQUAL else FALSE_PREDICATE
+    # text comparisons are case-insensitive; an index on lower(column) serves them
+    return sql.SQL("lower({column}) {operator} {value}").format(
+        column=column,
+        operator=translate_sql_operator(criteria.operator),
+        value=cast_literal(criteria.operand, "text"),
+    )
+
+
+def translate_pattern_predicate(criteria: Criteria, column: Composable, column_type: str) -> Composable:
+    if column_type not in TEXT_TYPES:
+        return TRUE_PREDICATE if criteria.operator == CRITERIA_NOT_EQUAL else FALSE_PREDICATE
+    like = sql.SQL("{column} ILIKE {pattern} ESCAPE {escape}").format(
+        column=column,
+        pattern=cast_literal(wildcard_to_like(criteria.operand), "text"),
+        escape=sql.Literal(LIKE_ESCAPE),
+    )
+    if criteria.operator == CRITERIA_NOT_EQUAL:
+        return sql.SQL("({column} IS NULL OR NOT {like})").format(column=column, like=like)
+    return like
+
+
+def translate_blank_predicate(criteria: Criteria, column: Composable, column_type: str) -> Composable:
+    is_text = column_type in TEXT_TYPES
+    if criteria.operator == CRITERIA_EQUAL:
+        if is_text:
+            return sql.SQL("({column} IS NULL OR {column} = '')").format(column=column)
+        return sql.SQL("{column} IS NULL").format(column=column)
+    if is_text:
+        return sql.SQL("({column} IS NOT NULL AND {column} <> '')").format(column=column)
+    return sql.SQL("{column} IS NOT NULL").format(column=column)
+
+
+def translate_logical_predicate(criteria: Criteria, column: Composable, column_type: str) -> Composable:
+    if column_type != BOOLEAN_TYPE:
+        return TRUE_PREDICATE if criteria.operator == CRITERIA_NOT_EQUAL else FALSE_PREDICATE
+    return sql.SQL("{column} {operator} {value}").format(
+        column=column,
+        operator=translate_sql_operator(criteria.operator),
+        value=sql.Literal(criteria.operand),
+    )
+
+
+criteria_to_predicate_dict = {
+    CriteriaOperandType.NUMBER: translate_number_predicate,
+    CriteriaOperandType.TEXT: translate_text_predicate,
+    CriteriaOperandType.PATTERN: translate_pattern_predicate,
+    CriteriaOperandType.BLANK: translate_blank_predicate,
+    CriteriaOperandType.LOGICAL: translate_logical_predicate,
+}
+
+
+def translate_criteria_to_predicate(criteria: Criteria, column: str, column_type: str) -> Composable:
+    return criteria_to_predicate_dict[criteria.operand_type](
+        criteria, sql.Identifier(column), column_type.lower()
+    )
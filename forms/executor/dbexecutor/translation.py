@@ -15,6 +15,7 @@
 from forms.core.catalog import BASE_TABLE, ROW_ID, TRANSLATE_TEMP_TABLE, TEMP_TABLE_COL_SUFFIX
 from forms.core.config import DBExecContext
 from forms.executor.dbexecutor.dbexecnode import DBExecNode, DBFuncExecNode, DBLitExecNode, DBRefExecNode
+from forms.executor.dbexecutor.predicate import translate_criteria_to_predicate
 
 from psycopg2 import sql
 from psycopg2.sql import Composable
@@ -27,6 +28,7 @@ from forms.utils.functions import (
     DB_AGGREGATE_IF_FUNCTIONS,
     Function,
 )
+from forms.utils.criteria import parse_criteria
 from forms.utils.reference import RefType
 
 WINDOW_PRECEDING = sql.SQL("PRECEDING")
@@ -354,77 +356,80 @@ def translate_aggregate_if_functions(
         output_child = input_child
         if len(subtree.children) == 3:
             output_child = subtree.children[2]
-        condition = subtree.children[1].literal.replace('"', "")
-        input_cols = input_child.cols
-        output_cols = output_child.cols
-        if subtree.function == Function.SUMIF:
-            agg_sql = sql.SQL("""SUM({agg_expression})""").format(
-                agg_expression=sql.SQL("+").join(
-                    sql.SQL(
-                        """ 
-                            CASE
-                                WHEN {input_col}{condition}
-                                THEN {output_col}
-                                ELSE 0
-                            END
-                        """
-                    ).format(
-                        input_col=sql.Identifier(input_cols[i]),
-                        condition=sql.SQL(condition),
-                        output_col=sql.Identifier(output_cols[i]),
-                    )
-                    for i in range(len(input_child.cols))
+        criteria = parse_criteria(subtree.children[1].literal)
+        if input_child.out_ref_type != RefType.FF:
+            window_size_sql = compute_window_size_expression(input_child, exec_context)
+        else:
+            window_size_sql = sql.SQL("")
+        predicates = [
+            translate_criteria_to_predicate(
+                criteria, input_col, input_child.table.get_column_type_by_name(input_col)
+            )
+            for input_col in input_child.cols
+        ]
+        output_cols = [sql.Identifier(output_col) for output_col in output_child.cols]
+
+        def filtered_aggregates(function: str, agg_columns: list) -> list:
+            return [
+                sql.SQL("""{function}({agg_column}) FILTER (WHERE {predicate}) {window}""").format(
+                    function=sql.SQL(function),
+                    agg_column=agg_column,
+                    predicate=predicate,
+                    window=window_size_sql,
                 )
+                for agg_column, predicate in zip(agg_columns, predicates)
+            ]
+
+        def coalesced_sum(agg_sqls: list) -> Composable:
+            return sql.SQL("+").join(
+                sql.SQL("""COALESCE({agg_sql}, 0)""").format(agg_sql=agg_sql) for agg_sql in agg_sqls
             )
+
+        if subtree.function == Function.SUMIF:
+            agg_sql = coalesced_sum(filtered_aggregates("SUM", output_cols))
+        elif subtree.function == Function.COUNTIF:
+            agg_sql = sql.SQL("+").join(filtered_aggregates("COUNT", [sql.SQL("*")] * len(predicates)))
         elif subtree.function == Function.MAXIF or subtree.function == Function.MINIF:
             row_func = "MAX" if subtree.function == Function.MAXIF else "MIN"
             col_func = "GREATEST" if subtree.function == Function.MAXIF else "LEAST"
-            agg_sql = sql.SQL("""{row_func}({col_func}({agg_expression}))""").format(
-                row_func=sql.SQL(row_func),
-                col_func=sql.SQL(col_func),
-                agg_expression=sql.SQL(",").join(
-                    sql.SQL(
-                        """ 
-                            CASE
-                                WHEN {input_col}{condition}
-                                THEN {output_col}
-                                ELSE NULL
-                            END
-                        """
-                    ).format(
-                        input_col=sql.Identifier(input_cols[i]),
-                        condition=sql.SQL(condition),
-                        output_col=sql.Identifier(output_cols[i]),
-                    )
-                    for i in range(len(input_child.cols))
-                ),
-            )
-        elif subtree.function == Function.COUNTIF:
-            agg_sql = sql.SQL("""SUM({agg_expression})""").format(
-                agg_expression=sql.SQL("+").join(
-                    sql.SQL(
-                        """CASE WHEN {input_col}{condition}
-                           THEN 1 
-                           ELSE 0 END
-                        """
-                    ).format(
-                        input_col=sql.Identifier(input_cols[i]),
-                        condition=sql.SQL(condition),
-                    )
-                    for i in range(len(input_child.cols))
+            agg_sqls = filtered_aggregates(row_func, output_cols)
+            agg_sql = (
+                agg_sqls[0]
+                if len(agg_sqls) == 1
+                else sql.SQL("""{col_func}({agg_expression})""").format(
+                    col_func=sql.SQL(col_func), agg_expression=sql.SQL(",").join(agg_sqls)
                 )
             )
+            # windows without any match yield 0, as in Excel and the DF executor
+            agg_sql = sql.SQL("""COALESCE({agg_sql}, 0)""").format(agg_sql=agg_sql)
+        elif subtree.function == Function.AVERAGEIF:
+            if len(predicates) == 1:
+                agg_sql = filtered_aggregates("AVG", output_cols)[0]
+            else:
+                # the sum of integer columns is an integer on Postgres, which would truncate the quotient
+                agg_sql = sql.SQL(
+                    """CAST({sum_sql} AS DOUBLE PRECISION) / NULLIF({count_sql}, 0)"""
+                ).format(
+                    sum_sql=coalesced_sum(filtered_aggregates("SUM", output_cols)),
+                    count_sql=sql.SQL("+").join(filtered_aggregates("COUNT", output_cols)),
+                )
         else:
             assert False
         if input_child.out_ref_type != RefType.FF:
-            window_size_sql = compute_window_size_expression(input_child, exec_context)
-            return agg_sql + window_size_sql
+            return agg_sql
         else:
             return sql.SQL(
                 """(SELECT {agg_sql}
-                               FROM {table_name})
+                               FROM {table_name}
+                               WHERE {row_id} BETWEEN {first_row_id} AND {last_row_id})
                            """
-            ).format(agg_sql=sql.Identifier(agg_sql), table_name=base_table)
+            ).format(
+                agg_sql=agg_sql,
+                table_name=base_table,
+                row_id=sql.Identifier(ROW_ID),
+                first_row_id=sql.Literal(input_child.ref.row + 1),
+                last_row_id=sql.Literal(input_child.ref.last_row + 1),
+            )
     else:
         assert False
 
@@ -101,6 +101,15 @@ from forms.executor.dfexecutor.textfunctionexecutor import (
     value_executor,
 )
 
+from forms.executor.dfexecutor.conditionalfuncexecutor import (
+    averageif_df_executor,
+    countif_df_executor,
+    maxif_df_executor,
+    minif_df_executor,
+    sumif_df_executor,
+)
+
+from forms.executor.dfexecutor import kernels
 from forms.executor.dfexecutor.utils import (
     construct_df_table,
     fill_in_nan,
@@ -109,6 +118,9 @@ from forms.executor.dfexecutor.utils import (
     get_value_rr,
     get_reference_indices,
     get_single_value,
+    get_window_bounds,
+    get_window_value_by_prefix,
+    get_window_value_by_rolling,
 )
 
 
@@ -164,6 +176,12 @@ def median_df_executor(physical_subtree: DFFuncExecNode) -> DFTable:
         if axis == AXIS_ALONG_ROW:
             window_size = ref.last_row - ref.row + 1
             step = df.shape[1]
+            if is_numeric_window(child):
+                # with or without the kernel, nulls are skipped and incomplete windows are null
+                block = kernels.get_float_block(child.table, range(ref.col, ref.last_col + 1))
+                if kernels.use_kernels() and kernels.is_median_window_supported(child):
+                    return DFTable(df=kernels.get_window_median(child, block))
+                return DFTable(df=get_window_value_by_rolling(child, block, "median"))
             if out_ref_type == RefType.RR:
                 new_df = pd.concat([pd.Series([np.nan]), df.stack()])
                 window_size = window_size * step
@@ -181,66 +199,6 @@ def median_df_executor(physical_subtree: DFFuncExecNode) -> DFTable:
             return construct_df_table(result)
 
 
-operator_dict = {
-    "=": np.equal,
-    "<": np.less,
-    "<=": np.less_equal,
-    ">": np.greater,
-    ">=": np.greater_equal,
-}
-
-
-def sumif_df_executor(physical_subtree: DFFuncExecNode) -> DFTable:
-    assert len(physical_subtree.children) == 2
-    ref_node = physical_subtree.children[0]
-    criteria = physical_subtree.children[1]
-    assert isinstance(ref_node, DFRefExecNode)
-    assert isinstance(criteria, DFLitExecNode)
-    literal_str = criteria.literal.replace('"', "")
-    first_digit = next(i for i, c in enumerate(literal_str) if c.isdigit())
-    op = literal_str[:first_digit]
-    val = literal_str[first_digit:]
-    val = float(val)
-    assert op in operator_dict.keys()
-    ref = ref_node.ref
-    out_ref_type = ref_node.out_ref_type
-    start_idx = ref_node.exec_context.formula_idx_start
-    end_idx = ref_node.exec_context.formula_idx_end
-    n_formula = end_idx - start_idx
-    axis = ref_node.exec_context.axis
-    if physical_subtree.out_ref_type == RefType.FF:
-        df = ref_node.table.get_table_content()
-        start_row, start_column, end_row, end_column = get_reference_indices(ref_node)
-        value = df.iloc[start_row:end_row, start_column:end_column].values.flatten()
-        # construct a one-cell dataframe table
-        result = np.sum(operator_dict[op](value, val) * value)
-        return construct_df_table(np.full((n_formula, 1), result))
-    else:
-        df = ref_node.table.get_table_content()
-        start_row, start_column, end_row, end_column = get_reference_indices(ref_node)
-        df = df.iloc[start_row:end_row, start_column:end_column]
-        df = df[operator_dict[op](df, val)].fillna(0)
-        # TODO: add support for axis_along_column
-        if axis == AXIS_ALONG_ROW:
-            window_size = ref.last_row - ref.row + 1
-            if out_ref_type == RefType.RR:
-                result = df.sum(axis=1).rolling(window_size).sum().dropna()
-            elif out_ref_type == RefType.FR:
-                result = df.sum(axis=1).expanding(window_size + start_idx).sum().dropna()
-            elif out_ref_type == RefType.RF:
-                result = (
-                    df.iloc[::-1]
-                    .sum(axis=1)
-                    .expanding(window_size - end_idx + 1)
-                    .sum()
-                    .dropna()
-                    .iloc[::-1]
-                )
-            result.index = range(result.index.size)
-            result = fill_in_nan(result, n_formula)
-            return construct_df_table(result)
-
-
 def plus_df_executor(physical_subtree: DFFuncExecNode) -> DFTable:
     values = get_arithmetic_function_values(physical_subtree)
     return construct_df_table(values[0] + values[1])
@@ -262,11 +220,14 @@ def divide_df_executor(physical_subtree: DFFuncExecNode) -> DFTable:
 
 
 def compute_max(values, literal):
-    return np.max(values, initial=literal, axis=0)
+    # nulls are skipped, as they are within a range, so the result is null only if every argument is
+    result = np.fmax.reduce(values, axis=0) if len(values) > 0 else literal
+    return result if literal == -math.inf else np.fmax(result, literal)
 
 
 def compute_min(values, literal):
-    return np.min(values, initial=literal, axis=0)
+    result = np.fmin.reduce(values, axis=0) if len(values) > 0 else literal
+    return result if literal == math.inf else np.fmin(result, literal)
 
 
 def compute_sum(values, literal):
@@ -301,8 +262,13 @@ def distributive_function_executor(physical_subtree: DFFuncExecNode, function: F
         result = func_all(values, literal)
         return construct_df_table(np.full((num_formulas, 1), result))
     else:
+        # formulas with an incomplete window are null, even though MAX and MIN skip null arguments
+        complete = None
         for child in physical_subtree.children:
             if isinstance(child, DFRefExecNode):
+                if function in (Function.MAX, Function.MIN):
+                    valid = get_window_bounds(child)[2]
+                    complete = valid if complete is None else complete & valid
                 ref = child.ref
                 df = child.table.get_table_content()
                 out_ref_type = child.out_ref_type
@@ -316,7 +282,24 @@ def distributive_function_executor(physical_subtree: DFFuncExecNode, function: F
                 # TODO: add support for axis_along_column
                 if axis == AXIS_ALONG_ROW:
                     window_size = ref.last_row - ref.row + 1
-                    if out_ref_type == RefType.RR:
+                    get_prefix = find_prefix_getter(child, function)
+                    if out_ref_type != RefType.FF and get_prefix is not None:
+                        value = get_window_value_by_prefix(child, get_prefix)
+                    elif function == Function.SUM and is_numeric_window(child):
+                        # each float window is summed on its own, treating nulls as zero
+                        block = kernels.get_float_block(child.table, range(ref.col, ref.last_col + 1))
+                        row_values = np.nansum(block, axis=1)
+                        value = get_window_value_by_rolling(child, row_values, "sum")
+                    elif function in (Function.MAX, Function.MIN) and is_numeric_window(child):
+                        # with or without the kernel, nulls are skipped and incomplete windows are null
+                        block = kernels.get_float_block(child.table, range(ref.col, ref.last_col + 1))
+                        if kernels.use_kernels():
+                            value = kernels.get_window_extreme(child, block, function == Function.MAX)
+                        else:
+                            reduce = np.fmax if function == Function.MAX else np.fmin
+                            row_values = reduce.reduce(block, axis=1)
+                            value = get_window_value_by_rolling(child, row_values, func_first_axis)
+                    elif out_ref_type == RefType.RR:
                         value = get_value_rr(df, window_size, func_first_axis, func_second_axis)
                     elif out_ref_type == RefType.FF:
                         # treat FF-type as literal value
@@ -330,7 +313,7 @@ def distributive_function_executor(physical_subtree: DFFuncExecNode, function: F
                         value = get_value_rf(
                             df, window_size - end_idx + 1, func_first_axis, func_second_axis
                         )
-                    if out_ref_type != RefType.FF:
+                    if out_ref_type != RefType.FF and get_prefix is None:
                         value.index = range(value.index.size)
                         value = fill_in_nan(value, n_formula)
                 if value is not None:
@@ -340,9 +323,31 @@ def distributive_function_executor(physical_subtree: DFFuncExecNode, function: F
         result = func_all(values, literal)
         if not isinstance(result, np.ndarray):
             result = [result]
+        elif complete is not None and result.ndim == 2:
+            result = np.where(complete[:, np.newaxis], result, np.nan)
         return construct_df_table(result)
 
 
+def find_prefix_getter(ref_node: DFRefExecNode, function: Function):
+    # COUNT windows, and SUM windows over integer columns, are exact differences of the table's cached
+    # prefix arrays; float prefixes would lose the small values of a window after a large value
+    table = ref_node.table
+    cols = range(ref_node.ref.col, ref_node.ref.last_col + 1)
+    if function == Function.COUNT:
+        return table.get_prefix_count
+    elif function == Function.SUM and all(table.is_integer_column(col) for col in cols):
+        return table.get_prefix_sum
+    return None
+
+
+def is_numeric_window(ref_node: DFRefExecNode) -> bool:
+    # windows over numeric columns are read as float blocks, by the compiled kernels or by pandas
+    cols = range(ref_node.ref.col, ref_node.ref.last_col + 1)
+    return ref_node.out_ref_type != RefType.FF and all(
+        ref_node.table.is_numeric_column(col) for col in cols
+    )
+
+
 def get_arithmetic_function_values(physical_subtree: DFFuncExecNode) -> list:
     values = []
     assert len(physical_subtree.children) == 2
@@ -376,6 +381,10 @@ function_to_executor_dict = {
     Function.MEDIAN: median_df_executor,
     Function.SUM: sum_df_executor,
     Function.SUMIF: sumif_df_executor,
+    Function.COUNTIF: countif_df_executor,
+    Function.AVERAGEIF: averageif_df_executor,
+    Function.MAXIF: maxif_df_executor,
+    Function.MINIF: minif_df_executor,
     Function.PLUS: plus_df_executor,
     Function.MINUS: minus_df_executor,
     Function.MULTIPLY: multiply_df_executor,
@@ -0,0 +1,308 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import numpy as np
+import pandas as pd
+
+from forms.executor.dfexecutor import kernels
+from forms.executor.dfexecutor.dftable import DFTable
+from forms.executor.dfexecutor.dfexecnode import DFFuncExecNode, DFRefExecNode, DFLitExecNode
+from forms.executor.dfexecutor.utils import (
+    construct_df_table,
+    get_reference_indices,
+    get_window_bounds,
+    get_window_value_by_prefix,
+    get_window_value_by_rolling,
+)
+from forms.utils.criteria import (
+    Criteria,
+    CriteriaOperandType,
+    CRITERIA_NOT_EQUAL,
+    parse_criteria,
+    wildcard_to_regex,
+)
+from forms.utils.exceptions import FunctionNotSupportedException
+from forms.utils.functions import Function
+from forms.utils.reference import AXIS_ALONG_ROW, RefType
+
+# Kinds of per-column structures that conditional aggregates cache in a DFTable
+CRITERIA_MASK = "criteria_mask"
+NUMERIC_VALUES = "numeric_values"
+CONDITIONAL_PREFIX_COUNT = "conditional_prefix_count"
+CONDITIONAL_VALUES = "conditional_values"
+
+comparison_operator_dict = {
+    "=": np.equal,
+    "<>": np.not_equal,
+    "<": np.less,
+    "<=": np.less_equal,
+    ">": np.greater,
+    ">=": np.greater_equal,
+}
+
+
+def is_number(value) -> bool:
+    return isinstance(value, (int, float, np.number)) and not isinstance(value, (bool, np.bool_))
+
+
+def get_numeric_values(column: pd.Series) -> np.ndarray:
+    # non-numeric cells (text, logical values, blanks) become NaN
+    if pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column):
+        return column.to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.array([value if is_number(value) else np.nan for value in column], dtype=np.float64)
+
+
+def get_text_values(column: pd.Series):
+    if pd.api.types.is_numeric_dtype(column) or pd.api.types.is_bool_dtype(column):
+        return None
+    return column.str.lower()
+
+
+def compile_criteria_mask(criteria: Criteria):
+    # turns a parsed criteria into a function from a column to its boolean match mask
+    operator = criteria.operator
+    operand = criteria.operand
+    operand_type = criteria.operand_type
+    negate = operator == CRITERIA_NOT_EQUAL
+
+    if operand_type == CriteriaOperandType.NUMBER:
+        compare = comparison_operator_dict[operator]
+
+        def mask_numbers(column: pd.Series) -> np.ndarray:
+            # NaN compares unequal to everything, so "<>" also matches text and blanks
+            return compare(get_numeric_values(column), operand)
+
+        return mask_numbers
+
+    if operand_type == CriteriaOperandType.BLANK:
+
+        def mask_blanks(column: pd.Series) -> np.ndarray:
+            blank = column.isna().to_numpy()
+            text = get_text_values(column)
+            if text is not None:
+                blank = blank | (text == "").to_numpy(dtype=bool, na_value=False)
+            return ~blank if negate else blank
+
+        return mask_blanks
+
+    if operand_type == CriteriaOperandType.LOGICAL:
+
+        def mask_logicals(column: pd.Series) -> np.ndarray:
+            if pd.api.types.is_bool_dtype(column):
+                matched = column.to_numpy(dtype=bool) == operand
+            else:
+                matched = np.array(
+                    [isinstance(value, (bool, np.bool_)) and value == operand for value in column],
+                    dtype=bool,
+                )
+            return ~matched if negate else matched
+
+        return mask_logicals
+
+    if operand_type == CriteriaOperandType.PATTERN:
+        regex = wildcard_to_regex(operand)
+
+        def mask_pattern(column: pd.Series) -> np.ndarray:
+            if get_text_values(column) is None:
+                matched = np.zeros(column.size, dtype=bool)
+            else:
+                matched = column.str.fullmatch(regex, case=False, na=False).to_numpy(dtype=bool)
+            return ~matched if negate else matched
+
+        return mask_pattern
+
+    compare = comparison_operator_dict[operator]
+
+    def mask_text(column: pd.Series) -> np.ndarray:
+        text = get_text_values(column)
+        if text is None:
+            return np.full(column.size, negate, dtype=bool)
+        matched = compare(text, operand).to_numpy(dtype=bool, na_value=False)
+        if negate:
+            # cells without text never equal a text operand
+            matched = ~(text == operand).to_numpy(dtype=bool, na_value=False)
+        return matched
+
+    return mask_text
+
+
+def get_criteria(criteria_node) -> Criteria:
+    if not isinstance(criteria_node, DFLitExecNode):
+        raise FunctionNotSupportedException("Only literal criteria are supported by pandas executors")
+    return parse_criteria(criteria_node.literal)
+
+
+def get_criteria_mask(table: DFTable, criteria: Criteria, col: int) -> np.ndarray:
+    return table.get_column_cache((CRITERIA_MASK, criteria), col, compile_criteria_mask(criteria))
+
+
+def get_shifted_numeric_values(table: DFTable, col: int, row_shift: int) -> np.ndarray:
+    # values[i] is the numeric value at row i + row_shift of the column
+    values = table.get_column_cache(NUMERIC_VALUES, col, get_numeric_values)
+    if row_shift == 0:
+        return values
+    shifted = np.full(values.size, np.nan)
+    if row_shift > 0:
+        shifted[: values.size - row_shift] = values[row_shift:]
+    else:
+        shifted[-row_shift:] = values[: values.size + row_shift]
+    return shifted
+
+
+# Pairs the criteria columns of a conditional aggregate with the columns whose values are aggregated
+class ConditionalColumn:
+    def __init__(self, range_node: DFRefExecNode, value_node: DFRefExecNode, criteria: Criteria):
+        self.range_table = range_node.table
+        self.value_table = value_node.table
+        self.criteria = criteria
+        self.row_shift = value_node.ref.row - range_node.ref.row
+        self.col_shift = value_node.ref.col - range_node.ref.col
+
+    def get_key(self, kind: str, col: int) -> tuple:
+        return (
+            kind,
+            self.criteria,
+            self.value_table.token,
+            self.value_table.version,
+            col + self.col_shift,
+            self.row_shift,
+        )
+
+    def get_column_cache(self, kind: str, col: int, build):
+        # cached with the range column, so edits of the aggregated column must drop it as well
+        value_cols = (col + self.col_shift,) if self.value_table is self.range_table else ()
+        return self.range_table.get_column_cache(self.get_key(kind, col), col, build, value_cols)
+
+    def get_mask(self, col: int) -> np.ndarray:
+        return get_criteria_mask(self.range_table, self.criteria, col)
+
+    def get_values(self, col: int) -> np.ndarray:
+        return get_shifted_numeric_values(self.value_table, col + self.col_shift, self.row_shift)
+
+    def get_prefix_count(self, col: int) -> np.ndarray:
+        # counts matching cells whose aggregated value is numeric
+        def build(_) -> np.ndarray:
+            selected = self.get_mask(col) & ~np.isnan(self.get_values(col))
+            prefix = np.zeros(selected.size + 1, dtype=np.int64)
+            np.cumsum(selected, out=prefix[1:])
+            return prefix
+
+        return self.get_column_cache(CONDITIONAL_PREFIX_COUNT, col, build)
+
+    def get_prefix_match_count(self, col: int) -> np.ndarray:
+        def build(_) -> np.ndarray:
+            prefix = np.zeros(self.range_table.get_num_of_rows() + 1, dtype=np.int64)
+            np.cumsum(self.get_mask(col), out=prefix[1:])
+            return prefix
+
+        return self.range_table.get_column_cache((CONDITIONAL_PREFIX_COUNT, self.criteria), col, build)
+
+    def get_conditional_values(self, col: int) -> np.ndarray:
+        # matching numeric values; everything else is NaN
+        def build(_) -> np.ndarray:
+            return np.where(self.get_mask(col), self.get_values(col), np.nan)
+
+        return self.get_column_cache(CONDITIONAL_VALUES, col, build)
+
+
+def sumif_df_executor(physical_subtree: DFFuncExecNode) -> DFTable:
+    return conditional_function_executor(physical_subtree, Function.SUMIF)
+
+
+def countif_df_executor(physical_subtree: DFFuncExecNode) -> DFTable:
+    return conditional_function_executor(physical_subtree, Function.COUNTIF)
+
+
+def averageif_df_executor(physical_subtree: DFFuncExecNode) -> DFTable:
+    return conditional_function_executor(physical_subtree, Function.AVERAGEIF)
+
+
+def maxif_df_executor(physical_subtree: DFFuncExecNode) -> DFTable:
+    return conditional_function_executor(physical_subtree, Function.MAXIF)
+
+
+def minif_df_executor(physical_subtree: DFFuncExecNode) -> DFTable:
+    return conditional_function_executor(physical_subtree, Function.MINIF)
+
+
+def compute_conditional_ff(function: Function, values: np.ndarray, mask: np.ndarray):
+    selected = mask & ~np.isnan(values)
+    if function == Function.COUNTIF:
+        return np.count_nonzero(mask)
+    elif function == Function.SUMIF:
+        return np.sum(values, where=selected)
+    elif function == Function.AVERAGEIF:
+        count = np.count_nonzero(selected)
+        return np.sum(values, where=selected) / count if count > 0 else np.nan
+    elif function == Function.MAXIF:
+        return np.max(values, where=selected, initial=-np.inf) if selected.any() else 0
+    elif function == Function.MINIF:
+        return np.min(values, where=selected, initial=np.inf) if selected.any() else 0
+
+
+def conditional_function_executor(physical_subtree: DFFuncExecNode, function: Function) -> DFTable:
+    children = physical_subtree.children
+    assert len(children) in {2, 3}
+    range_node = children[0]
+    # the 3-argument form aggregates a different range of the same shape
+    value_node = children[2] if len(children) == 3 else range_node
+    assert isinstance(range_node, DFRefExecNode) and isinstance(value_node, DFRefExecNode)
+    criteria = get_criteria(children[1])
+    conditional_column = ConditionalColumn(range_node, value_node, criteria)
+    ref = range_node.ref
+    n_formula = range_node.exec_context.formula_idx_end - range_node.exec_context.formula_idx_start
+    axis = range_node.exec_context.axis
+
+    if physical_subtree.out_ref_type == RefType.FF:
+        start_row, start_column, end_row, end_column = get_reference_indices(range_node)
+        cols = range(start_column, end_column)
+        mask = np.stack([conditional_column.get_mask(col)[start_row:end_row] for col in cols])
+        values = np.stack([conditional_column.get_values(col)[start_row:end_row] for col in cols])
+        # construct a one-cell dataframe table
+        result = compute_conditional_ff(function, values, mask)
+        return construct_df_table(np.full((n_formula, 1), result))
+
+    # TODO: add support for axis_along_column
+    if axis == AXIS_ALONG_ROW:
+        if function == Function.COUNTIF:
+            result = get_window_value_by_prefix(range_node, conditional_column.get_prefix_match_count)
+        elif function in (Function.SUMIF, Function.AVERAGEIF):
+            # as for SUM, each window is summed on its own rather than as a difference of running sums
+            cols = range(ref.col, ref.last_col + 1)
+            row_values = np.nansum(
+                [conditional_column.get_conditional_values(col) for col in cols], axis=0
+            )
+            result = get_window_value_by_rolling(range_node, row_values, "sum")
+            if function == Function.AVERAGEIF:
+                result = result / get_window_value_by_prefix(
+                    range_node, conditional_column.get_prefix_count
+                )
+        else:
+            if kernels.use_kernels():
+                cols = range(ref.col, ref.last_col + 1)
+                block = kernels.stack_columns(
+                    [conditional_column.get_conditional_values(col) for col in cols]
+                )
+                result = kernels.get_window_extreme(range_node, block, function == Function.MAXIF)
+            else:
+                reduce = np.fmax if function == Function.MAXIF else np.fmin
+                row_values = conditional_column.get_conditional_values(ref.col)
+                for col in range(ref.col + 1, ref.last_col + 1):
+                    row_values = reduce(row_values, conditional_column.get_conditional_values(col))
+                func = "max" if function == Function.MAXIF else "min"
+                result = get_window_value_by_rolling(range_node, row_values, func)
+            # complete windows without any match yield 0, as in Excel
+            _, _, valid = get_window_bounds(range_node)
+            result = result.mask(result.isna() & valid[:, np.newaxis], 0)
+        return construct_df_table(result)
@@ -16,56 +16,64 @@ import pandas as pd
 
 from time import time
 from forms.core.config import DFConfig
-from forms.executor.dfexecutor.dfexecnode import (
-    DFExecContext,
-    DFExecNode,
-    DFFuncExecNode,
-    from_plan_to_execution_tree,
-)
+from forms.executor.dfexecutor.dfexecnode import DFExecContext, from_plan_to_execution_tree
 
 from forms.planner.plannode import PlanNode
 from forms.executor.dfexecutor.dftable import DFTable
-from forms.executor.dfexecutor.dfexecnode import create_intermediate_ref_node
-from forms.executor.dfexecutor.basicfuncexecutor import find_function_executor
-from forms.utils.metrics import MetricsTracker
-from forms.utils.treenode import link_parent_to_children
-
-
-def execute_physical_plan(physical_plan: DFExecNode) -> DFTable:
-    new_children = []
-    for child in physical_plan.children:
-        if isinstance(child, DFFuncExecNode):
-            df_table = execute_physical_plan(child)
-            ref_node = create_intermediate_ref_node(df_table, child)
-            new_children.append(ref_node)
-        else:
-            new_children.append(child)
-    link_parent_to_children(physical_plan, new_children)
-
-    function_executor = find_function_executor(physical_plan.function)
-    res_table = function_executor(physical_plan)
-    return res_table
+from forms.executor.dfexecutor.fusion import fuse_element_wise
+from forms.executor.dfexecutor.program import Program, compile_program
+from forms.utils.memory import MemoryTracker, MEMORY_TRACKING_SIZES
+from forms.utils.metrics import MetricsTracker, EXECUTION_TIME, MICROS_PER_SEC, PEAK_MEMORY
+from forms.utils.tracing import Tracer
 
 
 class DFExecutor:
     def __init__(
-        self, df_config: DFConfig, exec_context: DFExecContext, metrics_tracker: MetricsTracker
+        self,
+        df_config: DFConfig,
+        exec_context: DFExecContext,
+        metrics_tracker: MetricsTracker,
+        tracer: Tracer = None,
     ):
         self.df_config = df_config
         self.exec_context = exec_context
         self.metrics_tracker = metrics_tracker
+        self.tracer = tracer
 
-    def execute_formula_plan(self, df: pd.DataFrame, formula_plan: PlanNode) -> pd.DataFrame:
-        df_table = DFTable(df)
+    def execute_formula_plan(self, df_table: DFTable, formula_plan: PlanNode) -> pd.DataFrame:
+        program = self.compile_formula_plan(df_table, formula_plan)
+        return self.execute_program(df_table, program)
+
+    def compile_formula_plan(self, df_table: DFTable, formula_plan: PlanNode) -> Program:
+        # df_table decides which subtrees are fused; the program can then run on any table of its shape
         physical_plan = from_plan_to_execution_tree(formula_plan, df_table)
         physical_plan.set_exec_context(self.exec_context)
+        if self.df_config.enable_fusion:
+            physical_plan = fuse_element_wise(physical_plan)
+        return compile_program(physical_plan)
 
+    def execute_program(self, df_table: DFTable, program: Program) -> pd.DataFrame:
+        memory_tracker = self.create_memory_tracker()
         start = time()
-        res_table = execute_physical_plan(physical_plan)
+        if memory_tracker is None:
+            res_table = program.run(df_table, self.exec_context, self.tracer)
+        else:
+            memory_tracker.start()
+            try:
+                res_table = program.run(df_table, self.exec_context, self.tracer, memory_tracker)
+            finally:
+                memory_tracker.stop()
+            self.metrics_tracker.put_one_metric(PEAK_MEMORY, memory_tracker.peak_bytes)
         execution_time = time() - start
-        self.metrics_tracker.put_one_metric("execution_time", execution_time)
+        self.metrics_tracker.put_one_metric(EXECUTION_TIME, int(execution_time * MICROS_PER_SEC))
 
         return res_table.get_table_content()
 
+    def create_memory_tracker(self) -> MemoryTracker:
+        mode = self.df_config.memory_tracking
+        if mode is None and self.df_config.memory_budget is None:
+            return None
+        return MemoryTracker(mode or MEMORY_TRACKING_SIZES, self.df_config.memory_budget)
+
     def clean_up(self):
         pass
@@ -12,12 +12,66 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
+import itertools
+import zlib
+
+import numpy as np
 import pandas as pd
 
+# Kinds of derived per-column structures cached by a DFTable
+PREFIX_SUM = "prefix_sum"
+PREFIX_COUNT = "prefix_count"
+FLOAT_VALUES = "float_values"
+
+
+def build_prefix_sum(column: pd.Series) -> np.ndarray:
+    # prefix[i] is the sum of the first i rows, treating nulls as zero; exact for integer columns only
+    dtype = np.int64 if pd.api.types.is_integer_dtype(column.dtype) else np.float64
+    values = column.fillna(0).to_numpy(dtype=dtype)
+    prefix = np.zeros(values.size + 1, dtype=dtype)
+    np.cumsum(values, out=prefix[1:])
+    return prefix
+
+
+def build_prefix_count(column: pd.Series) -> np.ndarray:
+    # prefix[i] is the number of non-null values in the first i rows
+    prefix = np.zeros(column.size + 1, dtype=np.int64)
+    np.cumsum(column.notna().to_numpy(), out=prefix[1:])
+    return prefix
+
+
+def build_float_values(column: pd.Series) -> np.ndarray:
+    # contiguous float64 copy of a numeric column; nulls become NaN
+    return column.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def get_column_fingerprint(column: pd.Series) -> tuple:
+    # changes whenever a value of the column is written in place, unlike the frame and its version
+    values = column.to_numpy()
+    if values.dtype == object:
+        data = pd.util.hash_array(values)
+    else:
+        data = np.ascontiguousarray(values).view(np.uint8)
+    return values.dtype.str, values.size, zlib.crc32(data)
+
+
+# never reused, unlike object ids, so a table can be named in the cache keys of another
+table_tokens = itertools.count()
+
+column_cache_builders = {
+    PREFIX_SUM: build_prefix_sum,
+    PREFIX_COUNT: build_prefix_count,
+    FLOAT_VALUES: build_float_values,
+}
+
 
 class DFTable:
     def __init__(self, df: pd.DataFrame):
         self.df = df
+        self.token = next(table_tokens)
+        # bumped whenever the content changes; cached structures built under an older version are stale
+        self.version = 0
+        self.column_caches = {}
 
     def get_num_of_rows(self) -> int:
         return self.df.shape[0]
@@ -27,3 +81,68 @@ class DFTable:
 
     def get_table_content(self) -> pd.DataFrame:
         return self.df
+
+    def get_memory_usage(self) -> int:
+        # shallow size in bytes: object columns count their pointers, not the objects
+        return int(self.df.memory_usage(index=True, deep=False).sum())
+
+    def set_table_content(self, df: pd.DataFrame):
+        self.df = df
+        self.invalidate()
+
+    def invalidate(self):
+        self.version += 1
+        self.column_caches = {}
+
+    def is_numeric_column(self, col: int) -> bool:
+        return pd.api.types.is_numeric_dtype(self.df.dtypes.iloc[col])
+
+    def is_integer_column(self, col: int) -> bool:
+        dtype = self.df.dtypes.iloc[col]
+        return pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_bool_dtype(dtype)
+
+    def invalidate_columns(self, cols):
+        # drops the cached structures derived from the given columns; the others stay valid
+        cols = set(cols)
+        self.column_caches = {
+            key: entry for key, entry in self.column_caches.items() if cols.isdisjoint(entry[2])
+        }
+
+    def invalidate_changed_columns(self) -> bool:
+        # drops the cached structures of columns modified in place since they were built
+        fingerprints = {}
+        changed = set()
+        for _, _, cols, built_fingerprints in list(self.column_caches.values()):
+            for col, built_fingerprint in zip(cols, built_fingerprints):
+                if col not in fingerprints:
+                    in_table = col < self.df.shape[1]
+                    fingerprints[col] = (
+                        get_column_fingerprint(self.df.iloc[:, col]) if in_table else None
+                    )
+                if fingerprints[col] != built_fingerprint:
+                    changed.add(col)
+        if changed:
+            self.invalidate_columns(changed)
+        return len(changed) > 0
+
+    def get_column_cache(self, kind, col: int, builder=None, depends_on: tuple = ()):
+        # kinds without a registered builder (e.g., criteria masks) supply their own;
+        # depends_on lists other columns of this table that the builder reads
+        key = (kind, col)
+        entry = self.column_caches.get(key)
+        if entry is None or entry[0] != self.version:
+            builder = column_cache_builders[kind] if builder is None else builder
+            cols = (col,) + tuple(depends_on)
+            fingerprints = tuple(get_column_fingerprint(self.df.iloc[:, c]) for c in cols)
+            entry = (self.version, builder(self.df.iloc[:, col]), cols, fingerprints)
+            self.column_caches[key] = entry
+        return entry[1]
+
+    def get_prefix_sum(self, col: int) -> np.ndarray:
+        return self.get_column_cache(PREFIX_SUM, col)
+
+    def get_prefix_count(self, col: int) -> np.ndarray:
+        return self.get_column_cache(PREFIX_COUNT, col)
+
+    def get_float_values(self, col: int) -> np.ndarray:
+        return self.get_column_cache(FLOAT_VALUES, col)
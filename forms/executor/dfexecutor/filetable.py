@@ -0,0 +1,138 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+# Tables stored in Arrow IPC or Parquet files, memory-mapped and read in chunks of rows. Only the
+# requested columns are read: the buffers of the other columns of an IPC file are never paged in, and
+# only the column chunks of the requested columns of a Parquet file are decoded.
+
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+from abc import ABC, abstractmethod
+
+from forms.utils.exceptions import FormSException
+
+
+class FileTable(ABC):
+    def __init__(self, path: str):
+        self.path = path
+        try:
+            self.source = pa.memory_map(path)
+        except (OSError, pa.ArrowException) as e:
+            raise FormSException(f"Cannot map {path}: {e}")
+        self.columns = []
+        self.num_rows = 0
+
+    @abstractmethod
+    def iter_batches(self, columns: list, chunk_size: int):
+        # record batches of at most chunk_size rows holding the named columns
+        pass
+
+    def iter_blocks(self, cols: list, chunk_size: int):
+        # float blocks of at most chunk_size rows holding the columns at the given positions
+        if not cols:
+            for start in range(0, self.num_rows, chunk_size):
+                yield np.empty((min(chunk_size, self.num_rows - start), 0))
+            return
+        names = [self.columns[col] for col in cols]
+        for batch in self.iter_batches(names, chunk_size):
+            block = np.empty((batch.num_rows, len(cols)))
+            for idx, name in enumerate(names):
+                try:
+                    block[:, idx] = batch.column(idx).to_numpy(zero_copy_only=False)
+                except (TypeError, ValueError, pa.ArrowException):
+                    raise FormSException(f"Column {name} must be numeric to be read in chunks")
+            yield block
+
+    def read_head(self, num_rows: int) -> pd.DataFrame:
+        for batch in self.iter_batches(self.columns, max(num_rows, 1)):
+            return batch.to_pandas().head(num_rows)
+        return pd.DataFrame(columns=self.columns)
+
+    def close(self):
+        self.source.close()
+
+
+class ArrowIPCTable(FileTable):
+    # record batches are slices of the mapped file, so reading them copies nothing
+    def __init__(self, path: str):
+        super().__init__(path)
+        try:
+            self.reader = ipc.open_file(self.source)
+        except pa.ArrowException as e:
+            self.source.close()
+            raise FormSException(f"{path} is not an Arrow IPC file: {e}")
+        self.columns = self.reader.schema.names
+        self.num_rows = sum(
+            self.reader.get_batch(idx).num_rows for idx in range(self.reader.num_record_batches)
+        )
+
+    def iter_batches(self, columns: list, chunk_size: int):
+        for idx in range(self.reader.num_record_batches):
+            batch = self.reader.get_batch(idx).select(columns)
+            for start in range(0, batch.num_rows, chunk_size):
+                yield batch.slice(start, chunk_size)
+
+
+class ParquetTable(FileTable):
+    def __init__(self, path: str):
+        super().__init__(path)
+        try:
+            self.parquet_file = pq.ParquetFile(self.source)
+        except pa.ArrowException as e:
+            self.source.close()
+            raise FormSException(f"{path} is not a Parquet file: {e}")
+        self.columns = self.parquet_file.schema_arrow.names
+        self.num_rows = self.parquet_file.metadata.num_rows
+
+    def iter_batches(self, columns: list, chunk_size: int):
+        yield from self.parquet_file.iter_batches(batch_size=chunk_size, columns=columns)
+
+
+class ResultWriter:
+    """
+    Writes the values of a formula to a Parquet file when the path ends with .parquet, and to an Arrow
+    IPC file otherwise. The values go to a temporary file that replaces path once all are written.
+    """
+
+    def __init__(self, path: str, column_name: str):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.schema = pa.schema([(column_name, pa.float64())])
+        if path.endswith(".parquet"):
+            self.writer = pq.ParquetWriter(self.tmp_path, self.schema)
+        else:
+            self.writer = ipc.new_file(self.tmp_path, self.schema)
+        self.num_written = 0
+
+    def write(self, values: np.ndarray):
+        if values.size == 0:
+            return
+        # NaN values are written as nulls
+        column = pa.array(values, type=pa.float64(), from_pandas=True)
+        self.writer.write_batch(pa.record_batch([column], schema=self.schema))
+        self.num_written += values.size
+
+    def close(self):
+        self.writer.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.writer.close()
+        os.remove(self.tmp_path)
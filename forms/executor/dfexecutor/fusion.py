@@ -0,0 +1,227 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+# Fusion of element-wise subtrees: arithmetic and math functions over single cells and literals are
+# compiled into one sequence of NumPy ufunc calls writing into reused buffers, instead of one
+# DataFrame per function node.
+
+import numpy as np
+import pandas as pd
+
+from forms.executor.dfexecutor.dfexecnode import DFExecNode, DFFuncExecNode, DFLitExecNode, DFRefExecNode
+from forms.executor.dfexecutor.dftable import DFTable
+from forms.utils.functions import Function
+from forms.utils.reference import AXIS_ALONG_ROW, RefType
+from forms.utils.treenode import link_parent_to_children
+
+BINARY_UFUNCS = {
+    Function.PLUS: np.add,
+    Function.MINUS: np.subtract,
+    Function.MULTIPLY: np.multiply,
+    Function.DIVIDE: np.divide,
+}
+
+UNARY_UFUNCS = {
+    Function.ABS: np.absolute,
+    Function.ACOS: np.arccos,
+    Function.ACOSH: np.arccosh,
+    Function.ASIN: np.arcsin,
+    Function.ASINH: np.arcsinh,
+    Function.ATAN: np.arctan,
+    Function.ATANH: np.arctanh,
+    Function.COS: np.cos,
+    Function.COSH: np.cosh,
+    Function.DEGREES: np.degrees,
+    Function.EXP: np.exp,
+    Function.INT: np.floor,
+    Function.LN: np.log,
+    Function.LOG10: np.log10,
+    Function.NEGATE: np.negative,
+    Function.RADIANS: np.radians,
+    Function.SIN: np.sin,
+    Function.SINH: np.sinh,
+    Function.SQRT: np.sqrt,
+    Function.TAN: np.tan,
+    Function.TANH: np.tanh,
+}
+
+# ufuncs standing for functions whose pandas executors yield integers, e.g., INT through math.floor
+INTEGER_RESULT_UFUNCS = {np.floor}
+
+# functions whose result is numeric whatever they read, and those that are numeric over numeric columns
+NUMERIC_RESULT_FUNCTIONS = {
+    Function.COUNT,
+    Function.SUMIF,
+    Function.COUNTIF,
+    Function.AVERAGEIF,
+    Function.MAXIF,
+    Function.MINIF,
+}
+NUMERIC_AGGREGATES = {Function.SUM, Function.AVG, Function.MIN, Function.MAX, Function.MEDIAN}
+
+# operand kinds of a fused step: an input of the fused node, or one of its buffers
+INPUT = 0
+BUFFER = 1
+
+
+class FusedExpression:
+    """
+    A post-order sequence of ufunc calls. Each step reads inputs or buffers and writes one buffer;
+    a buffer is reused by a later step once the value it holds has been consumed.
+    """
+
+    def __init__(self):
+        self.steps = []
+        self.num_buffers = 0
+        self.free_buffers = []
+        self.result = None
+
+    def add_step(self, ufunc, operands: list) -> tuple:
+        consumed = [idx for kind, idx in operands if kind == BUFFER]
+        out = consumed[0] if consumed else self.allocate_buffer()
+        self.free_buffers.extend(consumed[1:])
+        self.steps.append((ufunc, operands, out))
+        return BUFFER, out
+
+    def allocate_buffer(self) -> int:
+        if self.free_buffers:
+            return self.free_buffers.pop()
+        self.num_buffers += 1
+        return self.num_buffers - 1
+
+    def evaluate(self, inputs: list, n_formula: int) -> np.ndarray:
+        buffers = [None] * self.num_buffers
+        with np.errstate(all="ignore"):
+            for ufunc, operands, out in self.steps:
+                args = [inputs[idx] if kind == INPUT else buffers[idx] for kind, idx in operands]
+                dtypes = tuple(arg.dtype if isinstance(arg, np.ndarray) else type(arg) for arg in args)
+                out_dtype = ufunc.resolve_dtypes(dtypes + (None,))[-1]
+                # the dtype follows the pandas executors, e.g., integer sums stay integers
+                if buffers[out] is None or buffers[out].dtype != out_dtype:
+                    buffers[out] = np.empty(n_formula, dtype=out_dtype)
+                ufunc(*args, out=buffers[out])
+                # null results have no integer form and stay floats
+                if ufunc in INTEGER_RESULT_UFUNCS and np.isfinite(buffers[out]).all():
+                    buffers[out] = buffers[out].astype(np.int64)
+        return buffers[self.result[1]]
+
+
+class DFFusedExecNode(DFFuncExecNode):
+    # stands for a fused subtree; its children are the subtree's inputs in the order the steps use them
+    def __init__(self, exec_node: DFFuncExecNode, expression: FusedExpression):
+        super().__init__(
+            exec_node.function, exec_node.ref, exec_node.out_ref_type, exec_node.out_ref_axis
+        )
+        self.copy_formula_string_info_from(exec_node)
+        self.exec_context = exec_node.exec_context
+        self.expression = expression
+
+
+def is_numeric_column(table: DFTable, col: int) -> bool:
+    # numpy-backed numbers only: nullable extension columns would come back as objects
+    dtype = table.get_table_content().dtypes.iloc[col]
+    return isinstance(dtype, np.dtype) and dtype.kind in "iuf"
+
+
+def is_fusable_function(exec_node: DFExecNode) -> bool:
+    if not isinstance(exec_node, DFFuncExecNode) or isinstance(exec_node, DFFusedExecNode):
+        return False
+    if exec_node.function in BINARY_UFUNCS:
+        return len(exec_node.children) == 2
+    return exec_node.function in UNARY_UFUNCS and len(exec_node.children) == 1
+
+
+def is_fusable_input(exec_node: DFExecNode) -> bool:
+    if isinstance(exec_node, DFLitExecNode):
+        literal = exec_node.literal
+        return isinstance(literal, (int, float)) and not isinstance(literal, bool)
+    if isinstance(exec_node, DFRefExecNode):
+        ref = exec_node.ref
+        single_cell = ref.row == ref.last_row and ref.col == ref.last_col
+        return (
+            single_cell
+            and exec_node.out_ref_type in (RefType.RR, RefType.FF)
+            and is_numeric_column(exec_node.table, ref.col)
+        )
+    # other functions run on their own executor and feed their result into the fused steps
+    if exec_node.function in NUMERIC_RESULT_FUNCTIONS:
+        return True
+    return exec_node.function in NUMERIC_AGGREGATES and all(
+        is_numeric_column(ref_node.table, col)
+        for ref_node in get_ref_nodes(exec_node)
+        for col in range(ref_node.ref.col, ref_node.ref.last_col + 1)
+    )
+
+
+def get_ref_nodes(exec_node: DFExecNode) -> list:
+    if isinstance(exec_node, DFRefExecNode):
+        return [exec_node]
+    return [ref_node for child in exec_node.children for ref_node in get_ref_nodes(child)]
+
+
+def is_fusable(exec_node: DFExecNode) -> bool:
+    return is_fusable_function(exec_node) and all(
+        is_fusable(child) if is_fusable_function(child) else is_fusable_input(child)
+        for child in exec_node.children
+    )
+
+
+def compile_fused_expression(exec_node: DFExecNode, expression: FusedExpression, inputs: list) -> tuple:
+    if not is_fusable_function(exec_node):
+        inputs.append(exec_node)
+        return INPUT, len(inputs) - 1
+    operands = [compile_fused_expression(child, expression, inputs) for child in exec_node.children]
+    ufunc = BINARY_UFUNCS.get(exec_node.function) or UNARY_UFUNCS[exec_node.function]
+    return expression.add_step(ufunc, operands)
+
+
+def fuse_element_wise(exec_node: DFExecNode) -> DFExecNode:
+    # replaces every maximal fusable subtree that yields one value per formula with a fused node
+    if not isinstance(exec_node, DFFuncExecNode):
+        return exec_node
+    if (
+        exec_node.out_ref_type != RefType.FF
+        and exec_node.exec_context.axis == AXIS_ALONG_ROW
+        and is_fusable(exec_node)
+    ):
+        expression = FusedExpression()
+        inputs = []
+        expression.result = compile_fused_expression(exec_node, expression, inputs)
+        fused_node = DFFusedExecNode(exec_node, expression)
+        link_parent_to_children(fused_node, [fuse_element_wise(child) for child in inputs])
+        return fused_node
+    link_parent_to_children(exec_node, [fuse_element_wise(child) for child in exec_node.children])
+    return exec_node
+
+
+def get_input_values(input_node: DFExecNode, n_formula: int):
+    if isinstance(input_node, DFLitExecNode):
+        return input_node.literal
+    ref = input_node.ref
+    column = input_node.table.get_table_content().iloc[:, ref.col].to_numpy()
+    if input_node.out_ref_type == RefType.FF:
+        return column[ref.row].item() if ref.row < column.size else np.nan
+    first_row = input_node.exec_context.formula_idx_start + ref.row
+    values = column[first_row : first_row + n_formula]
+    if values.size < n_formula:
+        # formulas referencing rows past the end of the table read nulls
+        values = np.concatenate([values, np.full(n_formula - values.size, np.nan)])
+    return values
+
+
+def fused_df_executor(physical_subtree: DFFusedExecNode) -> DFTable:
+    exec_context = physical_subtree.exec_context
+    n_formula = exec_context.formula_idx_end - exec_context.formula_idx_start
+    inputs = [get_input_values(child, n_formula) for child in physical_subtree.children]
+    return DFTable(df=pd.DataFrame(physical_subtree.expression.evaluate(inputs, n_formula)))
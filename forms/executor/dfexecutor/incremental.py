@@ -0,0 +1,190 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+# Keeps the results of formulas up to date under cell edits. Every function of a plan computes row i of
+# its output from the windows of formula i only, so an edited cell affects the formulas whose windows
+# of some reference contain it: a band of formulas for RR, a suffix for FR, a prefix for RF and all of
+# them for FF. Only those rows are evaluated again, or patched with the value deltas for COUNT and for
+# SUM over integer columns.
+
+import numpy as np
+import pandas as pd
+
+from forms.core.config import DFExecContext
+from forms.executor.dfexecutor.dftable import DFTable
+from forms.executor.dfexecutor.program import Program, RefOperand
+from forms.utils.functions import Function
+from forms.utils.reference import RefType
+
+# above this share of affected formulas, one pass over all of them is cheaper than many ranges
+FULL_RECOMPUTE_RATIO = 0.5
+# up to this many patched ranges, deltas are added range by range instead of through a difference array
+MAX_RANGE_PATCHES = 16
+
+
+def get_affected_bounds(
+    ref, out_ref_type: RefType, rows: np.ndarray, exec_context: DFExecContext
+) -> tuple:
+    # first and last formula, relative to the range, whose window of the reference contains each row;
+    # the bounds are empty when no window does
+    formula_idx_start = exec_context.formula_idx_start
+    last_idx = exec_context.formula_idx_end - 1
+    if out_ref_type == RefType.RR:
+        starts, ends = rows - ref.last_row, rows - ref.row
+    elif out_ref_type == RefType.FR:
+        starts, ends = rows - ref.last_row, np.where(rows >= ref.row, last_idx, -1)
+    elif out_ref_type == RefType.RF:
+        starts, ends = np.zeros(rows.size, dtype=np.int64), np.where(
+            rows <= ref.last_row, rows - ref.row, -1
+        )
+    else:
+        inside = (rows >= ref.row) & (rows <= ref.last_row)
+        starts, ends = np.zeros(rows.size, dtype=np.int64), np.where(inside, last_idx, -1)
+    starts = np.maximum(starts, formula_idx_start) - formula_idx_start
+    ends = np.minimum(ends, last_idx) - formula_idx_start
+    return starts, ends
+
+
+def merge_ranges(starts: np.ndarray, ends: np.ndarray) -> list:
+    # half-open ranges [start, end) covering the given inclusive bounds
+    keep = starts <= ends
+    starts, ends = starts[keep], ends[keep] + 1
+    order = np.argsort(starts, kind="stable")
+    ranges = []
+    for start, end in zip(starts[order], ends[order]):
+        if ranges and start <= ranges[-1][1]:
+            ranges[-1][1] = max(ranges[-1][1], end)
+        else:
+            ranges.append([start, end])
+    return [(int(start), int(end)) for start, end in ranges]
+
+
+def get_numeric_delta(old_values: np.ndarray, new_values: np.ndarray, function: Function) -> np.ndarray:
+    if function == Function.COUNT:
+        return pd.notna(new_values).astype(np.float64) - pd.notna(old_values).astype(np.float64)
+    old_values = pd.to_numeric(pd.Series(old_values), errors="coerce").fillna(0).to_numpy(np.float64)
+    new_values = pd.to_numeric(pd.Series(new_values), errors="coerce").fillna(0).to_numpy(np.float64)
+    return new_values - old_values
+
+
+class MaintainedFormula:
+    """
+    The result of one formula over a range of formulas, kept in step with edits of the table it reads.
+    """
+
+    def __init__(self, formula_plan, program: Program, exec_context: DFExecContext, values: np.ndarray):
+        self.formula_plan = formula_plan
+        self.exec_context = exec_context
+        self.values = values
+        self.set_program(program)
+
+    def set_program(self, program: Program):
+        self.program = program
+        self.ref_operands = [
+            operand
+            for instruction in program.instructions
+            for operand in instruction.operands
+            if isinstance(operand, RefOperand)
+        ]
+
+    @property
+    def n_formula(self) -> int:
+        return self.exec_context.formula_idx_end - self.exec_context.formula_idx_start
+
+    def get_result(self) -> pd.DataFrame:
+        return pd.DataFrame(self.values.copy())
+
+    def is_invertible(self, table: DFTable) -> bool:
+        # a lone COUNT, or SUM over integer windows, changes by exactly the change of its cells; float
+        # deltas would lose the small values of a window after a large value is overwritten, and FF
+        # aggregates do not skip nulls, so both are evaluated again
+        if len(self.program.instructions) != 1:
+            return False
+        if any(operand.out_ref_type == RefType.FF for operand in self.ref_operands):
+            return False
+        function = self.program.instructions[0].prototype.function
+        if function == Function.COUNT:
+            return True
+        return function == Function.SUM and all(
+            table.is_integer_column(col)
+            for operand in self.ref_operands
+            for col in range(operand.ref.col, operand.ref.last_col + 1)
+        )
+
+    def apply_edits(
+        self, table: DFTable, rows: np.ndarray, cols: np.ndarray, old_values: np.ndarray, new_values
+    ):
+        # rows, cols, old_values and new_values describe the edited cells one by one
+        n_formula = self.n_formula
+        bounds = []
+        for operand in self.ref_operands:
+            ref = operand.ref
+            inside = (cols >= ref.col) & (cols <= ref.last_col)
+            starts, ends = get_affected_bounds(
+                ref, operand.out_ref_type, rows[inside], self.exec_context
+            )
+            bounds.append((inside, starts, ends))
+
+        if self.is_invertible(table):
+            function = self.program.instructions[0].prototype.function
+            delta = get_numeric_delta(old_values, new_values, function)
+            self.patch_with_delta(
+                np.concatenate([starts for _, starts, _ in bounds]),
+                np.concatenate([ends for _, _, ends in bounds]),
+                np.concatenate([delta[inside] for inside, _, _ in bounds]),
+            )
+            return
+
+        ranges = merge_ranges(
+            np.concatenate([starts for _, starts, _ in bounds]),
+            np.concatenate([ends for _, _, ends in bounds]),
+        )
+        if sum(end - start for start, end in ranges) > FULL_RECOMPUTE_RATIO * n_formula:
+            ranges = [(0, n_formula)]
+        for start, end in ranges:
+            self.recompute_range(table, start, end)
+
+    def patch_with_delta(self, starts: np.ndarray, ends: np.ndarray, delta: np.ndarray):
+        keep = (starts <= ends) & (delta != 0)
+        starts, ends, delta = starts[keep], ends[keep] + 1, delta[keep]
+        if self.values.dtype.kind != "f":
+            self.values = self.values.astype(np.float64)
+        # windows that are incomplete hold NaN and stay NaN
+        if starts.size <= MAX_RANGE_PATCHES:
+            for start, end, value in zip(starts, ends, delta):
+                self.values[start:end] += value
+        else:
+            diff = np.zeros(self.n_formula + 1)
+            np.add.at(diff, starts, delta)
+            np.add.at(diff, ends, -delta)
+            self.values += np.cumsum(diff[:-1])
+
+    def recompute_range(self, table: DFTable, start: int, end: int):
+        formula_idx_start = self.exec_context.formula_idx_start
+        exec_context = DFExecContext(
+            formula_idx_start + start, formula_idx_start + end, self.exec_context.axis
+        )
+        values = get_values(self.program.run(table, exec_context))
+        if values.dtype != self.values.dtype:
+            self.values = self.values.astype(np.result_type(self.values.dtype, values.dtype))
+        self.values[start:end] = values
+
+    def recompute(self, table: DFTable, program: Program):
+        self.set_program(program)
+        self.values = get_values(program.run(table, self.exec_context))
+
+
+def get_values(res_table: DFTable) -> np.ndarray:
+    # a writable copy, so that it can be patched in place
+    return res_table.get_table_content().iloc[:, 0].to_numpy(copy=True)
@@ -0,0 +1,221 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+# Optional numba kernels for window aggregates that pandas can only compute with generic rolling code.
+# Every kernel reads a 2-D float block (rows x columns) and the row range [starts[i], ends[i]) of each
+# formula; RR, FR and RF windows all have non-decreasing starts and ends, so one pass over the rows
+# serves all formulas. Without numba, or before the kernels are compiled, callers use pandas.
+
+import os
+import threading
+import numpy as np
+import pandas as pd
+
+from concurrent.futures import ThreadPoolExecutor
+
+from forms.executor.dfexecutor.dfexecnode import DFRefExecNode
+from forms.executor.dfexecutor.dftable import DFTable
+from forms.executor.dfexecutor.utils import get_window_bounds
+from forms.utils.reference import RefType
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# chunks smaller than this are not worth a thread
+MIN_CHUNK_FORMULAS = 1 << 15
+# the sorted window of the median kernel is shifted on every step, so long windows stay on pandas
+MAX_MEDIAN_WINDOW_CELLS = 4096
+
+kernels_enabled = njit is not None
+kernels_ready = threading.Event()
+warm_up_lock = threading.Lock()
+warm_up_thread = None
+thread_pool = None
+
+
+if njit is not None:
+
+    @njit(cache=True, nogil=True)
+    def window_extreme_kernel(block, starts, ends, valid, sign, out):
+        # monotonic deque of the rows whose (signed) row extreme can still be a window maximum
+        num_rows, num_cols = block.shape
+        capacity = ends[-1] - starts[0] + 1
+        deque_rows = np.empty(capacity, dtype=np.int64)
+        deque_values = np.empty(capacity, dtype=np.float64)
+        head = 0
+        tail = 0
+        next_row = starts[0]
+        for i in range(starts.size):
+            start = starts[i]
+            end = ends[i]
+            if next_row < start:
+                next_row = start
+            while next_row < end:
+                row_value = np.nan
+                for col in range(num_cols):
+                    value = block[next_row, col] * sign
+                    if not np.isnan(value) and (np.isnan(row_value) or value > row_value):
+                        row_value = value
+                if not np.isnan(row_value):
+                    while tail > head and deque_values[tail - 1] <= row_value:
+                        tail -= 1
+                    deque_rows[tail] = next_row
+                    deque_values[tail] = row_value
+                    tail += 1
+                next_row += 1
+            while head < tail and deque_rows[head] < start:
+                head += 1
+            if valid[i] and head < tail:
+                out[i] = deque_values[head] * sign
+            else:
+                out[i] = np.nan
+
+    @njit(cache=True, nogil=True)
+    def window_median_kernel(block, starts, ends, valid, out):
+        # the non-null cells of the current window, kept sorted; rows enter at the end and leave at the start
+        num_rows, num_cols = block.shape
+        window = np.empty((ends[-1] - starts[0]) * num_cols + 1, dtype=np.float64)
+        size = 0
+        low = starts[0]
+        high = starts[0]
+        for i in range(starts.size):
+            start = starts[i]
+            end = ends[i]
+            if start >= high:
+                size = 0
+                low = start
+                high = start
+            while high < end:
+                for col in range(num_cols):
+                    value = block[high, col]
+                    if not np.isnan(value):
+                        pos = np.searchsorted(window[:size], value)
+                        for k in range(size, pos, -1):
+                            window[k] = window[k - 1]
+                        window[pos] = value
+                        size += 1
+                high += 1
+            while low < start:
+                for col in range(num_cols):
+                    value = block[low, col]
+                    if not np.isnan(value):
+                        pos = np.searchsorted(window[:size], value)
+                        for k in range(pos, size - 1):
+                            window[k] = window[k + 1]
+                        size -= 1
+                low += 1
+            if not valid[i] or size == 0:
+                out[i] = np.nan
+            elif size % 2 == 1:
+                out[i] = window[size // 2]
+            else:
+                out[i] = (window[size // 2 - 1] + window[size // 2]) / 2
+
+
+def warm_up():
+    # compiles every kernel, or loads it from numba's on-disk cache, with tiny inputs
+    block = np.array([[1.0], [np.nan], [2.0]])
+    starts = np.array([0, 1], dtype=np.int64)
+    ends = np.array([2, 3], dtype=np.int64)
+    valid = np.array([True, True])
+    out = np.empty(2)
+    window_extreme_kernel(block, starts, ends, valid, 1.0, out)
+    window_median_kernel(block, starts, ends, valid, out)
+    kernels_ready.set()
+
+
+def start_warm_up():
+    # compiles in a background thread; until it finishes, callers keep using pandas
+    global warm_up_thread
+    if not kernels_enabled:
+        return
+    with warm_up_lock:
+        if warm_up_thread is None:
+            warm_up_thread = threading.Thread(target=warm_up, name="forms-kernel-warm-up", daemon=True)
+            warm_up_thread.start()
+
+
+def set_kernels_enabled(enabled: bool):
+    global kernels_enabled
+    kernels_enabled = enabled and njit is not None
+
+
+def use_kernels() -> bool:
+    return kernels_enabled and kernels_ready.is_set()
+
+
+def get_float_block(table: DFTable, cols: range) -> np.ndarray:
+    return stack_columns([table.get_float_values(col) for col in cols])
+
+
+def stack_columns(columns: list) -> np.ndarray:
+    # a single column is viewed as a block without copying
+    return columns[0][:, np.newaxis] if len(columns) == 1 else np.column_stack(columns)
+
+
+def get_thread_pool() -> ThreadPoolExecutor:
+    global thread_pool
+    with warm_up_lock:
+        if thread_pool is None:
+            thread_pool = ThreadPoolExecutor(os.cpu_count() or 1, thread_name_prefix="forms-kernel")
+    return thread_pool
+
+
+def run_window_kernel(kernel, block: np.ndarray, starts, ends, valid, *args) -> np.ndarray:
+    # the kernels release the GIL, so chunks of formulas run in parallel threads
+    out = np.empty(starts.size, dtype=np.float64)
+    num_chunks = min(os.cpu_count() or 1, starts.size // MIN_CHUNK_FORMULAS)
+    if num_chunks <= 1:
+        kernel(block, starts, ends, valid, *args, out)
+        return out
+    bounds = np.linspace(0, starts.size, num_chunks + 1).astype(np.int64)
+
+    def run_chunk(chunk: int):
+        first, last = bounds[chunk], bounds[chunk + 1]
+        kernel(block, starts[first:last], ends[first:last], valid[first:last], *args, out[first:last])
+
+    list(get_thread_pool().map(run_chunk, range(num_chunks)))
+    return out
+
+
+def get_int_window_bounds(ref_node: DFRefExecNode) -> tuple:
+    starts, ends, valid = get_window_bounds(ref_node)
+    return starts.astype(np.int64), ends.astype(np.int64), valid
+
+
+def get_window_extreme(ref_node: DFRefExecNode, block: np.ndarray, is_max: bool) -> pd.DataFrame:
+    # windows without a non-null cell yield NaN
+    starts, ends, valid = get_int_window_bounds(ref_node)
+    if starts.size == 0:
+        return pd.DataFrame(np.empty(0))
+    sign = 1.0 if is_max else -1.0
+    return pd.DataFrame(run_window_kernel(window_extreme_kernel, block, starts, ends, valid, sign))
+
+
+def get_window_median(ref_node: DFRefExecNode, block: np.ndarray) -> pd.DataFrame:
+    starts, ends, valid = get_int_window_bounds(ref_node)
+    if starts.size == 0:
+        return pd.DataFrame(np.empty(0))
+    return pd.DataFrame(run_window_kernel(window_median_kernel, block, starts, ends, valid))
+
+
+def is_median_window_supported(ref_node: DFRefExecNode) -> bool:
+    # growing FR and RF windows would shift the sorted window once per cell
+    ref = ref_node.ref
+    if ref_node.out_ref_type != RefType.RR:
+        return False
+    num_cells = (ref.last_row - ref.row + 1) * (ref.last_col - ref.col + 1)
+    return num_cells <= MAX_MEDIAN_WINDOW_CELLS
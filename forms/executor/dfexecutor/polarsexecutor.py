@@ -0,0 +1,383 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+# Lowers a whole physical plan into one polars expression, so that a single collect() runs it
+# multi-threaded without materializing the result of every function node.
+# Plans with a function or reference that cannot be lowered run on DFExecutor instead.
+
+import pandas as pd
+
+from time import time
+
+from forms.core.config import DFConfig, DFExecContext
+from forms.executor.dfexecutor.dfexecnode import (
+    DFExecNode,
+    DFFuncExecNode,
+    DFLitExecNode,
+    DFRefExecNode,
+    from_plan_to_execution_tree,
+)
+from forms.executor.dfexecutor.dfexecutor import DFExecutor
+from forms.executor.dfexecutor.dftable import DFTable
+from forms.planner.plannode import PlanNode
+from forms.utils.exceptions import FormSException
+from forms.utils.functions import Function
+from forms.utils.metrics import MetricsTracker, EXECUTION_TIME, MICROS_PER_SEC
+from forms.utils.reference import AXIS_ALONG_ROW, RefType
+from forms.utils.tracing import Tracer, EXECUTOR, FUNCTION, OUTPUT_ROWS, OUTPUT_BYTES
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+POLARS_EXECUTOR = "polars"
+POLARS_SERIES = "polars_series"
+VALUE_COLUMN = "value"
+FORMULA_INDEX_COLUMN = "formula_idx"
+
+ARITHMETIC_OPERATORS = {
+    Function.PLUS: lambda left, right: left + right,
+    Function.MINUS: lambda left, right: left - right,
+    Function.MULTIPLY: lambda left, right: left * right,
+    Function.DIVIDE: lambda left, right: left / right,
+}
+
+WINDOW_AGGREGATES = {Function.SUM, Function.COUNT, Function.MAX, Function.MIN, Function.AVG}
+
+MATH_EXPRESSIONS = {
+    Function.ABS: lambda value: value.abs(),
+    Function.ACOS: lambda value: value.arccos(),
+    Function.ACOSH: lambda value: value.arccosh(),
+    Function.ASIN: lambda value: value.arcsin(),
+    Function.ASINH: lambda value: value.arcsinh(),
+    Function.ATAN: lambda value: value.arctan(),
+    Function.ATANH: lambda value: value.arctanh(),
+    Function.COS: lambda value: value.cos(),
+    Function.COSH: lambda value: value.cosh(),
+    Function.DEGREES: lambda value: value.degrees(),
+    Function.EXP: lambda value: value.exp(),
+    Function.INT: lambda value: value.floor(),
+    Function.LN: lambda value: value.log(),
+    Function.LOG10: lambda value: value.log10(),
+    Function.NEGATE: lambda value: -value,
+    Function.RADIANS: lambda value: value.radians(),
+    Function.SIGN: lambda value: value.sign(),
+    Function.SIN: lambda value: value.sin(),
+    Function.SINH: lambda value: value.sinh(),
+    Function.SQRT: lambda value: value.sqrt(),
+    Function.TAN: lambda value: value.tan(),
+    Function.TANH: lambda value: value.tanh(),
+}
+
+TEXT_EXPRESSIONS = {
+    Function.LEN: lambda value: value.str.len_chars().cast(pl.Int64),
+    Function.LOWER: lambda value: value.str.to_lowercase(),
+    Function.TRIM: lambda value: value.str.strip_chars(),
+    Function.UPPER: lambda value: value.str.to_uppercase(),
+}
+
+# text functions whose optional second argument is a literal number of characters
+TEXT_SLICE_EXPRESSIONS = {
+    Function.LEFT: lambda value, num_characters: value.str.head(num_characters),
+    Function.RIGHT: lambda value, num_characters: value.str.tail(num_characters),
+}
+
+TEXT_CONCAT_FUNCTIONS = {Function.CONCAT, Function.CONCATENATE}
+
+
+def is_polars_available() -> bool:
+    return pl is not None
+
+
+def get_column_name(col: int) -> str:
+    return f"c{col}"
+
+
+def get_formula_index():
+    return pl.int_range(pl.len())
+
+
+def is_lowerable(exec_node: DFExecNode) -> bool:
+    if isinstance(exec_node, DFLitExecNode):
+        return True
+    if isinstance(exec_node, DFRefExecNode):
+        return exec_node.out_ref_axis == AXIS_ALONG_ROW
+    function = exec_node.function
+    children = exec_node.children
+    if function in WINDOW_AGGREGATES:
+        ref_children = [child for child in children if isinstance(child, DFRefExecNode)]
+        if function != Function.COUNT and not all(is_numeric_ref(child) for child in ref_children):
+            return False
+        # pandas aggregates fixed windows holding nulls differently, e.g., their SUM is null and
+        # COUNT includes the nulls, so such plans run on DFExecutor
+        if any(child.out_ref_type == RefType.FF and has_null_cells(child) for child in ref_children):
+            return False
+    elif function in ARITHMETIC_OPERATORS:
+        if len(children) != 2 or not all(is_single_value(child) for child in children):
+            return False
+    elif function in MATH_EXPRESSIONS or function in TEXT_EXPRESSIONS:
+        if len(children) != 1 or not is_single_value(children[0]):
+            return False
+    elif function in TEXT_SLICE_EXPRESSIONS:
+        if not is_single_value(children[0]):
+            return False
+        if len(children) == 2 and not isinstance(children[1], DFLitExecNode):
+            return False
+    elif function in TEXT_CONCAT_FUNCTIONS or function == Function.EXACT:
+        if not all(is_single_value(child) for child in children):
+            return False
+    else:
+        return False
+    return all(is_lowerable(child) for child in children)
+
+
+def is_single_value(exec_node: DFExecNode) -> bool:
+    # one cell per formula: a literal, a function result or a single-cell relative or fixed reference
+    if isinstance(exec_node, DFRefExecNode):
+        ref = exec_node.ref
+        single_cell = ref.row == ref.last_row and ref.col == ref.last_col
+        return single_cell and exec_node.out_ref_type in (RefType.RR, RefType.FF)
+    return True
+
+
+def is_numeric_ref(ref_node: DFRefExecNode) -> bool:
+    table = ref_node.table
+    return all(
+        table.is_numeric_column(col) for col in range(ref_node.ref.col, ref_node.ref.last_col + 1)
+    )
+
+
+def has_null_cells(ref_node: DFRefExecNode) -> bool:
+    ref = ref_node.ref
+    df = ref_node.table.get_table_content()
+    return df.iloc[ref.row : ref.last_row + 1, ref.col : ref.last_col + 1].isna().to_numpy().any()
+
+
+def collect_columns(exec_node: DFExecNode, columns: set) -> set:
+    if isinstance(exec_node, DFRefExecNode):
+        columns.update(range(exec_node.ref.col, exec_node.ref.last_col + 1))
+    for child in exec_node.children:
+        collect_columns(child, columns)
+    return columns
+
+
+def build_lazy_frame(df_table: DFTable, columns: set):
+    # only referenced columns are converted; each conversion is cached by the table until it changes
+    return pl.LazyFrame(
+        [
+            df_table.get_column_cache(POLARS_SERIES, col, builder=pl.from_pandas).alias(
+                get_column_name(col)
+            )
+            for col in sorted(columns)
+        ]
+    )
+
+
+def lower_exec_node(exec_node: DFExecNode):
+    # the i-th value of the returned expression is the result of the i-th formula
+    if isinstance(exec_node, DFLitExecNode):
+        return pl.lit(exec_node.literal)
+    if isinstance(exec_node, DFRefExecNode):
+        return lower_single_value(exec_node)
+    function = exec_node.function
+    if function in WINDOW_AGGREGATES:
+        return lower_aggregate(exec_node)
+    if function in ARITHMETIC_OPERATORS:
+        left, right = [lower_exec_node(child) for child in exec_node.children]
+        return ARITHMETIC_OPERATORS[function](left, right)
+    if function in MATH_EXPRESSIONS:
+        return MATH_EXPRESSIONS[function](lower_exec_node(exec_node.children[0]))
+    if function in TEXT_EXPRESSIONS:
+        return TEXT_EXPRESSIONS[function](lower_exec_node(exec_node.children[0]).cast(pl.String))
+    if function in TEXT_SLICE_EXPRESSIONS:
+        num_characters = 1 if len(exec_node.children) == 1 else int(exec_node.children[1].literal)
+        value = lower_exec_node(exec_node.children[0]).cast(pl.String)
+        return TEXT_SLICE_EXPRESSIONS[function](value, num_characters)
+    if function in TEXT_CONCAT_FUNCTIONS:
+        return pl.concat_str([lower_exec_node(child).cast(pl.String) for child in exec_node.children])
+    if function == Function.EXACT:
+        left, right = [lower_exec_node(child).cast(pl.String) for child in exec_node.children]
+        # as in pandas, a null never equals anything, including cells below the table
+        return (left == right).fill_null(False)
+    assert False
+
+
+def lower_single_value(ref_node: DFRefExecNode):
+    ref = ref_node.ref
+    column = pl.col(get_column_name(ref.col))
+    if ref_node.out_ref_type == RefType.FF:
+        return column.get(ref.row)
+    # cells below the table are nulls, as fill_in_nan pads the pandas results
+    return column.shift(-ref.row)
+
+
+def lower_aggregate(exec_node: DFFuncExecNode):
+    if exec_node.function == Function.AVG:
+        return lower_distributive(exec_node, Function.SUM) / lower_distributive(
+            exec_node, Function.COUNT
+        )
+    return lower_distributive(exec_node, exec_node.function)
+
+
+def lower_distributive(exec_node: DFFuncExecNode, function: Function):
+    values = []
+    literals = []
+    for child in exec_node.children:
+        if isinstance(child, DFLitExecNode):
+            literals.append(child.literal)
+        elif isinstance(child, DFRefExecNode):
+            values.append(lower_window(child, function))
+        else:
+            # a function result is a one-cell window of the formula's own row
+            values.append(aggregate_cells(function, [lower_exec_node(child)]))
+
+    if function == Function.COUNT:
+        return sum(values[1:], values[0]) + len(literals) if values else pl.lit(len(literals))
+    if function == Function.SUM:
+        return sum(values[1:], values[0]) + sum(literals) if values else pl.lit(sum(literals))
+    # null arguments are skipped, but the result is null as soon as one of the windows is incomplete
+    combine = pl.max_horizontal if function == Function.MAX else pl.min_horizontal
+    result = combine(values + [pl.lit(literal) for literal in literals])
+    ref_nodes = [child for child in exec_node.children if isinstance(child, DFRefExecNode)]
+    if not ref_nodes:
+        return result
+    return pl.when(pl.all_horizontal([lower_window_validity(child) for child in ref_nodes])).then(result)
+
+
+def lower_window_validity(ref_node: DFRefExecNode):
+    # whether the window of each formula lies within the table, as in get_window_bounds
+    ref = ref_node.ref
+    formula_idx = get_formula_index()
+    out_ref_type = ref_node.out_ref_type
+    if out_ref_type in (RefType.RR, RefType.FR):
+        return formula_idx + ref.last_row < pl.len()
+    if out_ref_type == RefType.RF:
+        return (formula_idx <= ref.last_row - ref.row) & (pl.lit(ref.last_row) < pl.len())
+    return pl.lit(ref.last_row) < pl.len()
+
+
+def aggregate_cells(function: Function, cells: list):
+    # the per-row value of a window: SUM and COUNT treat nulls as zero, MAX and MIN skip them
+    if function == Function.SUM:
+        return pl.sum_horizontal([cell.fill_null(0) for cell in cells])
+    if function == Function.COUNT:
+        return pl.sum_horizontal([cell.is_not_null().cast(pl.Int64) for cell in cells])
+    if function == Function.MAX:
+        return pl.max_horizontal(cells)
+    return pl.min_horizontal(cells)
+
+
+def lower_window(ref_node: DFRefExecNode, function: Function):
+    ref = ref_node.ref
+    cells = [pl.col(get_column_name(col)) for col in range(ref.col, ref.last_col + 1)]
+    out_ref_type = ref_node.out_ref_type
+    if out_ref_type == RefType.FF:
+        cells = [cell.slice(ref.row, ref.last_row - ref.row + 1) for cell in cells]
+        row_values = aggregate_cells(function, cells)
+        if function in (Function.SUM, Function.COUNT):
+            return row_values.sum()
+        return row_values.max() if function == Function.MAX else row_values.min()
+
+    row_values = aggregate_cells(function, cells)
+    is_additive = function in (Function.SUM, Function.COUNT)
+    if out_ref_type == RefType.RR:
+        window_size = ref.last_row - ref.row + 1
+        if is_additive:
+            rolled = row_values.rolling_sum(window_size, min_samples=1)
+        elif function == Function.MAX:
+            rolled = row_values.rolling_max(window_size, min_samples=1)
+        else:
+            rolled = row_values.rolling_min(window_size, min_samples=1)
+        # the window of the i-th formula ends at row last_row + i
+        return rolled.shift(-ref.last_row)
+
+    formula_idx = get_formula_index()
+    if out_ref_type == RefType.FR:
+        masked = pl.when(formula_idx >= ref.row).then(row_values)
+        if is_additive:
+            accumulated = masked.fill_null(0).cum_sum()
+        elif function == Function.MAX:
+            accumulated = masked.cum_max().forward_fill()
+        else:
+            accumulated = masked.cum_min().forward_fill()
+        return accumulated.shift(-ref.last_row)
+
+    # RF: the window of the i-th formula spans rows row + i to last_row
+    masked = pl.when(formula_idx <= ref.last_row).then(row_values)
+    if is_additive:
+        accumulated = masked.fill_null(0).cum_sum(reverse=True)
+    elif function == Function.MAX:
+        accumulated = masked.cum_max(reverse=True).backward_fill()
+    else:
+        accumulated = masked.cum_min(reverse=True).backward_fill()
+    return pl.when(formula_idx <= ref.last_row - ref.row).then(accumulated.shift(-ref.row))
+
+
+class PolarsExecutor:
+    def __init__(
+        self,
+        df_config: DFConfig,
+        exec_context: DFExecContext,
+        metrics_tracker: MetricsTracker,
+        tracer: Tracer = None,
+    ):
+        self.df_config = df_config
+        self.exec_context = exec_context
+        self.metrics_tracker = metrics_tracker
+        self.tracer = tracer
+
+    def execute_formula_plan(self, df_table: DFTable, formula_plan: PlanNode) -> pd.DataFrame:
+        physical_plan = from_plan_to_execution_tree(formula_plan, df_table)
+        physical_plan.set_exec_context(self.exec_context)
+        if not isinstance(physical_plan, DFFuncExecNode) or not is_lowerable(physical_plan):
+            executor = DFExecutor(self.df_config, self.exec_context, self.metrics_tracker, self.tracer)
+            return executor.execute_formula_plan(df_table, formula_plan)
+
+        span = None
+        if self.tracer is not None:
+            span = self.tracer.start_span(
+                physical_plan.function.name, **{FUNCTION: physical_plan.function.name}
+            )
+        start = time()
+        lazy_frame = build_lazy_frame(df_table, collect_columns(physical_plan, set()))
+        # the index column broadcasts a plan that only reads fixed references to every formula
+        try:
+            result = (
+                lazy_frame.select(
+                    get_formula_index().alias(FORMULA_INDEX_COLUMN),
+                    lower_exec_node(physical_plan).alias(VALUE_COLUMN),
+                )
+                .slice(
+                    self.exec_context.formula_idx_start,
+                    self.exec_context.formula_idx_end - self.exec_context.formula_idx_start,
+                )
+                .select(VALUE_COLUMN)
+                .collect()
+            )
+        except pl.exceptions.PolarsError as e:
+            raise FormSException(f"Polars execution error: {e}")
+        res = pd.DataFrame({0: result.get_column(VALUE_COLUMN).to_pandas()})
+        execution_time = time() - start
+        self.metrics_tracker.put_one_metric(EXECUTION_TIME, int(execution_time * MICROS_PER_SEC))
+
+        if span is not None:
+            self.tracer.finish_span(span)
+            span.set_attribute(EXECUTOR, POLARS_EXECUTOR)
+            span.set_attribute(OUTPUT_ROWS, res.shape[0])
+            span.set_attribute(OUTPUT_BYTES, int(res.memory_usage(index=True, deep=False).sum()))
+        return res
+
+    def clean_up(self):
+        pass
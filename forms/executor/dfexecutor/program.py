@@ -0,0 +1,254 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+# Physical plans compiled into a flat program: one instruction per function node, in post-order,
+# reading the base table, literals or the numbered slots written by earlier instructions. A program
+# holds no tables and is never mutated, so it can run many times over different tables and row ranges.
+
+import copy
+
+from typing import Callable, NamedTuple
+
+from forms.core.config import DFExecContext
+from forms.executor.dfexecutor.basicfuncexecutor import find_function_executor
+from forms.executor.dfexecutor.dfexecnode import DFExecNode, DFFuncExecNode, DFLitExecNode, DFRefExecNode
+from forms.executor.dfexecutor.dftable import DFTable
+from forms.executor.dfexecutor.fusion import DFFusedExecNode, fused_df_executor
+from forms.utils.exceptions import FormSException
+from forms.utils.memory import MemoryTracker
+from forms.utils.metrics import PEAK_MEMORY
+from forms.utils.reference import ORIGIN_REF, RefType
+from forms.utils.tracing import Tracer, EXECUTOR, FUNCTION, INPUT_ROWS, OUTPUT_ROWS, OUTPUT_BYTES
+from forms.utils.treenode import link_parent_to_children
+
+FLOAT_BYTES = 8
+
+
+class RefOperand(NamedTuple):
+    # a reference into the table the program runs on
+    ref: object
+    out_ref_type: RefType
+    out_ref_axis: int
+
+
+class LitOperand(NamedTuple):
+    literal: object
+    out_ref_type: RefType
+    out_ref_axis: int
+
+
+class SlotOperand(NamedTuple):
+    # the result of an earlier instruction; it has one row per formula, starting at row 0
+    slot: int
+    out_ref_axis: int
+
+
+class Instruction(NamedTuple):
+    executor: Callable
+    # the function node without children; each run works on a copy of it
+    prototype: DFFuncExecNode
+    operands: tuple
+    output_slot: int
+    # index of the instruction consuming the output, None for the last one
+    parent: int
+
+
+class Program:
+    def __init__(self, instructions: tuple, num_slots: int):
+        self.instructions = instructions
+        self.num_slots = num_slots
+        # pre-order of the instructions, so that the spans of a run follow the plan tree
+        self.span_order = tuple(get_pre_order(instructions, len(instructions) - 1))
+
+    def run(
+        self,
+        table: DFTable,
+        exec_context: DFExecContext,
+        tracer: Tracer = None,
+        memory_tracker: MemoryTracker = None,
+    ) -> DFTable:
+        n_formula = exec_context.formula_idx_end - exec_context.formula_idx_start
+        slot_context = DFExecContext(0, n_formula, exec_context.axis)
+        slots = [None] * self.num_slots
+        spans = self.create_spans(tracer)
+        for idx, instruction in enumerate(self.instructions):
+            node = bind_instruction(instruction, table, slots, exec_context, slot_context)
+            span = None if spans is None else spans[idx]
+            res_table = run_instruction(instruction, node, span, memory_tracker)
+            for operand in instruction.operands:
+                if isinstance(operand, SlotOperand):
+                    slots[operand.slot] = None
+            slots[instruction.output_slot] = res_table
+        if spans is not None:
+            spans[-1].extend_to_children()
+        return slots[self.instructions[-1].output_slot]
+
+    def create_spans(self, tracer: Tracer):
+        if tracer is None:
+            return None
+        spans = [None] * len(self.instructions)
+        for idx in self.span_order:
+            instruction = self.instructions[idx]
+            name = instruction.prototype.function.name
+            parent = None if instruction.parent is None else spans[instruction.parent]
+            spans[idx] = tracer.create_span(name, parent, **{FUNCTION: name})
+        return spans
+
+
+def get_pre_order(instructions: tuple, idx: int) -> list:
+    children = [child for child, instruction in enumerate(instructions) if instruction.parent == idx]
+    return [idx] + [child_idx for child in children for child_idx in get_pre_order(instructions, child)]
+
+
+def compile_program(physical_plan: DFExecNode) -> Program:
+    if not isinstance(physical_plan, DFFuncExecNode):
+        raise FormSException("A formula plan must be rooted at a function")
+    compiler = ProgramCompiler()
+    compiler.compile_node(physical_plan)
+    instructions = tuple(
+        Instruction(executor, prototype, operands, output_slot, compiler.parents[idx])
+        for idx, (executor, prototype, operands, output_slot) in enumerate(compiler.instructions)
+    )
+    return Program(instructions, compiler.num_slots)
+
+
+class ProgramCompiler:
+    def __init__(self):
+        self.instructions = []
+        self.parents = []
+        self.num_slots = 0
+        self.free_slots = []
+
+    def compile_node(self, exec_node: DFFuncExecNode) -> int:
+        # emits the instructions of the children, then the node's own, and returns its index
+        operands = []
+        child_indices = []
+        for child in exec_node.children:
+            if isinstance(child, DFFuncExecNode):
+                child_idx = self.compile_node(child)
+                child_indices.append(child_idx)
+                operands.append(SlotOperand(self.instructions[child_idx][3], child.out_ref_axis))
+            elif isinstance(child, DFRefExecNode):
+                operands.append(RefOperand(child.ref, child.out_ref_type, child.out_ref_axis))
+            elif isinstance(child, DFLitExecNode):
+                operands.append(LitOperand(child.literal, child.out_ref_type, child.out_ref_axis))
+            else:
+                raise FormSException("Unknown execution node type: {}".format(type(child)))
+
+        # a slot is free again once the instruction reading it has run
+        consumed = [operand.slot for operand in operands if isinstance(operand, SlotOperand)]
+        output_slot = consumed[0] if consumed else self.allocate_slot()
+        self.free_slots.extend(consumed[1:])
+
+        prototype = copy.copy(exec_node)
+        prototype.parent = None
+        prototype.children = []
+        if isinstance(exec_node, DFFusedExecNode):
+            executor = fused_df_executor
+        else:
+            executor = find_function_executor(exec_node.function)
+        idx = len(self.instructions)
+        self.instructions.append((executor, prototype, tuple(operands), output_slot))
+        self.parents.append(None)
+        for child_idx in child_indices:
+            self.parents[child_idx] = idx
+        return idx
+
+    def allocate_slot(self) -> int:
+        if self.free_slots:
+            return self.free_slots.pop()
+        self.num_slots += 1
+        return self.num_slots - 1
+
+
+def bind_instruction(
+    instruction: Instruction,
+    table: DFTable,
+    slots: list,
+    exec_context: DFExecContext,
+    slot_context: DFExecContext,
+) -> DFFuncExecNode:
+    # executors work on execution nodes, so each run builds a fresh one-level tree
+    children = []
+    for operand in instruction.operands:
+        if isinstance(operand, SlotOperand):
+            child = DFRefExecNode(ORIGIN_REF, slots[operand.slot], RefType.RR, operand.out_ref_axis)
+            child.exec_context = slot_context
+        elif isinstance(operand, RefOperand):
+            child = DFRefExecNode(operand.ref, table, operand.out_ref_type, operand.out_ref_axis)
+            child.exec_context = exec_context
+        else:
+            child = DFLitExecNode(operand.literal, operand.out_ref_type, operand.out_ref_axis)
+            child.exec_context = exec_context
+        children.append(child)
+    node = copy.copy(instruction.prototype)
+    node.exec_context = exec_context
+    link_parent_to_children(node, children)
+    return node
+
+
+def run_instruction(
+    instruction: Instruction, node: DFFuncExecNode, span, memory_tracker: MemoryTracker
+) -> DFTable:
+    description = f"Function {node.function.name}"
+    if span is not None:
+        span.start()
+    if memory_tracker is not None:
+        memory_tracker.check_budget(estimate_output_bytes(node), description)
+        start_bytes = memory_tracker.start_node()
+    res_table = instruction.executor(node)
+
+    if span is not None:
+        span.finish()
+        span.set_attribute(EXECUTOR, instruction.executor.__name__)
+        span.set_attribute(INPUT_ROWS, get_input_rows(node))
+        span.set_attribute(OUTPUT_ROWS, res_table.get_num_of_rows())
+        span.set_attribute(OUTPUT_BYTES, res_table.get_memory_usage())
+
+    # the results of earlier instructions are not needed anymore, unless the node passed one through
+    consumed = [
+        child
+        for child, operand in zip(node.children, instruction.operands)
+        if isinstance(operand, SlotOperand) and child.table is not res_table
+    ]
+    if memory_tracker is not None:
+        freed_bytes = sum(child.table.get_memory_usage() for child in consumed)
+        node_peak_bytes = memory_tracker.finish_node(
+            start_bytes, res_table.get_memory_usage(), freed_bytes, description
+        )
+        if span is not None:
+            span.set_attribute(PEAK_MEMORY, node_peak_bytes)
+    for child in consumed:
+        child.table = None
+    return res_table
+
+
+def estimate_output_bytes(physical_plan: DFFuncExecNode) -> int:
+    # one float64 per formula and column of the widest input
+    exec_context = physical_plan.exec_context
+    num_formulas = exec_context.formula_idx_end - exec_context.formula_idx_start
+    num_cols = 1
+    for child in physical_plan.children:
+        if isinstance(child, DFRefExecNode):
+            num_cols = max(num_cols, child.ref.last_col - child.ref.col + 1)
+    return num_formulas * num_cols * FLOAT_BYTES
+
+
+def get_input_rows(physical_plan: DFExecNode) -> int:
+    # rows of the tables read by the node, including its children's results
+    return sum(
+        child.table.get_num_of_rows()
+        for child in physical_plan.children
+        if isinstance(child, DFRefExecNode)
+    )
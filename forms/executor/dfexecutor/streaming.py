@@ -0,0 +1,453 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+# Formulas over a table that only grows by appended rows. The windows of formula i end at row
+# i + last_row for RR and FR references, and RF and FF windows end at a fixed row, so the value of
+# formula i is final once that row has arrived and never changes afterwards. Every reference keeps just
+# enough state to produce the values that become final with a batch: the rows of its open windows for
+# RR, running totals, extremes and median heaps for FR, the reduced windows for RF and FF. As in the
+# DF executor, a formula is null when one of its windows is empty or reaches past the last row, and
+# FF windows are reduced without skipping nulls, e.g., their SUM is null when one cell is and COUNT
+# includes the nulls.
+
+import heapq
+import warnings
+
+from abc import ABC, abstractmethod
+
+import numpy as np
+import pandas as pd
+
+from numpy.lib.stride_tricks import sliding_window_view
+
+from forms.executor.dfexecutor import kernels
+from forms.executor.dfexecutor.basicfuncexecutor import distributive_function_to_parameters_dict
+from forms.executor.dfexecutor.fusion import BINARY_UFUNCS, UNARY_UFUNCS
+from forms.planner.plannode import FunctionNode, LiteralNode, PlanNode, RefNode
+from forms.utils.exceptions import FormSException
+from forms.utils.functions import Function
+from forms.utils.reference import RefType
+
+DISTRIBUTIVE_FUNCTIONS = {Function.SUM, Function.COUNT, Function.MAX, Function.MIN}
+
+
+def reduce_rows(block: np.ndarray, function: Function) -> np.ndarray:
+    # one value per row of a block of cells; nulls are skipped
+    if function == Function.COUNT:
+        return np.count_nonzero(~np.isnan(block), axis=1).astype(np.float64)
+    if function == Function.SUM:
+        return np.nansum(block, axis=1)
+    if function == Function.MAX:
+        return np.fmax.reduce(block, axis=1)
+    return np.fmin.reduce(block, axis=1)
+
+
+def reduce_fixed_cells(cells: np.ndarray, function: Function) -> float:
+    # the cells of an FF window, reduced by the functions the DF executor applies to them
+    if function is None:
+        return cells[0]
+    if function == Function.MEDIAN:
+        return np.median(cells)
+    func_ff = distributive_function_to_parameters_dict[function][2]
+    return float(func_ff(cells))
+
+
+def reduce_suffixes(block: np.ndarray, function: Function) -> np.ndarray:
+    # the values of the windows from each row of the block to its last row
+    if function == Function.MEDIAN:
+        running_median = RunningMedian()
+        values = np.empty(block.shape[0])
+        for idx in range(block.shape[0] - 1, -1, -1):
+            for value in block[idx][~np.isnan(block[idx])]:
+                running_median.push(float(value))
+            values[idx] = running_median.median()
+        return values
+    reversed_rows = reduce_rows(block, function)[::-1]
+    if function in (Function.SUM, Function.COUNT):
+        return np.cumsum(reversed_rows)[::-1]
+    accumulate = np.fmax.accumulate if function == Function.MAX else np.fmin.accumulate
+    return accumulate(reversed_rows)[::-1]
+
+
+def reduce_sliding(block: np.ndarray, height: int, function: Function) -> np.ndarray:
+    # the values of the windows of the given height over consecutive rows of the block
+    num_windows = block.shape[0] - height + 1
+    if function is None:
+        return block[:, 0].copy()
+    if function in (Function.SUM, Function.COUNT):
+        # each window is summed on its own, since differences of running sums lose small values
+        return pd.Series(reduce_rows(block, function)).rolling(height).sum().to_numpy()[height - 1 :]
+
+    num_cells = height * block.shape[1]
+    if kernels.use_kernels() and (
+        function != Function.MEDIAN or num_cells <= kernels.MAX_MEDIAN_WINDOW_CELLS
+    ):
+        starts = np.arange(num_windows, dtype=np.int64)
+        valid = np.ones(num_windows, dtype=bool)
+        block = np.ascontiguousarray(block)
+        if function == Function.MEDIAN:
+            return kernels.run_window_kernel(
+                kernels.window_median_kernel, block, starts, starts + height, valid
+            )
+        sign = 1.0 if function == Function.MAX else -1.0
+        return kernels.run_window_kernel(
+            kernels.window_extreme_kernel, block, starts, starts + height, valid, sign
+        )
+
+    if function == Function.MEDIAN:
+        windows = sliding_window_view(block, (height, block.shape[1]))[:, 0].reshape(
+            num_windows, num_cells
+        )
+        with warnings.catch_warnings():
+            # windows of nulls only yield NaN
+            warnings.simplefilter("ignore", RuntimeWarning)
+            return np.nanmedian(windows, axis=1)
+    rolling = pd.Series(reduce_rows(block, function)).rolling(height, min_periods=1)
+    values = rolling.max() if function == Function.MAX else rolling.min()
+    return values.to_numpy()[height - 1 :]
+
+
+class RunningMedian:
+    # the lower half of the values in a max-heap of negated values, the upper half in a min-heap
+    def __init__(self):
+        self.low = []
+        self.high = []
+
+    def push(self, value: float):
+        if self.low and value > -self.low[0]:
+            heapq.heappush(self.high, value)
+        else:
+            heapq.heappush(self.low, -value)
+        if len(self.low) > len(self.high) + 1:
+            heapq.heappush(self.high, -heapq.heappop(self.low))
+        elif len(self.high) > len(self.low):
+            heapq.heappush(self.low, -heapq.heappop(self.high))
+
+    def median(self) -> float:
+        if not self.low:
+            return np.nan
+        if len(self.low) > len(self.high):
+            return -self.low[0]
+        return (self.high[0] - self.low[0]) / 2
+
+
+class StreamWindow(ABC):
+    """
+    The cells one reference reads for each formula, reduced by one function, or the single cell
+    itself when the function is None. Rows are buffered until no unfinished window needs them.
+    """
+
+    def __init__(self, ref, function: Function):
+        self.ref = ref
+        self.function = function
+        self.cols = slice(ref.col, ref.last_col + 1)
+        self.num_rows = 0
+        # the rows from buffer_start on that are still needed
+        self.buffer = np.empty((0, ref.last_col - ref.col + 1))
+        self.buffer_start = 0
+        # set once no more rows will be appended
+        self.finished = False
+
+    def append(self, block: np.ndarray):
+        self.buffer = np.concatenate([self.buffer, block[:, self.cols]])
+        self.num_rows += block.shape[0]
+        self.drop_rows_before(self.get_first_needed_row())
+
+    def drop_rows_before(self, row: int):
+        num_dropped = min(max(row - self.buffer_start, 0), self.buffer.shape[0])
+        self.buffer = self.buffer[num_dropped:]
+        self.buffer_start += num_dropped
+
+    def get_rows(self, start_row: int, end_row: int) -> np.ndarray:
+        return self.buffer[start_row - self.buffer_start : end_row - self.buffer_start]
+
+    @abstractmethod
+    def get_first_needed_row(self) -> int:
+        # the first row a formula that is not yet final still reads
+        pass
+
+    @abstractmethod
+    def get_num_valid(self) -> int:
+        # the number of formulas, from the first one, whose windows are complete and not empty
+        pass
+
+    def get_num_final(self) -> int:
+        # the number of formulas, from the first one, whose values no appended row can change
+        return self.num_rows if self.finished else self.get_num_valid()
+
+    @abstractmethod
+    def emit(self, start: int, end: int) -> np.ndarray:
+        # the values of valid formulas [start, end), where start is where the previous call ended
+        pass
+
+    def skip(self, start: int, end: int):
+        # formulas [start, end) are null, and so are all later ones
+        pass
+
+
+class SlidingWindow(StreamWindow):
+    # RR: formula i reads rows i + row to i + last_row
+    def __init__(self, ref, function: Function):
+        super().__init__(ref, function)
+        self.next_formula = 0
+
+    def get_first_needed_row(self) -> int:
+        return self.next_formula + self.ref.row
+
+    def get_num_valid(self) -> int:
+        return max(self.num_rows - self.ref.last_row, 0)
+
+    def emit(self, start: int, end: int) -> np.ndarray:
+        height = self.ref.last_row - self.ref.row + 1
+        block = self.get_rows(start + self.ref.row, end + self.ref.last_row)
+        values = reduce_sliding(block, height, self.function)
+        self.skip(start, end)
+        return values
+
+    def skip(self, start: int, end: int):
+        self.next_formula = end
+        self.drop_rows_before(self.get_first_needed_row())
+
+
+class GrowingWindow(StreamWindow):
+    # FR: formula i reads rows row to i + last_row, so each formula adds one row to the previous window
+    def __init__(self, ref, function: Function):
+        super().__init__(ref, function)
+        self.next_row = ref.row
+        self.total = 0.0
+        self.extreme = np.nan
+        self.running_median = RunningMedian()
+
+    def get_first_needed_row(self) -> int:
+        return self.next_row
+
+    def get_num_valid(self) -> int:
+        return max(self.num_rows - self.ref.last_row, 0)
+
+    def emit(self, start: int, end: int) -> np.ndarray:
+        end_row = end + self.ref.last_row
+        block = self.get_rows(self.next_row, end_row)
+        if self.function in (Function.SUM, Function.COUNT):
+            running = self.total + np.cumsum(reduce_rows(block, self.function))
+            self.total = running[-1]
+        elif self.function in (Function.MAX, Function.MIN):
+            accumulate = np.fmax.accumulate if self.function == Function.MAX else np.fmin.accumulate
+            running = accumulate(np.concatenate([[self.extreme], reduce_rows(block, self.function)]))[1:]
+            self.extreme = running[-1]
+        else:
+            running = np.empty(block.shape[0])
+            for idx, row in enumerate(block):
+                for value in row[~np.isnan(row)]:
+                    self.running_median.push(float(value))
+                running[idx] = self.running_median.median()
+        self.next_row = end_row
+        self.drop_rows_before(self.next_row)
+        # the window of formula i ends at row i + last_row
+        return running[block.shape[0] - (end - start) :]
+
+    def skip(self, start: int, end: int):
+        # the running state is not needed anymore, since no later formula is valid
+        self.next_row = max(self.next_row, end + self.ref.last_row)
+        self.drop_rows_before(self.next_row)
+
+
+class FixedWindow(StreamWindow):
+    # FF: every formula reads rows row to last_row
+    def __init__(self, ref, function: Function):
+        super().__init__(ref, function)
+        self.value = None
+
+    def append(self, block: np.ndarray):
+        if self.value is None:
+            # rows after last_row are never read
+            num_needed = max(self.ref.last_row + 1 - self.num_rows, 0)
+            self.buffer = np.concatenate([self.buffer, block[:num_needed, self.cols]])
+            self.drop_rows_before(self.ref.row)
+            if self.num_rows + block.shape[0] > self.ref.last_row:
+                self.value = self.reduce(self.buffer)
+                self.buffer = self.buffer[:0]
+        self.num_rows += block.shape[0]
+
+    def reduce(self, block: np.ndarray):
+        return reduce_fixed_cells(block.ravel(), self.function)
+
+    def get_first_needed_row(self) -> int:
+        return self.ref.row
+
+    def get_num_valid(self) -> int:
+        return self.num_rows if self.value is not None else 0
+
+    def get_num_final(self) -> int:
+        # no appended row changes the reduced windows
+        return self.num_rows if self.value is not None or self.finished else 0
+
+    def emit(self, start: int, end: int) -> np.ndarray:
+        return np.full(end - start, self.value, dtype=np.float64)
+
+
+class SuffixWindow(FixedWindow):
+    # RF: formula i reads rows i + row to last_row, so all windows are known once last_row has arrived
+    def reduce(self, block: np.ndarray) -> np.ndarray:
+        return reduce_suffixes(block, self.function)
+
+    def get_num_valid(self) -> int:
+        # the windows of formulas after last_row - row are empty
+        return min(self.value.size, self.num_rows) if self.value is not None else 0
+
+    def emit(self, start: int, end: int) -> np.ndarray:
+        return self.value[start:end]
+
+
+class StreamNode:
+    def __init__(self, function, children: list):
+        # a ufunc combining the values of the children, or a literal when there are no children
+        self.function = function
+        self.children = children
+
+    def emit(self, start: int, end: int) -> np.ndarray:
+        if not self.children:
+            return np.full(end - start, self.function, dtype=np.float64)
+        values = [child.emit(start, end) for child in self.children]
+        with np.errstate(all="ignore"):
+            return self.function.reduce(values) if len(values) > 2 else self.function(*values)
+
+
+def create_window(ref_node: RefNode, function: Function) -> StreamWindow:
+    if ref_node.out_ref_type == RefType.RR:
+        return SlidingWindow(ref_node.ref, function)
+    if ref_node.out_ref_type == RefType.FR:
+        return GrowingWindow(ref_node.ref, function)
+    if ref_node.out_ref_type == RefType.RF:
+        return SuffixWindow(ref_node.ref, function)
+    return FixedWindow(ref_node.ref, function)
+
+
+def get_numeric_literal(literal_node: LiteralNode) -> float:
+    literal = literal_node.literal
+    if not isinstance(literal, (int, float)) or isinstance(literal, bool):
+        raise FormSException(f"Literal {literal} is not supported in streaming mode")
+    return float(literal)
+
+
+def build_aggregate(function: Function, children: list, windows: list):
+    nodes = []
+    literals = []
+    for child in children:
+        if isinstance(child, RefNode):
+            window = create_window(child, function)
+            windows.append(window)
+            nodes.append(window)
+        elif isinstance(child, LiteralNode):
+            # COUNT counts literals of any type
+            literals.append(1.0 if function == Function.COUNT else get_numeric_literal(child))
+        else:
+            raise FormSException(f"Function {function.name} only reads references and literals")
+    if literals:
+        combine_literals = {Function.MAX: max, Function.MIN: min}.get(function, sum)
+        nodes.append(StreamNode(float(combine_literals(literals)), []))
+    if len(nodes) == 1:
+        return nodes[0]
+    combine = {
+        Function.SUM: np.add,
+        Function.COUNT: np.add,
+        Function.MAX: np.fmax,
+        Function.MIN: np.fmin,
+    }
+    return StreamNode(combine[function], nodes)
+
+
+def build_stream_node(plan_node: PlanNode, windows: list):
+    # the windows of all references are collected, since every one of them receives all rows
+    if isinstance(plan_node, LiteralNode):
+        return StreamNode(get_numeric_literal(plan_node), [])
+    if isinstance(plan_node, RefNode):
+        if not plan_node.ref.is_cell or plan_node.out_ref_type not in (RefType.RR, RefType.FF):
+            raise FormSException("A range must be aggregated to be streamed")
+        window = create_window(plan_node, None)
+        windows.append(window)
+        return window
+
+    function = plan_node.function
+    if function in DISTRIBUTIVE_FUNCTIONS:
+        return build_aggregate(function, plan_node.children, windows)
+    if function == Function.AVG:
+        sum_node = build_aggregate(Function.SUM, plan_node.children, windows)
+        count_node = build_aggregate(Function.COUNT, plan_node.children, windows)
+        return StreamNode(np.divide, [sum_node, count_node])
+    if function == Function.MEDIAN:
+        if len(plan_node.children) != 1 or not isinstance(plan_node.children[0], RefNode):
+            raise FormSException("MEDIAN is streamed over a single reference")
+        window = create_window(plan_node.children[0], Function.MEDIAN)
+        windows.append(window)
+        return window
+    ufunc = BINARY_UFUNCS.get(function) or UNARY_UFUNCS.get(function)
+    if ufunc is None:
+        raise FormSException(f"Function {function.name} is not supported in streaming mode")
+    return StreamNode(ufunc, [build_stream_node(child, windows) for child in plan_node.children])
+
+
+class StreamFormula:
+    """
+    One formula evaluated over an append-only table. The value of formula i is emitted once, as soon
+    as the rows of all its windows have been appended.
+    """
+
+    def __init__(self, root: PlanNode):
+        if not isinstance(root, (FunctionNode, RefNode, LiteralNode)):
+            raise FormSException(f"Unknown plan node type: {type(root)}")
+        self.windows = []
+        self.root = build_stream_node(root, self.windows)
+        self.num_rows = 0
+        self.num_emitted = 0
+
+    def get_columns(self) -> set:
+        return {col for window in self.windows for col in range(window.ref.col, window.ref.last_col + 1)}
+
+    def select_columns(self, columns: list):
+        # the appended blocks hold only the given columns, in this order
+        positions = {col: idx for idx, col in enumerate(columns)}
+        for window in self.windows:
+            window.cols = np.array(
+                [positions[col] for col in range(window.ref.col, window.ref.last_col + 1)]
+            )
+
+    def append(self, block: np.ndarray) -> tuple:
+        # returns the index of the first emitted formula and the values that became final
+        for window in self.windows:
+            window.append(block)
+        self.num_rows += block.shape[0]
+        return self.emit()
+
+    def finish(self) -> tuple:
+        # no more rows will be appended, so the remaining values are emitted
+        for window in self.windows:
+            window.finished = True
+        return self.emit()
+
+    def emit(self) -> tuple:
+        start = self.num_emitted
+        end = min([window.get_num_final() for window in self.windows], default=self.num_rows)
+        if end <= start:
+            return start, np.empty(0)
+        self.num_emitted = end
+        num_valid = min([window.get_num_valid() for window in self.windows], default=end)
+        valid_end = min(max(num_valid, start), end)
+        if valid_end == end:
+            return start, self.root.emit(start, end)
+        values = np.full(end - start, np.nan)
+        if valid_end > start:
+            values[: valid_end - start] = self.root.emit(start, valid_end)
+        for window in self.windows:
+            window.skip(valid_end, end)
+        return start, values
@@ -94,6 +94,64 @@ def get_reference_indices(ref_node: DFRefExecNode):
         return row + start_idx, col, ref.last_row + 1, col + col_width
 
 
+def get_window_bounds(ref_node: DFRefExecNode) -> (np.ndarray, np.ndarray, np.ndarray):
+    # row range [starts[i], ends[i]) referenced by the i-th formula, and whether that range is complete
+    ref = ref_node.ref
+    out_ref_type = ref_node.out_ref_type
+    formula_idx = np.arange(
+        ref_node.exec_context.formula_idx_start, ref_node.exec_context.formula_idx_end
+    )
+    n_rows = ref_node.table.get_num_of_rows()
+    if out_ref_type == RefType.RR:
+        starts, ends = ref.row + formula_idx, ref.last_row + 1 + formula_idx
+    elif out_ref_type == RefType.FR:
+        starts, ends = np.full(formula_idx.size, ref.row), ref.last_row + 1 + formula_idx
+    elif out_ref_type == RefType.RF:
+        starts, ends = ref.row + formula_idx, np.full(formula_idx.size, ref.last_row + 1)
+    else:
+        starts, ends = np.full(formula_idx.size, ref.row), np.full(formula_idx.size, ref.last_row + 1)
+    valid = (ends <= n_rows) & (starts < ends)
+    return np.minimum(starts, n_rows), np.minimum(ends, n_rows), valid
+
+
+def get_window_value_by_prefix(ref_node: DFRefExecNode, get_prefix) -> pd.DataFrame:
+    # aggregate every formula's window with two lookups per column into cached prefix arrays
+    ref = ref_node.ref
+    starts, ends, valid = get_window_bounds(ref_node)
+    value = np.zeros(starts.size, dtype=np.float64)
+    for col in range(ref.col, ref.last_col + 1):
+        prefix = get_prefix(col)
+        value += prefix[ends] - prefix[starts]
+    value[~valid] = np.nan
+    return pd.DataFrame(value)
+
+
+def get_window_value_by_rolling(ref_node: DFRefExecNode, row_values: np.ndarray, func) -> pd.DataFrame:
+    # sliding/expanding aggregate over per-row values; windows holding only nulls yield nulls.
+    # row_values may also be a block with several values per row, e.g., the cells of a MEDIAN window
+    ref = ref_node.ref
+    out_ref_type = ref_node.out_ref_type
+    starts, ends, valid = get_window_bounds(ref_node)
+    width = 1 if row_values.ndim == 1 else row_values.shape[1]
+    series = pd.Series(row_values.ravel(), dtype=np.float64)
+    if out_ref_type == RefType.RR:
+        window_size = (ref.last_row - ref.row + 1) * width
+        rolled = series.rolling(window_size, min_periods=1).agg(func).to_numpy()
+        positions = ends * width - 1
+    elif out_ref_type == RefType.FR:
+        rolled = series.iloc[ref.row * width :].expanding(1).agg(func).to_numpy()
+        positions = (ends - ref.row) * width - 1
+    else:
+        rolled = (
+            series.iloc[: (ref.last_row + 1) * width].iloc[::-1].expanding(1).agg(func).to_numpy()[::-1]
+        )
+        positions = starts * width
+    value = np.full(starts.size, np.nan)
+    if rolled.size > 0:
+        value[valid] = rolled[np.clip(positions, 0, rolled.size - 1)][valid]
+    return pd.DataFrame(value)
+
+
 def get_reference_indices_for_single_index(ref_node: DFRefExecNode, idx: int):
     ref = ref_node.ref
     table = ref_node.table
@@ -12,7 +12,7 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
-from openpyxl.formula.tokenizer import Tokenizer, Token
+from forms.parser.tokenizer import Token, tokenize
 from forms.planner.plannode import PlanNode, FunctionNode, LiteralNode, RefNode
 from forms.utils.functions import from_function_str
 from forms.utils.exceptions import (
@@ -34,8 +34,7 @@ def parse_formula(formula_string: str, axis: int) -> PlanNode:
         raise AxisNotSupportedException(f"Axis {axis} not supported")
     global formula_apply_axis
     formula_apply_axis = axis
-    tokenlizer = Tokenizer(formula_string)
-    tokens = tokenlizer.items
+    tokens = tokenize(formula_string)
     pos = 0
     return build_from_subexpression(tokens, pos)[0]
 
@@ -134,7 +133,11 @@ def build_from_literal_and_reference(tokens, pos: int) -> (PlanNode, int):
 
 
 def parse_range(cur_pos, cur_token) -> (Ref, RefType):
-    ref_list = cur_token.value.split(":")
+    return parse_range_str(cur_token.value, cur_pos, cur_token)
+
+
+def parse_range_str(range_str: str, cur_pos, cur_token) -> (Ref, RefType):
+    ref_list = range_str.split(":")
     row, col, row_relative, col_relative = parse_ref_str(ref_list[0], cur_pos, cur_token)
     last_row = row
     last_col = col
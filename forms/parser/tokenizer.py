@@ -0,0 +1,263 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import re
+
+from forms.utils.exceptions import FormulaStringSyntaxErrorException
+
+
+class Token:
+    """
+    A formula token. The type and subtype constants use the same values as
+    openpyxl's Token so that plans built from either tokenizer are identical.
+    """
+
+    __slots__ = ["value", "type", "subtype"]
+
+    LITERAL = "LITERAL"
+    OPERAND = "OPERAND"
+    FUNC = "FUNC"
+    ARRAY = "ARRAY"
+    PAREN = "PAREN"
+    SEP = "SEP"
+    OP_PRE = "OPERATOR-PREFIX"
+    OP_IN = "OPERATOR-INFIX"
+    OP_POST = "OPERATOR-POSTFIX"
+    WSPACE = "WHITE-SPACE"
+
+    TEXT = "TEXT"
+    NUMBER = "NUMBER"
+    LOGICAL = "LOGICAL"
+    ERROR = "ERROR"
+    RANGE = "RANGE"
+
+    OPEN = "OPEN"
+    CLOSE = "CLOSE"
+
+    ARG = "ARG"
+    ROW = "ROW"
+
+    def __init__(self, value: str, type_: str, subtype: str = ""):
+        self.value = value
+        self.type = type_
+        self.subtype = subtype
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, Token)
+            and self.value == other.value
+            and self.type == other.type
+            and self.subtype == other.subtype
+        )
+
+    def __repr__(self):
+        return f"Token({self.value!r}, {self.type!r}, {self.subtype!r})"
+
+
+WHITESPACE = " \t\r\n"
+INFIX_OPERATORS = "^*/&=<>"
+PREFIX_OR_INFIX_OPERATORS = "+-"
+POSTFIX_OPERATORS = "%"
+TWO_CHAR_OPERATORS = {">=", "<=", "<>"}
+LOGICAL_VALUES = {"TRUE", "FALSE"}
+ERROR_VALUES = ("#NULL!", "#DIV/0!", "#VALUE!", "#REF!", "#NAME?", "#NUM!", "#N/A", "#GETTING_DATA")
+
+# An operand runs until any character that starts another token
+OPERAND_PATTERN = re.compile(r"[^\s+\-*/^&=<>%(),;{}\"'\[]+")
+NUMBER_PATTERN = re.compile(r"^(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$")
+# A mantissa such as "1.5E" is continued by the sign of its exponent
+SCIENTIFIC_PREFIX_PATTERN = re.compile(r"(\d+\.?\d*|\.\d+)[eE]$")
+
+
+def tokenize(formula_string: str) -> list:
+    """
+    Split a formula string into tokens in a single left-to-right pass.
+
+    Only the subset of the formula grammar the planner supports is recognized:
+    functions, A1 references (with "$" and ":"), text/number/logical literals,
+    parentheses, and prefix, infix and postfix operators. Error values and
+    array constants are tokenized so that the parser can report them as unsupported.
+    A string that does not start with "=" is a single literal token.
+    """
+    if not formula_string.startswith("="):
+        return [Token(formula_string, Token.LITERAL)]
+
+    tokens = []
+    # Each entry records whether an open paren belongs to a function, a group or an array
+    open_stack = []
+    # The last non-whitespace token decides whether "+"/"-" is prefix or infix
+    last_token = None
+    pos = 1
+    length = len(formula_string)
+    while pos < length:
+        char = formula_string[pos]
+        new_token = None
+
+        if char in WHITESPACE:
+            end = pos + 1
+            while end < length and formula_string[end] in WHITESPACE:
+                end += 1
+            tokens.append(Token(" ", Token.WSPACE))
+            pos = end
+            continue
+        elif char == '"':
+            end = find_end_of_quoted(formula_string, pos, '"')
+            new_token = Token(formula_string[pos:end], Token.OPERAND, Token.TEXT)
+            pos = end
+        elif char == "#":
+            new_token = build_error_token(formula_string, pos)
+            pos += len(new_token.value)
+        elif char == "(":
+            if last_token is not None and last_token is tokens[-1] and is_function_name(last_token):
+                # The preceding operand is the function name
+                tokens.pop()
+                new_token = Token(last_token.value + "(", Token.FUNC, Token.OPEN)
+                open_stack.append(Token.FUNC)
+            else:
+                new_token = Token("(", Token.PAREN, Token.OPEN)
+                open_stack.append(Token.PAREN)
+            pos += 1
+        elif char == ")":
+            if not open_stack or open_stack[-1] == Token.ARRAY:
+                raise_tokenizer_exception(formula_string, pos)
+            new_token = Token(")", open_stack.pop(), Token.CLOSE)
+            pos += 1
+        elif char == "{":
+            new_token = Token("{", Token.ARRAY, Token.OPEN)
+            open_stack.append(Token.ARRAY)
+            pos += 1
+        elif char == "}":
+            if not open_stack or open_stack[-1] != Token.ARRAY:
+                raise_tokenizer_exception(formula_string, pos)
+            new_token = Token("}", open_stack.pop(), Token.CLOSE)
+            pos += 1
+        elif char == ",":
+            if open_stack and open_stack[-1] == Token.PAREN:
+                # A comma inside a plain group is the union operator
+                new_token = Token(",", Token.OP_IN)
+            else:
+                new_token = Token(",", Token.SEP, Token.ARG)
+            pos += 1
+        elif char == ";":
+            new_token = Token(";", Token.SEP, Token.ROW)
+            pos += 1
+        elif char in PREFIX_OR_INFIX_OPERATORS:
+            if is_end_of_operand(last_token):
+                new_token = Token(char, Token.OP_IN)
+            else:
+                new_token = Token(char, Token.OP_PRE)
+            pos += 1
+        elif char in INFIX_OPERATORS:
+            if formula_string[pos : pos + 2] in TWO_CHAR_OPERATORS:
+                new_token = Token(formula_string[pos : pos + 2], Token.OP_IN)
+                pos += 2
+            else:
+                new_token = Token(char, Token.OP_IN)
+                pos += 1
+        elif char in POSTFIX_OPERATORS:
+            new_token = Token(char, Token.OP_POST)
+            pos += 1
+        else:
+            end = find_end_of_operand(formula_string, pos)
+            new_token = build_operand_token(formula_string[pos:end])
+            pos = end
+
+        tokens.append(new_token)
+        last_token = new_token
+
+    if open_stack:
+        raise_tokenizer_exception(formula_string, length)
+    return tokens
+
+
+def find_end_of_operand(formula_string: str, pos: int) -> int:
+    end = pos
+    length = len(formula_string)
+    while end < length:
+        match = OPERAND_PATTERN.match(formula_string, end)
+        if match is not None:
+            end = match.end()
+            # 1.5E+3: the exponent sign belongs to the number
+            if (
+                end + 1 < length
+                and formula_string[end] in PREFIX_OR_INFIX_OPERATORS
+                and SCIENTIFIC_PREFIX_PATTERN.match(formula_string, pos, end)
+            ):
+                end += 1
+                continue
+        if end < length and formula_string[end] == "'":
+            # Quoted sheet name, e.g. 'Sheet 1'!A1
+            end = find_end_of_quoted(formula_string, end, "'")
+        elif end < length and formula_string[end] == "[":
+            end = find_end_of_brackets(formula_string, end)
+        else:
+            break
+    return end
+
+
+def find_end_of_quoted(formula_string: str, pos: int, quote: str) -> int:
+    # A doubled quote is an escaped quote
+    end = pos + 1
+    length = len(formula_string)
+    while True:
+        end = formula_string.find(quote, end)
+        if end == -1:
+            raise_tokenizer_exception(formula_string, pos)
+        if end + 1 < length and formula_string[end + 1] == quote:
+            end += 2
+        else:
+            return end + 1
+
+
+def find_end_of_brackets(formula_string: str, pos: int) -> int:
+    depth = 0
+    for end in range(pos, len(formula_string)):
+        if formula_string[end] == "[":
+            depth += 1
+        elif formula_string[end] == "]":
+            depth -= 1
+            if depth == 0:
+                return end + 1
+    raise_tokenizer_exception(formula_string, pos)
+
+
+def build_error_token(formula_string: str, pos: int) -> Token:
+    for error_value in ERROR_VALUES:
+        if formula_string.startswith(error_value, pos):
+            return Token(error_value, Token.OPERAND, Token.ERROR)
+    raise_tokenizer_exception(formula_string, pos)
+
+
+def build_operand_token(value: str) -> Token:
+    if value.upper() in LOGICAL_VALUES:
+        return Token(value, Token.OPERAND, Token.LOGICAL)
+    elif NUMBER_PATTERN.match(value):
+        return Token(value, Token.OPERAND, Token.NUMBER)
+    return Token(value, Token.OPERAND, Token.RANGE)
+
+
+def is_function_name(token: Token) -> bool:
+    return token.type == Token.OPERAND and token.subtype == Token.RANGE
+
+
+def is_end_of_operand(token: Token) -> bool:
+    if token is None:
+        return False
+    return token.type in {Token.OPERAND, Token.OP_POST} or (
+        token.type in {Token.FUNC, Token.PAREN, Token.ARRAY} and token.subtype == Token.CLOSE
+    )
+
+
+def raise_tokenizer_exception(formula_string: str, pos: int):
+    raise FormulaStringSyntaxErrorException(f"Syntax Error at {pos}: {formula_string}")
@@ -13,7 +13,7 @@
 #  limitations under the License.
 
 from abc import ABC, abstractmethod
-from openpyxl.formula.tokenizer import Token
+from forms.parser.tokenizer import Token
 
 from forms.planner.plannode import PlanNode, RefNode, FunctionNode, LiteralNode
 from forms.utils.functions import (
@@ -0,0 +1,156 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import re
+import threading
+
+from collections import OrderedDict
+from forms.parser.tokenizer import Token
+
+from forms.parser.parser import parse_range_str
+from forms.planner.plannode import PlanNode, collect_ref_nodes
+from forms.utils.exceptions import FormSException
+
+DEFAULT_PLAN_CACHE_CAPACITY = 1024
+
+# A1-style references outside of string literals; function names such as LOG10( are not references
+REFERENCE_PATTERN = re.compile(
+    r'"(?:[^"]|"")*"|(?<![\w.$])(\$?[A-Za-z]{1,3}\$?\d+(?::\$?[A-Za-z]{1,3}\$?\d+)?)(?![\w(!])'
+)
+REF_PLACEHOLDER = "\x00{}:{}x{}\x00"
+EXACT_KEY = "exact"
+TEMPLATE_KEY = "template"
+
+
+class FormulaTemplate:
+    # A formula string with its references abstracted into typed, shaped placeholders, so that
+    # =SUM(A1:A3) and =SUM(B1:B3) share the template =SUM(<RR:3x1>)
+    def __init__(self, formula_str: str):
+        self.ref_strs = []
+        self.refs = []
+        self.key = None
+        parts = []
+        last_end = 0
+        for match in REFERENCE_PATTERN.finditer(formula_str):
+            ref_str = match.group(1)
+            if ref_str is None:
+                continue
+            try:
+                ref, ref_type = parse_range_str(
+                    ref_str, match.start(1), Token(ref_str, Token.OPERAND, Token.RANGE)
+                )
+            except FormSException:
+                # leave it to the parser to report the error
+                return
+            parts.append(formula_str[last_end : match.start(1)])
+            parts.append(
+                REF_PLACEHOLDER.format(
+                    ref_type.name, ref.last_row - ref.row + 1, ref.last_col - ref.col + 1
+                )
+            )
+            last_end = match.end(1)
+            self.ref_strs.append(ref_str)
+            self.refs.append(ref)
+        parts.append(formula_str[last_end:])
+        self.key = "".join(parts)
+
+    def matches(self, plan: PlanNode) -> bool:
+        ref_nodes = collect_ref_nodes(plan)
+        return self.key is not None and [ref_node.open_value for ref_node in ref_nodes] == self.ref_strs
+
+
+class CachedPlan:
+    def __init__(self, parsed_plan: PlanNode, rewritten_plan: PlanNode, is_template: bool):
+        self.parsed_plan = parsed_plan
+        self.rewritten_plan = rewritten_plan
+        self.is_template = is_template
+
+
+def replicate_with_refs(plan: PlanNode, template: FormulaTemplate) -> PlanNode:
+    new_plan = plan.replicate_node_recursive()
+    if template is not None:
+        for ref_node in collect_ref_nodes(new_plan):
+            ref_node.ref = template.refs[ref_node.ref_slot]
+            ref_node.open_value = template.ref_strs[ref_node.ref_slot]
+    return new_plan
+
+
+def assign_ref_slots(plan: PlanNode):
+    for ref_slot, ref_node in enumerate(collect_ref_nodes(plan)):
+        ref_node.ref_slot = ref_slot
+
+
+class PlanCache:
+    # A bounded LRU cache of parsed and rewritten plans, keyed by formula template and rewriting flags.
+    # Plans handed out are copies, so callers are free to mutate them.
+    def __init__(self, capacity: int = DEFAULT_PLAN_CACHE_CAPACITY):
+        self.capacity = capacity
+        self.plans = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, formula_str: str, rewriting_flags: tuple) -> (PlanNode, PlanNode):
+        template = FormulaTemplate(formula_str)
+        with self.lock:
+            cached_plan, key = None, None
+            if template.key is not None:
+                key = (TEMPLATE_KEY, template.key, rewriting_flags)
+                cached_plan = self.plans.get(key)
+            if cached_plan is None:
+                key = (EXACT_KEY, formula_str, rewriting_flags)
+                cached_plan = self.plans.get(key)
+            if cached_plan is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.plans.move_to_end(key)
+        template = template if cached_plan.is_template else None
+        return (
+            replicate_with_refs(cached_plan.parsed_plan, template),
+            replicate_with_refs(cached_plan.rewritten_plan, template),
+        )
+
+    def put(
+        self, formula_str: str, rewriting_flags: tuple, parsed_plan: PlanNode, rewritten_plan: PlanNode
+    ):
+        # parsed_plan must carry the ref slots assigned before rewriting
+        template = FormulaTemplate(formula_str)
+        is_template = template.matches(parsed_plan)
+        if is_template:
+            key = (TEMPLATE_KEY, template.key, rewriting_flags)
+        else:
+            key = (EXACT_KEY, formula_str, rewriting_flags)
+        cached_plan = CachedPlan(
+            parsed_plan.replicate_node_recursive(),
+            rewritten_plan.replicate_node_recursive(),
+            is_template,
+        )
+        with self.lock:
+            self.plans[key] = cached_plan
+            self.plans.move_to_end(key)
+            while len(self.plans) > self.capacity:
+                self.plans.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.plans.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.plans)
+
+
+plan_cache = PlanCache()
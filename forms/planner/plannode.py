@@ -41,6 +41,8 @@ class RefNode(PlanNode):
         self.ref = ref
         self.out_ref_type = ref_type
         self.out_ref_axis = ref_axis
+        # position of this reference among the references of the formula string
+        self.ref_slot = None
 
     def populate_ref_info(self):
         pass
@@ -48,6 +50,7 @@ class RefNode(PlanNode):
     def replicate_node(self):
         ref_node = RefNode(self.ref, self.out_ref_type, self.out_ref_axis)
         ref_node.open_value = self.open_value
+        ref_node.ref_slot = self.ref_slot
         return ref_node
 
     def replicate_node_recursive(self):
@@ -98,7 +101,7 @@ class FunctionNode(PlanNode):
         function_node.out_ref_type = self.out_ref_type
         function_node.open_value = self.open_value
         function_node.func_type = self.func_type
-        function_node.seps = self.seps
+        function_node.seps = list(self.seps)
         function_node.close_value = self.close_value
         return function_node
 
@@ -113,3 +116,10 @@ def is_reference_range(node: PlanNode) -> bool:
     if isinstance(node, RefNode):
         return not node.ref.is_cell
     return False
+
+
+def collect_ref_nodes(node: PlanNode) -> list:
+    # references in the order they appear in the formula string
+    if isinstance(node, RefNode):
+        return [node]
+    return [ref_node for child in node.children for ref_node in collect_ref_nodes(child)]
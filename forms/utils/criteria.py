@@ -0,0 +1,125 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import re
+
+from enum import Enum, auto
+
+# Criteria-related definitions shared by the conditional aggregates (SUMIF, COUNTIF, ...)
+CRITERIA_EQUAL = "="
+CRITERIA_NOT_EQUAL = "<>"
+# longer operators first so that "<=" is not read as "<" followed by "="
+CRITERIA_OPERATORS = [CRITERIA_NOT_EQUAL, "<=", ">=", CRITERIA_EQUAL, "<", ">"]
+
+WILDCARD_ESCAPE = "~"
+WILDCARD_ANY = "*"
+WILDCARD_ONE = "?"
+
+NUMBER_PATTERN = re.compile(r"^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$")
+
+
+class CriteriaOperandType(Enum):
+    NUMBER = auto()
+    TEXT = auto()
+    PATTERN = auto()
+    BLANK = auto()
+    LOGICAL = auto()
+
+
+class Criteria:
+    def __init__(self, operator: str, operand, operand_type: CriteriaOperandType):
+        self.operator = operator
+        self.operand = operand
+        self.operand_type = operand_type
+
+    def get_key(self) -> tuple:
+        return self.operator, self.operand, self.operand_type
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Criteria) and self.get_key() == other.get_key()
+
+    def __hash__(self) -> int:
+        return hash(self.get_key())
+
+
+def parse_criteria(literal) -> Criteria:
+    if isinstance(literal, bool):
+        return Criteria(CRITERIA_EQUAL, literal, CriteriaOperandType.LOGICAL)
+    if isinstance(literal, (int, float)):
+        return Criteria(CRITERIA_EQUAL, float(literal), CriteriaOperandType.NUMBER)
+
+    criteria_str = strip_text_quotes(str(literal))
+    operator = CRITERIA_EQUAL
+    for criteria_operator in CRITERIA_OPERATORS:
+        if criteria_str.startswith(criteria_operator):
+            operator = criteria_operator
+            criteria_str = criteria_str[len(criteria_operator) :]
+            break
+
+    if criteria_str == "" and operator in {CRITERIA_EQUAL, CRITERIA_NOT_EQUAL}:
+        return Criteria(operator, "", CriteriaOperandType.BLANK)
+    if NUMBER_PATTERN.match(criteria_str.strip()):
+        return Criteria(operator, float(criteria_str), CriteriaOperandType.NUMBER)
+    if criteria_str.lower() in {"true", "false"}:
+        return Criteria(operator, criteria_str.lower() == "true", CriteriaOperandType.LOGICAL)
+    if operator in {CRITERIA_EQUAL, CRITERIA_NOT_EQUAL} and has_wildcard(criteria_str):
+        return Criteria(operator, criteria_str, CriteriaOperandType.PATTERN)
+    return Criteria(operator, unescape_wildcards(criteria_str).lower(), CriteriaOperandType.TEXT)
+
+
+def strip_text_quotes(text: str) -> str:
+    # text literals keep the quotes of the formula string, e.g., '">50"'
+    if len(text) >= 2 and text[0] == '"' and text[-1] == '"':
+        return text[1:-1].replace('""', '"')
+    return text
+
+
+def has_wildcard(pattern: str) -> bool:
+    pos = 0
+    while pos < len(pattern):
+        if pattern[pos] == WILDCARD_ESCAPE:
+            pos += 2
+            continue
+        if pattern[pos] in {WILDCARD_ANY, WILDCARD_ONE}:
+            return True
+        pos += 1
+    return False
+
+
+def unescape_wildcards(pattern: str) -> str:
+    return re.sub(r"~(.)", r"\1", pattern)
+
+
+def translate_wildcards(pattern: str, any_chars: str, one_char: str, escape) -> str:
+    # rewrites an Excel wildcard pattern into another pattern language
+    translated = []
+    pos = 0
+    while pos < len(pattern):
+        char = pattern[pos]
+        if char == WILDCARD_ESCAPE and pos + 1 < len(pattern):
+            translated.append(escape(pattern[pos + 1]))
+            pos += 2
+            continue
+        if char == WILDCARD_ANY:
+            translated.append(any_chars)
+        elif char == WILDCARD_ONE:
+            translated.append(one_char)
+        else:
+            translated.append(escape(char))
+        pos += 1
+    return "".join(translated)
+
+
+def wildcard_to_regex(pattern: str) -> str:
+    return translate_wildcards(pattern, ".*", ".", re.escape)
@@ -47,3 +47,11 @@ class FormulaStringNotSupportedException(FormSException):
 
 class AxisNotSupportedException(FormSException):
     """Exception raised for unsupported axis"""
+
+
+class MemoryBudgetExceededException(FormSException):
+    """Exception raised when a formula exceeds its memory budget"""
+
+
+class CyclicDependencyException(FormSException):
+    """Exception raised for formula columns that depend on each other"""
@@ -15,7 +15,7 @@
 from enum import Enum, auto
 
 from forms.utils.exceptions import FunctionNotSupportedException
-from openpyxl.formula.tokenizer import Token
+from forms.parser.tokenizer import Token
 
 
 # Function-related definitions
@@ -157,6 +157,10 @@ PANDAS_SUPPORTED_FUNCTIONS = {
     Function.AVG,
     Function.MEDIAN,
     Function.SUMIF,
+    Function.COUNTIF,
+    Function.AVERAGEIF,
+    Function.MAXIF,
+    Function.MINIF,
     # Text Functions
     Function.CONCAT,
     Function.CONCATENATE,
@@ -300,3 +304,4 @@ class FunctionType(Enum):
 class FunctionExecutor(Enum):
     DF_EXECUTOR = auto()
     DB_EXECUTOR = auto()
+    DUCKDB_EXECUTOR = auto()
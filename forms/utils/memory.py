@@ -0,0 +1,89 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import tracemalloc
+
+from forms.utils.exceptions import MemoryBudgetExceededException
+
+# account for the sizes of the produced tables; cheap, but misses temporaries inside executors
+MEMORY_TRACKING_SIZES = "sizes"
+# account for every allocation through tracemalloc; exact, but slows execution down noticeably
+MEMORY_TRACKING_TRACEMALLOC = "tracemalloc"
+MEMORY_TRACKING_MODES = {MEMORY_TRACKING_SIZES, MEMORY_TRACKING_TRACEMALLOC}
+
+
+class MemoryTracker:
+    """
+    Tracks the memory used while executing one formula, per plan node and in total,
+    and enforces an optional budget in bytes.
+    """
+
+    def __init__(self, mode: str = MEMORY_TRACKING_SIZES, budget: int = None):
+        self.use_tracemalloc = mode == MEMORY_TRACKING_TRACEMALLOC
+        self.budget = budget
+        self.live_bytes = 0
+        self.peak_bytes = 0
+        self.baseline_bytes = 0
+        self.started_tracemalloc = False
+
+    def start(self):
+        if self.use_tracemalloc:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started_tracemalloc = True
+            self.baseline_bytes = tracemalloc.get_traced_memory()[0]
+
+    def stop(self):
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+            self.started_tracemalloc = False
+
+    def check_budget(self, required_bytes: int, description: str):
+        # called before an allocation of about required_bytes so that it can be refused up front
+        if self.budget is not None and self.live_bytes + required_bytes > self.budget:
+            raise MemoryBudgetExceededException(
+                f"{description} needs about {required_bytes} bytes with {self.live_bytes} bytes "
+                f"already in use, which exceeds the memory budget of {self.budget} bytes"
+            )
+
+    def start_node(self) -> int:
+        if self.use_tracemalloc:
+            tracemalloc.reset_peak()
+            return tracemalloc.get_traced_memory()[0]
+        return self.live_bytes
+
+    def finish_node(
+        self, start_bytes: int, output_bytes: int, freed_bytes: int, description: str
+    ) -> int:
+        """
+        Account for a finished node that produced output_bytes and released freed_bytes of
+        its inputs, and return the peak allocation of the node itself.
+        """
+        if self.use_tracemalloc:
+            current_bytes, peak_bytes = tracemalloc.get_traced_memory()
+            node_peak_bytes = peak_bytes - start_bytes
+            self.peak_bytes = max(self.peak_bytes, peak_bytes - self.baseline_bytes)
+            self.live_bytes = current_bytes - self.baseline_bytes
+        else:
+            node_peak_bytes = output_bytes
+            self.live_bytes += output_bytes
+            self.peak_bytes = max(self.peak_bytes, self.live_bytes)
+            self.live_bytes -= freed_bytes
+
+        if self.budget is not None and self.peak_bytes > self.budget:
+            raise MemoryBudgetExceededException(
+                f"{description} raised the memory in use to {self.peak_bytes} bytes, "
+                f"which exceeds the memory budget of {self.budget} bytes"
+            )
+        return node_peak_bytes
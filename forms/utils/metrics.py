@@ -20,18 +20,33 @@ TRANSLATION_TIME = "translation_time"
 EXECUTION_TIME = "execution_time"
 TOTAL_TIME = "total_time"
 NUM_SUBPLANS = "num_subplans"
+TRACE = "trace"
+PEAK_MEMORY = "peak_memory"
 MICROS_PER_SEC = 1000000
 
 
 class MetricsTracker:
+    # all times are recorded in microseconds
     def __init__(self):
         self.metrics = {}
+        self.trace_spans = []
 
     def put_one_metric(self, key, value):
         self.metrics[key] = value
 
+    def put_trace(self, spans: list):
+        # keeps the span trees of the last formula
+        self.trace_spans = spans
+
+    def get_trace(self) -> list:
+        return list(self.trace_spans)
+
     def get_metrics(self):
-        return copy.deepcopy(self.metrics)
+        metrics = copy.deepcopy(self.metrics)
+        if self.trace_spans:
+            metrics[TRACE] = [span.to_dict() for span in self.trace_spans]
+        return metrics
 
     def reset_metrics(self):
         self.metrics = {}
+        self.trace_spans = []
@@ -0,0 +1,214 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import bisect
+import threading
+
+from forms.utils.metrics import (
+    PARSING_TIME,
+    REWRITE_TIME,
+    TRANSLATION_TIME,
+    EXECUTION_TIME,
+    TOTAL_TIME,
+    MICROS_PER_SEC,
+)
+
+METRIC_PREFIX = "forms_"
+FORMULAS_COUNTER = "formulas"
+FORMULA_ERRORS_COUNTER = "formula_errors"
+HISTOGRAM_METRICS = [PARSING_TIME, REWRITE_TIME, TRANSLATION_TIME, EXECUTION_TIME, TOTAL_TIME]
+
+# upper bounds in microseconds, from 50us to 60s
+DEFAULT_LATENCY_BUCKETS = [
+    50,
+    100,
+    250,
+    500,
+    1000,
+    2500,
+    5000,
+    10000,
+    25000,
+    50000,
+    100000,
+    250000,
+    500000,
+    1000000,
+    2500000,
+    5000000,
+    10000000,
+    30000000,
+    60000000,
+]
+
+BACKEND_LABEL = "backend"
+FUNCTION_LABEL = "function"
+
+
+class Histogram:
+    # Cumulative histogram of latencies in microseconds; the last bucket is +Inf
+    def __init__(self, buckets: list = None):
+        self.buckets = list(DEFAULT_LATENCY_BUCKETS if buckets is None else buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def get_cumulative_counts(self) -> list:
+        counts = []
+        total = 0
+        for bucket_count in self.bucket_counts:
+            total += bucket_count
+            counts.append(total)
+        return counts
+
+    def get_quantile(self, quantile: float) -> float:
+        """
+        Estimate a quantile by interpolating linearly inside the bucket that contains it,
+        as Prometheus' histogram_quantile does. Values beyond the last bound report that bound.
+        """
+        if self.count == 0:
+            return float("nan")
+        rank = quantile * self.count
+        cumulative_counts = self.get_cumulative_counts()
+        idx = bisect.bisect_left(cumulative_counts, rank)
+        if idx >= len(self.buckets):
+            return float(self.buckets[-1])
+        lower_bound = 0 if idx == 0 else self.buckets[idx - 1]
+        lower_count = 0 if idx == 0 else cumulative_counts[idx - 1]
+        bucket_count = self.bucket_counts[idx]
+        if bucket_count == 0:
+            return float(self.buckets[idx])
+        return lower_bound + (self.buckets[idx] - lower_bound) * (rank - lower_count) / bucket_count
+
+
+class MetricsRecorder:
+    """
+    Accumulates counters and latency histograms across formulas and workbooks,
+    labelled by backend and top-level function. Safe to share between threads.
+    """
+
+    def __init__(self, buckets: list = None):
+        self.buckets = buckets
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def record_formula(self, backend: str, function: str, metrics: dict):
+        labels = ((BACKEND_LABEL, backend), (FUNCTION_LABEL, function))
+        with self.lock:
+            self.increment_counter(FORMULAS_COUNTER, labels)
+            for metric in HISTOGRAM_METRICS:
+                if metric in metrics:
+                    key = (metric, labels)
+                    if key not in self.histograms:
+                        self.histograms[key] = Histogram(self.buckets)
+                    self.histograms[key].observe(metrics[metric])
+
+    def record_error(self, backend: str):
+        with self.lock:
+            self.increment_counter(FORMULA_ERRORS_COUNTER, ((BACKEND_LABEL, backend),))
+
+    def increment_counter(self, name: str, labels: tuple):
+        # the caller holds the lock
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + 1
+
+    def get_counter(self, name: str, **labels) -> int:
+        with self.lock:
+            return sum(
+                value
+                for (counter_name, counter_labels), value in self.counters.items()
+                if counter_name == name and matches_labels(counter_labels, labels)
+            )
+
+    def get_quantile(self, metric: str, quantile: float, **labels) -> float:
+        # merges the histograms of all label sets that match the given labels
+        with self.lock:
+            merged = Histogram(self.buckets)
+            for (name, histogram_labels), histogram in self.histograms.items():
+                if name == metric and matches_labels(histogram_labels, labels):
+                    merged.bucket_counts = [
+                        x + y for x, y in zip(merged.bucket_counts, histogram.bucket_counts)
+                    ]
+                    merged.count += histogram.count
+                    merged.sum += histogram.sum
+        return merged.get_quantile(quantile)
+
+    def render_openmetrics(self) -> str:
+        """
+        Render all metrics in the OpenMetrics text format. Latencies are exposed in seconds.
+        """
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted(
+                (key, list(histogram.buckets), histogram.get_cumulative_counts(), histogram.sum)
+                for key, histogram in self.histograms.items()
+            )
+
+        lines = []
+        last_name = None
+        for (name, labels), value in counters:
+            metric_name = METRIC_PREFIX + name
+            if name != last_name:
+                lines.append(f"# TYPE {metric_name} counter")
+                last_name = name
+            lines.append(f"{metric_name}_total{format_labels(labels)} {value}")
+
+        for (name, labels), buckets, cumulative_counts, total in histograms:
+            metric_name = f"{METRIC_PREFIX}{name}_seconds"
+            if name != last_name:
+                lines.append(f"# TYPE {metric_name} histogram")
+                lines.append(f"# UNIT {metric_name} seconds")
+                last_name = name
+            for bound, count in zip(buckets, cumulative_counts):
+                bucket_labels = labels + (("le", format_value(bound / MICROS_PER_SEC)),)
+                lines.append(f"{metric_name}_bucket{format_labels(bucket_labels)} {count}")
+            bucket_labels = labels + (("le", "+Inf"),)
+            lines.append(f"{metric_name}_bucket{format_labels(bucket_labels)} {cumulative_counts[-1]}")
+            lines.append(f"{metric_name}_count{format_labels(labels)} {cumulative_counts[-1]}")
+            lines.append(
+                f"{metric_name}_sum{format_labels(labels)} {format_value(total / MICROS_PER_SEC)}"
+            )
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self.lock:
+            self.counters = {}
+            self.histograms = {}
+
+
+def matches_labels(labels: tuple, expected_labels: dict) -> bool:
+    label_dict = dict(labels)
+    return all(label_dict.get(key) == value for key, value in expected_labels.items())
+
+
+def format_labels(labels: tuple) -> str:
+    return "{" + ",".join(f'{key}="{escape_label_value(value)}"' for key, value in labels) + "}"
+
+
+def escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_value(value: float) -> str:
+    return repr(float(value))
+
+
+metrics_recorder = MetricsRecorder()
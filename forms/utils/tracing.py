@@ -0,0 +1,177 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+
+from forms.utils.metrics import MICROS_PER_SEC
+
+FORMULA_SPAN = "formula"
+COMPILE_SPAN = "compile"
+EXECUTE_SPAN = "execute"
+
+# span attributes
+BACKEND = "backend"
+FORMULA = "formula"
+FUNCTION = "function"
+EXECUTOR = "executor"
+INPUT_ROWS = "input_rows"
+OUTPUT_ROWS = "output_rows"
+OUTPUT_BYTES = "output_bytes"
+
+
+class Span:
+    """
+    A timed region of work. Times are in microseconds; cpu_time is the CPU time
+    of the thread that ran the span, which excludes time spent waiting on a database.
+    """
+
+    def __init__(self, name: str, **attributes):
+        self.name = name
+        self.attributes = attributes
+        self.children = []
+        self.thread_id = threading.get_ident()
+        self.start_time = None
+        self.wall_time = 0
+        self.cpu_time = 0
+        self._wall_start = None
+        self._cpu_start = None
+
+    def start(self):
+        self.start_time = int(time.time() * MICROS_PER_SEC)
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+
+    def finish(self):
+        self.wall_time = int((time.perf_counter() - self._wall_start) * MICROS_PER_SEC)
+        self.cpu_time = int((time.thread_time() - self._cpu_start) * MICROS_PER_SEC)
+
+    def get_end_time(self) -> int:
+        return self.start_time + self.wall_time
+
+    def set_attribute(self, key: str, value):
+        self.attributes[key] = value
+
+    def get_attribute(self, key: str, default=None):
+        return self.attributes.get(key, default)
+
+    def add_child(self, span):
+        self.children.append(span)
+
+    def extend_to_children(self):
+        # make the span enclose its children when they ran before it, e.g., dependent SQL statements
+        for child in self.children:
+            child.extend_to_children()
+        started_children = [child for child in self.children if child.start_time is not None]
+        if not started_children:
+            return
+        start_times = [child.start_time for child in started_children]
+        end_times = [child.get_end_time() for child in started_children]
+        if self.start_time is not None:
+            start_times.append(self.start_time)
+            end_times.append(self.get_end_time())
+        self.start_time = min(start_times)
+        self.wall_time = max(end_times) - self.start_time
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "attributes": dict(self.attributes),
+            "start_time": self.start_time,
+            "wall_time": self.wall_time,
+            "cpu_time": self.cpu_time,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+class Tracer:
+    """
+    Collects the spans of one formula execution. Spans started through the tracer
+    are nested under the innermost span that is still open.
+    """
+
+    def __init__(self):
+        self.root_spans = []
+        self.span_stack = []
+
+    def create_span(self, name: str, parent: Span = None, **attributes) -> Span:
+        span = Span(name, **attributes)
+        if parent is None and self.span_stack:
+            parent = self.span_stack[-1]
+        if parent is None:
+            self.root_spans.append(span)
+        else:
+            parent.add_child(span)
+        return span
+
+    def start_span(self, name: str, **attributes) -> Span:
+        span = self.create_span(name, **attributes)
+        span.start()
+        self.span_stack.append(span)
+        return span
+
+    def finish_span(self, span: Span):
+        span.finish()
+        self.span_stack.remove(span)
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        span = self.start_span(name, **attributes)
+        try:
+            yield span
+        finally:
+            self.finish_span(span)
+
+    def get_root_spans(self) -> list:
+        return list(self.root_spans)
+
+
+def to_chrome_trace(spans: list) -> dict:
+    """
+    Convert span trees into the Chrome trace event format, which can be loaded
+    in chrome://tracing or Perfetto.
+    """
+    events = []
+    pid = os.getpid()
+
+    def add_events(span: Span):
+        if span.start_time is not None:
+            args = dict(span.attributes)
+            args["cpu_time"] = span.cpu_time
+            events.append(
+                {
+                    "name": span.name,
+                    "ph": "X",
+                    "ts": span.start_time,
+                    "dur": span.wall_time,
+                    "pid": pid,
+                    "tid": span.thread_id,
+                    "args": args,
+                }
+            )
+        for child in span.children:
+            add_events(child)
+
+    for span in spans:
+        add_events(span)
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def write_chrome_trace(spans: list, path: str):
+    with open(path, "w") as f:
+        json.dump(to_chrome_trace(spans), f, default=str)
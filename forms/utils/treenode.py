@@ -12,7 +12,7 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
-from openpyxl.formula.tokenizer import Token
+from forms.parser.tokenizer import Token
 
 
 class TreeNode:
@@ -52,6 +52,15 @@ def validate(function_executor: FunctionExecutor, num_rows: int, num_cols: int,
                 f"Function {plannode.function} is not supported by db executors"
             )
 
+        # the duckdb executor shares the SQL translator of the db executor
+        if (
+            function_executor == FunctionExecutor.DUCKDB_EXECUTOR
+            and plannode.function not in DB_SUPPORTED_FUNCTIONS
+        ):
+            raise FunctionNotSupportedException(
+                f"Function {plannode.function} is not supported by duckdb executors"
+            )
+
     elif isinstance(plannode, RefNode):
         if plannode.ref.row >= num_rows or plannode.ref.last_row >= num_rows:
             raise InvalidIndexException(
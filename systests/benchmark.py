@@ -15,19 +15,22 @@
 import os
 import time
 import json
-import docker
+import statistics
 import pandas as pd
 import psycopg2
 from psycopg2 import sql
 from psycopg2 import Error
 from sqlalchemy import create_engine
-from docker.errors import DockerException
-from docker.models.containers import Container
 
 from forms.core.forms import from_db
+from local_postgres import LocalPostgresCluster
 
 
-def start_postgres_container(postgres_user: str, dbname: str, password: str, port: int) -> Container:
+def start_postgres_container(postgres_user: str, dbname: str, password: str, port: int):
+    # imported here so that the local cluster mode works on hosts without docker
+    import docker
+    from docker.errors import DockerException
+
     docker_client = docker.from_env()
 
     # Start the PostgreSQL container
@@ -161,6 +164,126 @@ def run(
         container.remove()
 
 
+def run_formula(wb, formula_string: str) -> dict:
+    # compute_formula reports FormS errors and returns None instead of raising
+    wb.reset_metrics()
+    if wb.compute_formula(formula_string) is None:
+        raise Exception(f"Formula {formula_string} failed")
+    return wb.get_metrics()
+
+
+def summarize_runs(metrics_list: list) -> dict:
+    summary = {}
+    for metric, value in metrics_list[0].items():
+        if not isinstance(value, (int, float)):
+            continue
+        values = [metrics[metric] for metrics in metrics_list]
+        summary[metric] = {
+            "median": statistics.median(values),
+            "variance": statistics.variance(values) if len(values) > 1 else 0.0,
+        }
+    return summary
+
+
+def run_local(
+    dataset_path,
+    schema_path,
+    table_name,
+    primary_key,
+    formula_file_path,
+    pipeline_optimizations: list,
+    warmup: int,
+    repetitions: int,
+    output_folder,
+    pg_bin_dir=None,
+    data_root=None,
+):
+    postgres_user = "dt"
+    dbname = "forms_db"
+    order_key = primary_key
+
+    formula_string = "formula_string"
+    formulas = pd.read_csv(formula_file_path, header=None, names=[formula_string], delimiter="|")
+    formula_file_name = os.path.basename(formula_file_path)
+
+    with LocalPostgresCluster(postgres_user, dbname, pg_bin_dir, data_root) as cluster:
+        # the cluster trusts local connections, so the password is ignored
+        load_table(
+            postgres_user,
+            "",
+            dbname,
+            cluster.host,
+            cluster.port,
+            dataset_path,
+            schema_path,
+            table_name,
+        )
+
+        summary = {}
+        for pipeline_optimization in pipeline_optimizations:
+            optimization_str = "subtree" if pipeline_optimization else "function"
+            wb = from_db(
+                host=cluster.host,
+                port=cluster.port,
+                username=postgres_user,
+                password="",
+                db_name=dbname,
+                table_name=table_name,
+                primary_key=[primary_key],
+                order_key=[order_key],
+                enable_rewriting=True,
+                enable_pipelining=pipeline_optimization,
+            )
+
+            output_data = [{} for _ in range(repetitions)]
+            try:
+                for index, row in formulas.iterrows():
+                    formula_string = row["formula_string"]
+                    print(f"Running formula {index+1} ({optimization_str}): {formula_string}")
+                    for _ in range(warmup):
+                        run_formula(wb, formula_string)
+                    metrics_list = [run_formula(wb, formula_string) for _ in range(repetitions)]
+
+                    for run_idx, metrics in enumerate(metrics_list):
+                        output_data[run_idx][formula_string] = {
+                            "formula_id": index + 1,
+                            "formula_string": formula_string,
+                            "run": run_idx + 1,
+                            "optimization": optimization_str,
+                            "metrics": metrics,
+                        }
+                    formula_summary = summary.setdefault(
+                        formula_string, {"formula_id": index + 1, "formula_string": formula_string}
+                    )
+                    formula_summary[optimization_str] = summarize_runs(metrics_list)
+            finally:
+                wb.close()
+
+            # one result.json per repetition, in the same layout as the docker runs
+            for run_idx, run_data in enumerate(output_data):
+                output_file = os.path.join(
+                    output_folder,
+                    table_name,
+                    formula_file_name,
+                    optimization_str,
+                    str(run_idx + 1),
+                    "result.json",
+                )
+                os.makedirs(os.path.dirname(output_file), exist_ok=True)
+                with open(output_file, "w") as f:
+                    json.dump(run_data, f, indent=4)
+
+    summary_file = os.path.join(output_folder, table_name, formula_file_name, "summary.json")
+    os.makedirs(os.path.dirname(summary_file), exist_ok=True)
+    with open(summary_file, "w") as f:
+        json.dump(
+            {"warmup": warmup, "repetitions": repetitions, "formulas": list(summary.values())},
+            f,
+            indent=4,
+        )
+    return summary
+
+
 if __name__ == "__main__":
     import argparse
 
@@ -172,25 +295,66 @@ if __name__ == "__main__":
     parser.add_argument("--table_name", required=True, help="Name of the table")
     parser.add_argument("--primary_key", required=True, help="Primary key of the table")
     parser.add_argument("--formula_file_path", required=True, help="Path of the formula file")
-    parser.add_argument("--run", required=True, type=int, help="Test run identifier")
+    parser.add_argument(
+        "--run", type=int, default=1, help="Test run identifier; ignored with a local cluster"
+    )
     parser.add_argument(
         "--pipeline_optimization",
-        required=True,
-        help="False: function-level translation; True: subtree-level translation",
+        default="both",
+        help="False: function-level translation; True: subtree-level translation; both: run each",
     )
     parser.add_argument("--output_folder", required=True, help="Path to the output folder")
+    parser.add_argument(
+        "--postgres",
+        choices=["docker", "local"],
+        default="docker",
+        help="docker: postgres:13 container; local: throwaway cluster created with initdb/pg_ctl",
+    )
+    parser.add_argument(
+        "--warmup", type=int, default=1, help="Unmeasured runs per formula with a local cluster"
+    )
+    parser.add_argument(
+        "--repetitions", type=int, default=5, help="Measured runs per formula with a local cluster"
+    )
+    parser.add_argument(
+        "--pg_bin_dir", default=None, help="Directory with initdb and pg_ctl; defaults to PATH"
+    )
+    parser.add_argument(
+        "--data_root",
+        default=None,
+        help="Parent of the local cluster's data directory; defaults to /dev/shm when available",
+    )
 
     args = parser.parse_args()
 
-    pipeline_optimization = args.pipeline_optimization.lower() == "true"
-
-    run(
-        dataset_path=args.dataset_path,
-        schema_path=args.schema_path,
-        table_name=args.table_name,
-        primary_key=args.primary_key,
-        formula_file_path=args.formula_file_path,
-        run=args.run,
-        pipeline_optimization=pipeline_optimization,
-        output_folder=args.output_folder,
-    )
+    if args.pipeline_optimization.lower() == "both":
+        pipeline_optimizations = [False, True]
+    else:
+        pipeline_optimizations = [args.pipeline_optimization.lower() == "true"]
+
+    if args.postgres == "local":
+        run_local(
+            dataset_path=args.dataset_path,
+            schema_path=args.schema_path,
+            table_name=args.table_name,
+            primary_key=args.primary_key,
+            formula_file_path=args.formula_file_path,
+            pipeline_optimizations=pipeline_optimizations,
+            warmup=args.warmup,
+            repetitions=args.repetitions,
+            output_folder=args.output_folder,
+            pg_bin_dir=args.pg_bin_dir,
+            data_root=args.data_root,
+        )
+    else:
+        for pipeline_optimization in pipeline_optimizations:
+            run(
+                dataset_path=args.dataset_path,
+                schema_path=args.schema_path,
+                table_name=args.table_name,
+                primary_key=args.primary_key,
+                formula_file_path=args.formula_file_path,
+                run=args.run,
+                pipeline_optimization=pipeline_optimization,
+                output_folder=args.output_folder,
+            )
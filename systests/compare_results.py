@@ -0,0 +1,334 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import glob
+import html
+import json
+import os
+import sys
+
+import numpy as np
+
+from forms.utils.metrics import (
+    PARSING_TIME,
+    REWRITE_TIME,
+    TRANSLATION_TIME,
+    EXECUTION_TIME,
+    TOTAL_TIME,
+    MICROS_PER_SEC,
+)
+
+PHASES = [PARSING_TIME, REWRITE_TIME, TRANSLATION_TIME, EXECUTION_TIME, TOTAL_TIME]
+
+# verdicts of one comparison
+REGRESSION = "regression"
+IMPROVEMENT = "improvement"
+UNCHANGED = "unchanged"
+
+
+def load_results(root: str) -> dict:
+    """
+    Load a tree written by benchmark.py, root/table/formula_file/optimization/run/result.json,
+    into {(table, formula_file, optimization, formula_string): {phase: [value per run]}}.
+    """
+    results = {}
+    pattern = os.path.join(root, "*", "*", "*", "*", "result.json")
+    for path in sorted(glob.glob(pattern)):
+        optimization_dir = os.path.dirname(os.path.dirname(path))
+        formula_file_dir = os.path.dirname(optimization_dir)
+        table = os.path.basename(os.path.dirname(formula_file_dir))
+        formula_file = os.path.basename(formula_file_dir)
+        optimization = os.path.basename(optimization_dir)
+        with open(path) as f:
+            run_data = json.load(f)
+        for formula_string, payload in run_data.items():
+            phases = results.setdefault((table, formula_file, optimization, formula_string), {})
+            for phase in PHASES:
+                value = payload["metrics"].get(phase)
+                if isinstance(value, (int, float)):
+                    phases.setdefault(phase, []).append(value)
+    if not results:
+        raise Exception(f"No result.json files found under {root}")
+    return results
+
+
+def bootstrap_delta(
+    baseline: list, candidate: list, num_resamples: int, confidence: float, rng
+) -> tuple:
+    """
+    Relative change of the median from baseline to candidate, with a percentile bootstrap
+    confidence interval obtained by resampling the runs of both sides independently.
+    """
+    baseline = np.asarray(baseline, dtype=float)
+    candidate = np.asarray(candidate, dtype=float)
+    baseline_median = np.median(baseline)
+    if baseline_median == 0:
+        return float("nan"), float("nan"), float("nan")
+    delta = np.median(candidate) / baseline_median - 1
+
+    baseline_samples = rng.choice(baseline, (num_resamples, len(baseline)))
+    candidate_samples = rng.choice(candidate, (num_resamples, len(candidate)))
+    baseline_medians = np.median(baseline_samples, axis=1)
+    candidate_medians = np.median(candidate_samples, axis=1)
+    valid = baseline_medians > 0
+    deltas = candidate_medians[valid] / baseline_medians[valid] - 1
+    alpha = (1 - confidence) / 2
+    lower, upper = np.quantile(deltas, [alpha, 1 - alpha])
+    return float(delta), float(lower), float(upper)
+
+
+def get_verdict(lower: float, upper: float) -> str:
+    # significant when the whole confidence interval lies on one side of zero
+    if lower > 0:
+        return REGRESSION
+    if upper < 0:
+        return IMPROVEMENT
+    return UNCHANGED
+
+
+def compare(
+    baseline: dict,
+    candidate: dict,
+    phases: list,
+    num_resamples: int = 2000,
+    confidence: float = 0.95,
+    seed: int = 0,
+) -> list:
+    rng = np.random.default_rng(seed)
+    rows = []
+    for key in sorted(set(baseline) & set(candidate)):
+        for phase in phases:
+            baseline_values = baseline[key].get(phase)
+            candidate_values = candidate[key].get(phase)
+            if not baseline_values or not candidate_values:
+                continue
+            delta, lower, upper = bootstrap_delta(
+                baseline_values, candidate_values, num_resamples, confidence, rng
+            )
+            table, formula_file, optimization, formula_string = key
+            rows.append(
+                {
+                    "table": table,
+                    "formula_file": formula_file,
+                    "optimization": optimization,
+                    "formula_string": formula_string,
+                    "phase": phase,
+                    "baseline_median": float(np.median(baseline_values)),
+                    "candidate_median": float(np.median(candidate_values)),
+                    "baseline_runs": len(baseline_values),
+                    "candidate_runs": len(candidate_values),
+                    "delta": delta,
+                    "ci_lower": lower,
+                    "ci_upper": upper,
+                    "verdict": get_verdict(lower, upper),
+                }
+            )
+    return rows
+
+
+def get_gate_failures(rows: list, gate_phase: str, threshold: float) -> list:
+    # a formula fails the gate when it is significantly slower and its median grew by more than threshold
+    return [
+        row
+        for row in rows
+        if row["phase"] == gate_phase and row["verdict"] == REGRESSION and row["delta"] > threshold
+    ]
+
+
+def get_unmatched(baseline: dict, candidate: dict) -> tuple:
+    return sorted(set(baseline) - set(candidate)), sorted(set(candidate) - set(baseline))
+
+
+def format_time(micros: float) -> str:
+    if micros >= MICROS_PER_SEC:
+        return f"{micros / MICROS_PER_SEC:.2f} s"
+    if micros >= 1000:
+        return f"{micros / 1000:.2f} ms"
+    return f"{micros:.0f} us"
+
+
+def format_percent(value: float) -> str:
+    return "n/a" if np.isnan(value) else f"{value * 100:+.1f}%"
+
+
+REPORT_COLUMNS = ["Table", "Formula file", "Optimization", "Formula", "Phase"]
+REPORT_COLUMNS += ["Baseline", "Candidate", "Delta", "CI", "Verdict"]
+
+
+def get_report_cells(row: dict) -> list:
+    return [
+        row["table"],
+        row["formula_file"],
+        row["optimization"],
+        row["formula_string"],
+        row["phase"],
+        format_time(row["baseline_median"]),
+        format_time(row["candidate_median"]),
+        format_percent(row["delta"]),
+        f"[{format_percent(row['ci_lower'])}, {format_percent(row['ci_upper'])}]",
+        row["verdict"],
+    ]
+
+
+def get_summary_lines(comparison: dict, gate_phase: str, threshold: float) -> list:
+    rows = comparison["rows"]
+    counts = {
+        verdict: sum(1 for row in rows if row["verdict"] == verdict)
+        for verdict in [REGRESSION, IMPROVEMENT, UNCHANGED]
+    }
+    failures = comparison["gate_failures"]
+    lines = [
+        f"{counts[REGRESSION]} regressions, {counts[IMPROVEMENT]} improvements and "
+        f"{counts[UNCHANGED]} unchanged measurements.",
+        f"Gate ({gate_phase} no more than {threshold * 100:.0f}% slower): "
+        + ("FAILED" if failures else "passed")
+        + (f" for {len(failures)} formulas." if failures else "."),
+    ]
+    missing, added = comparison["unmatched"]
+    if missing or added:
+        lines.append(
+            f"{len(missing)} formulas only in the baseline, {len(added)} only in the candidate."
+        )
+    return lines
+
+
+def render_markdown(comparisons: list, gate_phase: str, threshold: float) -> str:
+    lines = ["# FormS benchmark comparison", ""]
+    for comparison in comparisons:
+        lines.append(f"## {comparison['baseline_label']} vs {comparison['candidate_label']}")
+        lines.append("")
+        lines.extend(get_summary_lines(comparison, gate_phase, threshold))
+        lines.append("")
+        lines.append("| " + " | ".join(REPORT_COLUMNS) + " |")
+        lines.append("|" + "---|" * len(REPORT_COLUMNS))
+        for row in comparison["rows"]:
+            cells = [str(cell).replace("|", "\\|") for cell in get_report_cells(row)]
+            lines.append("| " + " | ".join(cells) + " |")
+        lines.append("")
+    return "\n".join(lines)
+
+
+VERDICT_COLORS = {REGRESSION: "#f8d7da", IMPROVEMENT: "#d4edda", UNCHANGED: "#ffffff"}
+
+
+def render_html(comparisons: list, gate_phase: str, threshold: float) -> str:
+    parts = [
+        "<!DOCTYPE html>",
+        "<html><head><meta charset='utf-8'><title>FormS benchmark comparison</title>",
+        "<style>table{border-collapse:collapse}td,th{border:1px solid #ccc;padding:2px 6px}</style>",
+        "</head><body>",
+        "<h1>FormS benchmark comparison</h1>",
+    ]
+    for comparison in comparisons:
+        title = f"{comparison['baseline_label']} vs {comparison['candidate_label']}"
+        parts.append(f"<h2>{html.escape(title)}</h2>")
+        for line in get_summary_lines(comparison, gate_phase, threshold):
+            parts.append(f"<p>{html.escape(line)}</p>")
+        parts.append("<table><tr>")
+        parts.extend(f"<th>{html.escape(column)}</th>" for column in REPORT_COLUMNS)
+        parts.append("</tr>")
+        for row in comparison["rows"]:
+            parts.append(f"<tr style='background:{VERDICT_COLORS[row['verdict']]}'>")
+            parts.extend(f"<td>{html.escape(str(cell))}</td>" for cell in get_report_cells(row))
+            parts.append("</tr>")
+        parts.append("</table>")
+    parts.append("</body></html>")
+    return "\n".join(parts) + "\n"
+
+
+def run(
+    roots: list,
+    labels: list,
+    phases: list,
+    gate_phase: str,
+    threshold: float,
+    num_resamples: int,
+    confidence: float,
+    seed: int,
+    markdown_path: str = None,
+    html_path: str = None,
+    json_path: str = None,
+) -> list:
+    # the first tree is the baseline that every other tree is compared against
+    trees = [load_results(root) for root in roots]
+    comparisons = []
+    for label, candidate in zip(labels[1:], trees[1:]):
+        rows = compare(trees[0], candidate, phases, num_resamples, confidence, seed)
+        comparisons.append(
+            {
+                "baseline_label": labels[0],
+                "candidate_label": label,
+                "rows": rows,
+                "gate_failures": get_gate_failures(rows, gate_phase, threshold),
+                "unmatched": get_unmatched(trees[0], candidate),
+            }
+        )
+
+    markdown = render_markdown(comparisons, gate_phase, threshold)
+    print(markdown)
+    if markdown_path:
+        with open(markdown_path, "w") as f:
+            f.write(markdown)
+    if html_path:
+        with open(html_path, "w") as f:
+            f.write(render_html(comparisons, gate_phase, threshold))
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump(comparisons, f, indent=4)
+    return comparisons
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare FormS benchmark result trees")
+    parser.add_argument(
+        "results", nargs="+", help="Output folders of benchmark.py; the first one is the baseline"
+    )
+    parser.add_argument("--labels", default=None, help="Comma-separated names of the result folders")
+    parser.add_argument("--phases", default=",".join(PHASES), help="Comma-separated metrics to compare")
+    parser.add_argument("--gate_phase", default=TOTAL_TIME, help="Metric checked by the gate")
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="Largest tolerated slowdown, e.g., 0.1 for 10%%"
+    )
+    parser.add_argument("--resamples", type=int, default=2000, help="Number of bootstrap resamples")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the bootstrap")
+    parser.add_argument("--markdown", default=None, help="Path of the Markdown report")
+    parser.add_argument("--html", default=None, help="Path of the HTML report")
+    parser.add_argument("--json", default=None, help="Path of the comparison as JSON")
+
+    args = parser.parse_args()
+
+    if len(args.results) < 2:
+        parser.error("at least two result folders are needed")
+    result_labels = args.labels.split(",") if args.labels else args.results
+    if len(result_labels) != len(args.results):
+        parser.error("--labels needs one label per result folder")
+
+    result_comparisons = run(
+        roots=args.results,
+        labels=result_labels,
+        phases=args.phases.split(","),
+        gate_phase=args.gate_phase,
+        threshold=args.threshold,
+        num_resamples=args.resamples,
+        confidence=args.confidence,
+        seed=args.seed,
+        markdown_path=args.markdown,
+        html_path=args.html,
+        json_path=args.json,
+    )
+    # a non-zero exit code lets CI block the upgrade
+    sys.exit(1 if any(comparison["gate_failures"] for comparison in result_comparisons) else 0)
@@ -0,0 +1,368 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+
+import numpy as np
+import pandas as pd
+
+import forms
+from forms.core.forms import from_df
+from forms.executor.dfexecutor.basicfuncexecutor import function_to_executor_dict
+from forms.utils.functions import Function
+from forms.utils.metrics import EXECUTION_TIME, MICROS_PER_SEC
+from forms.utils.reference import RefType
+
+CELL_REF_TYPES = [RefType.RR, RefType.FF]
+
+# column roles appended after the value columns, with the values scalar functions need
+EXTRA_COLUMNS = ["big", "int", "int_high", "text", "text2", "roman", "hex", "number_text"]
+
+# functions that take a range; "{range}" is replaced with a window of the requested shape
+RANGE_TEMPLATES = {
+    Function.SUM: "=SUM({range})",
+    Function.COUNT: "=COUNT({range})",
+    Function.AVG: "=AVERAGE({range})",
+    Function.MEDIAN: "=MEDIAN({range})",
+    Function.MIN: "=MIN({range})",
+    Function.MAX: "=MAX({range})",
+    Function.SUMIF: '=SUMIF({range}, ">{threshold}")',
+    Function.COUNTIF: '=COUNTIF({range}, ">{threshold}")',
+    Function.AVERAGEIF: '=AVERAGEIF({range}, ">{threshold}")',
+    Function.MAXIF: '=MAXIF({range}, ">{threshold}")',
+    Function.MINIF: '=MINIF({range}, ">{threshold}")',
+}
+
+# functions applied cell by cell; "{v}" and "{v2}" are value cells, the others are EXTRA_COLUMNS
+CELL_TEMPLATES = {
+    Function.PLUS: "={v}+{v2}",
+    Function.MINUS: "={v}-{v2}",
+    Function.MULTIPLY: "={v}*{v2}",
+    Function.DIVIDE: "={v}/{v2}",
+    Function.NEGATE: "=-{v}",
+    Function.CONCAT: "=CONCAT({text}, {text2})",
+    Function.CONCATENATE: "=CONCATENATE({text}, {text2})",
+    Function.EXACT: "=EXACT({text}, {text2})",
+    Function.FIND: '=FIND("a", {text})',
+    Function.LEFT: "=LEFT({text}, 3)",
+    Function.LEN: "=LEN({text})",
+    Function.LOWER: "=LOWER({text})",
+    Function.MID: "=MID({text}, 2, 3)",
+    Function.REPLACE: '=REPLACE({text}, 1, 2, "xy")',
+    Function.RIGHT: "=RIGHT({text}, 3)",
+    Function.TRIM: "=TRIM({text})",
+    Function.UPPER: "=UPPER({text})",
+    Function.VALUE: "=VALUE({number_text})",
+    Function.ACOSH: "=ACOSH({big})",
+    Function.ACOTH: "=ACOTH({big})",
+    Function.COTH: "=COTH({big})",
+    Function.ARABIC: "=ARABIC({roman})",
+    Function.FACT: "=FACT({int})",
+    Function.FACTDOUBLE: "=FACTDOUBLE({int})",
+    Function.ISEVEN: "=ISEVEN({int})",
+    Function.ISODD: "=ISODD({int})",
+    Function.ROMAN: "=ROMAN({int})",
+    Function.ATAN2: "=ATAN2({v}, {v2})",
+    Function.DECIMAL: "=DECIMAL({hex}, 16)",
+    Function.MOD: "=MOD({big}, {int})",
+    Function.MROUND: "=MROUND({big}, {int})",
+    Function.POWER: "=POWER({v}, 3)",
+    Function.RANDBETWEEN: "=RANDBETWEEN({int}, {int_high})",
+    Function.CEILING: "=CEILING({v}, 0.01)",
+    Function.CEILING_MATH: "=CEILING.MATH({v}, 0.01)",
+    Function.FLOOR: "=FLOOR({v}, 0.01)",
+    Function.FLOOR_MATH: "=FLOOR.MATH({v}, 0.01)",
+    Function.ROUND: "=ROUND({v}, 2)",
+    Function.ROUNDDOWN: "=ROUNDDOWN({v}, 2)",
+    Function.ROUNDUP: "=ROUNDUP({v}, 2)",
+    Function.TRUNC: "=TRUNC({v}, 2)",
+}
+
+WORDS = ["alpha", " beta", "gamma ", "delta", "epsilon", "zeta", "eta", "theta"]
+ROMAN_NUMERALS = ["I", "II", "III", "IV", "V", "VI", "VII", "VIII", "IX", "X", "XL", "L"]
+
+
+def get_column_letter(col: int) -> str:
+    letters = ""
+    col += 1
+    while col > 0:
+        col, remainder = divmod(col - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+def generate_frame(num_rows: int, num_value_cols: int, dtype: str, seed: int) -> pd.DataFrame:
+    """
+    Generate value columns of the given dtype ("float" in (0, 1) or "int" in [1, 10]),
+    followed by the EXTRA_COLUMNS used by scalar functions.
+    """
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for i in range(num_value_cols):
+        if dtype == "float":
+            columns[f"value{i}"] = rng.uniform(0.01, 0.99, num_rows)
+        elif dtype == "int":
+            columns[f"value{i}"] = rng.integers(1, 11, num_rows)
+        else:
+            raise ValueError(f"Unknown dtype: {dtype}")
+    columns["big"] = rng.uniform(1.5, 10, num_rows)
+    columns["int"] = rng.integers(1, 11, num_rows)
+    columns["int_high"] = rng.integers(11, 21, num_rows)
+    columns["text"] = rng.choice(WORDS, num_rows)
+    columns["text2"] = rng.choice(WORDS, num_rows)
+    columns["roman"] = rng.choice(ROMAN_NUMERALS, num_rows)
+    columns["hex"] = [format(value, "X") for value in rng.integers(1, 4096, num_rows)]
+    columns["number_text"] = [f"{value:.3f}" for value in rng.uniform(0, 1000, num_rows)]
+    return pd.DataFrame(columns)
+
+
+def build_range(ref_type: RefType, first_col: int, last_col: int, window: int, num_rows: int) -> str:
+    first, last = get_column_letter(first_col), get_column_letter(last_col)
+    if ref_type == RefType.RR:
+        return f"{first}1:{last}{window}"
+    elif ref_type == RefType.FF:
+        return f"${first}$1:${last}${window}"
+    elif ref_type == RefType.FR:
+        # a growing window that starts with `window` rows
+        return f"{first}$1:{last}{window}"
+    # a shrinking window that ends at the last row
+    return f"{first}1:{last}${num_rows}"
+
+
+def build_cell(ref_type: RefType, col: int) -> str:
+    letter = get_column_letter(col)
+    return f"{letter}1" if ref_type == RefType.RR else f"${letter}$1"
+
+
+def build_formula(
+    function: Function,
+    ref_type: RefType,
+    window: int,
+    window_cols: int,
+    num_rows: int,
+    num_value_cols: int,
+    threshold,
+) -> str:
+    if function in RANGE_TEMPLATES:
+        ref_range = build_range(ref_type, 0, window_cols - 1, window, num_rows)
+        return RANGE_TEMPLATES[function].format(range=ref_range, threshold=threshold)
+    cells = {"v": build_cell(ref_type, 0), "v2": build_cell(ref_type, min(1, num_value_cols - 1))}
+    for i, role in enumerate(EXTRA_COLUMNS):
+        cells[role] = build_cell(ref_type, num_value_cols + i)
+    template = CELL_TEMPLATES.get(function, "=" + function.value.upper() + "({v})")
+    return template.format(**cells)
+
+
+def get_cases(functions: list, ref_types: list, windows: list) -> list:
+    # (function, ref type, window); window sizes only apply to range functions and
+    # RF windows always end at the last row, so they have no size (None)
+    cases = []
+    for function in functions:
+        if function in RANGE_TEMPLATES:
+            for ref_type in ref_types:
+                if ref_type == RefType.RF:
+                    cases.append((function, ref_type, None))
+                    continue
+                for window in windows:
+                    cases.append((function, ref_type, window))
+        else:
+            for ref_type in ref_types:
+                if ref_type in CELL_REF_TYPES:
+                    cases.append((function, ref_type, 1))
+    return cases
+
+
+def time_formula(wb, formula_str: str, warmup: int, repetitions: int, keep_caches: bool) -> dict:
+    def run_once():
+        if not keep_caches:
+            wb.invalidate_caches()
+        # compute_formula reports FormS errors on stdout/stderr and returns None
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            start = time.perf_counter()
+            res = wb.compute_formula(formula_str)
+            wall_time = int((time.perf_counter() - start) * MICROS_PER_SEC)
+        if res is None:
+            raise RuntimeError(output.getvalue().splitlines()[0])
+        return wall_time, wb.get_metrics().get(EXECUTION_TIME)
+
+    wall_times = []
+    execution_times = []
+    try:
+        for _ in range(warmup):
+            run_once()
+        for _ in range(repetitions):
+            wall_time, execution_time = run_once()
+            wall_times.append(wall_time)
+            execution_times.append(execution_time)
+    except Exception as e:
+        # executor failures are results too: the case is reported instead of stopping the suite
+        return {"status": "error", "error": f"{type(e).__name__}: {e}"}
+    return {
+        "status": "ok",
+        "wall_times": wall_times,
+        "execution_times": execution_times,
+        "median": statistics.median(execution_times),
+        "min": min(execution_times),
+        "mean": statistics.mean(execution_times),
+        "stdev": statistics.stdev(execution_times) if len(execution_times) > 1 else 0.0,
+    }
+
+
+def get_git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_environment() -> dict:
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "forms": forms.__version__,
+        "git_commit": get_git_commit(),
+    }
+
+
+def run(
+    rows: list,
+    value_cols: int,
+    dtype: str,
+    functions: list,
+    ref_types: list,
+    windows: list,
+    window_cols: int,
+    warmup: int,
+    repetitions: int,
+    keep_caches: bool,
+    seed: int,
+    output_path: str,
+) -> dict:
+    threshold = 0.5 if dtype == "float" else 5
+    results = []
+    for num_rows in rows:
+        df = generate_frame(num_rows, value_cols, dtype, seed)
+        wb = from_df(df, enable_rewriting=False)
+        for function, ref_type, window in get_cases(functions, ref_types, windows):
+            if window is not None and window > num_rows:
+                continue
+            formula_str = build_formula(
+                function, ref_type, window, window_cols, num_rows, value_cols, threshold
+            )
+            print(f"{num_rows} rows: {formula_str}")
+            result = {
+                "function": function.name,
+                "ref_type": ref_type.name,
+                "rows": num_rows,
+                "window": window,
+                "window_cols": window_cols,
+                "formula_string": formula_str,
+            }
+            result.update(time_formula(wb, formula_str, warmup, repetitions, keep_caches))
+            results.append(result)
+        wb.close()
+
+    output = {
+        "environment": get_environment(),
+        "config": {
+            "rows": rows,
+            "value_cols": value_cols,
+            "dtype": dtype,
+            "windows": windows,
+            "window_cols": window_cols,
+            "warmup": warmup,
+            "repetitions": repetitions,
+            "keep_caches": keep_caches,
+            "seed": seed,
+            "unit": "microseconds",
+        },
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "w") as f:
+        json.dump(output, f, indent=4)
+    return output
+
+
+def parse_int_list(value: str) -> list:
+    return [int(item) for item in value.split(",")]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of the DataFrame executors")
+    parser.add_argument("--rows", default="1000,10000,100000", help="Comma-separated row counts")
+    parser.add_argument("--value_cols", type=int, default=4, help="Number of value columns")
+    parser.add_argument("--dtype", default="float", choices=["float", "int"], help="Value dtype")
+    parser.add_argument(
+        "--functions", default="", help="Comma-separated function names; all executors by default"
+    )
+    parser.add_argument("--ref_types", default="RR,FF,FR,RF", help="Comma-separated RefTypes")
+    parser.add_argument("--windows", default="2,10,100", help="Comma-separated window sizes")
+    parser.add_argument("--window_cols", type=int, default=1, help="Columns spanned by windows")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs per case")
+    parser.add_argument("--repetitions", type=int, default=5, help="Timed runs per case")
+    parser.add_argument(
+        "--keep_caches",
+        action="store_true",
+        help="Keep per-column caches between runs instead of measuring cold kernels",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated frames")
+    parser.add_argument("--output", default="output/df_benchmark.json", help="Path of the JSON result")
+
+    args = parser.parse_args()
+
+    if args.functions:
+        selected_functions = [Function[name.strip().upper()] for name in args.functions.split(",")]
+    else:
+        selected_functions = list(function_to_executor_dict.keys())
+    if args.window_cols > args.value_cols:
+        parser.error("--window_cols cannot exceed --value_cols")
+
+    run(
+        rows=parse_int_list(args.rows),
+        value_cols=args.value_cols,
+        dtype=args.dtype,
+        functions=selected_functions,
+        ref_types=[RefType[name.strip().upper()] for name in args.ref_types.split(",")],
+        windows=parse_int_list(args.windows),
+        window_cols=args.window_cols,
+        warmup=args.warmup,
+        repetitions=args.repetitions,
+        keep_caches=args.keep_caches,
+        seed=args.seed,
+        output_path=args.output,
+    )
@@ -0,0 +1,434 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+import psycopg2
+
+from df_benchmark import get_environment
+from local_postgres import LocalPostgresCluster
+from scaling_benchmark import load_dataframe
+from workload_generator import FormulaGenerator, WorkloadSpec, generate_dataframe
+from forms.core.forms import from_db, from_df
+from forms.utils.metrics import MICROS_PER_SEC
+
+# seconds between releasing the workers and their first request
+START_DELAY = 0.1
+LATENCY_PERCENTILES = [50, 90, 95, 99, 99.9]
+
+CONNECTIONS_QUERY = "SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()"
+# temporary tables of all sessions, as FormS creates one per intermediate result
+TEMP_TABLES_QUERY = """
+    SELECT count(*), coalesce(sum(pg_total_relation_size(c.oid)), 0)
+    FROM pg_class c
+    WHERE c.relpersistence = 't' AND c.relkind = 'r'
+"""
+
+
+def create_workbook(settings: dict):
+    if settings["backend"] == "df":
+        return from_df(settings["df"])
+    return from_db(
+        table_name=settings["table_name"],
+        primary_key=["id"],
+        order_key=["id"],
+        **settings["db_params"],
+    )
+
+
+def run_requests(worker_idx: int, settings: dict, wb, start_time: float) -> list:
+    """
+    Issue formulas from start_time for settings["duration"] seconds. With a target rate,
+    requests follow a fixed schedule shared by all workers and latency is measured from the
+    scheduled time, so a worker that falls behind reports its queueing delay as well.
+    """
+    num_workers = settings["num_workers"]
+    formulas = settings["formulas"]
+    rate = settings["rate"]
+    end_time = start_time + settings["duration"]
+    interval = num_workers / rate if rate > 0 else 0
+    next_time = start_time + worker_idx / rate if rate > 0 else start_time
+
+    records = []
+    request_idx = 0
+    while next_time < end_time:
+        now = time.time()
+        if now < next_time:
+            time.sleep(next_time - now)
+        scheduled_time = next_time if rate > 0 else time.time()
+        formula_str = formulas[(worker_idx + request_idx * num_workers) % len(formulas)]
+        error = None
+        begin = time.time()
+        try:
+            # compute_formula reports FormS errors and returns None instead of raising
+            if wb.compute_formula(formula_str) is None:
+                error = "FormSException"
+        except Exception as e:
+            error = f"{type(e).__name__}: {str(e).strip().splitlines()[0] if str(e).strip() else ''}"
+        finish = time.time()
+        records.append(
+            {
+                "worker": worker_idx,
+                "formula_string": formula_str,
+                "scheduled": scheduled_time,
+                "start": begin,
+                "end": finish,
+                "error": error,
+            }
+        )
+        request_idx += 1
+        next_time = next_time + interval if rate > 0 else finish
+    return records
+
+
+def worker_main(worker_idx: int, settings: dict, shared_wb, barrier, start_value, lock, results):
+    wb = shared_wb
+    records = []
+    error = None
+    try:
+        if wb is None:
+            # DB workbooks (re)create shared auxiliary objects, so creation is serialized
+            with lock:
+                wb = create_workbook(settings)
+        # the first worker through the barrier picks the common start time
+        if barrier.wait() == 0:
+            start_value.value = time.time() + START_DELAY
+        barrier.wait()
+        records = run_requests(worker_idx, settings, wb, start_value.value)
+        # closing a DB workbook drops the shared objects, so wait until every worker is done
+        barrier.wait()
+    except Exception as e:
+        barrier.abort()
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        if shared_wb is None and wb is not None:
+            with lock:
+                wb.close()
+        results.put((worker_idx, records, error))
+
+
+class PostgresMonitor(threading.Thread):
+    # Samples the number of connections and of temporary tables while the load runs
+    def __init__(self, db_params: dict, interval: float):
+        super().__init__(daemon=True)
+        self.db_params = db_params
+        self.interval = interval
+        self.samples = []
+        self.stop_event = threading.Event()
+
+    def run(self):
+        conn = psycopg2.connect(
+            dbname=self.db_params["db_name"],
+            user=self.db_params["username"],
+            password=self.db_params["password"],
+            host=self.db_params["host"],
+            port=self.db_params["port"],
+        )
+        conn.autocommit = True
+        try:
+            with conn.cursor() as cursor:
+                while True:
+                    cursor.execute(CONNECTIONS_QUERY)
+                    connections = cursor.fetchone()[0]
+                    cursor.execute(TEMP_TABLES_QUERY)
+                    temp_tables, temp_bytes = cursor.fetchone()
+                    self.samples.append(
+                        {
+                            "time": time.time(),
+                            "connections": connections,
+                            "temp_tables": temp_tables,
+                            "temp_bytes": int(temp_bytes),
+                        }
+                    )
+                    if self.stop_event.wait(self.interval):
+                        break
+        finally:
+            conn.close()
+
+    def stop(self):
+        self.stop_event.set()
+        self.join()
+
+    def summarize(self) -> dict:
+        if not self.samples:
+            return {}
+        return {
+            # includes the monitor's own connection
+            "max_connections": max(sample["connections"] for sample in self.samples),
+            "temp_tables_start": self.samples[0]["temp_tables"],
+            "temp_tables_end": self.samples[-1]["temp_tables"],
+            "max_temp_tables": max(sample["temp_tables"] for sample in self.samples),
+            "temp_bytes_growth": self.samples[-1]["temp_bytes"] - self.samples[0]["temp_bytes"],
+            "max_temp_bytes": max(sample["temp_bytes"] for sample in self.samples),
+        }
+
+
+def run_workers(settings: dict, mode: str, shared_wb) -> tuple:
+    num_workers = settings["num_workers"]
+    if mode == "thread":
+        results = queue.Queue()
+        start_value = multiprocessing.Value("d", 0.0)
+        barrier = threading.Barrier(num_workers)
+        lock = threading.Lock()
+        workers = [
+            threading.Thread(
+                target=worker_main,
+                args=(i, settings, shared_wb, barrier, start_value, lock, results),
+            )
+            for i in range(num_workers)
+        ]
+    else:
+        context = multiprocessing.get_context()
+        results = context.Queue()
+        start_value = context.Value("d", 0.0)
+        barrier = context.Barrier(num_workers)
+        lock = context.Lock()
+        workers = [
+            context.Process(
+                target=worker_main,
+                args=(i, settings, None, barrier, start_value, lock, results),
+            )
+            for i in range(num_workers)
+        ]
+
+    for worker in workers:
+        worker.start()
+    # drain the queue before joining, as a process cannot exit while its results are unsent
+    worker_results = [results.get() for _ in range(num_workers)]
+    for worker in workers:
+        worker.join()
+    return start_value.value, sorted(worker_results, key=lambda result: result[0])
+
+
+def summarize_records(records: list, start_time: float, duration: float) -> dict:
+    ok_records = [record for record in records if record["error"] is None]
+    error_types = {}
+    for record in records:
+        if record["error"] is not None:
+            error_types[record["error"]] = error_types.get(record["error"], 0) + 1
+
+    elapsed = max([record["end"] for record in records], default=start_time) - start_time
+    summary = {
+        "requests": len(records),
+        "ok": len(ok_records),
+        "errors": len(records) - len(ok_records),
+        "error_rate": (len(records) - len(ok_records)) / len(records) if records else 0.0,
+        "error_types": error_types,
+        "elapsed": elapsed,
+        "offered_rate": len(records) / duration,
+        "throughput": len(ok_records) / elapsed if elapsed > 0 else 0.0,
+    }
+    # latency counts from the scheduled time, service time from the actual start
+    for name, start_key in [("latency", "scheduled"), ("service_time", "start")]:
+        values = [(record["end"] - record[start_key]) * MICROS_PER_SEC for record in ok_records]
+        if values:
+            percentiles = np.percentile(values, LATENCY_PERCENTILES)
+            summary[name] = {f"p{p:g}": float(v) for p, v in zip(LATENCY_PERCENTILES, percentiles)}
+            summary[name]["max"] = float(max(values))
+    return summary
+
+
+def run(
+    backend: str,
+    mode: str,
+    num_workers: int,
+    shared_workbook: bool,
+    rate: float,
+    duration: float,
+    num_rows: int,
+    num_formulas: int,
+    formula_file_path: str,
+    seed: int,
+    sample_interval: float,
+    output_path: str,
+    db_params: dict = None,
+    pg_bin_dir: str = None,
+    keep_records: bool = False,
+) -> dict:
+    spec = WorkloadSpec(num_rows, num_formulas=num_formulas, seed=seed)
+    if formula_file_path:
+        with open(formula_file_path) as f:
+            formulas = [line.strip() for line in f if line.strip()]
+    else:
+        formulas = FormulaGenerator(spec).generate()
+
+    settings = {
+        "backend": backend,
+        "num_workers": num_workers,
+        "formulas": formulas,
+        "rate": rate,
+        "duration": duration,
+        "df": None,
+        "db_params": None,
+        "table_name": "load_test",
+    }
+
+    with contextlib.ExitStack() as stack:
+        df = generate_dataframe(spec)
+        monitor = None
+        if backend == "df":
+            settings["df"] = df
+        else:
+            if db_params is None:
+                cluster = stack.enter_context(LocalPostgresCluster("dt", "forms_db", pg_bin_dir))
+                db_params = {
+                    "host": cluster.host,
+                    "port": cluster.port,
+                    "username": "dt",
+                    "password": "",
+                    "db_name": "forms_db",
+                }
+            settings["db_params"] = db_params
+            load_dataframe(db_params, settings["table_name"], spec, df)
+
+        # a DB workbook created up front builds the shared auxiliary objects before the workers
+        # start and keeps them alive until the last one finished
+        anchor_wb = None
+        if shared_workbook or backend == "db":
+            anchor_wb = create_workbook(settings)
+            stack.callback(anchor_wb.close)
+        if backend == "db":
+            monitor = PostgresMonitor(db_params, sample_interval)
+            monitor.start()
+            stack.callback(monitor.stop)
+
+        print(
+            f"Running {num_workers} {mode} workers on {backend} for {duration}s "
+            f"at {rate if rate > 0 else 'unlimited'} formulas/s"
+        )
+        # compute_formula prints every error; redirecting per thread would race, so it is done here
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            start_time, worker_results = run_workers(
+                settings, mode, anchor_wb if shared_workbook else None
+            )
+        if monitor is not None:
+            monitor.stop()
+
+    records = [record for _, worker_records, _ in worker_results for record in worker_records]
+    summary = summarize_records(records, start_time, duration)
+    summary["worker_failures"] = {
+        worker_idx: error for worker_idx, _, error in worker_results if error is not None
+    }
+    summary["requests_per_worker"] = [len(worker_records) for _, worker_records, _ in worker_results]
+    if monitor is not None:
+        summary["postgres"] = monitor.summarize()
+
+    print(json.dumps(summary, indent=4))
+    output = {
+        "environment": get_environment(),
+        "config": {
+            "backend": backend,
+            "mode": mode,
+            "num_workers": num_workers,
+            "shared_workbook": shared_workbook,
+            "rate": rate,
+            "duration": duration,
+            "rows": num_rows,
+            "formulas": formulas,
+            "seed": seed,
+            "unit": "microseconds",
+        },
+        "summary": summary,
+        "postgres_samples": monitor.samples if monitor is not None else [],
+    }
+    if keep_records:
+        output["records"] = records
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "w") as f:
+        json.dump(output, f, indent=4)
+    return output
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Concurrent load test of FormS workbooks")
+    parser.add_argument("--backend", choices=["df", "db"], default="db", help="Workbook backend")
+    parser.add_argument("--mode", choices=["thread", "process"], default="thread", help="Worker type")
+    parser.add_argument("--workers", type=int, default=4, help="Number of concurrent workers")
+    parser.add_argument(
+        "--shared_workbook",
+        action="store_true",
+        help="All threads use one workbook instead of one each; thread mode only",
+    )
+    parser.add_argument(
+        "--rate", type=float, default=0, help="Target formulas/s over all workers; 0 for no limit"
+    )
+    parser.add_argument("--duration", type=float, default=10, help="Seconds of load")
+    parser.add_argument("--rows", type=int, default=10000, help="Rows of the generated table")
+    parser.add_argument("--formulas", type=int, default=20, help="Number of generated formulas")
+    parser.add_argument(
+        "--formula_file_path", default=None, help="Formula file to use instead of generated ones"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the table and formulas")
+    parser.add_argument(
+        "--sample_interval", type=float, default=0.5, help="Seconds between Postgres samples"
+    )
+    parser.add_argument("--output", default="output/load_test.json", help="Path of the JSON result")
+    parser.add_argument("--keep_records", action="store_true", help="Store every request in the output")
+    parser.add_argument(
+        "--postgres",
+        choices=["local", "server"],
+        default="local",
+        help="local: throwaway cluster created with initdb/pg_ctl; server: connect with the options below",
+    )
+    parser.add_argument("--pg_bin_dir", default=None, help="Directory with initdb and pg_ctl")
+    parser.add_argument("--host", default="localhost", help="Host of the Postgres server")
+    parser.add_argument("--port", type=int, default=5432, help="Port of the Postgres server")
+    parser.add_argument("--username", default="dt", help="User of the Postgres server")
+    parser.add_argument("--password", default="1234", help="Password of the Postgres server")
+    parser.add_argument("--db_name", default="forms_db", help="Database of the Postgres server")
+
+    args = parser.parse_args()
+
+    if args.shared_workbook and args.mode == "process":
+        parser.error("--shared_workbook needs --mode thread")
+    if args.workers < 1:
+        parser.error("--workers must be positive")
+
+    server_params = None
+    if args.postgres == "server":
+        server_params = {
+            "host": args.host,
+            "port": args.port,
+            "username": args.username,
+            "password": args.password,
+            "db_name": args.db_name,
+        }
+
+    run(
+        backend=args.backend,
+        mode=args.mode,
+        num_workers=args.workers,
+        shared_workbook=args.shared_workbook,
+        rate=args.rate,
+        duration=args.duration,
+        num_rows=args.rows,
+        num_formulas=args.formulas,
+        formula_file_path=args.formula_file_path,
+        seed=args.seed,
+        sample_interval=args.sample_interval,
+        output_path=args.output,
+        db_params=server_params,
+        pg_bin_dir=args.pg_bin_dir,
+        keep_records=args.keep_records,
+    )
@@ -0,0 +1,174 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import shutil
+import socket
+import subprocess
+import tempfile
+
+import psycopg2
+from psycopg2 import sql
+
+# tmpfs keeps the data directory in memory, so disk speed does not leak into the measurements
+TMPFS_DIR = "/dev/shm"
+
+# the cluster is thrown away after the run, so durability is traded for stable timings
+SERVER_SETTINGS = {
+    "listen_addresses": "localhost",
+    "fsync": "off",
+    "synchronous_commit": "off",
+    "full_page_writes": "off",
+}
+
+
+def find_pg_bin_dir(pg_bin_dir: str = None) -> str:
+    """
+    Locate the directory with initdb and pg_ctl: an explicit directory, then PATH,
+    then the output of pg_config --bindir.
+    """
+    if pg_bin_dir is not None:
+        if not os.path.isfile(os.path.join(pg_bin_dir, "initdb")):
+            raise Exception(f"initdb not found in {pg_bin_dir}")
+        return pg_bin_dir
+
+    initdb = shutil.which("initdb")
+    if initdb is not None:
+        return os.path.dirname(initdb)
+
+    pg_config = shutil.which("pg_config")
+    if pg_config is not None:
+        bin_dir = subprocess.run(
+            [pg_config, "--bindir"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        if os.path.isfile(os.path.join(bin_dir, "initdb")):
+            return bin_dir
+
+    raise Exception("initdb and pg_ctl not found; add them to PATH or pass --pg_bin_dir")
+
+
+def get_free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("localhost", 0))
+        return s.getsockname()[1]
+
+
+class LocalPostgresCluster:
+    """
+    A throwaway PostgreSQL cluster created with initdb and controlled with pg_ctl.
+    The cluster listens on a free port, trusts local connections and is removed on stop().
+    """
+
+    def __init__(self, postgres_user: str, dbname: str, pg_bin_dir: str = None, data_root: str = None):
+        self.postgres_user = postgres_user
+        self.dbname = dbname
+        self.bin_dir = find_pg_bin_dir(pg_bin_dir)
+        if data_root is None and os.path.isdir(TMPFS_DIR) and os.access(TMPFS_DIR, os.W_OK):
+            data_root = TMPFS_DIR
+        self.data_root = data_root
+        self.host = "localhost"
+        self.port = None
+        self.base_dir = None
+        self.started = False
+
+    @property
+    def data_dir(self) -> str:
+        return os.path.join(self.base_dir, "data")
+
+    @property
+    def log_file(self) -> str:
+        return os.path.join(self.base_dir, "postgres.log")
+
+    def run_pg_command(self, command: str, *args):
+        result = subprocess.run(
+            [os.path.join(self.bin_dir, command), *args], capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise Exception(f"{command} failed: {result.stderr.strip() or result.stdout.strip()}")
+
+    def start(self):
+        if os.name == "posix" and os.geteuid() == 0:
+            raise Exception("initdb cannot be run as root; run the benchmark as an unprivileged user")
+
+        self.base_dir = tempfile.mkdtemp(prefix="forms_pg_", dir=self.data_root)
+        try:
+            self.run_pg_command(
+                "initdb",
+                "-D",
+                self.data_dir,
+                "-U",
+                self.postgres_user,
+                "--auth=trust",
+                "--encoding=UTF8",
+                "--no-sync",
+            )
+
+            # another process may take the port between picking and binding it, so retry a few times
+            for _ in range(3):
+                self.port = get_free_port()
+                options = [f"-p {self.port}", f"-k {self.base_dir}"]
+                options += [f"-c {key}={value}" for key, value in SERVER_SETTINGS.items()]
+                try:
+                    self.run_pg_command(
+                        "pg_ctl",
+                        "-D",
+                        self.data_dir,
+                        "-l",
+                        self.log_file,
+                        "-o",
+                        " ".join(options),
+                        "-w",
+                        "start",
+                    )
+                    self.started = True
+                    break
+                except Exception:
+                    continue
+            if not self.started:
+                raise Exception(f"PostgreSQL did not start, see {self.log_file}")
+
+            self.create_database()
+        except Exception:
+            self.stop()
+            raise
+
+    def create_database(self):
+        conn = psycopg2.connect(
+            dbname="postgres", user=self.postgres_user, host=self.host, port=self.port
+        )
+        try:
+            # CREATE DATABASE cannot run inside a transaction block
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(self.dbname)))
+        finally:
+            conn.close()
+
+    def stop(self):
+        try:
+            if self.started:
+                # immediate shutdown skips the checkpoint; the data is deleted right after
+                self.run_pg_command("pg_ctl", "-D", self.data_dir, "-m", "immediate", "-w", "stop")
+                self.started = False
+        finally:
+            if self.base_dir is not None:
+                shutil.rmtree(self.base_dir, ignore_errors=True)
+                self.base_dir = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
@@ -0,0 +1,437 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import contextlib
+import io
+import json
+import os
+import statistics
+
+import numpy as np
+import psycopg2
+from psycopg2 import sql
+
+from df_benchmark import RANGE_TEMPLATES, build_range, get_environment
+from local_postgres import LocalPostgresCluster
+from workload_generator import KEY_COLUMNS, THRESHOLD, WorkloadSpec, generate_dataframe, get_schema_sql
+from forms.core.forms import from_db, from_df
+from forms.utils.functions import DB_SUPPORTED_FUNCTIONS, Function
+from forms.utils.metrics import EXECUTION_TIME, TOTAL_TIME
+from forms.utils.reference import RefType
+
+DIMENSIONS = ["rows", "window", "width", "depth"]
+BACKENDS = ["df", "db"]
+
+# a fitted exponent above this is reported as superlinear
+DEFAULT_ALERT_EXPONENT = 1.2
+
+
+class SweepPoint:
+    def __init__(self, rows: int, window: int, width: int, depth: int):
+        self.rows = rows
+        self.window = min(window, rows)
+        self.width = width
+        self.depth = depth
+
+    def replace(self, dimension: str, value: int):
+        values = {"rows": self.rows, "window": self.window, "width": self.width, "depth": self.depth}
+        values[dimension] = value
+        return SweepPoint(**values)
+
+    def get_size(self, dimension: str) -> int:
+        # the amount of work a dimension scales: a formula of depth d has 2^d leaves
+        if dimension == "depth":
+            return 2**self.depth
+        return getattr(self, dimension)
+
+    def to_dict(self) -> dict:
+        return {"rows": self.rows, "window": self.window, "width": self.width, "depth": self.depth}
+
+
+def get_grid(dimension: str, min_value: int, max_value: int, num_points: int) -> list:
+    # depth is swept linearly since every level already doubles the number of leaves
+    if dimension == "depth":
+        return list(range(min_value, max_value + 1))
+    grid = np.geomspace(min_value, max_value, num_points).round().astype(int)
+    return sorted(set(int(value) for value in grid))
+
+
+def build_formula(function: Function, ref_type: RefType, point: SweepPoint) -> str:
+    # 2^depth range functions over the first `width` numeric columns, added pairwise; the
+    # windows differ by one row per leaf so that no backend can evaluate the leaves only once
+    first_col = len(KEY_COLUMNS)
+    last_col = first_col + point.width - 1
+    expressions = []
+    for leaf_idx in range(2**point.depth):
+        window = min(point.window + leaf_idx, point.rows)
+        ref_range = build_range(ref_type, first_col, last_col, window, point.rows)
+        expressions.append(RANGE_TEMPLATES[function].format(range=ref_range, threshold=THRESHOLD)[1:])
+    for level in range(point.depth):
+        if level > 0:
+            expressions = [f"({expression})" for expression in expressions]
+        expressions = [f"{left}+{right}" for left, right in zip(expressions[::2], expressions[1::2])]
+    return "=" + expressions[0]
+
+
+def measure(wb, formula_str: str, warmup: int, repetitions: int, invalidate_caches: bool) -> dict:
+    def run_once():
+        if invalidate_caches:
+            wb.invalidate_caches()
+        wb.reset_metrics()
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            res = wb.compute_formula(formula_str)
+        if res is None:
+            raise RuntimeError(output.getvalue().strip().splitlines()[0])
+        metrics = wb.get_metrics()
+        return metrics[TOTAL_TIME], metrics[EXECUTION_TIME]
+
+    total_times = []
+    execution_times = []
+    try:
+        for _ in range(warmup):
+            run_once()
+        for _ in range(repetitions):
+            total_time, execution_time = run_once()
+            total_times.append(total_time)
+            execution_times.append(execution_time)
+    except Exception as e:
+        return {"status": "error", "error": f"{type(e).__name__}: {e}"}
+    return {
+        "status": "ok",
+        "total_times": total_times,
+        "execution_times": execution_times,
+        "median_total_time": statistics.median(total_times),
+        "median_execution_time": statistics.median(execution_times),
+    }
+
+
+def fit_exponent(sizes: list, times: list) -> float:
+    # slope of log(time) over log(size): 1 is linear, 2 quadratic, 0 independent of the size
+    if len(sizes) < 2 or len(set(sizes)) < 2:
+        return None
+    slope, _ = np.polyfit(np.log(sizes), np.log(np.maximum(times, 1)), 1)
+    return float(slope)
+
+
+def load_dataframe(db_params: dict, table_name: str, spec: WorkloadSpec, df):
+    # (re)create the table of a generated frame and bulk-load it with COPY
+    conn = psycopg2.connect(
+        dbname=db_params["db_name"],
+        user=db_params["username"],
+        password=db_params["password"],
+        host=db_params["host"],
+        port=db_params["port"],
+    )
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(sql.SQL("DROP TABLE IF EXISTS {} CASCADE").format(sql.Identifier(table_name)))
+            cursor.execute(get_schema_sql(spec, table_name))
+            csv_buffer = io.StringIO()
+            df.to_csv(csv_buffer, header=False, index=False)
+            csv_buffer.seek(0)
+            cursor.copy_expert(f"COPY {table_name} FROM STDIN WITH CSV", csv_buffer)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+class WorkbookCache:
+    """
+    Creates the tables and workbooks of every row count once. All tables have
+    `num_numeric_cols` columns so that every width of the sweep fits. DB workbooks share
+    their auxiliary table and base view per database, so only one of them is open at a time.
+    """
+
+    def __init__(self, num_numeric_cols: int, seed: int, db_params: dict = None):
+        self.num_numeric_cols = num_numeric_cols
+        self.seed = seed
+        self.db_params = db_params
+        self.frames = {}
+        self.workbooks = {}
+        self.loaded_tables = set()
+
+    def get_frame(self, rows: int):
+        if rows not in self.frames:
+            spec = WorkloadSpec(rows, num_numeric_cols=self.num_numeric_cols, seed=self.seed)
+            self.frames[rows] = (spec, generate_dataframe(spec))
+        return self.frames[rows]
+
+    def get_workbook(self, backend: str, rows: int):
+        if (backend, rows) in self.workbooks:
+            return self.workbooks[(backend, rows)]
+        spec, df = self.get_frame(rows)
+        if backend == "df":
+            wb = from_df(df, enable_rewriting=False)
+        else:
+            for key in [key for key in self.workbooks if key[0] == "db"]:
+                self.workbooks.pop(key).close()
+            table_name = f"scaling_{rows}"
+            if table_name not in self.loaded_tables:
+                load_dataframe(self.db_params, table_name, spec, df)
+                self.loaded_tables.add(table_name)
+            wb = from_db(table_name=table_name, primary_key=["id"], order_key=["id"], **self.db_params)
+        self.workbooks[(backend, rows)] = wb
+        return wb
+
+    def close(self):
+        for wb in self.workbooks.values():
+            wb.close()
+        self.workbooks = {}
+
+
+def sweep(
+    cache: WorkbookCache,
+    backends: list,
+    function: Function,
+    ref_type: RefType,
+    base_point: SweepPoint,
+    grids: dict,
+    warmup: int,
+    repetitions: int,
+    alert_exponent: float,
+) -> tuple:
+    results = []
+    fits = []
+    for backend in backends:
+        if backend == "db" and function not in DB_SUPPORTED_FUNCTIONS:
+            print(f"Skipping {function.name} on db: not supported by the DB executors")
+            continue
+        for dimension, grid in grids.items():
+            if dimension == "window" and ref_type == RefType.RF:
+                # RF windows always end at the last row, so they have no size of their own
+                continue
+            sizes = []
+            times = []
+            for value in grid:
+                point = base_point.replace(dimension, value)
+                formula_str = build_formula(function, ref_type, point)
+                print(f"{backend} {dimension}={value}: {formula_str[:80]}")
+                wb = cache.get_workbook(backend, point.rows)
+                result = {
+                    "backend": backend,
+                    "dimension": dimension,
+                    "value": value,
+                    "size": point.get_size(dimension),
+                    "formula_string": formula_str,
+                    **point.to_dict(),
+                }
+                result.update(measure(wb, formula_str, warmup, repetitions, backend == "df"))
+                results.append(result)
+                if result["status"] == "ok":
+                    sizes.append(result["size"])
+                    times.append(result["median_total_time"])
+            exponent = fit_exponent(sizes, times)
+            fits.append(
+                {
+                    "backend": backend,
+                    "dimension": dimension,
+                    "exponent": exponent,
+                    "points": len(sizes),
+                    "superlinear": exponent is not None and exponent > alert_exponent,
+                }
+            )
+    return results, fits
+
+
+def plot_curves(results: list, fits: list, plot_dir: str):
+    try:
+        import matplotlib
+
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib is not installed; skipping the plots")
+        return
+
+    os.makedirs(plot_dir, exist_ok=True)
+    for dimension in DIMENSIONS:
+        dimension_fits = [fit for fit in fits if fit["dimension"] == dimension]
+        if not dimension_fits:
+            continue
+        fig, ax = plt.subplots()
+        for fit in dimension_fits:
+            points = [
+                (result["size"], result["median_total_time"])
+                for result in results
+                if result["backend"] == fit["backend"]
+                and result["dimension"] == dimension
+                and result["status"] == "ok"
+            ]
+            if not points:
+                continue
+            sizes, times = zip(*points)
+            exponent = "n/a" if fit["exponent"] is None else f"{fit['exponent']:.2f}"
+            ax.plot(sizes, times, marker="o", label=f"{fit['backend']} (exponent {exponent})")
+        ax.set_xscale("log", base=2 if dimension == "depth" else 10)
+        ax.set_yscale("log")
+        ax.set_xlabel("leaves" if dimension == "depth" else dimension)
+        ax.set_ylabel("median total time (us)")
+        ax.legend()
+        fig.savefig(os.path.join(plot_dir, f"{dimension}.png"), bbox_inches="tight")
+        plt.close(fig)
+
+
+def run(
+    backends: list,
+    function: Function,
+    ref_type: RefType,
+    base_point: SweepPoint,
+    grids: dict,
+    warmup: int,
+    repetitions: int,
+    alert_exponent: float,
+    seed: int,
+    output_path: str,
+    plot_dir: str = None,
+    db_params: dict = None,
+    pg_bin_dir: str = None,
+) -> dict:
+    num_numeric_cols = max(grids.get("width", []) + [base_point.width])
+
+    with contextlib.ExitStack() as stack:
+        if "db" in backends and db_params is None:
+            cluster = stack.enter_context(LocalPostgresCluster("dt", "forms_db", pg_bin_dir))
+            db_params = {
+                "host": cluster.host,
+                "port": cluster.port,
+                "username": "dt",
+                "password": "",
+                "db_name": "forms_db",
+            }
+        cache = WorkbookCache(num_numeric_cols, seed, db_params)
+        stack.callback(cache.close)
+        results, fits = sweep(
+            cache,
+            backends,
+            function,
+            ref_type,
+            base_point,
+            grids,
+            warmup,
+            repetitions,
+            alert_exponent,
+        )
+
+    for fit in fits:
+        exponent = "n/a" if fit["exponent"] is None else f"{fit['exponent']:.2f}"
+        alert = "  <-- superlinear" if fit["superlinear"] else ""
+        print(f"{fit['backend']} {fit['dimension']}: exponent {exponent}{alert}")
+
+    output = {
+        "environment": get_environment(),
+        "config": {
+            "backends": backends,
+            "function": function.name,
+            "ref_type": ref_type.name,
+            "base_point": base_point.to_dict(),
+            "grids": grids,
+            "warmup": warmup,
+            "repetitions": repetitions,
+            "alert_exponent": alert_exponent,
+            "seed": seed,
+            "unit": "microseconds",
+        },
+        "fits": fits,
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, "w") as f:
+        json.dump(output, f, indent=4)
+    if plot_dir:
+        plot_curves(results, fits, plot_dir)
+    return output
+
+
+def parse_range(value: str) -> tuple:
+    min_value, max_value = value.split(":")
+    return int(min_value), int(max_value)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Scaling sweeps of FormS formulas")
+    parser.add_argument("--backends", default="df,db", help="Comma-separated: df, db")
+    parser.add_argument("--function", default="SUM", help="Range function, e.g., SUM or MEDIAN")
+    parser.add_argument("--ref_type", default="RR", help="RefType of the range: RR, FR, RF or FF")
+    parser.add_argument("--dimensions", default=",".join(DIMENSIONS), help="Dimensions to sweep")
+    parser.add_argument("--rows", default="1000:100000", help="min:max of the rows sweep")
+    parser.add_argument("--window", default="1:1000", help="min:max of the window sweep")
+    parser.add_argument("--width", default="1:8", help="min:max of the column width sweep")
+    parser.add_argument("--depth", default="0:4", help="min:max of the nesting depth sweep")
+    parser.add_argument("--points", type=int, default=5, help="Points of the geometric grids")
+    parser.add_argument("--base_rows", type=int, default=10000, help="Rows when not swept")
+    parser.add_argument("--base_window", type=int, default=10, help="Window when not swept")
+    parser.add_argument("--base_width", type=int, default=1, help="Width when not swept")
+    parser.add_argument("--base_depth", type=int, default=0, help="Depth when not swept")
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed runs per point")
+    parser.add_argument("--repetitions", type=int, default=3, help="Timed runs per point")
+    parser.add_argument(
+        "--alert_exponent",
+        type=float,
+        default=DEFAULT_ALERT_EXPONENT,
+        help="Report fits above this exponent as superlinear",
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated tables")
+    parser.add_argument("--output", default="output/scaling.json", help="Path of the JSON result")
+    parser.add_argument("--plot_dir", default=None, help="Folder for PNG curves (needs matplotlib)")
+    parser.add_argument(
+        "--postgres",
+        choices=["local", "server"],
+        default="local",
+        help="local: throwaway cluster created with initdb/pg_ctl; server: connect with the options below",
+    )
+    parser.add_argument("--pg_bin_dir", default=None, help="Directory with initdb and pg_ctl")
+    parser.add_argument("--host", default="localhost", help="Host of the Postgres server")
+    parser.add_argument("--port", type=int, default=5432, help="Port of the Postgres server")
+    parser.add_argument("--username", default="dt", help="User of the Postgres server")
+    parser.add_argument("--password", default="1234", help="Password of the Postgres server")
+    parser.add_argument("--db_name", default="forms_db", help="Database of the Postgres server")
+
+    args = parser.parse_args()
+
+    selected_function = Function[args.function.strip().upper()]
+    if selected_function not in RANGE_TEMPLATES:
+        parser.error(f"--function must be one of {', '.join(f.name for f in RANGE_TEMPLATES)}")
+    sweep_grids = {}
+    for dimension_name in args.dimensions.split(","):
+        grid_min, grid_max = parse_range(getattr(args, dimension_name))
+        sweep_grids[dimension_name] = get_grid(dimension_name, grid_min, grid_max, args.points)
+
+    server_params = None
+    if args.postgres == "server":
+        server_params = {
+            "host": args.host,
+            "port": args.port,
+            "username": args.username,
+            "password": args.password,
+            "db_name": args.db_name,
+        }
+
+    run(
+        backends=args.backends.split(","),
+        function=selected_function,
+        ref_type=RefType[args.ref_type.strip().upper()],
+        base_point=SweepPoint(args.base_rows, args.base_window, args.base_width, args.base_depth),
+        grids=sweep_grids,
+        warmup=args.warmup,
+        repetitions=args.repetitions,
+        alert_exponent=args.alert_exponent,
+        seed=args.seed,
+        output_path=args.output,
+        plot_dir=args.plot_dir,
+        db_params=server_params,
+        pg_bin_dir=args.pg_bin_dir,
+    )
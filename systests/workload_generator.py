@@ -0,0 +1,372 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+import math
+import os
+
+import numpy as np
+import pandas as pd
+
+from df_benchmark import build_range, get_column_letter
+from forms.utils.functions import Function
+from forms.utils.reference import RefType
+
+# rows are generated in chunks seeded by (seed, chunk index), so the output only
+# depends on the number of rows and the seed, and memory stays bounded for 100M rows
+CHUNK_ROWS = 1000000
+
+KEY_COLUMNS = ["id", "sorted_key", "unsorted_key", "lookup_value"]
+
+# numeric values are uniform in [0, VALUE_RANGE), so conditions compare against its middle
+VALUE_RANGE = 100
+THRESHOLD = VALUE_RANGE // 2
+
+WORDS = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta", "iota", "kappa"]
+
+AGGREGATE_TEMPLATES = {
+    Function.SUM: "SUM({range})",
+    Function.COUNT: "COUNT({range})",
+    Function.AVG: "AVERAGE({range})",
+    Function.MIN: "MIN({range})",
+    Function.MAX: "MAX({range})",
+    Function.SUMIF: 'SUMIF({range}, ">{threshold}")',
+    Function.COUNTIF: 'COUNTIF({range}, ">{threshold}")',
+    Function.AVERAGEIF: 'AVERAGEIF({range}, ">{threshold}")',
+    Function.MAXIF: 'MAXIF({range}, ">{threshold}")',
+    Function.MINIF: 'MINIF({range}, ">{threshold}")',
+}
+LOOKUP_FUNCTIONS = {Function.LOOKUP, Function.INDEX}
+LEAF_FUNCTIONS = set(AGGREGATE_TEMPLATES) | LOOKUP_FUNCTIONS
+
+# functions whose arguments are nested expressions
+COMBINATOR_TEMPLATES = {
+    Function.PLUS: "{0}+{1}",
+    Function.MINUS: "{0}-{1}",
+    Function.MULTIPLY: "{0}*{1}",
+    Function.DIVIDE: "{0}/{1}",
+    Function.IF: "IF({cell}>{threshold}, {0}, {1})",
+}
+
+# runs on both backends; LOOKUP, INDEX and IF are only supported by the DB executors
+DEFAULT_FUNCTION_MIX = "SUM:3,AVG:2,MAX:1,MIN:1,COUNT:1,SUMIF:1,COUNTIF:1,PLUS:2,MINUS:1"
+DEFAULT_REF_TYPE_MIX = "RR:4,FR:2,RF:1,FF:1"
+
+
+class WorkloadSpec:
+    """
+    Parameters of a synthetic workload: the shape of the table and the distribution
+    of the formulas evaluated on it.
+    """
+
+    def __init__(
+        self,
+        num_rows: int,
+        num_numeric_cols: int = 4,
+        num_text_cols: int = 1,
+        null_density: float = 0.0,
+        function_mix: dict = None,
+        ref_type_mix: dict = None,
+        windows: list = None,
+        window_cols: int = 1,
+        depth: int = 0,
+        num_formulas: int = 20,
+        seed: int = 0,
+    ):
+        self.num_rows = num_rows
+        self.num_numeric_cols = num_numeric_cols
+        self.num_text_cols = num_text_cols
+        self.null_density = null_density
+        self.function_mix = (
+            parse_mix(DEFAULT_FUNCTION_MIX, Function) if function_mix is None else function_mix
+        )
+        self.ref_type_mix = (
+            parse_mix(DEFAULT_REF_TYPE_MIX, RefType) if ref_type_mix is None else ref_type_mix
+        )
+        self.windows = [10, 100] if windows is None else windows
+        self.window_cols = window_cols
+        self.depth = depth
+        self.num_formulas = num_formulas
+        self.seed = seed
+
+    @property
+    def numeric_columns(self) -> list:
+        return [f"num_{i}" for i in range(self.num_numeric_cols)]
+
+    @property
+    def text_columns(self) -> list:
+        return [f"text_{i}" for i in range(self.num_text_cols)]
+
+    @property
+    def columns(self) -> list:
+        return KEY_COLUMNS + self.numeric_columns + self.text_columns
+
+    def get_column_letter(self, column: str) -> str:
+        return get_column_letter(self.columns.index(column))
+
+    def to_dict(self) -> dict:
+        return {
+            "num_rows": self.num_rows,
+            "num_numeric_cols": self.num_numeric_cols,
+            "num_text_cols": self.num_text_cols,
+            "null_density": self.null_density,
+            "function_mix": {function.name: weight for function, weight in self.function_mix.items()},
+            "ref_type_mix": {ref_type.name: weight for ref_type, weight in self.ref_type_mix.items()},
+            "windows": self.windows,
+            "window_cols": self.window_cols,
+            "depth": self.depth,
+            "num_formulas": self.num_formulas,
+            "seed": self.seed,
+            "columns": {column: self.get_column_letter(column) for column in self.columns},
+        }
+
+
+def parse_mix(value: str, enum_class) -> dict:
+    # "SUM:3,AVG:1" -> {Function.SUM: 3.0, Function.AVG: 1.0}; a missing weight means 1
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.strip().partition(":")
+        mix[enum_class[name.strip().upper()]] = float(weight) if weight else 1.0
+    return mix
+
+
+def get_unsorted_key_params(num_rows: int) -> tuple:
+    # (id * multiplier + offset) mod num_rows is a permutation of the ids when the multiplier
+    # is coprime with num_rows, which shuffles the keys without materializing a permutation
+    multiplier = 2654435761 % num_rows if num_rows > 1 else 1
+    while math.gcd(multiplier, num_rows) != 1:
+        multiplier += 1
+    return multiplier, num_rows // 3
+
+
+def generate_chunk(spec: WorkloadSpec, chunk_idx: int, sorted_key_start: int) -> pd.DataFrame:
+    start = chunk_idx * CHUNK_ROWS
+    num_rows = min(CHUNK_ROWS, spec.num_rows - start)
+    rng = np.random.default_rng([spec.seed, chunk_idx])
+
+    ids = np.arange(start + 1, start + num_rows + 1, dtype=np.int64)
+    multiplier, offset = get_unsorted_key_params(spec.num_rows)
+    columns = {
+        "id": ids,
+        # strictly increasing with random gaps, for approximate matches
+        "sorted_key": sorted_key_start + np.cumsum(rng.integers(1, 4, num_rows)),
+        # a shuffle of 1..num_rows, for exact matches and INDEX positions
+        "unsorted_key": (ids * multiplier + offset) % spec.num_rows + 1,
+        "lookup_value": rng.integers(1, spec.num_rows + 1, num_rows),
+    }
+    for column in spec.numeric_columns:
+        values = rng.uniform(0, VALUE_RANGE, num_rows).round(4)
+        if spec.null_density > 0:
+            values[rng.random(num_rows) < spec.null_density] = np.nan
+        columns[column] = values
+    for column in spec.text_columns:
+        values = pd.Series(rng.choice(WORDS, num_rows), dtype=object)
+        if spec.null_density > 0:
+            values[rng.random(num_rows) < spec.null_density] = None
+        columns[column] = values
+    return pd.DataFrame(columns)
+
+
+def generate_chunks(spec: WorkloadSpec):
+    sorted_key_start = 0
+    for chunk_idx in range(math.ceil(spec.num_rows / CHUNK_ROWS)):
+        chunk = generate_chunk(spec, chunk_idx, sorted_key_start)
+        sorted_key_start = int(chunk["sorted_key"].iloc[-1])
+        yield chunk
+
+
+def generate_dataframe(spec: WorkloadSpec) -> pd.DataFrame:
+    return pd.concat(generate_chunks(spec), ignore_index=True)
+
+
+def get_schema_sql(spec: WorkloadSpec, table_name: str) -> str:
+    column_defs = [f"    {column} BIGINT NOT NULL" for column in KEY_COLUMNS]
+    column_defs[0] += " PRIMARY KEY"
+    column_defs += [f"    {column} FLOAT" for column in spec.numeric_columns]
+    column_defs += [f"    {column} TEXT" for column in spec.text_columns]
+    return f"CREATE TABLE {table_name} (\n" + ",\n".join(column_defs) + "\n);\n"
+
+
+class FormulaGenerator:
+    # Draws formulas from a WorkloadSpec; the same spec always produces the same formulas
+    def __init__(self, spec: WorkloadSpec):
+        self.spec = spec
+        self.rng = np.random.default_rng([spec.seed, 1 << 32])
+        self.leaf_mix = {f: w for f, w in spec.function_mix.items() if f in LEAF_FUNCTIONS}
+        self.combinator_mix = {f: w for f, w in spec.function_mix.items() if f in COMBINATOR_TEMPLATES}
+        unknown = set(spec.function_mix) - set(self.leaf_mix) - set(self.combinator_mix)
+        if unknown:
+            raise ValueError(
+                f"Functions not supported by the generator: {sorted(f.name for f in unknown)}"
+            )
+
+    def choose(self, mix: dict):
+        options = list(mix)
+        weights = np.array([mix[option] for option in options])
+        return options[self.rng.choice(len(options), p=weights / weights.sum())]
+
+    def choose_numeric_column(self, width: int = 1) -> int:
+        # index of the first column of `width` adjacent numeric columns
+        first = len(KEY_COLUMNS)
+        return first + int(self.rng.integers(0, self.spec.num_numeric_cols - width + 1))
+
+    def build_cell(self) -> str:
+        return get_column_letter(self.choose_numeric_column()) + "1"
+
+    def build_lookup(self, function: Function) -> str:
+        num_rows = self.spec.num_rows
+        result_col = get_column_letter(self.choose_numeric_column())
+        result_range = f"{result_col}$1:{result_col}${num_rows}"
+        if function == Function.INDEX:
+            position = self.spec.get_column_letter("unsorted_key") + "1"
+            return f"INDEX({result_range}, {position})"
+        # approximate matches need sorted keys; exact matches run on the shuffled keys
+        exact = bool(self.rng.integers(0, 2))
+        key_col = self.spec.get_column_letter("unsorted_key" if exact else "sorted_key")
+        value = self.spec.get_column_letter("lookup_value") + "1"
+        return f"LOOKUP({value}, {key_col}$1:{key_col}${num_rows}, {result_range}, {0 if exact else 1})"
+
+    def build_leaf(self) -> str:
+        if not self.leaf_mix:
+            return self.build_cell()
+        function = self.choose(self.leaf_mix)
+        if function in LOOKUP_FUNCTIONS:
+            return self.build_lookup(function)
+        ref_type = self.choose(self.spec.ref_type_mix)
+        window = min(int(self.rng.choice(self.spec.windows)), self.spec.num_rows)
+        first_col = self.choose_numeric_column(self.spec.window_cols)
+        ref_range = build_range(
+            ref_type, first_col, first_col + self.spec.window_cols - 1, window, self.spec.num_rows
+        )
+        return AGGREGATE_TEMPLATES[function].format(range=ref_range, threshold=THRESHOLD)
+
+    def build_expression(self, depth: int) -> str:
+        if depth == 0:
+            return self.build_leaf()
+        function = self.choose(self.combinator_mix) if self.combinator_mix else Function.PLUS
+        args = [self.build_expression(depth - 1) for _ in range(2)]
+        if function in (Function.MULTIPLY, Function.DIVIDE, Function.MINUS):
+            args = [f"({arg})" if depth > 1 else arg for arg in args]
+        return COMBINATOR_TEMPLATES[function].format(*args, cell=self.build_cell(), threshold=THRESHOLD)
+
+    def generate(self) -> list:
+        return ["=" + self.build_expression(self.spec.depth) for _ in range(self.spec.num_formulas)]
+
+
+def write_csv(spec: WorkloadSpec, path: str):
+    # no header, as expected by COPY ... WITH CSV; empty fields are loaded as NULL
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for chunk in generate_chunks(spec):
+            chunk.to_csv(f, header=False, index=False)
+
+
+def write_parquet(spec: WorkloadSpec, path: str):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise Exception("Writing Parquet requires pyarrow")
+
+    writer = None
+    try:
+        for chunk in generate_chunks(spec):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def generate(spec: WorkloadSpec, table_name: str, output_folder: str, formats: list) -> dict:
+    """
+    Write the dataset, its schema and a formula file into output_folder, and return the
+    paths of the written files keyed by their role.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    paths = {}
+    if "csv" in formats:
+        paths["dataset"] = os.path.join(output_folder, f"{table_name}.csv")
+        write_csv(spec, paths["dataset"])
+        paths["schema"] = os.path.join(output_folder, f"{table_name}.sql")
+        with open(paths["schema"], "w") as f:
+            f.write(get_schema_sql(spec, table_name))
+    if "parquet" in formats:
+        paths["parquet"] = os.path.join(output_folder, f"{table_name}.parquet")
+        write_parquet(spec, paths["parquet"])
+
+    paths["formulas"] = os.path.join(output_folder, f"{table_name}_formulas.csv")
+    with open(paths["formulas"], "w") as f:
+        for formula_str in FormulaGenerator(spec).generate():
+            f.write(formula_str + "\n")
+
+    paths["spec"] = os.path.join(output_folder, f"{table_name}_spec.json")
+    with open(paths["spec"], "w") as f:
+        json.dump({"table_name": table_name, "primary_key": "id", **spec.to_dict()}, f, indent=4)
+    return paths
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Synthetic workload generator for FormS benchmarks")
+    parser.add_argument("--rows", type=int, required=True, help="Number of rows")
+    parser.add_argument("--numeric_cols", type=int, default=4, help="Number of numeric columns")
+    parser.add_argument("--text_cols", type=int, default=1, help="Number of text columns")
+    parser.add_argument(
+        "--null_density", type=float, default=0.0, help="Fraction of NULLs in value columns"
+    )
+    parser.add_argument(
+        "--function_mix",
+        default=DEFAULT_FUNCTION_MIX,
+        help="Comma-separated FUNCTION:weight pairs, e.g., SUM:3,LOOKUP:1,IF:1",
+    )
+    parser.add_argument(
+        "--ref_type_mix", default=DEFAULT_REF_TYPE_MIX, help="Comma-separated REFTYPE:weight pairs"
+    )
+    parser.add_argument("--windows", default="10,100", help="Comma-separated window sizes")
+    parser.add_argument("--window_cols", type=int, default=1, help="Columns spanned by windows")
+    parser.add_argument("--depth", type=int, default=0, help="Nesting depth of the formulas")
+    parser.add_argument("--formulas", type=int, default=20, help="Number of formulas")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the dataset and formulas")
+    parser.add_argument("--formats", default="csv,parquet", help="Comma-separated: csv, parquet")
+    parser.add_argument("--table_name", default="synthetic", help="Name of the table")
+    parser.add_argument("--output_folder", required=True, help="Path to the output folder")
+
+    args = parser.parse_args()
+
+    if args.window_cols > args.numeric_cols:
+        parser.error("--window_cols cannot exceed --numeric_cols")
+    if not 0 <= args.null_density < 1:
+        parser.error("--null_density must be in [0, 1)")
+
+    workload_spec = WorkloadSpec(
+        num_rows=args.rows,
+        num_numeric_cols=args.numeric_cols,
+        num_text_cols=args.text_cols,
+        null_density=args.null_density,
+        function_mix=parse_mix(args.function_mix, Function),
+        ref_type_mix=parse_mix(args.ref_type_mix, RefType),
+        windows=[int(window) for window in args.windows.split(",")],
+        window_cols=args.window_cols,
+        depth=args.depth,
+        num_formulas=args.formulas,
+        seed=args.seed,
+    )
+    written = generate(
+        workload_spec, args.table_name, args.output_folder, [f.strip() for f in args.formats.split(",")]
+    )
+    for role, written_path in written.items():
+        print(f"{role}: {written_path}")
@@ -0,0 +1,101 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import pytest
+import os
+import numpy as np
+import pandas as pd
+import psycopg2
+
+from forms.core.forms import from_db
+
+# a copy of the test table, since the tests add a column to it
+copy_table_name = "test_table_into"
+result_table_name = "test_table_results"
+
+
+def execute(statement: str):
+    connection = psycopg2.connect(
+        host=os.getenv("POSTGRES_HOST"),
+        port=int(os.getenv("POSTGRES_PORT")),
+        user=os.getenv("POSTGRES_USER"),
+        password=os.getenv("POSTGRES_PASSWORD"),
+        dbname=os.getenv("POSTGRES_DB"),
+    )
+    with connection:
+        with connection.cursor() as cursor:
+            cursor.execute(statement)
+    connection.close()
+
+
+@pytest.fixture(scope="module")
+def get_wb():
+    execute(f"DROP TABLE IF EXISTS {copy_table_name}, {result_table_name}")
+    execute(f"CREATE TABLE {copy_table_name} AS SELECT * FROM {os.getenv('POSTGRES_TEST_TABLE')}")
+    wb = from_db(
+        host=os.getenv("POSTGRES_HOST"),
+        port=int(os.getenv("POSTGRES_PORT")),
+        username=os.getenv("POSTGRES_USER"),
+        password=os.getenv("POSTGRES_PASSWORD"),
+        db_name=os.getenv("POSTGRES_DB"),
+        table_name=copy_table_name,
+        primary_key=[os.getenv("POSTGRES_PRIMARY_KEY")],
+        order_key=[os.getenv("POSTGRES_ORDER_KEY")],
+        enable_rewriting=False,
+        enable_pipelining=True,
+    )
+
+    # Yield the object to be used in tests
+    yield wb
+    # Close the DBWorkbook
+    wb.close()
+    execute(f"DROP TABLE IF EXISTS {copy_table_name}, {result_table_name}")
+
+
+def read_table(wb, table_name: str) -> pd.DataFrame:
+    return pd.read_sql_query(f"SELECT * FROM {table_name} ORDER BY a", wb.connection)
+
+
+def test_into_table(get_wb):
+    wb = get_wb
+    assert wb.compute_formula_into("=SUM(B1:C2)", "total", table_name=result_table_name) == 4
+    df = read_table(wb, result_table_name)
+    assert list(df.columns) == ["a", "total"]
+    assert np.array_equal(df.values, [[1, 9], [2, 11], [3, 13], [4, 7]])
+
+
+def test_into_new_column(get_wb):
+    wb = get_wb
+    assert wb.compute_formula_into("=A1+INDEX(D$1:D$4,A1)", "e", batch_size=1) == 4
+    df = read_table(wb, copy_table_name)
+    assert list(df.columns) == ["a", "b", "c", "d", "e"]
+    assert np.array_equal(df["e"], [3, 4, 6, np.nan], equal_nan=True)
+    # the new column is read by later formulas
+    assert wb.num_columns == 5
+    assert np.array_equal(wb.compute_formula("=E1*2").iloc[:, -1], [6, 8, 12, np.nan], equal_nan=True)
+
+
+def test_into_existing_column(get_wb):
+    wb = get_wb
+    assert wb.compute_formula_into("=B1*C1", "d", batch_size=3) == 4
+    assert np.array_equal(read_table(wb, copy_table_name)["d"], [4, 6, 8, 10])
+
+
+def test_invalid_targets(get_wb):
+    wb = get_wb
+    assert wb.compute_formula_into("=B1*C1", "a") is None
+    assert wb.compute_formula_into("=B1*C1", "total", table_name=result_table_name) is None
+    assert wb.compute_formula_into("=B1*C1", "f", batch_size=0) is None
+    assert list(read_table(wb, copy_table_name).columns) == ["a", "b", "c", "d", "e"]
+    assert np.array_equal(read_table(wb, copy_table_name)["a"], [1, 2, 3, 4])
@@ -121,6 +121,41 @@ def test_sum_if_over_rows(get_wb):
     assert np.array_equal(computed_df.values, expected_df.values, equal_nan=True)
 
 
+def test_count_if_over_rows(get_wb):
+    wb = get_wb
+    computed_df = wb.compute_formula('=COUNTIF(C1:C2,">2")')
+    expected_df = pd.DataFrame({"row_id": [1, 2, 3, 4], "A": [1, 2, 2, 1]})
+    assert np.array_equal(computed_df.values, expected_df.values, equal_nan=True)
+
+
+def test_max_if_over_columns_and_rows(get_wb):
+    wb = get_wb
+    computed_df = wb.compute_formula('=MAXIF(C1:D2,"<4")')
+    expected_df = pd.DataFrame({"row_id": [1, 2, 3, 4], "A": [3, 3, 3, 3]})
+    assert np.array_equal(computed_df.values, expected_df.values, equal_nan=True)
+
+
+def test_max_if_without_matches(get_wb):
+    wb = get_wb
+    computed_df = wb.compute_formula('=MAXIF(C1:D2,">10")')
+    expected_df = pd.DataFrame({"row_id": [1, 2, 3, 4], "A": [0, 0, 0, 0]})
+    assert np.array_equal(computed_df.values, expected_df.values, equal_nan=True)
+
+
+def test_sum_if_with_sum_range(get_wb):
+    wb = get_wb
+    computed_df = wb.compute_formula('=SUMIF(A1:A2,">=2",D1:D2)')
+    expected_df = pd.DataFrame({"row_id": [1, 2, 3, 4], "A": [2, 4, 5, 3]})
+    assert np.array_equal(computed_df.values, expected_df.values, equal_nan=True)
+
+
+def test_count_if_on_ff(get_wb):
+    wb = get_wb
+    computed_df = wb.compute_formula('=COUNTIF(C$1:C$3,"<>3")')
+    expected_df = pd.DataFrame({"row_id": [1, 2, 3, 4], "A": [2, 2, 2, 2]})
+    assert np.array_equal(computed_df.values, expected_df.values, equal_nan=True)
+
+
 # Cell-wise formulas
 def test_plus(get_wb):
     wb = get_wb
@@ -148,3 +183,17 @@ def test_if_function(get_wb):
     computed_df = wb.compute_formula("=IF(A1 < 3, B1, C1)")
     expected_df = pd.DataFrame({"row_id": [1, 2, 3, 4], "A": [2, 2, 4, 5]})
     assert np.array_equal(computed_df.values, expected_df.values, equal_nan=True)
+
+
+def test_trace_of_subtrees(get_wb):
+    wb = get_wb
+    wb.compute_formula("=A1+INDEX(D$1:D$4,A1)")
+    formula_span = wb.get_metrics()["trace"][0]
+    plus_span = formula_span["children"][1]["children"][0]
+    index_span = plus_span["children"][0]
+    assert plus_span["name"] == "PLUS" and index_span["name"] == "INDEX"
+    assert plus_span["attributes"]["output_rows"] == 4
+    assert index_span["attributes"]["output_rows"] > 0
+    assert plus_span["attributes"]["input_rows"] == index_span["attributes"]["output_rows"]
+    assert plus_span["start_time"] <= index_span["start_time"]
+    assert plus_span["wall_time"] >= index_span["wall_time"]
@@ -0,0 +1,79 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import pytest
+import os
+import numpy as np
+import pandas as pd
+import psycopg2
+
+from forms.core.forms import from_db
+
+# a copy of the test table with INTEGER columns, whose SUM is an integer unlike the SUM of BIGINT columns
+integer_table_name = "test_table_integer"
+
+
+def execute(statement: str):
+    connection = psycopg2.connect(
+        host=os.getenv("POSTGRES_HOST"),
+        port=int(os.getenv("POSTGRES_PORT")),
+        user=os.getenv("POSTGRES_USER"),
+        password=os.getenv("POSTGRES_PASSWORD"),
+        dbname=os.getenv("POSTGRES_DB"),
+    )
+    with connection:
+        with connection.cursor() as cursor:
+            cursor.execute(statement)
+    connection.close()
+
+
+@pytest.fixture(scope="module")
+def get_wb():
+    execute(f"DROP TABLE IF EXISTS {integer_table_name}")
+    execute(
+        f"CREATE TABLE {integer_table_name} AS SELECT a, b::integer AS b, c::integer AS c, "
+        f"d::integer AS d FROM {os.getenv('POSTGRES_TEST_TABLE')}"
+    )
+    wb = from_db(
+        host=os.getenv("POSTGRES_HOST"),
+        port=int(os.getenv("POSTGRES_PORT")),
+        username=os.getenv("POSTGRES_USER"),
+        password=os.getenv("POSTGRES_PASSWORD"),
+        db_name=os.getenv("POSTGRES_DB"),
+        table_name=integer_table_name,
+        primary_key=[os.getenv("POSTGRES_PRIMARY_KEY")],
+        order_key=[os.getenv("POSTGRES_ORDER_KEY")],
+        enable_rewriting=False,
+        enable_pipelining=True,
+    )
+
+    # Yield the object to be used in tests
+    yield wb
+    # Close the DBWorkbook
+    wb.close()
+    execute(f"DROP TABLE IF EXISTS {integer_table_name}")
+
+
+def test_average_if_over_columns(get_wb):
+    wb = get_wb
+    computed_df = wb.compute_formula('=AVERAGEIF(B1:C2,">1")')
+    expected_df = pd.DataFrame({"row_id": [1, 2, 3, 4], "A": [2.25, 2.75, 3.25, 3.5]})
+    assert np.array_equal(computed_df.values, expected_df.values)
+
+
+def test_average_if_over_one_column(get_wb):
+    wb = get_wb
+    computed_df = wb.compute_formula('=AVERAGEIF(C1:C2,">1")')
+    expected_df = pd.DataFrame({"row_id": [1, 2, 3, 4], "A": [2.5, 3.5, 4.5, 5]})
+    assert np.array_equal(computed_df.values, expected_df.values)
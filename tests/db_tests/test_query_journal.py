@@ -0,0 +1,98 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+import pytest
+import os
+import pandas as pd
+import numpy as np
+
+from forms.core.forms import from_db
+from forms.executor.dbexecutor.journal import JournalEntry, QueryJournal
+
+
+@pytest.fixture(scope="module")
+def get_wb():
+    wb = from_db(
+        host=os.getenv("POSTGRES_HOST"),
+        port=int(os.getenv("POSTGRES_PORT")),
+        username=os.getenv("POSTGRES_USER"),
+        password=os.getenv("POSTGRES_PASSWORD"),
+        db_name=os.getenv("POSTGRES_DB"),
+        table_name=os.getenv("POSTGRES_TEST_TABLE"),
+        primary_key=[os.getenv("POSTGRES_PRIMARY_KEY")],
+        order_key=[os.getenv("POSTGRES_ORDER_KEY")],
+        enable_rewriting=False,
+        enable_pipelining=True,
+    )
+
+    # Yield the object to be used in tests
+    yield wb
+    # Close the DBWorkbook
+    wb.close()
+
+
+def test_journal_is_bounded():
+    journal = QueryJournal(capacity=2)
+    for i in range(3):
+        journal.record(JournalEntry("=A1", "", "SUM", f"SELECT {i}", 1, 1))
+    assert [entry["sql"] for entry in journal.get_entries()] == ["SELECT 1", "SELECT 2"]
+
+
+def test_journal_records_each_statement(get_wb, tmp_path):
+    wb = get_wb
+    wb.clear_query_journal()
+    wb.compute_formula("=A1+INDEX(D$1:D$4,A1)")
+    entries = wb.get_query_journal()
+    assert len(entries) == 2
+
+    index_entry, plus_entry = entries
+    assert index_entry["function"] == "INDEX"
+    assert index_entry["sql"].startswith("CREATE TEMP TABLE")
+    assert index_entry["subtree"] != ""
+    assert index_entry["temp_table_size"] is None
+    assert plus_entry["function"] == "PLUS"
+    assert plus_entry["formula"] == "=A1+INDEX(D$1:D$4,A1)"
+    assert plus_entry["rows"] == 4
+    assert plus_entry["temp_table_size"] is None
+    assert all(entry["latency"] >= 0 and entry["explain"] is None for entry in entries)
+
+    wb.set_table_sizes_enabled(True)
+    wb.clear_query_journal()
+    wb.compute_formula("=A1+INDEX(D$1:D$4,A1)")
+    entries = wb.get_query_journal()
+    assert entries[0]["temp_table_size"] > 0 and entries[1]["temp_table_size"] is None
+    wb.set_table_sizes_enabled(False)
+
+    path = tmp_path / "journal.jsonl"
+    wb.dump_query_journal(str(path))
+    with open(path) as f:
+        assert [json.loads(line) for line in f] == entries
+
+
+def test_journal_with_explain(get_wb):
+    wb = get_wb
+    wb.clear_query_journal()
+    wb.set_explain_enabled(True)
+    try:
+        computed_df = wb.compute_formula("=SUM(A1:B2)+INDEX(D$1:D$4,A1)")
+    finally:
+        wb.set_explain_enabled(False)
+    expected_df = pd.DataFrame({"row_id": [1, 2, 3, 4], "A": [9, 11, 14, np.nan]})
+    assert np.array_equal(computed_df.values, expected_df.values, equal_nan=True)
+    entries = wb.get_query_journal()
+    assert len(entries) == 2
+    for entry in entries:
+        assert "Plan" in entry["explain"][0]
+        assert entry["rows"] == entry["explain"][0]["Plan"]["Actual Rows"] or entry["subtree"] == ""
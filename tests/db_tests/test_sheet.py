@@ -0,0 +1,54 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import pytest
+import os
+import numpy as np
+
+from forms.core.forms import from_db
+from forms.core.sheet import Sheet
+
+
+@pytest.fixture(scope="module")
+def get_wb():
+    wb = from_db(
+        host=os.getenv("POSTGRES_HOST"),
+        port=int(os.getenv("POSTGRES_PORT")),
+        username=os.getenv("POSTGRES_USER"),
+        password=os.getenv("POSTGRES_PASSWORD"),
+        db_name=os.getenv("POSTGRES_DB"),
+        table_name=os.getenv("POSTGRES_TEST_TABLE"),
+        primary_key=[os.getenv("POSTGRES_PRIMARY_KEY")],
+        order_key=[os.getenv("POSTGRES_ORDER_KEY")],
+        enable_rewriting=False,
+        enable_pipelining=True,
+    )
+
+    # Yield the object to be used in tests
+    yield wb
+    # Close the DBWorkbook
+    wb.close()
+
+
+def test_chained_columns(get_wb):
+    sheet = Sheet(get_wb)
+    assert sheet.add_column("e", "=A1+B1") == "E"
+    assert sheet.add_column("f", "=SUM(E1:E2)") == "F"
+    assert sheet.add_column("g", "=F1*C1") == "G"
+    sheet.compute(["g"])
+    computed = sheet.get_values()
+    assert computed["e"].isna().all() and computed["f"].isna().all()
+    assert np.allclose(computed["g"], [14, 27, 44, 30])
+    # the results are part of the workbook's table
+    assert np.allclose(get_wb.compute_formula("=G1+1").iloc[:, -1], [15, 28, 45, 31])
@@ -0,0 +1,50 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import re
+
+from forms.utils.criteria import CriteriaOperandType, parse_criteria, wildcard_to_regex
+
+
+def evaluate_criteria(literal, expected_operator, expected_operand, expected_operand_type):
+    criteria = parse_criteria(literal)
+    assert criteria.operator == expected_operator
+    assert criteria.operand == expected_operand
+    assert criteria.operand_type == expected_operand_type
+
+
+def test_parse_numeric_criteria():
+    evaluate_criteria('">50"', ">", 50.0, CriteriaOperandType.NUMBER)
+    evaluate_criteria('"<=-1.5"', "<=", -1.5, CriteriaOperandType.NUMBER)
+    evaluate_criteria('"<>0"', "<>", 0.0, CriteriaOperandType.NUMBER)
+    evaluate_criteria(3.0, "=", 3.0, CriteriaOperandType.NUMBER)
+
+
+def test_parse_text_and_blank_criteria():
+    evaluate_criteria('"Apple"', "=", "apple", CriteriaOperandType.TEXT)
+    evaluate_criteria('">b"', ">", "b", CriteriaOperandType.TEXT)
+    evaluate_criteria('"inf"', "=", "inf", CriteriaOperandType.TEXT)
+    evaluate_criteria('""', "=", "", CriteriaOperandType.BLANK)
+    evaluate_criteria('"="', "=", "", CriteriaOperandType.BLANK)
+    evaluate_criteria('"<>"', "<>", "", CriteriaOperandType.BLANK)
+    evaluate_criteria('"TRUE"', "=", True, CriteriaOperandType.LOGICAL)
+
+
+def test_parse_wildcard_criteria():
+    evaluate_criteria('"a*"', "=", "a*", CriteriaOperandType.PATTERN)
+    evaluate_criteria('"<>?b"', "<>", "?b", CriteriaOperandType.PATTERN)
+    evaluate_criteria('"a~*"', "=", "a*", CriteriaOperandType.TEXT)
+    assert re.fullmatch(wildcard_to_regex("a?c*"), "abcde")
+    assert re.fullmatch(wildcard_to_regex("a~?c"), "a?c")
+    assert not re.fullmatch(wildcard_to_regex("a~?c"), "abc")
@@ -0,0 +1,95 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import pandas as pd
+import numpy as np
+
+from forms.core.forms import from_df
+from forms.executor.dfexecutor.dftable import DFTable
+
+df = pd.DataFrame(
+    {
+        "col1": [3.0, np.nan, 1.0, 2.0, 1.0],
+        "col2": ["b", "a", None, "b", "c"],
+    }
+)
+
+
+def test_column_caches():
+    table = DFTable(df)
+    assert np.array_equal(table.get_prefix_sum(0), [0, 3, 3, 4, 6, 7])
+    assert np.array_equal(table.get_prefix_count(1), [0, 1, 2, 2, 3, 4])
+    assert np.array_equal(table.get_float_values(0), [3.0, np.nan, 1.0, 2.0, 1.0], equal_nan=True)
+
+
+def test_column_caches_are_reused_until_invalidated():
+    table = DFTable(df.copy())
+    prefix = table.get_prefix_sum(0)
+    assert table.get_prefix_sum(0) is prefix
+
+    table.set_table_content(pd.DataFrame({"col1": [1.0, 1.0]}))
+    assert table.version == 1
+    assert np.array_equal(table.get_prefix_sum(0), [0, 1, 2])
+
+
+def test_workbook_data_change_invalidates_caches():
+    wb = from_df(pd.DataFrame(np.ones((10, 2))))
+    computed_df = wb.compute_formula("=SUM(A1:B2)")
+    assert np.array_equal(computed_df.values[:9, 0], np.full(9, 4.0))
+
+    wb.df = pd.DataFrame(np.full((10, 2), 2.0))
+    computed_df = wb.compute_formula("=SUM(A1:B2)")
+    assert np.array_equal(computed_df.values[:9, 0], np.full(9, 8.0))
+
+    wb.df.iloc[0, 0] = 10.0
+    wb.invalidate_caches()
+    computed_df = wb.compute_formula("=SUM(A1:B2)")
+    assert computed_df.values[0, 0] == 16.0
+    wb.close()
+
+
+def test_workbook_in_place_change_rebuilds_caches():
+    wb = from_df(pd.DataFrame({"a": np.arange(10), "b": np.ones(10)}))
+    assert wb.compute_formula("=SUM(A1:A2)").values[0, 0] == 1
+    assert wb.compute_formula("=COUNT(B1:B3)").values[4, 0] == 3
+    assert wb.compute_formula('=SUMIF(A1:A3, ">0", B1:B3)').values[0, 0] == 2
+
+    # no invalidate_caches call: the edits are found by the next formula
+    wb.df.iloc[0, 0] = 100
+    wb.df.iloc[5, 1] = np.nan
+    assert wb.compute_formula("=SUM(A1:A2)").values[0, 0] == 101
+    assert wb.compute_formula("=COUNT(B1:B3)").values[4, 0] == 2
+    assert wb.compute_formula('=SUMIF(A1:A3, ">0", B1:B3)').values[0, 0] == 3
+    wb.close()
+
+
+def test_windowed_sum_and_count_with_nulls():
+    values = pd.DataFrame({"a": [1.0, np.nan, 3.0, 4.0, np.nan, 6.0], "b": [1.0] * 6})
+    wb = from_df(values)
+    computed_df = wb.compute_formula("=SUM(A1:B2)")
+    expected = values.sum(axis=1).rolling(2).sum().shift(-1)
+    assert np.allclose(computed_df.values[:, 0], expected.values, equal_nan=True)
+
+    computed_df = wb.compute_formula("=COUNT(A$1:A2)")
+    assert np.array_equal(computed_df.values[:, 0], [1, 2, 3, 3, 4, np.nan], equal_nan=True)
+
+    computed_df = wb.compute_formula("=SUM(A1:A$6)")
+    assert np.array_equal(computed_df.values[:, 0], [14, 13, 13, 10, 6, 6])
+    wb.close()
+
+
+def test_tables_have_distinct_tokens():
+    # cache keys name other tables by token, which, unlike an object id, is never reused
+    tokens = {DFTable(df).token for _ in range(3)}
+    assert len(tokens) == 3
@@ -0,0 +1,128 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from psycopg2 import sql
+
+from forms.core.forms import from_df, DuckDBWorkbook
+from forms.executor.dbexecutor.dialect import render_composable
+from forms.utils.exceptions import FormSException
+
+duckdb = pytest.importorskip("duckdb")
+
+test_df = pd.DataFrame(
+    {
+        "a": [1, 2, 3, 4],
+        "b": [2, 2, 2, 2],
+        "c": [2, 3, 4, 5],
+        "d": [3, 2, 2, 3],
+        "e": ["x", "y", "x", "zz"],
+    }
+)
+
+
+@pytest.fixture(scope="module", params=[True, False], ids=["pipelining", "no_pipelining"])
+def get_wb(request):
+    wb = from_df(test_df, backend="duckdb", enable_pipelining=request.param)
+    yield wb
+    wb.close()
+
+
+def assert_values(computed_df: pd.DataFrame, expected_values: list):
+    assert list(computed_df.iloc[:, 0]) == [1, 2, 3, 4]
+    computed_values = computed_df.iloc[:, 1].astype(float).values
+    assert np.allclose(computed_values, np.array(expected_values, dtype=float), equal_nan=True)
+
+
+def test_from_df_backend():
+    wb = from_df(test_df, backend="duckdb")
+    assert isinstance(wb, DuckDBWorkbook)
+    wb.close()
+    with pytest.raises(FormSException):
+        from_df(test_df, backend="sqlite")
+    with pytest.raises(FormSException):
+        from_df(test_df, backend="duckdb", memory_tracking="sizes")
+
+
+def test_arithmetic(get_wb):
+    assert_values(get_wb.compute_formula("=A1-B1+C2"), [2, 4, 6, np.nan])
+
+
+def test_relative_window(get_wb):
+    assert_values(get_wb.compute_formula("=SUM(A1:B2)"), [7, 9, 11, 6])
+
+
+def test_fixed_start_and_end(get_wb):
+    assert_values(get_wb.compute_formula("=SUM(A$1:A2)"), [3, 6, 10, 10])
+    assert_values(get_wb.compute_formula("=MAX(C1:D$4)"), [5, 5, 5, 5])
+
+
+def test_nested_aggregates(get_wb):
+    assert_values(get_wb.compute_formula("=SUM(A1:A2)+MIN(C1:D1)"), [5, 7, 9, 7])
+
+
+def test_criteria(get_wb):
+    assert_values(get_wb.compute_formula('=SUMIF(A1:A2,">2")'), [np.nan, 3, 7, 4])
+    assert_values(get_wb.compute_formula('=COUNTIF(E1:E2,"x")'), [1, 1, 1, 0])
+
+
+def test_extreme_if_without_matches(get_wb):
+    # 0, as on the DF executor, where windows are complete
+    assert_values(get_wb.compute_formula('=MAXIF(C1:D2,">10")'), [0, 0, 0, 0])
+    assert_values(get_wb.compute_formula('=MINIF(C$1:D$2,">10")'), [0, 0, 0, 0])
+    df_wb = from_df(test_df)
+    assert list(df_wb.compute_formula('=MAXIF(C1:D2,">10")').iloc[:3, 0]) == [0, 0, 0]
+    assert list(df_wb.compute_formula('=MINIF(C$1:D$2,">10")').iloc[:, 0]) == [0, 0, 0, 0]
+    df_wb.close()
+
+
+def test_conditional(get_wb):
+    assert_values(get_wb.compute_formula("=IF(A1>B1,C1,D1)"), [3, 2, 4, 5])
+
+
+def test_exact_lookup(get_wb):
+    assert_values(get_wb.compute_formula("=LOOKUP(A1,$C$1:$C$4,$D$1:$D$4,0)"), [np.nan, 3, 2, 2])
+
+
+def test_intermediate_tables_are_dropped():
+    wb = from_df(test_df, backend="duckdb", enable_pipelining=False)
+    assert_values(wb.compute_formula("=SUM(A1:A2)+MIN(C1:D1)"), [5, 7, 9, 7])
+    tables = wb.connection.execute("SELECT table_name FROM information_schema.tables").fetchall()
+    assert sorted(table for (table,) in tables) == ["FormS_I", "FormS_T"]
+    wb.close()
+
+
+def test_row_ids_follow_dataframe_order():
+    num_rows = 100000
+    df = pd.DataFrame({"a": np.arange(num_rows)[::-1]})
+    wb = from_df(df, backend="duckdb", threads=4)
+    computed_df = wb.compute_formula("=A1*1")
+    assert np.array_equal(computed_df.iloc[:, 1].values, df["a"].values)
+    wb.close()
+
+
+def test_render_composable():
+    composable = sql.SQL("SELECT {col} FROM {table} WHERE {col} = {value} AND {flag}").format(
+        col=sql.Identifier('we"ird'),
+        table=sql.Identifier("FormS_T"),
+        value=sql.Literal("it's"),
+        flag=sql.Literal(True),
+    )
+    assert (
+        render_composable(composable)
+        == """SELECT "we""ird" FROM "FormS_T" WHERE "we""ird" = 'it''s' AND TRUE"""
+    )
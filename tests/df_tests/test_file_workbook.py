@@ -0,0 +1,125 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import pytest
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from forms.core.forms import from_arrow_ipc, from_df, from_parquet
+from forms.utils.metrics import TOTAL_TIME
+
+num_rows = 150
+rng = np.random.default_rng(0)
+test_df = pd.DataFrame(
+    {
+        "a": rng.random(num_rows) * 10,
+        "b": rng.integers(0, 10, num_rows),
+        "c": rng.random(num_rows),
+        # never referenced, so it is never converted
+        "d": [f"row {i}" for i in range(num_rows)],
+    }
+)
+test_df.loc[[3, 70], "c"] = np.nan
+formulas = [
+    "=SUM(A$1:A1)",
+    "=AVERAGE(A1:A5)",
+    "=SUM(A1:B3)",
+    "=COUNT(A$1:C2, 1)",
+    "=MAX(A1:B4)-MIN(C$1:C2)",
+    "=MEDIAN(A1:B3)",
+    "=SUM($A$1:$A$10)+A1*B2",
+    "=SQRT(A1)/(B1+1)",
+    "=SUM(A1:B$90)",
+    "=COUNT(C3:C$120)+A1",
+    "=MAX(A1:A3, 2)",
+]
+
+
+@pytest.fixture(params=["parquet", "arrow"])
+def file_wb(request, tmp_path):
+    path = str(tmp_path / f"table.{request.param}")
+    table = pa.Table.from_pandas(test_df, preserve_index=False)
+    if request.param == "parquet":
+        pq.write_table(table, path, row_group_size=40)
+        wb = from_parquet(path, chunk_size=17)
+    else:
+        feather.write_feather(table, path, chunksize=40)
+        wb = from_arrow_ipc(path, chunk_size=17)
+    yield wb
+    wb.close()
+
+
+def test_same_as_df(file_wb):
+    df_wb = from_df(test_df.iloc[:, :3])
+    for formula_str in formulas:
+        expected = df_wb.compute_formula(formula_str).iloc[:, 0].to_numpy(dtype=np.float64)
+        computed = file_wb.compute_formula(formula_str).iloc[:, 0].to_numpy()
+        assert computed.size == num_rows, formula_str
+        assert np.allclose(computed, expected, equal_nan=True), formula_str
+    df_wb.close()
+
+
+@pytest.mark.parametrize(
+    "formula_str, expected",
+    [
+        ("=SUM(A2:A3)", [2, 2, 1, 2, np.nan, np.nan]),
+        ("=SUM(A1:B2)", [1e17, 4, 6, 10, 13, np.nan]),
+        ("=COUNT(A$1:B1)", [2, 4, 5, 7, 8, 10]),
+        ("=MAX(A1:B2)", [1e17, 2, 4, 5, 6, np.nan]),
+        ("=MEDIAN(A2:B3)", [1, 1, 4, 5, np.nan, np.nan]),
+        # as in the DF executor, a null in a fixed range makes its SUM null and is counted by COUNT
+        ("=SUM(B$2:B$4)+A2", [np.nan] * 6),
+        ("=COUNT(B$2:B$4)+B1", [4, 5, np.nan, 7, 8, 9]),
+    ],
+)
+def test_hand_computed_values(formula_str, expected, tmp_path):
+    # two rows per chunk, so that windows span chunks
+    path = str(tmp_path / "small.parquet")
+    df = pd.DataFrame({"a": [1e17, 1, 1, 1, np.nan, 2], "b": [1, 2, np.nan, 4, 5, 6]})
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path, row_group_size=3)
+    wb = from_parquet(path, chunk_size=2)
+    computed = wb.compute_formula(formula_str).iloc[:, 0].to_numpy(dtype=np.float64)
+    wb.close()
+    assert np.array_equal(computed, expected, equal_nan=True)
+
+
+def test_metrics(file_wb):
+    file_wb.compute_formula("=SUM(A1:A5)")
+    # times are in whole microseconds, as for the other backends
+    assert isinstance(file_wb.get_metrics()[TOTAL_TIME], int)
+    assert file_wb.get_trace()[0].attributes["backend"] == "file"
+
+
+def test_compute_formula_into(file_wb, tmp_path):
+    expected = file_wb.compute_formula("=AVERAGE(A1:A5)").iloc[:, 0].to_numpy()
+    path = str(tmp_path / "results.parquet")
+    assert file_wb.compute_formula_into("=AVERAGE(A1:A5)", path) == num_rows
+    assert np.allclose(pq.read_table(path).column(0).to_numpy(), expected, equal_nan=True)
+
+    path = str(tmp_path / "results.arrow")
+    assert file_wb.compute_formula_into("=AVERAGE(A1:A5)", path, num_formulas=30) == 30
+    assert np.allclose(feather.read_table(path).column(0).to_numpy(), expected[:30])
+    assert not os.path.exists(f"{path}.tmp")
+
+
+def test_unsupported_formulas(file_wb, tmp_path):
+    path = str(tmp_path / "results.parquet")
+    assert file_wb.compute_formula("=SUM(A1:A2)+D1") is None
+    assert file_wb.compute_formula("=SUM(A1:A$200)") is None
+    assert file_wb.compute_formula_into('=SUMIF(A1:A3, ">2", B1:B3)', path) is None
+    assert not os.path.exists(path) and not os.path.exists(f"{path}.tmp")
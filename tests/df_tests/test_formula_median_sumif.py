@@ -93,3 +93,65 @@ def test_compute_sumif_fr():
     computed_df = local_wb.compute_formula('=SUMIF(A$1:C3, ">=1")')
     expected_df = pd.DataFrame(np.arange(9, 303, 3))
     assert np.array_equal(computed_df.iloc[0:98].values, expected_df.values)
+
+
+mixed_df = pd.DataFrame(
+    {
+        "A": ["apple", "Banana", None, "apricot", "", "cherry", "APPLE", "berry"],
+        "B": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0],
+        "C": [5.0, np.nan, 15.0, 20.0, 25.0, 30.0, np.nan, 40.0],
+    }
+)
+mixed_wb = from_df(mixed_df)
+
+
+def test_compute_countif_text_and_wildcards():
+    computed_df = mixed_wb.compute_formula('=COUNTIF(A$1:A$8, "ap*")')
+    assert np.array_equal(computed_df.values, np.full((8, 1), 3))
+    computed_df = mixed_wb.compute_formula('=COUNTIF(A$1:A$8, "?erry")')
+    assert np.array_equal(computed_df.values, np.full((8, 1), 1))
+    computed_df = mixed_wb.compute_formula('=COUNTIF(A$1:A$8, "")')
+    assert np.array_equal(computed_df.values, np.full((8, 1), 2))
+    computed_df = mixed_wb.compute_formula('=COUNTIF(A$1:A$8, "<>")')
+    assert np.array_equal(computed_df.values, np.full((8, 1), 6))
+
+
+def test_compute_sumif_with_sum_range_rr():
+    computed_df = mixed_wb.compute_formula('=SUMIF(A1:A2, "apple", B1:B2)')
+    expected = [1, 0, 0, 0, 0, 7, 7, np.nan]
+    assert np.array_equal(computed_df.values[:, 0], expected, equal_nan=True)
+
+
+def test_compute_countif_rr():
+    computed_df = mixed_wb.compute_formula('=COUNTIF(C1:C3, ">=15")')
+    expected = [1, 2, 3, 3, 2, 2, np.nan, np.nan]
+    assert np.array_equal(computed_df.values[:, 0], expected, equal_nan=True)
+
+
+def test_compute_averageif_fr():
+    computed_df = mixed_wb.compute_formula('=AVERAGEIF(B$1:B1, ">2", C$1:C1)')
+    expected = [np.nan, np.nan, 15, 17.5, 20, 22.5, 22.5, 26]
+    assert np.array_equal(computed_df.values[:, 0], expected, equal_nan=True)
+
+
+def test_compute_maxif_minif():
+    computed_df = mixed_wb.compute_formula('=MAXIF(C1:C2, "<20")')
+    expected = [5, 15, 15, 0, 0, 0, 0, np.nan]
+    assert np.array_equal(computed_df.values[:, 0], expected, equal_nan=True)
+    computed_df = mixed_wb.compute_formula('=MINIF(C1:C$8, ">10")')
+    expected = [15, 15, 15, 20, 25, 30, 40, 40]
+    assert np.array_equal(computed_df.values[:, 0], expected, equal_nan=True)
+    computed_df = mixed_wb.compute_formula('=MAXIF(A$1:A$8, "b*", B$1:B$8)')
+    assert np.array_equal(computed_df.values, np.full((8, 1), 8))
+
+
+def test_compute_sumif_mixed_magnitudes():
+    # a large matching value must not absorb the small values of the windows after it
+    local_wb = from_df(pd.DataFrame({"A": [1e17, 1, 1, 1, 1, 1], "B": [1] * 6}))
+    computed_df = local_wb.compute_formula('=SUMIF(B2:B3, ">0", A2:A3)')
+    assert np.array_equal(computed_df.values[:, 0], [2, 2, 2, 2, np.nan, np.nan], equal_nan=True)
+    computed_df = local_wb.compute_formula('=AVERAGEIF(B2:B3, ">0", A2:A3)')
+    assert np.array_equal(computed_df.values[:, 0], [1, 1, 1, 1, np.nan, np.nan], equal_nan=True)
+    computed_df = local_wb.compute_formula('=SUMIF(A2:A$6, "<10")')
+    assert np.array_equal(computed_df.values[:, 0], [5, 4, 3, 2, 1, np.nan], equal_nan=True)
+    local_wb.close()
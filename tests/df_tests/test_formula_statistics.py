@@ -77,9 +77,39 @@ def test_compute_min():
     assert np.array_equal(computed_df.values, expected_df.values, equal_nan=True)
 
 
+def test_compute_max_min_null_arguments():
+    # null arguments are skipped as null cells of a range are; incomplete windows are still null
+    local_wb = from_df(pd.DataFrame({"A": [1.0, np.nan, 3, 4], "B": [2.0, 5, np.nan, 1]}))
+    computed_df = local_wb.compute_formula("=MAX(A1, B1)")
+    assert np.array_equal(computed_df.values[:, 0], [2, 5, 3, 4])
+    computed_df = local_wb.compute_formula("=MAX(B2, A1)")
+    assert np.array_equal(computed_df.values[:, 0], [5, np.nan, 3, np.nan], equal_nan=True)
+    computed_df = local_wb.compute_formula("=MIN(A1, B1, 0)")
+    assert np.array_equal(computed_df.values[:, 0], [0, 0, 0, 0])
+    computed_df = local_wb.compute_formula("=MAX(A1:A2, B1)")
+    assert np.array_equal(computed_df.values[:, 0], [2, 5, 4, np.nan], equal_nan=True)
+    computed_df = local_wb.compute_formula("=MIN(A1:A$4, B2)")
+    assert np.array_equal(computed_df.values[:, 0], [1, 3, 1, np.nan], equal_nan=True)
+    local_wb.close()
+
+
 def test_compute_count():
     global wb
     computed_df = wb.compute_formula("=COUNT(A1:B3,B1:B2)")
     expected_df = pd.DataFrame(np.full(100, 8))
     expected_df.iloc[98:100, 0] = np.nan
     assert np.array_equal(computed_df.values, expected_df.values, equal_nan=True)
+
+
+def test_compute_sum_mixed_magnitudes():
+    # a large value must not absorb the small values of the windows after it
+    local_wb = from_df(pd.DataFrame({"A": [1e17, 1, 1, 1, 1, 1], "B": [1, 2, 3, 4, 5, 6]}))
+    computed_df = local_wb.compute_formula("=SUM(A2:A3)")
+    assert np.array_equal(computed_df.values[:, 0], [2, 2, 2, 2, np.nan, np.nan], equal_nan=True)
+    computed_df = local_wb.compute_formula("=SUM(A2:B$6)")
+    assert np.array_equal(computed_df.values[:, 0], [25, 22, 18, 13, 7, np.nan], equal_nan=True)
+    computed_df = local_wb.compute_formula("=AVERAGE(A2:A3)")
+    assert np.array_equal(computed_df.values[:, 0], [1, 1, 1, 1, np.nan, np.nan], equal_nan=True)
+    computed_df = local_wb.compute_formula("=SUM(B1:B2)")
+    assert np.array_equal(computed_df.values[:, 0], [3, 5, 7, 9, 11, np.nan], equal_nan=True)
+    local_wb.close()
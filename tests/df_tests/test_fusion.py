@@ -0,0 +1,140 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from forms.core.config import DFExecContext
+from forms.core.forms import from_df, compile_formula_str
+from forms.executor.dfexecutor.dfexecnode import from_plan_to_execution_tree
+from forms.executor.dfexecutor.dftable import DFTable
+from forms.executor.dfexecutor.fusion import DFFusedExecNode, fuse_element_wise
+from forms.utils.functions import FunctionExecutor
+from forms.utils.metrics import MetricsTracker
+from forms.utils.reference import DEFAULT_AXIS
+
+num_rows = 40
+rng = np.random.default_rng(0)
+test_df = pd.DataFrame(
+    {
+        "col1": rng.random(num_rows) * 10 + 1,
+        "col2": rng.integers(1, 10, num_rows),
+        "col3": rng.random(num_rows),
+        "col4": rng.integers(0, 5, num_rows),
+        "col5": rng.choice(["a", "b"], num_rows),
+    }
+)
+
+fused_wb = None
+unfused_wb = None
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_workbooks():
+    global fused_wb, unfused_wb
+    fused_wb = from_df(test_df)
+    unfused_wb = from_df(test_df, enable_fusion=False)
+    yield
+    fused_wb.close()
+    unfused_wb.close()
+
+
+def fuse(formula_str: str):
+    root = compile_formula_str(
+        formula_str, FunctionExecutor.DF_EXECUTOR, num_rows, test_df.shape[1], MetricsTracker()
+    )
+    exec_tree = from_plan_to_execution_tree(root, DFTable(test_df))
+    exec_tree.set_exec_context(DFExecContext(0, num_rows, DEFAULT_AXIS))
+    return fuse_element_wise(exec_tree)
+
+
+@pytest.mark.parametrize(
+    "formula_str",
+    [
+        "=A1+B1",
+        "=A1-B2*C1",
+        "=(A1*B1+C1)/D1-SQRT(A1)",
+        "=EXP(C1)+LN(B1)-ABS(A2-B3)",
+        "=A1*$B$1+2",
+        "=SUM(A1:B3)+A1*B1",
+        "=SUM(A1:B3)*ABS(MAX(A1,B$2)-3)",
+        '=COUNTIF(E1:E3, "a")/B1',
+        "=INT(A1)",
+        "=INT(A1*C1)+B1",
+        "=INT(B1)*D1",
+    ],
+)
+def test_same_as_unfused(formula_str):
+    assert isinstance(fuse(formula_str), DFFusedExecNode)
+    expected = unfused_wb.compute_formula(formula_str).iloc[:, 0]
+    computed = fused_wb.compute_formula(formula_str).iloc[:, 0]
+    assert computed.dtype == expected.dtype
+    assert np.allclose(computed, expected, equal_nan=True)
+
+
+@pytest.mark.parametrize("enable_fusion", [True, False])
+@pytest.mark.parametrize(
+    "formula_str, expected",
+    [
+        ("=A1+(B1*C1)", [1e17, np.nan, 2, np.nan, 5]),
+        ("=(A2-B2)/C2", [np.nan, -np.inf, np.nan, 1.75, np.nan]),
+        ("=SUM(A2:B3)+(A2*C1)", [8, 15, np.nan, np.nan, np.nan]),
+        ("=SQRT(C1)*B1", [np.sqrt(2), np.nan, 0, 2, np.sqrt(2) / 2]),
+        ("=MAX(A2,B2)*C1", [2, 12, 0, 4, np.nan]),
+        # as in the pandas executor, a null in a fixed range makes its SUM null and is counted by COUNT
+        ("=SUM(B$1:B$3)+C1", [np.nan] * 5),
+        ("=COUNT(A$1:A$5)-C1", [3, 1, 5, 4, 3]),
+    ],
+)
+def test_hand_computed_values(formula_str, expected, enable_fusion):
+    df = pd.DataFrame(
+        {
+            "a": [1e17, 1.0, 2.0, np.nan, 4.0],
+            "b": [1.0, np.nan, 3.0, 2.0, 0.5],
+            "c": [2, 4, 0, 1, 2],
+        }
+    )
+    wb = from_df(df, enable_fusion=enable_fusion)
+    computed = wb.compute_formula(formula_str).iloc[:, 0].to_numpy(dtype=np.float64)
+    wb.close()
+    assert np.allclose(computed, expected, rtol=0, atol=1e-12, equal_nan=True)
+
+
+def test_inputs_and_buffers():
+    fused_node = fuse("=SUM(A1:B3)+((A1*B1)+(C1*D1))-(A2*B2)")
+    assert [child.__class__.__name__ for child in fused_node.children] == ["DFFuncExecNode"] + [
+        "DFRefExecNode"
+    ] * 6
+    # six steps, but the intermediate values only ever occupy two buffers
+    assert len(fused_node.expression.steps) == 6
+    assert fused_node.expression.num_buffers == 2
+
+
+@pytest.mark.parametrize("formula_str", ["=E1+1", "=SUM($A$1:$A$3)*2", "=LEN(E1)+1"])
+def test_not_fused(formula_str):
+    assert not isinstance(fuse(formula_str), DFFusedExecNode)
+
+
+def test_fusion_inside_other_functions():
+    fused_node = fuse("=SUM(A1:B3)+(LEN(E1)*(A1+B1))").children[1].children[1]
+    assert isinstance(fused_node, DFFusedExecNode)
+
+
+def test_errors_yield_nan():
+    df = pd.DataFrame({"a": [4.0, -1.0, 0.0]})
+    wb = from_df(df)
+    computed = wb.compute_formula("=SQRT(A1)/A1").iloc[:, 0]
+    assert np.allclose(computed, [0.5, np.nan, np.nan], equal_nan=True)
+    wb.close()
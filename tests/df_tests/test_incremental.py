@@ -0,0 +1,169 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from forms.core.forms import from_df
+from forms.executor.dfexecutor.incremental import get_affected_bounds, merge_ranges
+from forms.core.config import DFExecContext
+from forms.utils.exceptions import FormSException
+from forms.utils.reference import DEFAULT_AXIS, Ref, RefType
+
+num_rows = 50
+formulas = [
+    "=SUM(A1:B3)",
+    "=COUNT(A$1:A2)",
+    "=SUM(B2:C$50)",
+    "=SUM($A$1:$A$10)+A1",
+    "=MAX(A1:A4)*B1",
+    '=SUMIF(C1:C3, ">2", A1:A3)',
+    "=AVERAGE(A$1:B2)-MIN(B1:C3)",
+    "=(A1*B1+C1)/2",
+]
+
+
+def create_df() -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        {
+            "a": rng.random(num_rows) * 10,
+            "b": rng.integers(0, 10, num_rows).astype(float),
+            "c": rng.integers(0, 5, num_rows),
+        }
+    )
+
+
+def assert_up_to_date(wb, df: pd.DataFrame):
+    fresh_wb = from_df(df.copy())
+    for formula_str in formulas:
+        expected = fresh_wb.compute_formula(formula_str).iloc[:, 0].astype(float)
+        computed = wb.get_result(formula_str).iloc[:, 0].astype(float)
+        assert np.allclose(computed, expected, equal_nan=True), formula_str
+    fresh_wb.close()
+
+
+@pytest.fixture
+def maintained_wb():
+    wb = from_df(create_df())
+    for formula_str in formulas:
+        wb.compute_formula(formula_str, maintain=True)
+    yield wb
+    wb.close()
+
+
+def test_single_edits(maintained_wb):
+    maintained_wb.set_values(5, 0, 100.0)
+    assert_up_to_date(maintained_wb, maintained_wb.df)
+    maintained_wb.set_values(0, 1, np.nan)
+    maintained_wb.set_values(num_rows - 1, 2, 4)
+    assert_up_to_date(maintained_wb, maintained_wb.df)
+
+
+def test_batch_edits(maintained_wb):
+    rng = np.random.default_rng(1)
+    for _ in range(5):
+        rows = rng.choice(num_rows, 8, replace=False)
+        maintained_wb.set_values(rows, [0, 1], rng.random((8, 2)) * 20)
+        assert_up_to_date(maintained_wb, maintained_wb.df)
+
+
+def test_dtype_changes(maintained_wb):
+    maintained_wb.set_values([3, 4], 2, [1.5, 2.5])
+    assert maintained_wb.df["c"].dtype == np.float64
+    assert_up_to_date(maintained_wb, maintained_wb.df)
+
+
+def test_replaced_table(maintained_wb):
+    df = create_df() * 2
+    maintained_wb.df = df
+    assert_up_to_date(maintained_wb, df)
+
+
+def test_hand_computed_results():
+    wb = from_df(pd.DataFrame({"a": [1.0, 2, 3, 4, 5], "b": [1.0] * 5, "c": [0, 3, 1, 4, 2]}))
+    small_formulas = [
+        "=SUM(A1:B2)",
+        "=SUM($A$1:$A$3)+A1",
+        "=MAX(A1:A2)*B1",
+        '=SUMIF(C1:C2, ">2", A1:A2)',
+        "=COUNT(A$1:A2)",
+    ]
+    for formula_str in small_formulas:
+        wb.compute_formula(formula_str, maintain=True)
+
+    def assert_results(*expected_results):
+        for formula_str, expected in zip(small_formulas, expected_results):
+            computed = wb.get_result(formula_str).iloc[:, 0].to_numpy(dtype=np.float64)
+            assert np.array_equal(computed, expected, equal_nan=True), formula_str
+
+    wb.set_values(1, 0, 1e17)
+    assert_results(
+        [1e17, 1e17, 9, 11, np.nan],
+        [1e17, 2e17, 1e17, 1e17, 1e17],
+        [1e17, 1e17, 4, 5, np.nan],
+        [1e17, 1e17, 4, 4, np.nan],
+        [2, 3, 4, 5, np.nan],
+    )
+    # the large value must leave no trace once it is overwritten
+    wb.set_values(1, 0, 2.0)
+    assert_results(
+        [5, 7, 9, 11, np.nan],
+        [7, 8, 9, 10, 11],
+        [2, 3, 4, 5, np.nan],
+        [2, 2, 4, 4, np.nan],
+        [2, 3, 4, 5, np.nan],
+    )
+    # as in the pandas executor, a null in a fixed range makes its SUM null
+    wb.set_values(2, 0, np.nan)
+    assert_results(
+        [5, 4, 6, 11, np.nan],
+        [np.nan] * 5,
+        [2, 2, 4, 5, np.nan],
+        [2, 2, 4, 4, np.nan],
+        [2, 2, 3, 4, np.nan],
+    )
+    # integer windows are patched with the deltas of the edited cells
+    wb.compute_formula("=SUM(C1:C2)", maintain=True)
+    wb.set_values([0, 3], 2, [5, 10])
+    computed = wb.get_result("=SUM(C1:C2)").iloc[:, 0].to_numpy(dtype=np.float64)
+    assert np.array_equal(computed, [8, 4, 11, 12, np.nan], equal_nan=True)
+    wb.close()
+
+
+def test_invalid_edits(maintained_wb):
+    with pytest.raises(FormSException):
+        maintained_wb.set_values(num_rows, 0, 1.0)
+    with pytest.raises(FormSException):
+        maintained_wb.set_values([1, 1], 0, 1.0)
+    with pytest.raises(FormSException):
+        maintained_wb.get_result("=SUM(A1:A5)")
+    maintained_wb.release_formula(formulas[0])
+    with pytest.raises(FormSException):
+        maintained_wb.get_result(formulas[0])
+
+
+def test_affected_bounds():
+    ref = Ref(2, 0, 4, 0)
+    rows = np.array([0, 3, 10])
+    exec_context = DFExecContext(0, 8, DEFAULT_AXIS)
+    starts, ends = get_affected_bounds(ref, RefType.RR, rows, exec_context)
+    assert merge_ranges(starts, ends) == [(0, 2), (6, 8)]
+    starts, ends = get_affected_bounds(ref, RefType.FR, rows, exec_context)
+    assert merge_ranges(starts, ends) == [(0, 8)]
+    starts, ends = get_affected_bounds(ref, RefType.RF, rows, exec_context)
+    assert merge_ranges(starts, ends) == [(0, 2)]
+    starts, ends = get_affected_bounds(ref, RefType.FF, rows, exec_context)
+    assert merge_ranges(starts, ends) == [(0, 8)]
@@ -0,0 +1,154 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from forms.core.forms import from_df
+from forms.executor.dfexecutor import kernels
+
+pytest.importorskip("numba")
+
+num_rows = 60
+rng = np.random.default_rng(0)
+test_df = pd.DataFrame(
+    {
+        "col1": rng.random(num_rows) * 10,
+        "col2": rng.integers(1, 10, num_rows).astype(float),
+        "col3": rng.random(num_rows),
+        "col4": rng.integers(0, 5, num_rows),
+    }
+)
+# scattered nulls, and rows of nulls that leave whole windows empty
+test_df.loc[rng.choice(num_rows, 12, replace=False), "col1"] = np.nan
+test_df.loc[rng.choice(num_rows, 6, replace=False), "col3"] = np.nan
+test_df.loc[20:24, ["col1", "col2", "col3"]] = np.nan
+
+wb = None
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_workbook():
+    global wb
+    kernels.warm_up()
+    wb = from_df(test_df)
+    yield
+    kernels.set_kernels_enabled(True)
+    wb.close()
+
+
+def compute(formula_str: str, use_kernels: bool) -> np.ndarray:
+    kernels.set_kernels_enabled(use_kernels)
+    try:
+        return wb.compute_formula(formula_str).iloc[:, 0].to_numpy(dtype=np.float64)
+    finally:
+        kernels.set_kernels_enabled(True)
+
+
+@pytest.mark.parametrize(
+    "formula_str",
+    [
+        "=MAX(A1:B3)",
+        "=MIN(A1:C5)",
+        "=MAX(A$1:B3)",
+        "=MAX(A1:A3, 4)",
+        "=MEDIAN(A1:B3)",
+        "=MEDIAN(C1:C4)",
+        "=MAX(A1:A1)",
+        "=MIN(A$2:A3)",
+        "=MAX(A2:A$4)",
+        "=MIN(A3:C$50)",
+        "=MEDIAN(A$1:C2)",
+        "=MEDIAN(C2:C$50)",
+        '=MAXIF(D1:D5, ">2", A1:A5)',
+        '=MINIF(D$1:D5, "<3", B$1:B5)',
+        '=MAXIF(D3:D$60, "1", C3:C$60)',
+        '=MINIF(B1:D4, ">=1")',
+    ],
+)
+def test_same_as_pandas(formula_str):
+    expected = compute(formula_str, False)
+    computed = compute(formula_str, True)
+    assert np.allclose(computed, expected, equal_nan=True)
+
+
+@pytest.mark.parametrize("use_kernels", [True, False])
+@pytest.mark.parametrize(
+    "formula_str, expected",
+    [
+        ("=MAX(A1:B2)", [1e17, 4, 3, 2, 5, np.nan]),
+        ("=MIN(A1:A3)", [3, 3, -2, -2, np.nan, np.nan]),
+        ("=MEDIAN(A1:B2)", [4, 3.5, 3, 0, 1.25, np.nan]),
+        ("=MAX(A$1:A2)", [1e17, 1e17, 1e17, 1e17, 1e17, np.nan]),
+        ("=MIN(B2:B$6)", [0.5, 0.5, 0.5, 0.5, 0.5, np.nan]),
+        ("=MEDIAN(A2:B$6)", [2.5, 2, 1.25, 1.25, 2.75, np.nan]),
+        ('=MAXIF(C1:C3, ">1", B1:B3)', [4, 4, 2, 2, np.nan, np.nan]),
+        ('=MINIF(C$1:C2, "1", A$1:A2)', [1e17, 3, 3, 3, 3, np.nan]),
+    ],
+)
+def test_hand_computed_windows(formula_str, expected, use_kernels):
+    df = pd.DataFrame(
+        {
+            "a": [1e17, np.nan, 3.0, np.nan, -2.0, 5.0],
+            "b": [1.0, 4.0, np.nan, np.nan, 2.0, 0.5],
+            "c": [1, 2, 1, 3, 2, 1],
+        }
+    )
+    local_wb = from_df(df)
+    kernels.set_kernels_enabled(use_kernels)
+    try:
+        computed = local_wb.compute_formula(formula_str).iloc[:, 0].to_numpy(dtype=np.float64)
+    finally:
+        kernels.set_kernels_enabled(True)
+        local_wb.close()
+    assert np.array_equal(computed, expected, equal_nan=True)
+
+
+def test_shrinking_windows():
+    # windows starting past the last row of an RF reference are null
+    df = pd.DataFrame({"a": [1.0, 5.0, np.nan, 2.0, 3.0], "b": [1.0] * 5})
+    shrinking_wb = from_df(df)
+    computed = shrinking_wb.compute_formula("=MAX(A2:A$4)").iloc[:, 0]
+    assert np.allclose(computed, [5, 2, 2, np.nan, np.nan], equal_nan=True)
+    computed = shrinking_wb.compute_formula("=MEDIAN(A2:B3)").iloc[:, 0]
+    assert np.allclose(computed, [1, 1, 1.5, np.nan, np.nan], equal_nan=True)
+    shrinking_wb.close()
+
+
+def test_null_cells_are_skipped():
+    df = pd.DataFrame({"a": [1.0, np.nan, 3.0, np.nan, np.nan], "b": [2.0, 4.0, np.nan, np.nan, 0.0]})
+    block = df.to_numpy()
+    starts = np.array([0, 1, 2, 3], dtype=np.int64)
+    ends = np.array([2, 3, 4, 4], dtype=np.int64)
+    valid = np.array([True, True, True, False])
+    maximums = kernels.run_window_kernel(kernels.window_extreme_kernel, block, starts, ends, valid, 1.0)
+    assert np.allclose(maximums, [4, 4, 3, np.nan], equal_nan=True)
+    minimums = kernels.run_window_kernel(kernels.window_extreme_kernel, block, starts, ends, valid, -1.0)
+    assert np.allclose(minimums, [1, 3, 3, np.nan], equal_nan=True)
+    medians = kernels.run_window_kernel(kernels.window_median_kernel, block, starts, ends, valid)
+    assert np.allclose(medians, [2, 3.5, 3, np.nan], equal_nan=True)
+
+
+def test_parallel_chunks(monkeypatch):
+    values = rng.random((1000, 2))
+    starts = np.arange(990, dtype=np.int64)
+    ends = starts + 10
+    valid = np.ones(990, dtype=bool)
+    serial = kernels.run_window_kernel(kernels.window_median_kernel, values, starts, ends, valid)
+    monkeypatch.setattr(kernels, "MIN_CHUNK_FORMULAS", 100)
+    monkeypatch.setattr(kernels.os, "cpu_count", lambda: 4)
+    parallel = kernels.run_window_kernel(kernels.window_median_kernel, values, starts, ends, valid)
+    assert np.array_equal(serial, parallel)
+    assert np.allclose(serial, [np.median(values[i : i + 10]) for i in range(990)])
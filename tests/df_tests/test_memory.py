@@ -0,0 +1,85 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from forms.core.forms import from_df
+from forms.utils.exceptions import MemoryBudgetExceededException
+from forms.utils.memory import MemoryTracker
+from forms.utils.metrics import PEAK_MEMORY, TRACE
+
+df = pd.DataFrame(np.arange(4000, dtype=float).reshape(1000, 4))
+formula_str = "=SUM(A$1:D1)+ABS(MAX(A1:B3))"
+
+
+def get_function_spans(metrics: dict) -> dict:
+    spans = {}
+
+    def collect(span):
+        if "function" in span["attributes"]:
+            spans[span["name"]] = span
+        for child in span["children"]:
+            collect(child)
+
+    collect(metrics[TRACE][0])
+    return spans
+
+
+def test_memory_tracker_sizes():
+    tracker = MemoryTracker(budget=100)
+    start_bytes = tracker.start_node()
+    assert tracker.finish_node(start_bytes, 40, 0, "first") == 40
+    start_bytes = tracker.start_node()
+    assert tracker.finish_node(start_bytes, 40, 40, "second") == 40
+    assert (tracker.live_bytes, tracker.peak_bytes) == (40, 80)
+    with pytest.raises(MemoryBudgetExceededException):
+        tracker.check_budget(61, "third")
+    with pytest.raises(MemoryBudgetExceededException):
+        tracker.finish_node(tracker.start_node(), 61, 0, "third")
+
+
+@pytest.mark.parametrize("memory_tracking", ["sizes", "tracemalloc"])
+def test_peak_memory_per_node(memory_tracking):
+    wb = from_df(df, memory_tracking=memory_tracking, enable_fusion=False)
+    computed_df = wb.compute_formula(formula_str)
+    assert computed_df.shape == (1000, 1)
+    metrics = wb.get_metrics()
+    spans = get_function_spans(metrics)
+    assert set(spans) == {"PLUS", "SUM", "ABS", "MAX"}
+    for span in spans.values():
+        assert span["attributes"]["peak_memory"] > 0
+    # the results of SUM and ABS are alive at the same time
+    assert metrics[PEAK_MEMORY] >= spans["SUM"]["attributes"]["peak_memory"]
+    wb.close()
+
+
+def test_memory_not_tracked_by_default():
+    wb = from_df(df)
+    wb.compute_formula(formula_str)
+    metrics = wb.get_metrics()
+    assert PEAK_MEMORY not in metrics
+    assert "peak_memory" not in get_function_spans(metrics)["SUM"]["attributes"]
+    wb.close()
+
+
+def test_memory_budget_guard(capsys):
+    wb = from_df(df, memory_budget=16000)
+    assert wb.compute_formula(formula_str) is None
+    assert "exceeds the memory budget of 16000 bytes" in capsys.readouterr().out
+
+    wb = from_df(df, memory_budget=10**8)
+    assert wb.compute_formula(formula_str) is not None
+    wb.close()
@@ -0,0 +1,100 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import threading
+import pandas as pd
+
+from forms.core.forms import from_df, from_parquet, from_stream, render_openmetrics
+from forms.utils.metrics import EXECUTION_TIME, TOTAL_TIME
+from forms.utils.metricsrecorder import (
+    FORMULAS_COUNTER,
+    FORMULA_ERRORS_COUNTER,
+    Histogram,
+    MetricsRecorder,
+    metrics_recorder,
+)
+
+
+def test_histogram_quantile():
+    histogram = Histogram([10, 20, 40])
+    for value in [5, 15, 15, 30]:
+        histogram.observe(value)
+    assert histogram.get_cumulative_counts() == [1, 3, 4, 4]
+    assert histogram.get_quantile(0.5) == 15
+    assert histogram.get_quantile(1.0) == 40
+    histogram.observe(100)
+    assert histogram.get_quantile(1.0) == 40
+
+
+def test_render_openmetrics():
+    recorder = MetricsRecorder([1000, 10000])
+    recorder.record_formula("df", "SUM", {TOTAL_TIME: 500, EXECUTION_TIME: 2000})
+    recorder.record_formula("df", "SUM", {TOTAL_TIME: 5000})
+    recorder.record_error("db")
+    text = recorder.render_openmetrics()
+    lines = text.splitlines()
+    assert "# TYPE forms_formulas counter" in lines
+    assert 'forms_formulas_total{backend="df",function="SUM"} 2' in lines
+    assert 'forms_formula_errors_total{backend="db"} 1' in lines
+    assert "# TYPE forms_total_time_seconds histogram" in lines
+    assert 'forms_total_time_seconds_bucket{backend="df",function="SUM",le="0.001"} 1' in lines
+    assert 'forms_total_time_seconds_bucket{backend="df",function="SUM",le="+Inf"} 2' in lines
+    assert 'forms_total_time_seconds_sum{backend="df",function="SUM"} 0.0055' in lines
+    assert 'forms_execution_time_seconds_count{backend="df",function="SUM"} 1' in lines
+    assert lines[-1] == "# EOF"
+
+
+def test_concurrent_recording():
+    recorder = MetricsRecorder()
+
+    def record():
+        for _ in range(1000):
+            recorder.record_formula("df", "SUM", {TOTAL_TIME: 100})
+
+    threads = [threading.Thread(target=record) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert recorder.get_counter(FORMULAS_COUNTER) == 4000
+    assert recorder.get_quantile(TOTAL_TIME, 0.99, backend="df") <= 100
+
+
+def test_workbook_records_formulas():
+    wb = from_df(pd.DataFrame({"col1": [1, 2, 3]}))
+    before = metrics_recorder.get_counter(FORMULAS_COUNTER, backend="df", function="MAX")
+    wb.compute_formula("=MAX(A1:A2)")
+    wb.compute_formula("=MAX(A1:A3)")
+    assert metrics_recorder.get_counter(FORMULAS_COUNTER, backend="df", function="MAX") == before + 2
+    assert 'forms_formulas_total{backend="df",function="MAX"}' in render_openmetrics()
+    wb.close()
+
+
+def test_file_and_stream_workbooks_record_formulas(tmp_path):
+    path = str(tmp_path / "table.parquet")
+    pd.DataFrame({"col1": [1.0, 2.0, 3.0]}).to_parquet(path)
+    file_wb = from_parquet(path)
+    before = metrics_recorder.get_counter(FORMULAS_COUNTER, backend="file", function="SUM")
+    file_wb.compute_formula("=SUM(A1:A2)")
+    assert metrics_recorder.get_counter(FORMULAS_COUNTER, backend="file", function="SUM") == before + 1
+    before = metrics_recorder.get_counter(FORMULA_ERRORS_COUNTER, backend="file")
+    assert file_wb.compute_formula("=SUM(A1:A$9)") is None
+    assert metrics_recorder.get_counter(FORMULA_ERRORS_COUNTER, backend="file") == before + 1
+    file_wb.close()
+
+    stream_wb = from_stream(["col1"])
+    before = metrics_recorder.get_counter(FORMULAS_COUNTER, backend="stream", function="MAX")
+    stream_wb.compute_formula("=MAX(A1:A2)")
+    assert metrics_recorder.get_counter(FORMULAS_COUNTER, backend="stream", function="MAX") == before + 1
+    stream_wb.close()
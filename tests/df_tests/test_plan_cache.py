@@ -0,0 +1,87 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import pandas as pd
+import numpy as np
+
+from forms.core.forms import from_df, parse_formula_str
+from forms.planner.plancache import FormulaTemplate, PlanCache, assign_ref_slots
+from forms.planner.plannode import collect_ref_nodes
+from forms.utils.reference import Ref, RefType
+
+m = 20
+n = 3
+df = pd.DataFrame(np.arange(0, m * n).reshape(m, n))
+
+
+def cache_plan(plan_cache: PlanCache, formula_str: str, rewriting_flags=(False, False)):
+    root = parse_formula_str(formula_str)
+    assign_ref_slots(root)
+    plan_cache.put(formula_str, rewriting_flags, root, root)
+
+
+def test_template_abstracts_references():
+    template_one = FormulaTemplate("=SUM(A1:A3)")
+    template_two = FormulaTemplate("=SUM(B1:B3)")
+    assert template_one.key == template_two.key
+    assert template_two.refs == [Ref(0, 1, 2, 1)]
+
+    assert FormulaTemplate("=SUM(A1:A3)").key != FormulaTemplate("=SUM(A1:A4)").key
+    assert FormulaTemplate("=SUM(A1:A3)").key != FormulaTemplate("=SUM(A$1:A3)").key
+    assert FormulaTemplate('=SUMIF(A1:A3, "B1")').ref_strs == ["A1:A3"]
+    assert FormulaTemplate("=LOG10(A1)").ref_strs == ["A1"]
+
+
+def test_shifted_references_share_plan():
+    plan_cache = PlanCache()
+    cache_plan(plan_cache, "=SUM(A1:A3, B$1)")
+    parsed_plan, rewritten_plan = plan_cache.get("=SUM(C2:C4, A$1)", (False, False))
+    assert plan_cache.hits == 1
+    ref_nodes = collect_ref_nodes(rewritten_plan)
+    assert [ref_node.ref for ref_node in ref_nodes] == [Ref(1, 2, 3, 2), Ref(0, 0)]
+    assert [ref_node.out_ref_type for ref_node in ref_nodes] == [RefType.RR, RefType.FF]
+    assert rewritten_plan.construct_formula_string() == "SUM(C2:C4,A$1)"
+
+    assert plan_cache.get("=SUM(C2:C4, A$1)", (True, False)) is None
+    assert plan_cache.get("=SUM(C2:C5, A$1)", (False, False)) is None
+    assert plan_cache.misses == 2
+
+
+def test_cached_plans_are_copies():
+    plan_cache = PlanCache()
+    cache_plan(plan_cache, "=A1+B1")
+    _, rewritten_plan = plan_cache.get("=A1+B1", (False, False))
+    rewritten_plan.children = []
+    _, rewritten_plan = plan_cache.get("=A1+B1", (False, False))
+    assert len(rewritten_plan.children) == 2
+
+
+def test_plan_cache_is_bounded():
+    plan_cache = PlanCache(capacity=2)
+    cache_plan(plan_cache, "=SUM(A1:A2)")
+    cache_plan(plan_cache, "=MAX(A1:A2)")
+    plan_cache.get("=SUM(B1:B2)", (False, False))
+    cache_plan(plan_cache, "=MIN(A1:A2)")
+    assert len(plan_cache) == 2
+    assert plan_cache.get("=MAX(A1:A2)", (False, False)) is None
+    assert plan_cache.get("=SUM(A1:A2)", (False, False)) is not None
+
+
+def test_compute_with_cached_plans():
+    wb = from_df(df)
+    for col in ["A", "B", "C"]:
+        computed_df = wb.compute_formula(f"=SUM({col}1:{col}3)")
+        expected_df = df.iloc[:, ord(col) - ord("A")].rolling(3).sum().shift(-2)
+        assert np.array_equal(computed_df.values[:, 0], expected_df.values, equal_nan=True)
+    wb.close()
@@ -0,0 +1,189 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from forms.core.forms import from_df, compile_formula_str
+from forms.executor.dfexecutor.dfexecnode import from_plan_to_execution_tree
+from forms.executor.dfexecutor.dftable import DFTable
+from forms.executor.dfexecutor.polarsexecutor import is_lowerable
+from forms.utils.exceptions import FormSException
+from forms.utils.functions import FunctionExecutor
+from forms.utils.metrics import MetricsTracker
+
+pl = pytest.importorskip("polars")
+
+num_rows = 50
+rng = np.random.default_rng(0)
+test_df = pd.DataFrame(
+    {
+        "col1": rng.random(num_rows) * 10,
+        "col2": rng.integers(1, 10, num_rows).astype(float),
+        "col3": rng.random(num_rows),
+        "col4": rng.integers(0, 5, num_rows),
+        "col5": rng.choice(["  Ab", "cD ", "x"], num_rows),
+    }
+)
+# nulls below the fixed windows of the lowered formulas
+test_df.loc[[12, 30, 31], "col1"] = np.nan
+test_df.loc[[20, 49], "col2"] = np.nan
+
+pandas_wb = None
+polars_wb = None
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup_workbooks():
+    global pandas_wb, polars_wb
+    pandas_wb = from_df(test_df)
+    polars_wb = from_df(test_df, backend="polars")
+    yield
+    pandas_wb.close()
+    polars_wb.close()
+
+
+def assert_same_result(formula_str: str):
+    expected = pandas_wb.compute_formula(formula_str).iloc[:, 0]
+    computed = polars_wb.compute_formula(formula_str).iloc[:, 0]
+    assert len(computed) == len(expected)
+    assert computed.dtype == expected.dtype
+    if pd.api.types.is_numeric_dtype(expected):
+        assert np.allclose(computed.astype(float), expected.astype(float), equal_nan=True)
+    else:
+        assert list(computed) == list(expected)
+
+
+def lowerable(formula_str: str) -> bool:
+    root = compile_formula_str(
+        formula_str, FunctionExecutor.DF_EXECUTOR, num_rows, test_df.shape[1], MetricsTracker()
+    )
+    return is_lowerable(from_plan_to_execution_tree(root, DFTable(test_df)))
+
+
+@pytest.mark.parametrize(
+    "formula_str",
+    [
+        "=SUM(A1:B3)",
+        "=SUM(A$1:B3)",
+        "=SUM(A1:B$50)",
+        "=SUM(A$2:C$5)",
+        "=COUNT(A1:C4)",
+        "=AVERAGE(A1:B3)",
+        "=MAX(A1:D3)",
+        "=MIN(A$1:B3)",
+        "=SUM(A1:A2, 5, B$1:B$3)",
+        "=MAX(A1:A3, 4)",
+        "=MIN(A1, B2, C1:C2)",
+    ],
+)
+def test_window_aggregates(formula_str):
+    assert lowerable(formula_str)
+    assert_same_result(formula_str)
+
+
+@pytest.mark.parametrize(
+    "formula_str",
+    ["=SUM(A$1:B$50)", "=SUM($A$1:$B$50)+A1", "=COUNT(A$10:C$20)", "=AVERAGE(A$1:B$50)"],
+)
+def test_fixed_windows_with_nulls(formula_str):
+    # pandas aggregates these differently from the other windows, so they are not lowered
+    assert not lowerable(formula_str)
+    assert_same_result(formula_str)
+
+
+@pytest.mark.parametrize(
+    "formula_str",
+    ["=A1-B1+C2", "=(A1*B1+C1)/D1-SQRT(A1)", "=EXP(C1)+LN(B1)", "=MIN(A$3:B$9)+A1"],
+)
+def test_element_wise_functions(formula_str):
+    assert lowerable(formula_str)
+    assert_same_result(formula_str)
+
+
+@pytest.mark.parametrize("formula_str", ["=LOWER(E1)", "=LEN(E1)", "=TRIM(E1)", "=EXACT(E1,E2)"])
+def test_text_functions(formula_str):
+    assert lowerable(formula_str)
+    assert_same_result(formula_str)
+
+
+def test_shrinking_windows():
+    df = pd.DataFrame({"a": [1.0, 5.0, np.nan, 2.0, 3.0], "b": [1.0] * 5})
+    wb = from_df(df, backend="polars")
+    assert np.allclose(
+        wb.compute_formula("=MAX(A2:A$4)").iloc[:, 0], [5, 2, 2, np.nan, np.nan], equal_nan=True
+    )
+    assert np.allclose(
+        wb.compute_formula("=SUM(A2:B$4)").iloc[:, 0], [10, 4, 3, np.nan, np.nan], equal_nan=True
+    )
+    assert np.allclose(
+        wb.compute_formula("=MIN(A$2:A3)").iloc[:, 0], [5, 2, 2, np.nan, np.nan], equal_nan=True
+    )
+    wb.close()
+
+
+@pytest.mark.parametrize(
+    "formula_str, expected",
+    [
+        ("=SUM(A2:A3)", [2, 1, 1, 3, np.nan, np.nan]),
+        ("=SUM(A1:B2)", [1e17, 4, 5, 10, 14, np.nan]),
+        ("=SUM(A$2:B3)", [4, 8, 14, 22, np.nan, np.nan]),
+        ("=COUNT(A1:B2)", [4, 3, 2, 3, 4, np.nan]),
+        ("=AVERAGE(A2:B3)", [4 / 3, 2.5, 10 / 3, 3.5, np.nan, np.nan]),
+        ("=MAX(A2:C2)", [2, 2, 5, 5, 6, np.nan]),
+        ("=MIN(B2:C$6)", [0, 0, 0, 0, 0, np.nan]),
+        ("=SUM(A$2:A$3)+C1", [5, 3, 4, 7, 6, 2]),
+        # fixed ranges with nulls are left to pandas, where SUM is null and COUNT counts the nulls
+        ("=SUM(A$3:A$5)+C1", [np.nan] * 6),
+        ("=COUNT(A$3:A$5)+C1", [6, 4, 5, 8, 7, 3]),
+        ("=MAX(A$3:B$4)-C1", [1, 3, 2, -1, 0, 4]),
+    ],
+)
+def test_hand_computed_values(formula_str, expected):
+    df = pd.DataFrame(
+        {
+            "a": [1e17, 1, 1, np.nan, 1, 2.0],
+            "b": [1.0, 2, np.nan, 4, 5, 6],
+            "c": [3, 1, 2, 5, 4, 0],
+        }
+    )
+    wb = from_df(df, backend="polars")
+    computed = wb.compute_formula(formula_str).iloc[:, 0].to_numpy(dtype=np.float64)
+    wb.close()
+    assert np.allclose(computed, expected, rtol=0, atol=1e-12, equal_nan=True)
+
+
+def test_null_arguments():
+    df = pd.DataFrame({"a": [1.0, np.nan, 3.0, 4.0], "b": [2.0, 5.0, np.nan, 1.0]})
+    wb = from_df(df, backend="polars")
+    assert np.allclose(wb.compute_formula("=MAX(A1, B1)").iloc[:, 0], [2, 5, 3, 4])
+    assert np.allclose(
+        wb.compute_formula("=MAX(A1:A2, B1)").iloc[:, 0], [2, 5, 4, np.nan], equal_nan=True
+    )
+    assert np.allclose(
+        wb.compute_formula("=MIN(A1:A$4, B2)").iloc[:, 0], [1, 3, 1, np.nan], equal_nan=True
+    )
+    wb.close()
+
+
+def test_fallback_to_pandas():
+    formula_str = '=SUMIF(D1:D3, ">2")'
+    assert not lowerable(formula_str)
+    assert_same_result(formula_str)
+
+
+def test_from_df_backend():
+    with pytest.raises(FormSException):
+        from_df(test_df, backend="polars", memory_tracking="sizes")
@@ -0,0 +1,106 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from forms.core.config import DFConfig, DFExecContext
+from forms.core.forms import compile_formula_str
+from forms.executor.dfexecutor.dfexecutor import DFExecutor
+from forms.executor.dfexecutor.dftable import DFTable
+from forms.utils.functions import FunctionExecutor
+from forms.utils.metrics import MetricsTracker
+from forms.utils.reference import DEFAULT_AXIS
+
+num_rows = 30
+rng = np.random.default_rng(0)
+test_df = pd.DataFrame(rng.random((num_rows, 3)) * 10)
+formulas = [
+    "=SUM(A1:B3)+ABS(MAX(A1,B$2))",
+    "=SUM(A$1:A3)*COUNT(B1:C2)",
+    "=MAX(A1:C4)-MIN(A1:A2)+A1",
+    '=SUMIF(A1:A3, ">5", B1:B3)/(A1+1)',
+    "=AVERAGE(A1:B2)",
+]
+
+
+def compile_program(formula_str: str, enable_fusion: bool = True, df: pd.DataFrame = test_df):
+    root = compile_formula_str(formula_str, FunctionExecutor.DF_EXECUTOR, *df.shape, MetricsTracker())
+    executor = create_executor(0, df.shape[0], enable_fusion)
+    return executor.compile_formula_plan(DFTable(df), root)
+
+
+def create_executor(start: int, end: int, enable_fusion: bool = True) -> DFExecutor:
+    df_config = DFConfig(True, enable_fusion=enable_fusion)
+    return DFExecutor(df_config, DFExecContext(start, end, DEFAULT_AXIS), MetricsTracker())
+
+
+def run(program, df: pd.DataFrame, start: int = 0, end: int = num_rows) -> np.ndarray:
+    result = create_executor(start, end).execute_program(DFTable(df), program)
+    return result.iloc[:, 0].to_numpy(dtype=np.float64)
+
+
+@pytest.mark.parametrize("formula_str", formulas)
+def test_program_runs_many_times(formula_str):
+    program = compile_program(formula_str)
+    instructions = program.instructions
+    first = run(program, test_df)
+    assert np.allclose(run(program, test_df), first, equal_nan=True)
+    assert program.instructions is instructions
+    assert all(not instruction.prototype.children for instruction in instructions)
+
+
+@pytest.mark.parametrize("formula_str", formulas)
+def test_row_ranges(formula_str):
+    program = compile_program(formula_str, enable_fusion=False)
+    full = run(program, test_df)
+    for start, end in [(0, 7), (7, 20), (20, num_rows)]:
+        assert np.allclose(run(program, test_df, start, end), full[start:end], equal_nan=True)
+
+
+@pytest.mark.parametrize(
+    "formula_str, expected",
+    [
+        ("=SUM(A2:B3)+ABS(MAX(A1,B$2))", [1e17, 8, 8.5, np.nan, np.nan, np.nan]),
+        ('=SUMIF(A1:A3, ">1", B1:B3)/(C1+1)', [4 / 3, 0.6, 3.5, 0.25, np.nan, np.nan]),
+        ("=AVERAGE(A2:B3)", [2, 7 / 3, 6.5 / 3, 1.625, np.nan, np.nan]),
+        ("=MAX(A1:C2)-MIN(B1:B$6)", [1e17, 3.5, 2.5, 3.5, 3.5, np.nan]),
+    ],
+)
+def test_hand_computed_values(formula_str, expected):
+    df = pd.DataFrame([[1e17, 1, 2], [1, np.nan, 4], [2, 3, 0], [np.nan, 2, 1], [4, 0.5, 2], [1, 1, 3]])
+    program = compile_program(formula_str, df=df)
+    # a second run of the same program must not see values left over from the first
+    for _ in range(2):
+        computed = run(program, df, 0, df.shape[0])
+        assert np.allclose(computed, expected, rtol=0, atol=1e-12, equal_nan=True)
+    assert np.allclose(run(program, df, 2, 5), expected[2:5], rtol=0, atol=1e-12, equal_nan=True)
+
+
+def test_other_tables():
+    program = compile_program(formulas[0])
+    other_df = test_df * 2 - 5
+    expected = run(compile_program(formulas[0]), test_df)
+    assert np.allclose(run(program, test_df), expected, equal_nan=True)
+    assert not np.allclose(run(program, other_df), expected, equal_nan=True)
+    assert np.allclose(run(program, other_df), run(program, other_df.copy()), equal_nan=True)
+
+
+def test_slots_are_reused():
+    program = compile_program("=ABS(SUM(A1:A2)+MAX(B1:B3))*MIN(C1:C2)-COUNT(A1:C1)", False)
+    functions = [instruction.prototype.function.name for instruction in program.instructions]
+    assert functions == ["SUM", "MAX", "PLUS", "ABS", "MIN", "MULTIPLY", "COUNT", "MINUS"]
+    assert program.num_slots == 2
+    assert [instruction.parent for instruction in program.instructions] == [2, 2, 3, 5, 5, 7, 7, None]
@@ -0,0 +1,171 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from forms.core.forms import from_df
+from forms.core.sheet import Sheet, get_waves
+from forms.utils.exceptions import CyclicDependencyException, FormSException
+
+num_rows = 20
+rng = np.random.default_rng(0)
+test_df = pd.DataFrame({"a": rng.random(num_rows) * 10, "b": rng.integers(1, 5, num_rows).astype(float)})
+
+
+def create_sheet(backend: str = "pandas", max_workers: int = None):
+    wb = from_df(test_df.copy(), backend=backend)
+    sheet = Sheet(wb, max_workers)
+    assert sheet.add_column("total", "=A1*B1") == "C"
+    assert sheet.add_column("window", "=SUM(C1:C3)") == "D"
+    assert sheet.add_column("shifted", "=C1+A1") == "E"
+    assert sheet.add_column("result", "=D1-E1") == "F"
+    return wb, sheet
+
+
+def get_expected() -> pd.DataFrame:
+    total = test_df["a"] * test_df["b"]
+    window = total.rolling(3).sum().shift(-2)
+    shifted = total + test_df["a"]
+    return pd.DataFrame(
+        {"total": total, "window": window, "shifted": shifted, "result": window - shifted}
+    )
+
+
+def test_dependencies():
+    wb, sheet = create_sheet()
+    dependencies = sheet.get_dependencies()
+    assert dependencies == {
+        "total": set(),
+        "window": {"total"},
+        "shifted": {"total"},
+        "result": {"window", "shifted"},
+    }
+    assert get_waves(dependencies) == [["total"], ["window", "shifted"], ["result"]]
+    wb.close()
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_chained_columns(max_workers):
+    wb, sheet = create_sheet(max_workers=max_workers)
+    sheet.compute()
+    expected = get_expected()
+    computed = sheet.get_values()
+    assert list(computed.columns) == list(expected.columns)
+    assert np.allclose(computed, expected, equal_nan=True)
+    # the results are part of the workbook's table
+    assert np.allclose(wb.compute_formula("=F1*2").iloc[:, 0], expected["result"] * 2, equal_nan=True)
+    wb.close()
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_hand_computed_columns(max_workers):
+    wb = from_df(pd.DataFrame({"a": [1e17, 1, 2, np.nan, 4], "b": [1, 1, 2, 3, np.nan]}))
+    sheet = Sheet(wb, max_workers)
+    sheet.add_column("total", "=A1*B1")
+    sheet.add_column("window", "=SUM(C2:C3)")
+    sheet.add_column("larger", "=MAX(A1, C2)")
+    sheet.add_column("result", "=D1-C1")
+    sheet.compute()
+    expected = {
+        "total": [1e17, 1, 4, np.nan, np.nan],
+        # the large value of the total column is never in a window
+        "window": [5, 4, 0, np.nan, np.nan],
+        "larger": [1e17, 4, 2, np.nan, np.nan],
+        "result": [-1e17, 3, -4, np.nan, np.nan],
+    }
+    computed = sheet.get_values()
+    for name, values in expected.items():
+        assert np.array_equal(computed[name], values, equal_nan=True), name
+    wb.close()
+
+
+def test_intermediate_columns_are_released():
+    wb, sheet = create_sheet()
+    sheet.compute(["result"])
+    assert np.allclose(sheet.get_values(["result"])["result"], get_expected()["result"], equal_nan=True)
+    for name in ["total", "window", "shifted"]:
+        values = wb.df[name].to_numpy()
+        assert values.dtype == np.float64 and values.strides == (0,)
+        assert np.isnan(values).all()
+    # released columns can still be read, and written again
+    assert wb.compute_formula("=SUM(C1:D2)+C1").iloc[:, 0].isna().all()
+    sheet.compute(["shifted"])
+    assert np.allclose(sheet.get_values(["shifted"])["shifted"], get_expected()["shifted"])
+    wb.close()
+
+
+def test_input_df_is_not_modified():
+    df = test_df.copy()
+    wb = from_df(df)
+    sheet = Sheet(wb)
+    sheet.add_column("total", "=A1*B1")
+    sheet.add_column("result", "=SUM(C1:C2)")
+    sheet.compute(["result"])
+    assert wb.df is not df
+    pd.testing.assert_frame_equal(df, test_df)
+    wb.close()
+    pytest.importorskip("duckdb")
+    duckdb_wb = from_df(df, backend="duckdb")
+    assert np.allclose(duckdb_wb.compute_formula("=A1*B1").iloc[:, -1], test_df["a"] * test_df["b"])
+    duckdb_wb.close()
+
+
+def test_only_needed_columns_are_computed():
+    wb, sheet = create_sheet()
+    sheet.compute(["shifted"])
+    assert wb.df["window"].isna().all()
+    assert np.allclose(sheet.get_values(["shifted"])["shifted"], get_expected()["shifted"])
+    wb.close()
+
+
+def test_cycles():
+    wb = from_df(test_df.copy())
+    sheet = Sheet(wb)
+    sheet.add_column("c", "=A1+D1")
+    sheet.add_column("d", "=C2*2")
+    sheet.add_column("e", "=B1*1")
+    with pytest.raises(CyclicDependencyException):
+        sheet.compute()
+    sheet.compute(["e"])
+    assert np.allclose(sheet.get_values(["e"])["e"], test_df["b"])
+    wb.close()
+
+
+def test_invalid_columns():
+    wb, sheet = create_sheet()
+    with pytest.raises(FormSException):
+        sheet.add_column("total", "=A1")
+    with pytest.raises(FormSException):
+        sheet.add_column("a", "=A1")
+    with pytest.raises(FormSException):
+        sheet.compute(["missing"])
+    sheet.add_column("bad", "=SUM(A1:Z2)")
+    with pytest.raises(FormSException):
+        sheet.compute(["bad"])
+    wb.close()
+
+
+def test_duckdb_sheet():
+    pytest.importorskip("duckdb")
+    wb, sheet = create_sheet(backend="duckdb")
+    sheet.compute(["result", "shifted"])
+    computed = sheet.get_values()
+    expected = get_expected()
+    # incomplete windows are summed over the rows that exist in SQL
+    assert np.allclose(computed["result"][:-2], expected["result"][:-2])
+    assert np.allclose(computed["shifted"], expected["shifted"])
+    assert computed["total"].isna().all() and computed["window"].isna().all()
+    wb.close()
@@ -0,0 +1,213 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from forms.core.forms import from_checkpoint, from_df, from_stream
+from forms.executor.dfexecutor import kernels
+from forms.executor.dfexecutor.streaming import RunningMedian, StreamWindow
+from forms.utils.exceptions import FormSException
+
+num_rows = 120
+rng = np.random.default_rng(0)
+test_df = pd.DataFrame(
+    {
+        "a": rng.random(num_rows) * 10,
+        "b": rng.integers(0, 10, num_rows),
+        "c": rng.random(num_rows),
+    }
+)
+batch_sizes = [1, 7, 2, 30, 5, 45, 30]
+formulas = [
+    "=SUM(A$1:A1)",
+    "=AVERAGE(A1:A5)",
+    "=SUM(A1:B3)",
+    "=COUNT(A$1:C2, 1)",
+    "=MAX(A1:B4)-MIN(C$1:C2)",
+    "=MEDIAN(A1:B3)",
+    "=MEDIAN(B$1:B2)",
+    "=SUM($A$1:$A$10)+A1*B2",
+    "=MAX($B$3:$C$8, 4)",
+    "=SQRT(A1)/(B1+1)",
+    "=MIN(A1:A3, 2)",
+]
+
+
+def stream(wb, df: pd.DataFrame, sizes: list) -> dict:
+    outputs = {formula_str: [] for formula_str in formulas}
+    start = 0
+    for size in sizes:
+        for formula_str, result in wb.append(df.iloc[start : start + size]).items():
+            outputs[formula_str].append(result)
+        start += size
+    return {formula_str: pd.concat(results) for formula_str, results in outputs.items()}
+
+
+def assert_same_as_df(outputs: dict):
+    wb = from_df(test_df)
+    for formula_str, result in outputs.items():
+        expected = wb.compute_formula(formula_str).iloc[:, 0].to_numpy(dtype=np.float64)
+        assert list(result.index) == list(range(result.shape[0])), formula_str
+        assert result.shape[0] > 0
+        assert np.allclose(result.iloc[:, 0], expected[: result.shape[0]], equal_nan=True), formula_str
+        assert not np.isnan(expected[: result.shape[0]]).any()
+    wb.close()
+
+
+@pytest.fixture
+def streaming_wb():
+    wb = from_stream(list(test_df.columns))
+    for formula_str in formulas:
+        wb.compute_formula(formula_str)
+    yield wb
+    wb.close()
+
+
+@pytest.mark.parametrize("use_kernels", [True, False])
+def test_same_as_df(streaming_wb, use_kernels):
+    if use_kernels:
+        kernels.warm_up()
+    kernels.set_kernels_enabled(use_kernels)
+    try:
+        assert_same_as_df(stream(streaming_wb, test_df, batch_sizes))
+    finally:
+        kernels.set_kernels_enabled(True)
+
+
+def test_values_are_emitted_once_final(streaming_wb):
+    outputs = streaming_wb.append(test_df.iloc[:4])
+    assert outputs["=SUM(A$1:A1)"].shape[0] == 4
+    assert outputs["=AVERAGE(A1:A5)"].shape[0] == 0
+    assert outputs["=SUM($A$1:$A$10)+A1*B2"].shape[0] == 0
+    outputs = streaming_wb.append(test_df.iloc[4:10])
+    assert list(outputs["=AVERAGE(A1:A5)"].index) == list(range(6))
+    assert list(outputs["=SUM($A$1:$A$10)+A1*B2"].index) == list(range(9))
+
+
+def test_checkpoint(streaming_wb, tmp_path):
+    path = str(tmp_path / "stream.ckpt")
+    first = stream(streaming_wb, test_df, batch_sizes[:4])
+    streaming_wb.save_checkpoint(path)
+    resumed_wb = from_checkpoint(path)
+    rest = stream(resumed_wb, test_df.iloc[sum(batch_sizes[:4]) :], batch_sizes[4:])
+    assert_same_as_df({f: pd.concat([first[f], rest[f]]) for f in formulas})
+    resumed_wb.close()
+
+
+def test_unsupported_formulas(streaming_wb):
+    assert streaming_wb.compute_formula('=SUMIF(A1:A3, ">2", B1:B3)') is None
+    streaming_wb.append(test_df.iloc[:3])
+    assert streaming_wb.compute_formula("=SUM(A1:A2)") is None
+    with pytest.raises(FormSException):
+        streaming_wb.append(test_df.iloc[:3, :2])
+    with pytest.raises(FormSException):
+        streaming_wb.append(test_df.iloc[:3].astype(str).assign(a="x"))
+
+
+def test_rf_windows():
+    rf_formulas = ["=SUM(A1:B$50)", "=AVERAGE(C2:C$70)+A1", "=MAX(A1:A$40)", "=MEDIAN(B3:B$60)"]
+    wb = from_stream(list(test_df.columns))
+    for formula_str in rf_formulas:
+        wb.compute_formula(formula_str)
+    outputs = {formula_str: [] for formula_str in rf_formulas}
+    for start in range(0, num_rows, 25):
+        for formula_str, result in wb.append(test_df.iloc[start : start + 25]).items():
+            outputs[formula_str].append(result.iloc[:, 0].to_numpy())
+    values = {formula_str: np.concatenate(results) for formula_str, results in outputs.items()}
+    # all windows are known once their last row has arrived, and later formulas have empty windows
+    assert all(result.size == num_rows for result in values.values())
+
+    df_wb = from_df(test_df)
+    for formula_str in rf_formulas[:2]:
+        expected = df_wb.compute_formula(formula_str).iloc[:, 0].to_numpy(dtype=np.float64)
+        assert np.allclose(values[formula_str], expected, equal_nan=True), formula_str
+    df_wb.close()
+    a, b = test_df["a"].to_numpy(), test_df["b"].to_numpy(dtype=np.float64)
+    assert np.allclose(values["=MAX(A1:A$40)"][:40], [a[i:40].max() for i in range(40)])
+    assert np.allclose(values["=MEDIAN(B3:B$60)"][:58], [np.median(b[i + 2 : 60]) for i in range(58)])
+    assert (
+        np.isnan(values["=MAX(A1:A$40)"][40:]).all() and np.isnan(values["=MEDIAN(B3:B$60)"][58:]).all()
+    )
+    wb.close()
+
+
+def test_running_median():
+    running_median = RunningMedian()
+    values = rng.random(50)
+    for idx, value in enumerate(values):
+        running_median.push(value)
+        assert running_median.median() == np.median(values[: idx + 1])
+
+
+def test_windows_implement_every_step():
+    class PartialWindow(StreamWindow):
+        def get_num_valid(self) -> int:
+            return 0
+
+    with pytest.raises(TypeError):
+        PartialWindow(None, None)
+
+
+def test_hand_computed_values():
+    # the last rows are missing where their windows never become final
+    df = pd.DataFrame({"a": [2, np.nan, 4, 1, 3], "b": [1, 5, np.nan, 2, 2]})
+    expected = {
+        "=SUM(A$1:A1)": [2, 2, 6, 7, 10],
+        "=AVERAGE(A1:B2)": [8 / 3, 4.5, 7 / 3, 2],
+        "=MAX(A1:A3, B1)": [4, 5, 4],
+        "=MEDIAN(A1:B2)": [2, 4.5, 2, 2],
+        "=COUNT(A$1:B1)": [2, 3, 4, 6, 8],
+        "=MIN(A1, B1)": [1, 5, 4, 1, 2],
+    }
+    wb = from_stream(list(df.columns))
+    for formula_str in expected:
+        wb.compute_formula(formula_str)
+    results = wb.append(df.iloc[:2])
+    for formula_str, values in wb.append(df.iloc[2:]).items():
+        computed = pd.concat([results[formula_str], values]).iloc[:, 0]
+        assert computed.size == len(expected[formula_str]), formula_str
+        assert np.allclose(computed, expected[formula_str], rtol=0, atol=1e-12), formula_str
+    wb.close()
+
+
+def test_fixed_windows_with_nulls():
+    # as in the DF executor, FF windows do not skip nulls, unlike the other windows
+    df = pd.DataFrame({"a": [1, np.nan, 3, 4, 5, 6], "b": [1, 2, 3, np.nan, 5, 6]})
+    expected = {
+        "=SUM(A$2:B$6)": [np.nan] * 6,
+        "=COUNT(A$1:A$3)": [3] * 6,
+        "=MEDIAN(B$1:B$3)": [2] * 6,
+        "=MAX(A$1:B$4)+A1": [5, np.nan, 7, 8, 9, 10],
+        "=SUM(A1:B2)": [4, 8, 10, 14, 22],
+    }
+    wb = from_stream(list(df.columns))
+    for formula_str in expected:
+        wb.compute_formula(formula_str)
+    results = wb.append(df.iloc[:4])
+    for formula_str, values in wb.append(df.iloc[4:]).items():
+        computed = pd.concat([results[formula_str], values]).iloc[:, 0]
+        assert np.array_equal(computed, expected[formula_str], equal_nan=True), formula_str
+    wb.close()
+
+
+def test_sliding_sums_with_mixed_magnitudes():
+    # a large value must not absorb the small values of the windows after it
+    df = pd.DataFrame({"a": [1, 1e17, 1, 1, 1, 1]})
+    wb = from_stream(list(df.columns))
+    wb.compute_formula("=SUM(A1:A2)")
+    computed = wb.append(df)["=SUM(A1:A2)"].iloc[:, 0]
+    assert np.array_equal(computed, [1e17 + 1, 1e17 + 1, 2, 2, 2])
+    wb.close()
@@ -0,0 +1,83 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import pytest
+
+from forms.parser.tokenizer import Token, tokenize
+from forms.utils.exceptions import FormulaStringSyntaxErrorException
+
+formula_strings = [
+    "=SUM(A1:B3)",
+    "=A1 - B1",
+    "= -A1",
+    "=SUM(A1 ,-1)",
+    "=(A1,B1)",
+    "=1.5E+3*2%",
+    '="a""b" & C$1',
+    "=IF(A1>=2,TRUE,#N/A)",
+    "=A1<>{1,2;3,4}",
+    "=  SUM( A1 )",
+    '=SUMIF(A1:A10,">=5",B$1:B$10)/COUNT($A$1:A1)',
+    "='Sheet 1'!A1+1",
+    "=-(-A1)^2",
+    "=MAX(A1:B3)-MIN(1,2)%",
+    "=SUM (A1)",
+    "abc",
+]
+
+
+def as_tuples(tokens):
+    return [(token.value, token.type, token.subtype) for token in tokens]
+
+
+def test_tokenize_function_and_references():
+    assert tokenize("=SUM(A1:B3,$C$1)") == [
+        Token("SUM(", Token.FUNC, Token.OPEN),
+        Token("A1:B3", Token.OPERAND, Token.RANGE),
+        Token(",", Token.SEP, Token.ARG),
+        Token("$C$1", Token.OPERAND, Token.RANGE),
+        Token(")", Token.FUNC, Token.CLOSE),
+    ]
+
+
+def test_tokenize_operators_and_literals():
+    assert tokenize('=-A1*2.5%&"x"') == [
+        Token("-", Token.OP_PRE),
+        Token("A1", Token.OPERAND, Token.RANGE),
+        Token("*", Token.OP_IN),
+        Token("2.5", Token.OPERAND, Token.NUMBER),
+        Token("%", Token.OP_POST),
+        Token("&", Token.OP_IN),
+        Token('"x"', Token.OPERAND, Token.TEXT),
+    ]
+    assert tokenize("=(A1)-TRUE") == [
+        Token("(", Token.PAREN, Token.OPEN),
+        Token("A1", Token.OPERAND, Token.RANGE),
+        Token(")", Token.PAREN, Token.CLOSE),
+        Token("-", Token.OP_IN),
+        Token("TRUE", Token.OPERAND, Token.LOGICAL),
+    ]
+
+
+@pytest.mark.parametrize("formula_string", ["=SUM(A1", "=A1)", '="abc', "={1,2)", "=#FOO"])
+def test_tokenize_syntax_error(formula_string):
+    with pytest.raises(FormulaStringSyntaxErrorException):
+        tokenize(formula_string)
+
+
+@pytest.mark.parametrize("formula_string", formula_strings)
+def test_tokenize_matches_openpyxl(formula_string):
+    tokenizer = pytest.importorskip("openpyxl.formula.tokenizer")
+    expected = as_tuples(tokenizer.Tokenizer(formula_string).items)
+    assert as_tuples(tokenize(formula_string)) == expected
@@ -0,0 +1,90 @@
+#  Copyright 2022-2023 The FormS Authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+import pandas as pd
+
+from forms.core.forms import from_df
+from forms.utils.metrics import EXECUTION_TIME, TOTAL_TIME, TRACE
+from forms.utils.tracing import Tracer, to_chrome_trace
+
+df = pd.DataFrame({"col1": list(range(10)), "col2": list(range(10, 20))})
+
+
+def test_span_nesting():
+    tracer = Tracer()
+    with tracer.span("outer") as outer:
+        with tracer.span("inner"):
+            pass
+        tracer.create_span("created")
+    assert tracer.get_root_spans() == [outer]
+    assert [child.name for child in outer.children] == ["inner", "created"]
+    assert outer.wall_time >= outer.children[0].wall_time
+
+
+def test_extend_to_children():
+    tracer = Tracer()
+    parent = tracer.create_span("parent")
+    child = tracer.create_span("child", parent)
+    child.start_time, child.wall_time = 100, 50
+    parent.start_time, parent.wall_time = 160, 10
+    parent.extend_to_children()
+    assert (parent.start_time, parent.wall_time) == (100, 70)
+
+
+def test_trace_follows_plan_tree():
+    wb = from_df(df, enable_rewriting=False, enable_fusion=False)
+    wb.compute_formula("=SUM(A1:B3)+ABS(MAX(A1,B$2))")
+    metrics = wb.get_metrics()
+    assert isinstance(metrics[EXECUTION_TIME], int)
+    assert metrics[TOTAL_TIME] >= metrics[EXECUTION_TIME]
+
+    formula_span = metrics[TRACE][0]
+    assert formula_span["attributes"]["backend"] == "df"
+    assert [span["name"] for span in formula_span["children"]] == ["compile", "execute"]
+
+    plus_span = formula_span["children"][1]["children"][0]
+    assert plus_span["name"] == "PLUS"
+    assert plus_span["attributes"]["executor"] == "plus_df_executor"
+    assert plus_span["attributes"]["output_rows"] == 10
+    assert [span["name"] for span in plus_span["children"]] == ["SUM", "ABS"]
+    max_span = plus_span["children"][1]["children"][0]
+    assert max_span["name"] == "MAX"
+    assert max_span["attributes"]["input_rows"] == 20
+    assert max_span["attributes"]["output_bytes"] > 0
+    wb.close()
+
+
+def test_trace_of_fused_plan():
+    wb = from_df(df, enable_rewriting=False)
+    wb.compute_formula("=SUM(A1:B3)+ABS(MAX(A1,B$2))")
+    execute_span = wb.get_metrics()[TRACE][0]["children"][1]
+    plus_span = execute_span["children"][0]
+    assert plus_span["attributes"]["executor"] == "fused_df_executor"
+    assert [span["name"] for span in plus_span["children"]] == ["SUM", "MAX"]
+    wb.close()
+
+
+def test_export_chrome_trace(tmp_path):
+    wb = from_df(df, enable_rewriting=False)
+    wb.compute_formula("=SUM(A1:A2)")
+    path = tmp_path / "trace.json"
+    wb.export_chrome_trace(str(path))
+    with open(path) as f:
+        trace = json.load(f)
+    names = [event["name"] for event in trace["traceEvents"]]
+    assert names == ["formula", "compile", "execute", "SUM"]
+    assert all(event["ph"] == "X" and event["dur"] >= 0 for event in trace["traceEvents"])
+    assert to_chrome_trace(wb.get_trace()) == trace
+    wb.close()